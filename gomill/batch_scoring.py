@@ -0,0 +1,106 @@
+"""Area scoring for many positions at once, using NumPy.
+
+This module requires the numpy package.
+
+Positions are represented as a NumPy array of shape (number of positions,
+size, size), with values EMPTY, BLACK, and WHITE. Array indices are (position
+number, row, col), using the same coordinate system as boards.Board.
+
+"""
+
+import numpy
+
+EMPTY = 0
+BLACK = 1
+WHITE = 2
+
+def stack_boards(boards):
+    """Make a positions array from a sequence of Boards.
+
+    boards -- nonempty sequence of boards.Board, all of the same size
+
+    Returns a uint8 array of shape (len(boards), size, size).
+
+    Raises ValueError if the boards aren't all the same size.
+
+    """
+    boards = list(boards)
+    if not boards:
+        raise ValueError("no boards")
+    size = boards[0].side
+    stride = size + 2
+    positions = numpy.empty((len(boards), size, size), numpy.uint8)
+    for number, board in enumerate(boards):
+        if board.side != size:
+            raise ValueError("boards have different sizes")
+        # Board keeps its position in a padded array using the same codes as
+        # this module, so we can copy the interior across directly.
+        padded = numpy.frombuffer(board._board, numpy.uint8)
+        positions[number] = padded.reshape(stride, stride)[1:-1, 1:-1]
+    return positions
+
+def _spread(reached, empty):
+    """Extend sets of points to the orthogonally adjacent empty points.
+
+    reached -- bool array of shape (..., size, size)
+    empty   -- bool array of the same shape
+
+    Updates 'reached' in place, adding all the points in 'empty' which are
+    adjacent to a point in 'reached'.
+
+    """
+    grown = reached.copy()
+    grown[..., 1:, :] |= reached[..., :-1, :]
+    grown[..., :-1, :] |= reached[..., 1:, :]
+    grown[..., :, 1:] |= reached[..., :, :-1]
+    grown[..., :, :-1] |= reached[..., :, 1:]
+    grown &= empty
+    reached |= grown
+
+def _reached_from(stones, empty):
+    """Find the empty points connected to the specified stones.
+
+    stones -- bool array of shape (..., size, size)
+    empty  -- bool array of the same shape
+
+    Returns a bool array with True for each empty point in an empty region
+    which borders on one of 'stones'.
+
+    """
+    reached = stones.copy()
+    count = reached.sum()
+    while True:
+        _spread(reached, empty)
+        new_count = reached.sum()
+        if new_count == count:
+            return reached & empty
+        count = new_count
+
+def area_scores(positions):
+    """Calculate the area scores of many positions.
+
+    positions -- array-like of shape (number of positions, size, size)
+                 (see the module docstring)
+
+    Returns an int array of length (number of positions), giving black score
+    minus white score for each position.
+
+    The results are the same as boards.Board.area_score() would give: all
+    stones are assumed to be alive, and an empty region counts for each colour
+    which it borders.
+
+    The empty regions are found by repeatedly growing the sets of points
+    reachable from each colour's stones, for all the positions at once; the
+    number of iterations needed depends on the length of the longest path
+    through an empty region.
+
+    """
+    positions = numpy.asarray(positions)
+    if positions.ndim != 3 or positions.shape[1] != positions.shape[2]:
+        raise ValueError("positions array has the wrong shape")
+    empty = (positions == EMPTY)
+    # Handle both colours together: axis 0 is (black, white)
+    stones = numpy.array([positions == BLACK, positions == WHITE])
+    areas = stones | _reached_from(stones, numpy.array([empty, empty]))
+    counts = areas.sum(axis=3).sum(axis=2).astype(int)
+    return counts[0] - counts[1]
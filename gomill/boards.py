@@ -1,34 +1,95 @@
 """Go board representation."""
 
+from array import array
 from itertools import chain
+import random
 
 from gomill.common import *
 
-class _Group(object):
-    """Represent a solidly-connected group.
+# Contents of the board array
+_EMPTY = 0
+_BLACK = 1
+_WHITE = 2
+_BORDER = 3
+
+_colour_codes = {'b' : _BLACK, 'w' : _WHITE}
+_colours = (None, 'b', 'w')
+
+class _Geometry(object):
+    """Precalculated layout information for a given board size.
 
     Public attributes:
-      colour
-      points
-      is_surrounded
+      side         -- board size
+      stride       -- distance between the starts of successive rows
+      board_points -- list of coordinates of all points on the board
+      indices      -- list of array indices of all points on the board
+      point_at     -- list mapping array index -> (row, col) or None
+      neighbours   -- list mapping array index -> tuple of the indices of its
+                      on-board neighbours (empty for border positions)
+      empty_array  -- board array for the empty board
+      zobrist      -- tuple of lists, indexed by array value then array index,
+                      giving the Zobrist hash key for each (colour, point)
 
-    Points are coordinate pairs (row, col).
+    The board array has a one-position border of _BORDER all round. The
+    array index of (row, col) is (row+1)*stride + (col+1).
 
-    """
+    board_points and indices are in the same order.
 
-class _Region(object):
-    """Represent an empty region.
+    Geometry objects are shared between all boards of the same size, so must
+    be treated as read-only.
 
-    Public attributes:
-      points
-      neighbouring_colours
+    """
+    def __init__(self, side):
+        self.side = side
+        stride = self.stride = side + 2
+        size = stride * stride
+        self.board_points = [(_row, _col) for _row in range(side)
+                             for _col in range(side)]
+        self.indices = [(row+1)*stride + col+1
+                        for (row, col) in self.board_points]
+        self.point_at = [None] * size
+        self.neighbours = [()] * size
+        empty_array = array('B', [_BORDER]) * size
+        for point, index in zip(self.board_points, self.indices):
+            self.point_at[index] = point
+            empty_array[index] = _EMPTY
+        for index in self.indices:
+            candidates = (index-stride, index-1, index+1, index+stride)
+            self.neighbours[index] = tuple(
+                [neighbour for neighbour in candidates
+                 if empty_array[neighbour] != _BORDER])
+        self.empty_array = empty_array
+        # Seeded by board size, so hashes are reproducible between runs.
+        rng = random.Random(side)
+        self.zobrist = (None,
+                        [rng.getrandbits(64) for _ in xrange(size)],
+                        [rng.getrandbits(64) for _ in xrange(size)])
+
+_geometries = {}
+
+def _get_geometry(side):
+    """Return the (cached) _Geometry for the specified board size."""
+    try:
+        return _geometries[side]
+    except KeyError:
+        geometry = _geometries[side] = _Geometry(side)
+        return geometry
+
+class _Chain(object):
+    """Represent a solidly-connected group, together with its liberties.
 
-    Points are coordinate pairs (row, col).
+    Public attributes:
+      colour    -- array value (_BLACK or _WHITE)
+      points    -- set of array indices
+      liberties -- set of array indices
 
     """
-    def __init__(self):
-        self.points = set()
-        self.neighbouring_colours = set()
+    __slots__ = ('colour', 'points', 'liberties')
+
+    def __init__(self, colour, points, liberties):
+        self.colour = colour
+        self.points = points
+        self.liberties = liberties
 
 class Board(object):
     """A legal Go position.
@@ -39,94 +100,179 @@ class Board(object):
       side         -- board size (int >= 2)
       board_points -- list of coordinates of all points on the board
 
+    The position is stored in a flat array of bytes with a border (see
+    _Geometry).
+
+    The board keeps track of the solidly-connected groups ('chains') and their
+    liberties as stones are played, so play() only has to examine the
+    neighbourhood of the new stone. The chain information is calculated
+    lazily after copy() and apply_setup().
+
+    The board also maintains a Zobrist hash of the position (see
+    get_zobrist_hash()).
+
+    If keep_undo_journal is true, the board keeps a journal of the changes made
+    by play() and apply_setup(), so that they can be reverted cheaply (see
+    undo()).
+
     """
-    def __init__(self, side):
+    def __init__(self, side, keep_undo_journal=False):
         self.side = side
         if side < 2:
             raise ValueError
-        self.board_points = [(_row, _col) for _row in range(side)
-                             for _col in range(side)]
-        self.board = []
-        for row in range(side):
-            self.board.append([None] * side)
+        self._geometry = _get_geometry(side)
+        self.board_points = self._geometry.board_points
+        self._board = self._geometry.empty_array[:]
         self._is_empty = True
+        self._hash = 0
+        # list mapping array index -> _Chain, or None if not calculated
+        self._chain_at = None
+        # list of tuples describing each change, for undo(), or None if the
+        # journal isn't kept
+        #  play():        (index, captured colour, captured indices,
+        #                  previous hash, previous is_empty)
+        #  apply_setup(): (None, previous board array,
+        #                  previous hash, previous is_empty)
+        if keep_undo_journal:
+            self._journal = []
+        else:
+            self._journal = None
+
+    def copy(self, keep_undo_journal=None):
+        """Return an independent copy of this Board.
+
+        keep_undo_journal -- bool (default: as for this board)
+
+        The copy's undo journal starts empty.
 
-    def copy(self):
-        """Return an independent copy of this Board."""
-        b = Board(self.side)
-        b.board = [self.board[i][:] for i in xrange(self.side)]
+        """
+        if keep_undo_journal is None:
+            keep_undo_journal = (self._journal is not None)
+        b = Board.__new__(Board)
+        b.side = self.side
+        b._geometry = self._geometry
+        b.board_points = self.board_points
+        b._board = self._board[:]
         b._is_empty = self._is_empty
+        b._hash = self._hash
+        b._chain_at = None
+        if keep_undo_journal:
+            b._journal = []
+        else:
+            b._journal = None
         return b
 
-    def _make_group(self, row, col, colour):
-        points = set()
-        is_surrounded = True
-        to_handle = set()
-        to_handle.add((row, col))
+    def _make_chain(self, index):
+        board = self._board
+        neighbours = self._geometry.neighbours
+        colour = board[index]
+        points = set([index])
+        liberties = set()
+        to_handle = [index]
         while to_handle:
-            point = to_handle.pop()
-            points.add(point)
-            r, c = point
-            for neighbour in [(r-1, c), (r+1, c), (r, c-1), (r, c+1)]:
-                (r1, c1) = neighbour
-                if not ((0 <= r1 < self.side) and (0 <= c1 < self.side)):
-                    continue
-                neigh_colour = self.board[r1][c1]
-                if neigh_colour is None:
-                    is_surrounded = False
-                elif neigh_colour == colour:
-                    if neighbour not in points:
-                        to_handle.add(neighbour)
-        group = _Group()
-        group.colour = colour
-        group.points = points
-        group.is_surrounded = is_surrounded
-        return group
-
-    def _make_empty_region(self, row, col):
-        points = set()
-        neighbouring_colours = set()
-        to_handle = set()
-        to_handle.add((row, col))
-        while to_handle:
-            point = to_handle.pop()
-            points.add(point)
-            r, c = point
-            for neighbour in [(r-1, c), (r+1, c), (r, c-1), (r, c+1)]:
-                (r1, c1) = neighbour
-                if not ((0 <= r1 < self.side) and (0 <= c1 < self.side)):
-                    continue
-                neigh_colour = self.board[r1][c1]
-                if neigh_colour is None:
-                    if neighbour not in points:
-                        to_handle.add(neighbour)
-                else:
-                    neighbouring_colours.add(neigh_colour)
-        region = _Region()
-        region.points = points
-        region.neighbouring_colours = neighbouring_colours
-        return region
-
-    def _find_surrounded_groups(self):
-        """Find solidly-connected groups with 0 liberties.
-
-        Returns a list of _Groups.
+            for neighbour in neighbours[to_handle.pop()]:
+                neigh_colour = board[neighbour]
+                if neigh_colour == _EMPTY:
+                    liberties.add(neighbour)
+                elif neigh_colour == colour and neighbour not in points:
+                    points.add(neighbour)
+                    to_handle.append(neighbour)
+        return _Chain(colour, points, liberties)
+
+    def _get_chains(self):
+        """Return the chain list, calculating it if necessary."""
+        chain_at = self._chain_at
+        if chain_at is not None:
+            return chain_at
+        board = self._board
+        chain_at = self._chain_at = [None] * len(board)
+        for index in self._geometry.indices:
+            if board[index] == _EMPTY or chain_at[index] is not None:
+                continue
+            group = self._make_chain(index)
+            for point in group.points:
+                chain_at[point] = group
+        return chain_at
+
+    def _recalculate_chains(self, indices):
+        """Recalculate the chains containing the specified points.
+
+        indices -- iterable of array indices (empty points are ignored)
 
         """
-        surrounded = []
-        handled = set()
-        for (row, col) in self.board_points:
-            colour = self.board[row][col]
-            if colour is None:
+        board = self._board
+        chain_at = self._chain_at
+        done = set()
+        for index in indices:
+            if board[index] == _EMPTY or index in done:
                 continue
-            point = (row, col)
-            if point in handled:
+            group = self._make_chain(index)
+            done |= group.points
+            for point in group.points:
+                chain_at[point] = group
+
+    def _merge_chains(self, chain1, chain2):
+        """Merge two chains of the same colour.
+
+        Returns the merged chain (which is one of the two originals).
+
+        """
+        if len(chain1.points) < len(chain2.points):
+            chain1, chain2 = chain2, chain1
+        chain1.points |= chain2.points
+        chain1.liberties |= chain2.liberties
+        chain_at = self._chain_at
+        for point in chain2.points:
+            chain_at[point] = chain1
+        return chain1
+
+    def _remove_chain(self, group):
+        """Remove a chain's stones from the board.
+
+        The removed points become liberties of the neighbouring chains.
+
+        """
+        board = self._board
+        chain_at = self._chain_at
+        neighbours = self._geometry.neighbours
+        keys = self._geometry.zobrist[group.colour]
+        h = self._hash
+        for point in group.points:
+            board[point] = _EMPTY
+            chain_at[point] = None
+            h ^= keys[point]
+        self._hash = h
+        for point in group.points:
+            for neighbour in neighbours[point]:
+                neigh_chain = chain_at[neighbour]
+                if neigh_chain is not None:
+                    neigh_chain.liberties.add(point)
+
+    def _check_consistent(self):
+        chain_at = self._get_chains()
+        for index in self._geometry.indices:
+            if self._board[index] == _EMPTY:
+                assert chain_at[index] is None
                 continue
-            group = self._make_group(row, col, colour)
-            if group.is_surrounded:
-                surrounded.append(group)
-            handled.update(group.points)
-        return surrounded
+            expected = self._make_chain(index)
+            group = chain_at[index]
+            assert group.colour == expected.colour
+            assert group.points == expected.points
+            assert group.liberties == expected.liberties
+            assert group.liberties
+            for point in group.points:
+                assert chain_at[point] is group
+        assert self._hash == self._calculate_hash()
+
+    def _calculate_hash(self):
+        board = self._board
+        zobrist = self._geometry.zobrist
+        h = 0
+        for index in self._geometry.indices:
+            colour = board[index]
+            if colour != _EMPTY:
+                h ^= zobrist[colour][index]
+        return h
 
     def is_empty(self):
         """Say whether the board is empty."""
@@ -140,9 +286,22 @@ class Board(object):
         Raises IndexError if the coordinates are out of range.
 
         """
-        if row < 0 or col < 0:
+        side = self.side
+        if row < 0 or col < 0 or row >= side or col >= side:
             raise IndexError
-        return self.board[row][col]
+        return _colours[self._board[(row+1)*(side+2) + col+1]]
+
+    def get_zobrist_hash(self):
+        """Return a hash of the position.
+
+        Returns a nonnegative int (less than 2**64).
+
+        Boards of the same size with the same position always have the same
+        hash; the hash of an empty board is 0. The hash is maintained
+        incrementally, so this is cheap to call.
+
+        """
+        return self._hash
 
     def play(self, row, col, colour):
         """Play a move on the board.
@@ -157,31 +316,60 @@ class Board(object):
         Returns the point forbidden by simple ko, or None
 
         """
-        if row < 0 or col < 0:
+        side = self.side
+        if row < 0 or col < 0 or row >= side or col >= side:
             raise IndexError
-        opponent = opponent_of(colour)
-        if self.board[row][col] is not None:
+        try:
+            colour = _colour_codes[colour]
+        except KeyError:
             raise ValueError
-        self.board[row][col] = colour
+        index = (row+1)*(side+2) + col+1
+        board = self._board
+        if board[index] != _EMPTY:
+            raise ValueError
+        chain_at = self._get_chains()
+        hash_before = self._hash
+        was_empty = self._is_empty
+        board[index] = colour
         self._is_empty = False
-        surrounded = self._find_surrounded_groups()
+        self._hash ^= self._geometry.zobrist[colour][index]
+        group = _Chain(colour, set([index]), set())
+        chain_at[index] = group
+        to_capture = []
+        for neighbour in self._geometry.neighbours[index]:
+            neigh_chain = chain_at[neighbour]
+            if neigh_chain is None:
+                group.liberties.add(neighbour)
+                continue
+            neigh_chain.liberties.discard(index)
+            if neigh_chain.colour != colour:
+                if not neigh_chain.liberties and neigh_chain not in to_capture:
+                    to_capture.append(neigh_chain)
+            elif neigh_chain is not group:
+                group = self._merge_chains(group, neigh_chain)
         simple_ko_point = None
-        if surrounded:
-            if len(surrounded) == 1:
-                to_capture = surrounded
-                if len(to_capture[0].points) == self.side*self.side:
-                    self._is_empty = True
-            else:
-                to_capture = [group for group in surrounded
-                              if group.colour == opponent]
-                if len(to_capture) == 1 and len(to_capture[0].points) == 1:
-                    self_capture = [group for group in surrounded
-                                    if group.colour == colour]
-                    if len(self_capture[0].points) == 1:
-                        (simple_ko_point,) = to_capture[0].points
-            for group in to_capture:
-                for r, c in group.points:
-                    self.board[r][c] = None
+        if to_capture:
+            if (len(to_capture) == 1 and not group.liberties and
+                len(group.points) == 1 and len(to_capture[0].points) == 1):
+                (ko_index,) = to_capture[0].points
+                simple_ko_point = self._geometry.point_at[ko_index]
+            captured_colour = to_capture[0].colour
+            captured = []
+            for dead in to_capture:
+                captured.extend(dead.points)
+                self._remove_chain(dead)
+        elif not group.liberties:
+            captured_colour = colour
+            captured = list(group.points)
+            self._remove_chain(group)
+            if len(group.points) == side*side:
+                self._is_empty = True
+        else:
+            captured_colour = None
+            captured = ()
+        if self._journal is not None:
+            self._journal.append(
+                (index, captured_colour, captured, hash_before, was_empty))
         return simple_ko_point
 
     def apply_setup(self, black_points, white_points, empty_points):
@@ -202,38 +390,132 @@ class Board(object):
         Raises IndexError if any coordinates are out of range.
 
         """
+        side = self.side
         for (row, col) in chain(black_points, white_points, empty_points):
-            if row < 0 or col < 0 or row >= self.side or col >= self.side:
+            if row < 0 or col < 0 or row >= side or col >= side:
                 raise IndexError
+        stride = side + 2
+        board = self._board
+        if self._journal is not None:
+            self._journal.append(
+                (None, board[:], self._hash, self._is_empty))
         for (row, col) in black_points:
-            self.board[row][col] = 'b'
+            board[(row+1)*stride + col+1] = _BLACK
         for (row, col) in white_points:
-            self.board[row][col] = 'w'
+            board[(row+1)*stride + col+1] = _WHITE
         for (row, col) in empty_points:
-            self.board[row][col] = None
-        captured = self._find_surrounded_groups()
-        for group in captured:
-            for row, col in group.points:
-                self.board[row][col] = None
+            board[(row+1)*stride + col+1] = _EMPTY
+        self._chain_at = None
+        self._hash = self._calculate_hash()
+        captured = {}
+        for group in self._get_chains():
+            if group is not None and not group.liberties:
+                captured[id(group)] = group
+        for group in captured.itervalues():
+            self._remove_chain(group)
         self._is_empty = True
-        for (row, col) in self.board_points:
-            if self.board[row][col] is not None:
+        for index in self._geometry.indices:
+            if board[index] != _EMPTY:
                 self._is_empty = False
                 break
         return not(captured)
 
+    def _is_legal_index(self, index, colour, chain_at):
+        """Check legality of a move to an empty point.
+
+        index    -- array index of an empty point
+        colour   -- array value (_BLACK or _WHITE)
+        chain_at -- result of _get_chains()
+
+        Returns False if the move would be a self-capture.
+
+        """
+        board = self._board
+        for neighbour in self._geometry.neighbours[index]:
+            neigh_colour = board[neighbour]
+            if neigh_colour == _EMPTY:
+                return True
+            liberty_count = len(chain_at[neighbour].liberties)
+            if neigh_colour == colour:
+                if liberty_count > 1:
+                    return True
+            elif liberty_count == 1:
+                return True
+        return False
+
+    def is_legal(self, row, col, colour, ko_point=None,
+                 allow_self_capture=False):
+        """Say whether a move would be legal.
+
+        row, col           -- coordinates of the move
+        colour             -- colour to play
+        ko_point           -- point forbidden by simple ko, or None
+        allow_self_capture -- bool (default False)
+
+        Returns False if the point is occupied, is the ko point, or (unless
+        allow_self_capture is true) if the move would be a self-capture.
+
+        Raises IndexError if the coordinates are out of range.
+
+        Doesn't change the board.
+
+        """
+        side = self.side
+        if row < 0 or col < 0 or row >= side or col >= side:
+            raise IndexError
+        try:
+            colour = _colour_codes[colour]
+        except KeyError:
+            raise ValueError
+        index = (row+1)*(side+2) + col+1
+        if self._board[index] != _EMPTY or (row, col) == ko_point:
+            return False
+        if allow_self_capture:
+            return True
+        return self._is_legal_index(index, colour, self._get_chains())
+
+    def legal_moves(self, colour, ko_point=None, allow_self_capture=False):
+        """List the legal moves for a player.
+
+        colour             -- colour to play
+        ko_point           -- point forbidden by simple ko, or None
+        allow_self_capture -- bool (default False)
+
+        Returns a list of points (row, col), in the same order as
+        board_points.
+
+        The moves returned are those for which is_legal() would return True.
+
+        Doesn't change the board.
+
+        """
+        try:
+            colour = _colour_codes[colour]
+        except KeyError:
+            raise ValueError
+        board = self._board
+        point_at = self._geometry.point_at
+        candidates = [index for index in self._geometry.indices
+                      if board[index] == _EMPTY]
+        if not allow_self_capture:
+            chain_at = self._get_chains()
+            is_legal_index = self._is_legal_index
+            candidates = [index for index in candidates
+                          if is_legal_index(index, colour, chain_at)]
+        return [point_at[index] for index in candidates
+                if point_at[index] != ko_point]
+
     def list_occupied_points(self):
         """List all nonempty points.
 
         Returns a list of pairs (colour, (row, col))
 
         """
-        result = []
-        for (row, col) in self.board_points:
-            colour = self.board[row][col]
-            if colour is not None:
-                result.append((colour, (row, col)))
-        return result
+        board = self._board
+        point_at = self._geometry.point_at
+        return [(_colours[board[index]], point_at[index])
+                for index in self._geometry.indices
+                if board[index] != _EMPTY]
 
     def area_score(self):
         """Calculate the area score of a position.
@@ -245,21 +527,103 @@ class Board(object):
         Doesn't take komi into account.
 
         """
-        scores = {'b' : 0, 'w' : 0}
-        handled = set()
-        for (row, col) in self.board_points:
-            colour = self.board[row][col]
-            if colour is not None:
+        board = self._board
+        neighbours = self._geometry.neighbours
+        scores = [0, 0, 0, 0]
+        handled = array('B', [0]) * len(board)
+        for index in self._geometry.indices:
+            colour = board[index]
+            if colour != _EMPTY:
                 scores[colour] += 1
                 continue
-            point = (row, col)
-            if point in handled:
+            if handled[index]:
                 continue
-            region = self._make_empty_region(row, col)
-            region_size = len(region.points)
-            for colour in ('b', 'w'):
-                if colour in region.neighbouring_colours:
-                    scores[colour] += region_size
-            handled.update(region.points)
-        return scores['b'] - scores['w']
+            # Flood-fill the empty region containing this point
+            handled[index] = 1
+            region_size = 0
+            neighbouring_colours = 0
+            to_handle = [index]
+            while to_handle:
+                point = to_handle.pop()
+                region_size += 1
+                for neighbour in neighbours[point]:
+                    neigh_colour = board[neighbour]
+                    if neigh_colour == _EMPTY:
+                        if not handled[neighbour]:
+                            handled[neighbour] = 1
+                            to_handle.append(neighbour)
+                    else:
+                        neighbouring_colours |= neigh_colour
+            if neighbouring_colours & _BLACK:
+                scores[_BLACK] += region_size
+            if neighbouring_colours & _WHITE:
+                scores[_WHITE] += region_size
+        return scores[_BLACK] - scores[_WHITE]
+
+    def undo(self):
+        """Undo the most recent change made by play() or apply_setup().
+
+        Raises ValueError if there is nothing to undo, or if the board doesn't
+        keep an undo journal.
+
+        Only changes made since the board was created (or copied) can be
+        undone. Undoing a play() takes time proportional to the number of
+        stones it captured and the sizes of the neighbouring groups.
 
+        """
+        if self._journal is None:
+            raise ValueError("board has no undo journal")
+        try:
+            entry = self._journal.pop()
+        except IndexError:
+            raise ValueError("nothing to undo")
+        index = entry[0]
+        if index is None:
+            _, self._board, self._hash, self._is_empty = entry
+            self._chain_at = None
+            return
+        _, captured_colour, captured, self._hash, self._is_empty = entry
+        board = self._board
+        for point in captured:
+            board[point] = captured_colour
+        board[index] = _EMPTY
+        chain_at = self._chain_at
+        if chain_at is None:
+            return
+        chain_at[index] = None
+        neighbours = self._geometry.neighbours
+        to_recalculate = list(neighbours[index])
+        for point in captured:
+            to_recalculate.append(point)
+            to_recalculate.extend(neighbours[point])
+        self._recalculate_chains(to_recalculate)
+
+    def checkpoint(self):
+        """Return a token representing the current state of the board.
+
+        Pass the token to restore() to return to this state.
+
+        A token remains valid until undo() or restore() is used to go back
+        past the point at which it was created.
+
+        Raises ValueError if the board doesn't keep an undo journal.
+
+        """
+        if self._journal is None:
+            raise ValueError("board has no undo journal")
+        return len(self._journal)
+
+    def restore(self, checkpoint):
+        """Return to the state represented by a token from checkpoint().
+
+        This undoes all changes made since the checkpoint was taken (see
+        undo()).
+
+        Raises ValueError if the token is no longer valid.
+
+        """
+        journal = self._journal
+        if journal is None or not 0 <= checkpoint <= len(journal):
+            raise ValueError("invalid checkpoint")
+        while len(journal) > checkpoint:
+            self.undo()
@@ -429,6 +429,7 @@ class Cem_tuner(Competition):
         job.board_size = self.board_size
         job.komi = self.komi
         job.move_limit = self.move_limit
+        job.superko_rule = self.superko_rule
         job.handicap = self.handicap
         job.handicap_is_free = (self.handicap_style == 'free')
         job.use_internal_scorer = (self.scorer == 'internal')
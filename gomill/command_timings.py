@@ -0,0 +1,189 @@
+"""Record how long GTP engines take to respond to commands.
+
+See Gtp_controller.set_command_timings().
+
+"""
+
+import math
+
+from gomill import ascii_tables
+
+
+# Times are recorded in a histogram whose buckets grow geometrically: bucket n
+# holds times t with _MIN_TIME * _RATIO**(n-1) < t <= _MIN_TIME * _RATIO**n
+# (bucket 0 holds everything up to _MIN_TIME). So percentiles are accurate to
+# about 10%, and a histogram covering times from 10us to a day has fewer than
+# 300 buckets.
+_MIN_TIME = 1e-5
+_RATIO = 2 ** 0.125
+_LOG_RATIO = math.log(_RATIO)
+
+def _bucket_for_time(seconds):
+    if seconds <= _MIN_TIME:
+        return 0
+    return int(math.ceil(math.log(seconds / _MIN_TIME) / _LOG_RATIO))
+
+def _bucket_upper_bound(bucket):
+    return _MIN_TIME * _RATIO ** bucket
+
+
+class Timing_summary(object):
+    """Summary statistics for one command.
+
+    Public attributes:
+      count -- int
+      total -- float (seconds)
+      mean  -- float (seconds)
+      p50   -- float (seconds)
+      p95   -- float (seconds)
+      p99   -- float (seconds)
+      max   -- float (seconds)
+
+    The percentiles are approximate (they may be up to about 10% too high),
+    but never greater than max.
+
+    """
+    def as_dict(self):
+        return dict((name, getattr(self, name))
+                    for name in ('count', 'total', 'mean',
+                                 'p50', 'p95', 'p99', 'max'))
+
+
+class Command_timings(object):
+    """Response times for GTP commands, grouped by command name.
+
+    Use record() to add a time, and get_summary() to retrieve statistics.
+
+    Command_timings objects are suitable for pickling.
+
+    """
+    def __init__(self):
+        # Map command name -> list [count, total, max, {bucket : count}]
+        self._stats = {}
+
+    def record(self, command, seconds):
+        """Record the time taken to respond to a command.
+
+        command -- string (command name)
+        seconds -- float
+
+        """
+        try:
+            stats = self._stats[command]
+        except KeyError:
+            stats = self._stats[command] = [0, 0.0, 0.0, {}]
+        stats[0] += 1
+        stats[1] += seconds
+        if seconds > stats[2]:
+            stats[2] = seconds
+        buckets = stats[3]
+        bucket = _bucket_for_time(seconds)
+        buckets[bucket] = buckets.get(bucket, 0) + 1
+
+    def merge(self, other):
+        """Add the times recorded in another Command_timings to this one."""
+        for command, (count, total, max_time, other_buckets) in \
+                other._stats.iteritems():
+            try:
+                stats = self._stats[command]
+            except KeyError:
+                stats = self._stats[command] = [0, 0.0, 0.0, {}]
+            stats[0] += count
+            stats[1] += total
+            if max_time > stats[2]:
+                stats[2] = max_time
+            buckets = stats[3]
+            for bucket, n in other_buckets.iteritems():
+                buckets[bucket] = buckets.get(bucket, 0) + n
+
+    def is_empty(self):
+        """Say whether no times have been recorded."""
+        return not self._stats
+
+    def get_commands(self):
+        """Return a sorted list of the command names with recorded times."""
+        return sorted(self._stats)
+
+    def get_summary(self, command):
+        """Return a Timing_summary for the specified command.
+
+        Raises KeyError if there are no times for the command.
+
+        """
+        count, total, max_time, buckets = self._stats[command]
+        summary = Timing_summary()
+        summary.count = count
+        summary.total = total
+        summary.mean = total / count
+        summary.max = max_time
+        ranked = sorted(buckets.iteritems())
+        for name, fraction in (('p50', 0.50), ('p95', 0.95), ('p99', 0.99)):
+            rank = int(math.ceil(fraction * count))
+            seen = 0
+            for bucket, n in ranked:
+                seen += n
+                if seen >= rank:
+                    break
+            setattr(summary, name, min(_bucket_upper_bound(bucket), max_time))
+        return summary
+
+    def get_json_data(self):
+        """Return the recorded times in a form suitable for json.dump().
+
+        Returns a dict command name -> dict with keys
+          count, total, mean, p50, p95, p99, max -- as for Timing_summary
+          histogram -- list of pairs (upper bound in seconds, count)
+
+        Command_timings.from_json_data() recreates the Command_timings.
+
+        """
+        result = {}
+        for command in self._stats:
+            d = self.get_summary(command).as_dict()
+            d['histogram'] = [
+                [_bucket_upper_bound(bucket), n]
+                for bucket, n in sorted(self._stats[command][3].iteritems())]
+            result[command] = d
+        return result
+
+    @classmethod
+    def from_json_data(cls, data):
+        """Make a Command_timings from the result of get_json_data()."""
+        timings = cls()
+        for command, d in data.iteritems():
+            buckets = {}
+            for upper_bound, n in d['histogram']:
+                bucket = _bucket_for_time(upper_bound * (1 - 1e-9))
+                buckets[bucket] = buckets.get(bucket, 0) + n
+            timings._stats[str(command)] = [
+                d['count'], d['total'], d['max'], buckets]
+        return timings
+
+
+def _format_time(seconds):
+    if seconds < 1.0:
+        return "%.1fms" % (seconds * 1000)
+    return "%.2fs" % seconds
+
+def make_timings_table(timings):
+    """Produce an ascii table describing a Command_timings.
+
+    Returns an ascii_tables.Table, with a row for each command.
+
+    """
+    commands = timings.get_commands()
+    summaries = [timings.get_summary(command) for command in commands]
+    t = ascii_tables.Table(row_count=len(commands))
+    t.add_heading("command")
+    i = t.add_column(align='left', right_padding=3)
+    t.set_column_values(i, commands)
+    t.add_heading("count")
+    i = t.add_column(align='right', right_padding=3)
+    t.set_column_values(i, [s.count for s in summaries])
+    for name in ('mean', 'p50', 'p95', 'p99', 'max'):
+        t.add_heading(name)
+        i = t.add_column(align='right', right_padding=2)
+        t.set_column_values(
+            i, [_format_time(getattr(s, name)) for s in summaries])
+    t.columns[i].right_padding = 1
+    return t
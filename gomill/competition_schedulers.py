@@ -73,6 +73,32 @@ class Simple_scheduler(object):
         self.outstanding = set()
         #self._check_consistent()
 
+    def replay_fix(self, token):
+        """Note that a game's result was stored after this state was saved.
+
+        This is for bringing a reloaded scheduler up to date; the token may
+        not have been issued by this scheduler object.
+
+        Any tokens which must have been issued before this one but which
+        haven't been fixed are treated as if they'd been rolled back.
+
+        Raises ValueError if the token has already been fixed.
+
+        """
+        if token in self.outstanding:
+            self.fix(token)
+            return
+        if token in self.to_reissue:
+            self.to_reissue.discard(token)
+        elif token >= self.next_new:
+            self.to_reissue.update(xrange(self.next_new, token))
+            self.next_new = token + 1
+        else:
+            raise ValueError("token %s already fixed" % token)
+        self.issued = self.next_new - len(self.to_reissue)
+        self.fixed += 1
+        #self._check_consistent()
+
 
 class Group_scheduler(object):
     """Schedule multiple lists of games in parallel.
@@ -151,6 +177,20 @@ class Group_scheduler(object):
         for allocator in self.allocators.itervalues():
             allocator.rollback()
 
+    def replay_fix(self, group_code, game_number):
+        """Note that a game's result was stored after this state was saved.
+
+        See Simple_scheduler.replay_fix().
+
+        If the group isn't known, it's added with no limit (a later call to
+        set_groups() will set the limit or forget the group).
+
+        """
+        if group_code not in self.allocators:
+            self.allocators[group_code] = Simple_scheduler()
+            self.limits[group_code] = None
+        self.allocators[group_code].replay_fix(game_number)
+
     def nothing_issued_yet(self):
         """Say whether nothing has been issued yet."""
         return all(allocator.issued == 0
@@ -35,7 +35,8 @@ class Control_file_token(object):
 
 
 _player_settings = [
-    Setting('command', interpret_shlex_sequence),
+    Setting('command', allow_none(interpret_shlex_sequence), default=None),
+    Setting('address', allow_none(interpret_8bit_string), default=None),
     Setting('cwd', allow_none(interpret_8bit_string), default=None),
     Setting('environ',
             allow_none(interpret_map_of(
@@ -50,6 +51,12 @@ _player_settings = [
     Setting('startup_gtp_commands', allow_none(interpret_sequence),
             defaultmaker=list),
     Setting('discard_stderr', interpret_bool, default=False),
+    Setting('command_timeout', allow_none(interpret_positive_float),
+            default=None),
+    Setting('genmove_timeout', allow_none(interpret_positive_float),
+            default=None),
+    Setting('games_per_engine', interpret_positive_int, default=1),
+    Setting('use_pipelining', interpret_bool, default=True),
     ]
 
 class Player_config(Quiet_config):
@@ -237,12 +244,29 @@ class Competition(object):
         player = game_jobs.Player()
         player.code = code
 
-        try:
-            player.cmd_args = config['command']
-            if '/' in player.cmd_args[0]:
-                player.cmd_args[0] = self.resolve_pathname(player.cmd_args[0])
-        except Exception, e:
-            raise ControlFileError("'command': %s" % e)
+        if config['address'] is not None:
+            if config['command'] is not None:
+                raise ControlFileError(
+                    "'command' and 'address' both specified")
+            try:
+                address = gtp_controller.parse_engine_address(
+                    config['address'])
+                if isinstance(address, str):
+                    address = self.resolve_pathname(address)
+            except Exception, e:
+                raise ControlFileError("'address': %s" % e)
+            player.address = address
+            player.cmd_args = None
+        elif config['command'] is None:
+            raise ControlFileError("'command' not specified")
+        else:
+            try:
+                player.cmd_args = config['command']
+                if '/' in player.cmd_args[0]:
+                    player.cmd_args[0] = self.resolve_pathname(
+                        player.cmd_args[0])
+            except Exception, e:
+                raise ControlFileError("'command': %s" % e)
 
         try:
             player.cwd = self.resolve_pathname(config['cwd'])
@@ -284,6 +308,11 @@ class Competition(object):
         if config['discard_stderr']:
             player.discard_stderr = True
 
+        player.command_timeout = config['command_timeout']
+        player.genmove_timeout = config['genmove_timeout']
+        player.games_per_engine = config['games_per_engine']
+        player.use_pipelining = config['use_pipelining']
+
         return player
 
 
@@ -313,6 +342,49 @@ class Competition(object):
         # This is called for the 'show' command, so it mustn't log anything.
         raise NotImplementedError
 
+    # Set this true in subclasses which implement get_journal_record() and
+    # apply_journal_record().
+    uses_results_journal = False
+
+    def get_journal_record(self, response):
+        """Describe the state changes made by process_game_result().
+
+        response -- the game_jobs.Game_job_result which has just been passed
+                    to process_game_result()
+
+        Returns a pickleable value suitable for apply_journal_record().
+
+        This is called only if uses_results_journal is true. In that case the
+        ringmaster doesn't write the full competition state after each game;
+        instead it appends the record to a journal, which it replays when
+        reloading the state.
+
+        Competitions which use the journal mustn't change their persistent
+        state in process_game_error().
+
+        """
+        raise NotImplementedError
+
+    def apply_journal_record(self, status, record):
+        """Update a previously reported state with a journal record.
+
+        status -- value previously reported by get_status()
+        record -- value previously returned by get_journal_record()
+
+        Updates 'status' in place, as if the game result had been processed
+        before get_status() was called.
+
+        This is called before set_status(), with records in the order in which
+        they were created.
+
+        If the record is invalid, CompetitionError may be raised with a
+        description of the error, or any other exception may be raised without
+        a friendly description.
+
+        """
+        # This is called for the 'show' command, so it mustn't log anything.
+        raise NotImplementedError
+
     def get_player_checks(self):
         """List the Player_checks for check_players() to check.
 
@@ -506,6 +578,9 @@ game_settings = [
     Setting('handicap', allow_none(interpret_int), default=None),
     Setting('handicap_style', interpret_enum('fixed', 'free'), default='fixed'),
     Setting('move_limit', interpret_positive_int, default=1000),
+    Setting('superko_rule',
+            allow_none(interpret_enum('positional', 'situational')),
+            default=None),
     Setting('scorer', interpret_enum('internal', 'players'), default='players'),
     Setting('internal_scorer_handicap_compensation',
             interpret_enum('no', 'full', 'short'), default='full'),
@@ -0,0 +1,366 @@
+"""Single-threaded event loop for generator-based coroutines.
+
+This lets a single process wait for many GTP engines at once.
+
+A coroutine is a generator function. Inside a coroutine:
+  - yield another coroutine (a generator) to run it; the yield expression's
+    value is that coroutine's result (or its exception is raised there)
+  - yield a Wait_readable to wait for a file descriptor to become readable
+  - raise Return(value) to return a value (finishing normally returns None)
+
+Exceptions propagate through chains of coroutines in the usual way.
+
+"""
+
+import collections
+import errno
+import heapq
+import select
+import sys
+import time
+import types
+
+
+class Return(Exception):
+    """Exception raised by a coroutine to return a value.
+
+    Use 'raise Return(value)' where an ordinary function would use
+    'return value' (Python 2 generators can't return values).
+
+    """
+    def __init__(self, value=None):
+        Exception.__init__(self, value)
+        self.value = value
+
+class Wait_readable(object):
+    """Request to suspend a coroutine until a file descriptor is readable.
+
+    Instantiate with
+      fd       -- int
+      deadline -- float, as returned by time.time() (or None for no limit)
+
+    The value of the yield expression is True if the file descriptor became
+    readable (this includes reaching end-of-file), or False if the deadline
+    passed first.
+
+    Only one coroutine may wait for a given file descriptor at a time.
+
+    """
+    __slots__ = ('fd', 'deadline')
+
+    def __init__(self, fd, deadline=None):
+        self.fd = fd
+        self.deadline = deadline
+
+
+class _Epoll_poller(object):
+    def __init__(self):
+        self._epoll = select.epoll()
+
+    def register(self, fd):
+        self._epoll.register(fd, select.EPOLLIN | select.EPOLLPRI)
+
+    def unregister(self, fd):
+        self._epoll.unregister(fd)
+
+    def poll(self, timeout):
+        if timeout is None:
+            timeout = -1
+        return [fd for fd, _ in self._epoll.poll(timeout)]
+
+    def close(self):
+        self._epoll.close()
+
+class _Poll_poller(object):
+    def __init__(self):
+        self._poll = select.poll()
+
+    def register(self, fd):
+        self._poll.register(fd, select.POLLIN | select.POLLPRI)
+
+    def unregister(self, fd):
+        self._poll.unregister(fd)
+
+    def poll(self, timeout):
+        if timeout is not None:
+            timeout = int(timeout * 1000 + 1)
+        return [fd for fd, _ in self._poll.poll(timeout)]
+
+    def close(self):
+        pass
+
+def _make_poller():
+    if hasattr(select, 'epoll'):
+        return _Epoll_poller()
+    return _Poll_poller()
+
+
+class Task(object):
+    """A coroutine being run by an Event_loop.
+
+    Public attributes:
+      is_finished -- bool
+      result      -- the coroutine's result (None until it finishes)
+      exc_info    -- triple as from sys.exc_info(), or None
+
+    exc_info is set if the coroutine finished by raising an exception.
+
+    """
+    def __init__(self, coroutine):
+        self.is_finished = False
+        self.result = None
+        self.exc_info = None
+        # Generators making up the coroutine call chain (innermost last)
+        self._stack = [coroutine]
+        # File descriptor we're waiting for, or None
+        self._waiting_fd = None
+        # Incremented for each wait (to recognise stale timers)
+        self._wait_seq = 0
+
+    def get_result(self):
+        """Return the coroutine's result, or raise its exception."""
+        if not self.is_finished:
+            raise StandardError("task is not finished")
+        if self.exc_info is not None:
+            raise self.exc_info[0], self.exc_info[1], self.exc_info[2]
+        return self.result
+
+
+class Event_loop(object):
+    """Run coroutines, waiting for file descriptors with epoll (or poll).
+
+    Normal use:
+      loop = Event_loop()
+      task = loop.start(coroutine)   [as often as you like]
+      finished_tasks = loop.run_until_some_finished()   [repeatedly]
+      loop.close()
+
+    or, to run a single coroutine:
+      result = loop.run_until_complete(coroutine)
+
+    Coroutines run only from within run_until_some_finished() and
+    run_until_complete(). Don't call these recursively from a coroutine (a
+    coroutine may use a separate Event_loop, though this blocks its own loop).
+
+    KeyboardInterrupt and other exceptions which aren't subclasses of
+    Exception are propagated out of the loop rather than being passed to the
+    task's callers.
+
+    """
+    def __init__(self):
+        self._poller = _make_poller()
+        # Tasks ready to run: pairs (task, value)
+        self._ready = collections.deque()
+        # Map fd -> waiting task
+        self._waiting = {}
+        # Heap of tuples (deadline, wait_seq, task)
+        self._timers = []
+        self._tasks = set()
+
+    def start(self, coroutine):
+        """Start running a coroutine.
+
+        coroutine -- generator
+
+        Returns a Task.
+
+        The coroutine doesn't start running until the loop next runs.
+
+        """
+        if not isinstance(coroutine, types.GeneratorType):
+            raise TypeError("not a coroutine: %r" % (coroutine,))
+        task = Task(coroutine)
+        self._tasks.add(task)
+        self._ready.append((task, None))
+        return task
+
+    def has_tasks(self):
+        """Say whether there are any unfinished tasks."""
+        return bool(self._tasks)
+
+    def run_until_some_finished(self):
+        """Run the loop until at least one task finishes.
+
+        Returns a list of Tasks which have finished since this was last called.
+
+        Raises StandardError if there are no unfinished tasks.
+
+        """
+        while True:
+            finished = self._run_once()
+            if finished:
+                return finished
+
+    def run_until_complete(self, coroutine):
+        """Run a coroutine to completion, and return its result.
+
+        Propagates any exception raised by the coroutine.
+
+        Any other tasks are also run while waiting.
+
+        """
+        task = self.start(coroutine)
+        while not task.is_finished:
+            self._run_once()
+        return task.get_result()
+
+    def close(self):
+        """Abandon all unfinished tasks, and release resources.
+
+        The coroutines are closed (so any 'finally' clauses run).
+
+        """
+        for task in list(self._tasks):
+            self._abandon(task)
+        self._ready.clear()
+        self._timers = []
+        self._poller.close()
+
+    def _run_once(self):
+        if not self._ready:
+            if not self._tasks:
+                raise StandardError("no tasks to run")
+            self._wait_for_events()
+        finished = []
+        while self._ready:
+            task, value = self._ready.popleft()
+            self._step(task, value)
+            if task.is_finished:
+                finished.append(task)
+        return finished
+
+    def _wait_for_events(self):
+        timers = self._timers
+        while timers and timers[0][2]._wait_seq != timers[0][1]:
+            heapq.heappop(timers)
+        if timers:
+            timeout = max(0.0, timers[0][0] - time.time())
+        else:
+            timeout = None
+        try:
+            fds = self._poller.poll(timeout)
+        except (IOError, OSError, select.error), e:
+            if e.args[0] != errno.EINTR:
+                raise
+            fds = []
+        for fd in fds:
+            task = self._waiting.get(fd)
+            if task is not None:
+                self._end_wait(task)
+                self._ready.append((task, True))
+        now = time.time()
+        while timers and timers[0][0] <= now:
+            deadline, wait_seq, task = heapq.heappop(timers)
+            if task._wait_seq == wait_seq and task._waiting_fd is not None:
+                self._end_wait(task)
+                self._ready.append((task, False))
+
+    def _begin_wait(self, task, request):
+        fd = request.fd
+        if fd in self._waiting:
+            raise ValueError("already waiting for file descriptor %d" % fd)
+        self._poller.register(fd)
+        self._waiting[fd] = task
+        task._waiting_fd = fd
+        task._wait_seq += 1
+        if request.deadline is not None:
+            heapq.heappush(self._timers,
+                           (request.deadline, task._wait_seq, task))
+
+    def _end_wait(self, task):
+        fd = task._waiting_fd
+        del self._waiting[fd]
+        task._waiting_fd = None
+        task._wait_seq += 1
+        try:
+            self._poller.unregister(fd)
+        except EnvironmentError:
+            # The descriptor may have been closed already
+            pass
+
+    def _step(self, task, value, exc_info=None):
+        """Run a task until it next waits or finishes."""
+        stack = task._stack
+        while True:
+            gen = stack[-1]
+            try:
+                if exc_info is None:
+                    request = gen.send(value)
+                else:
+                    request = gen.throw(*exc_info)
+            except Return, e:
+                value, exc_info = e.value, None
+            except StopIteration:
+                value, exc_info = None, None
+            except Exception:
+                value, exc_info = None, sys.exc_info()
+            else:
+                value, exc_info = None, None
+                if isinstance(request, types.GeneratorType):
+                    stack.append(request)
+                    continue
+                if isinstance(request, Wait_readable):
+                    try:
+                        self._begin_wait(task, request)
+                    except Exception:
+                        exc_info = sys.exc_info()
+                        continue
+                    return
+                exc_info = (TypeError, TypeError(
+                    "bad value yielded by coroutine: %r" % (request,)), None)
+                continue
+            stack.pop()
+            if not stack:
+                self._finish(task, value, exc_info)
+                return
+
+    def _finish(self, task, value, exc_info):
+        task.is_finished = True
+        task.result = value
+        task.exc_info = exc_info
+        self._tasks.discard(task)
+
+    def _abandon(self, task):
+        if task._waiting_fd is not None:
+            self._end_wait(task)
+        while task._stack:
+            try:
+                task._stack.pop().close()
+            except Exception:
+                pass
+        self._finish(task, None, None)
+
+
+def run_blocking(coroutine):
+    """Run a coroutine to completion using a new Event_loop.
+
+    Returns the coroutine's result, or propagates its exception.
+
+    This is for using coroutine-based interfaces from ordinary code.
+
+    """
+    loop = Event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+def run_all(coroutines):
+    """Run several coroutines concurrently using a new Event_loop.
+
+    coroutines -- iterable of generators
+
+    Returns a list of finished Tasks, in the same order as the coroutines.
+
+    Exceptions from the coroutines aren't propagated; use Task.get_result()
+    or examine Task.exc_info.
+
+    """
+    loop = Event_loop()
+    try:
+        tasks = [loop.start(coroutine) for coroutine in coroutines]
+        while loop.has_tasks():
+            loop.run_until_some_finished()
+    finally:
+        loop.close()
+    return tasks
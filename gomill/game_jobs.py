@@ -3,11 +3,13 @@
 import datetime
 import os
 
+from gomill import event_loops
 from gomill import gtp_controller
 from gomill import gtp_games
 from gomill import job_manager
 from gomill import sgf
 from gomill import utils
+from gomill.event_loops import Return
 from gomill.gtp_controller import BadGtpResponse, GtpChannelError
 
 class Player(object):
@@ -18,6 +20,7 @@ class Player(object):
       cmd_args -- list of strings, as for subprocess.Popen
 
     optional attributes:
+      address              -- engine address (default None)
       is_reliable_scorer   -- bool (default True)
       allow_claim          -- bool (default False)
       gtp_aliases          -- map command string -> command string
@@ -25,13 +28,29 @@ class Player(object):
       discard_stderr       -- bool (default False)
       cwd                  -- working directory to change to (default None)
       environ              -- maplike of environment variables (default None)
+      command_timeout      -- float or None (default None)
+      genmove_timeout      -- float or None (default None)
+      games_per_engine     -- int (default 1)
+      use_pipelining       -- bool (default True)
 
-    See gtp_controllers.Gtp_controller for an explanation of gtp_aliases.
+    See gtp_controllers.Gtp_controller for an explanation of gtp_aliases, of
+    the time limits (see Gtp_controller.set_timeouts()), and of use_pipelining
+    (see Gtp_controller.enable_pipelining()).
+
+    If address is not None, cmd_args is ignored (and may be None); instead of
+    starting a subprocess, the game connects to an engine listening at that
+    address (see gtp_controller.Socket_gtp_channel). In this case
+    discard_stderr, cwd and environ have no effect. Each game makes a new
+    connection, unless games_per_engine allows a connection to be reused.
 
     The startup commands will be executed before starting the game. Their
     responses will be ignored, but the game will be aborted if any startup
     command returns an error.
 
+    If games_per_engine is greater than 1, the player's engine subprocess may
+    be kept running at the end of a game and reused (within the same process)
+    for up to that many games in total; see Game_job for details.
+
     By default, the player will be given a copy of the parent process's
     environment variables; use 'environ' to add variables or replace particular
     values.
@@ -40,6 +59,7 @@ class Player(object):
 
     """
     def __init__(self):
+        self.address = None
         self.is_reliable_scorer = True
         self.allow_claim = False
         self.gtp_aliases = {}
@@ -47,6 +67,10 @@ class Player(object):
         self.discard_stderr = False
         self.cwd = None
         self.environ = None
+        self.command_timeout = None
+        self.genmove_timeout = None
+        self.games_per_engine = 1
+        self.use_pipelining = True
 
     def make_environ(self):
         """Return environment variables to use with the player's subprocess.
@@ -63,19 +87,195 @@ class Player(object):
         """Return an independent clone of the Player."""
         result = Player()
         result.code = code
-        result.cmd_args = list(self.cmd_args)
+        if self.cmd_args is None:
+            result.cmd_args = None
+        else:
+            result.cmd_args = list(self.cmd_args)
+        result.address = self.address
         result.is_reliable_scorer = self.is_reliable_scorer
         result.allow_claim = self.allow_claim
         result.gtp_aliases = dict(self.gtp_aliases)
         result.startup_gtp_commands = list(self.startup_gtp_commands)
         result.discard_stderr = self.discard_stderr
         result.cwd = self.cwd
+        result.command_timeout = self.command_timeout
+        result.genmove_timeout = self.genmove_timeout
+        result.games_per_engine = self.games_per_engine
+        result.use_pipelining = self.use_pipelining
         if self.environ is None:
             result.environ = None
         else:
             result.environ = dict(self.environ)
         return result
 
+# Time to wait when connecting to players with an address (seconds)
+connect_timeout = 60.0
+
+def _engine_key(player, stderr_pathname, is_async):
+    """Return a hashable value describing how a player's engine is started.
+
+    is_async -- bool (whether the engine is driven by an Async_gtp_controller)
+
+    Pooled engines are only reused for players with the same key.
+
+    """
+    if player.address is not None:
+        return (player.code, player.address, is_async)
+    if player.environ is None:
+        environ = None
+    else:
+        environ = tuple(sorted(dict(player.environ).items()))
+    return (player.code, tuple(player.cmd_args), player.cwd, environ,
+            stderr_pathname, is_async)
+
+def _close_pooled_engine(engine):
+    """Close a Pooled_engine, waiting until it has closed.
+
+    This mustn't be used from within an event loop for an engine driven by an
+    Async_gtp_controller (use _close_pooled_engine_async() instead).
+
+    """
+    controller = engine.controller
+    if engine.is_async:
+        event_loops.run_blocking(controller.safe_close())
+    else:
+        controller.safe_close()
+
+def _close_pooled_engine_async(engine):
+    """Coroutine variant of _close_pooled_engine()."""
+    if engine.is_async:
+        yield engine.controller.safe_close()
+    else:
+        engine.controller.safe_close()
+
+class Pooled_engine(object):
+    """An engine subprocess which may be used for more than one game.
+
+    Public attributes:
+      key                -- value from _engine_key()
+      controller         -- Gtp_controller
+      engine_description -- Engine_description
+      is_async           -- bool (whether controller is Async_gtp_controller)
+      games_played       -- int
+      cpu_time_baseline  -- float or None
+
+    cpu_time_baseline is the engine's gomill-cpu_time report at the end of its
+    most recent game (0.0 if it hasn't played a game yet, None if unknown).
+
+    """
+    def __init__(self, key, controller, engine_description, is_async):
+        self.key = key
+        self.controller = controller
+        self.engine_description = engine_description
+        self.is_async = is_async
+        self.games_played = 0
+        self.cpu_time_baseline = 0.0
+
+class Engine_pool(object):
+    """Idle engine subprocesses, kept for use in later games.
+
+    Instantiate with the maximum number of idle engines to keep.
+
+    Public attributes:
+      max_idle -- int
+
+    """
+    def __init__(self, max_idle):
+        self.max_idle = max_idle
+        self._idle = []
+
+    def __len__(self):
+        return len(self._idle)
+
+    def take(self, key):
+        """Remove and return an idle engine with the specified key.
+
+        Returns a Pooled_engine, or None if there isn't a suitable one.
+
+        """
+        for i in xrange(len(self._idle)-1, -1, -1):
+            if self._idle[i].key == key:
+                return self._idle.pop(i)
+        return None
+
+    def _add(self, engine):
+        """Add a Pooled_engine to the pool.
+
+        Returns a list of the engines which no longer fit in the pool (those
+        which have been idle longest). The caller must close them.
+
+        """
+        self._idle.append(engine)
+        excess_count = max(len(self._idle) - self.max_idle, 0)
+        excess = self._idle[:excess_count]
+        del self._idle[:excess_count]
+        return excess
+
+    def give_back(self, engine):
+        """Add a Pooled_engine to the pool.
+
+        If this leaves more than max_idle engines in the pool, closes the ones
+        which have been idle longest.
+
+        """
+        for excess_engine in self._add(engine):
+            _close_pooled_engine(excess_engine)
+
+    def give_back_async(self, engine):
+        """Coroutine variant of give_back().
+
+        Use this from within an event loop; other coroutines in the loop can
+        make progress while the excess engines are closing.
+
+        """
+        for excess_engine in self._add(engine):
+            yield _close_pooled_engine_async(excess_engine)
+
+    def close_all(self):
+        """Close all the idle engines.
+
+        Engines driven by an Async_gtp_controller are closed concurrently,
+        using a new event loop, so this mustn't be called from within an event
+        loop.
+
+        """
+        async_engines = []
+        while self._idle:
+            engine = self._idle.pop(0)
+            if engine.is_async:
+                async_engines.append(engine)
+            else:
+                engine.controller.safe_close()
+        if async_engines:
+            event_loops.run_all(
+                [engine.controller.safe_close() for engine in async_engines])
+
+_engine_pool = None
+
+def get_engine_pool(max_idle):
+    """Return this process's Engine_pool, creating it if necessary.
+
+    Sets the pool's max_idle.
+
+    The first call arranges (via job_manager.register_cleanup_function()) for
+    close_engine_pool() to be called when the process stops running jobs.
+
+    """
+    global _engine_pool
+    if _engine_pool is None:
+        _engine_pool = Engine_pool(max_idle)
+        job_manager.register_cleanup_function(close_engine_pool)
+    _engine_pool.max_idle = max_idle
+    return _engine_pool
+
+def close_engine_pool():
+    """Close all engines in this process's Engine_pool, and discard it."""
+    global _engine_pool
+    if _engine_pool is not None:
+        _engine_pool.close_all()
+        _engine_pool = None
+
+
 class Game_job_result(object):
     """Information returned after a worker process plays a game.
 
@@ -86,6 +286,10 @@ class Game_job_result(object):
       warnings              -- list of strings
       log_entries           -- list of strings
       engine_descriptions   -- map player code -> Engine_description
+      command_timings       -- map player code -> Command_timings, or None
+
+    command_timings is None unless the job's record_command_timings
+    attribute was set.
 
     Game_job_results are suitable for pickling.
 
@@ -112,6 +316,7 @@ class Game_job(object):
       game_data           -- arbitrary pickleable data
       handicap            -- int
       handicap_is_free    -- bool (default False)
+      superko_rule        -- 'positional' or 'situational'
       use_internal_scorer -- bool (default True)
       internal_scorer_handicap_compensation -- 'no' , 'short', or 'full'
                              (default 'no')
@@ -123,6 +328,8 @@ class Game_job(object):
       sgf_note            -- multiline string to put into SGF root comment
       gtp_log_pathname    -- pathname to use for the GTP log
       stderr_pathname     -- pathname to send players' stderr to
+      max_idle_engines    -- int (default 2)
+      record_command_timings -- bool (default False)
 
     The game_id will be returned in the job result, so you can tell which game
     you're getting the result for. It also appears in the SGF file as a comment
@@ -150,12 +357,35 @@ class Game_job(object):
     calling process. But if a player has discard_stderr=True then its standard
     error is sent to os.devnull instead.
 
+    If record_command_timings is true, the job result includes the time each
+    player's engine took to respond to each GTP command (see
+    Gtp_controller.set_command_timings()).
+
+    If a player has games_per_engine greater than 1, its engine is taken from
+    (and, at the end of a successful game, returned to) a pool of idle engines
+    kept in the process which runs the job (see get_engine_pool()). An engine
+    is only reused for a player with the same code, command (or address), cwd,
+    and environ, and the same stderr destination. A reused engine is sent 'clear_board'
+    and the startup commands instead of the usual start-of-engine checks.
+    It isn't reused after it has played games_per_engine games, or if there
+    was any low-level error communicating with it. The pool keeps at most
+    max_idle_engines idle engines; the least recently used are closed.
+
+    The GOMILL_GAME_ID environment variable seen by a reused engine is the
+    id of the game it was started for.
+
+    CPU times for pooled engines come only from gomill-cpu_time (the
+    operating system's figures aren't available until the engine exits, and
+    then cover all its games). For a reused engine, the time reported for a
+    game is the difference between successive gomill-cpu_time responses.
+
     Game_jobs are suitable for pickling.
 
     """
     def __init__(self):
         self.handicap = None
         self.handicap_is_free = False
+        self.superko_rule = None
         self.sgf_filename = None
         self.sgf_dirname = None
         self.void_sgf_dirname = None
@@ -167,6 +397,8 @@ class Game_job(object):
         self.game_data = None
         self.gtp_log_pathname = None
         self.stderr_pathname = None
+        self.max_idle_engines = 2
+        self.record_command_timings = False
 
     # The code here has to be happy to run in a separate process.
 
@@ -181,57 +413,231 @@ class Game_job(object):
 
         """
         self._worker_id = worker_id
+        self._is_async = False
         self._files_to_close = []
+        self._pooled_engines = {'b' : None, 'w' : None}
         try:
             return self._run()
         finally:
-            # These files are all either flushed after every write, or not
-            # written to at all from this process, so there shouldn't be any
-            # errors from close().
-            for f in self._files_to_close:
-                try:
-                    f.close()
-                except EnvironmentError:
-                    pass
+            self._close_files()
 
-    def _start_player(self, game_controller, game,
-                      colour, player, gtp_log_file):
+    def run_async(self, worker_id=None):
+        """Coroutine variant of run().
+
+        This is used by job_manager.Event_loop_job_manager. It's a coroutine
+        for use with event_loops.Event_loop; its result is as for run().
+
+        The game is played using gtp_controller.Async_game_controller and
+        gtp_games.Async_gtp_game, so other games in the same event loop can
+        make progress while this game's engines are thinking.
+
+        """
+        self._worker_id = worker_id
+        self._is_async = True
+        self._files_to_close = []
+        self._pooled_engines = {'b' : None, 'w' : None}
+        try:
+            response = yield self._run_async()
+        finally:
+            self._close_files()
+        raise Return(response)
+
+    def _close_files(self):
+        # These files are all either flushed after every write, or not
+        # written to at all from this process, so there shouldn't be any
+        # errors from close().
+        for f in self._files_to_close:
+            try:
+                f.close()
+            except EnvironmentError:
+                pass
+
+    def _prepare_player(self, game, colour, player):
+        """Common startup code for _start_player() and _start_player_async().
+
+        Returns a tuple (pooled_engine, engine_key, subprocess_kwargs)
+
+        pooled_engine is a Pooled_engine taken from the pool, or None.
+        engine_key is the pool key, or None if the player doesn't use the pool.
+        subprocess_kwargs are keyword arguments for set_player_subprocess() (or
+        set_player_socket(), if the player has an address), or None if
+        pooled_engine is not None.
+
+        """
         if player.discard_stderr:
             stderr_pathname = os.devnull
         else:
             stderr_pathname = self.stderr_pathname
+        if not self.use_internal_scorer and player.is_reliable_scorer:
+            game.allow_scorer(colour)
+        if player.allow_claim:
+            game.set_claim_allowed(colour)
+        if player.games_per_engine > 1:
+            key = _engine_key(player, stderr_pathname, self._is_async)
+            pooled_engine = get_engine_pool(self.max_idle_engines).take(key)
+        else:
+            key = None
+            pooled_engine = None
+        if pooled_engine is not None:
+            pooled_engine.controller.set_timeouts(
+                player.command_timeout, player.genmove_timeout)
+            pooled_engine.controller.enable_pipelining(player.use_pipelining)
+            return pooled_engine, key, None
+        if player.address is not None:
+            subprocess_kwargs = {
+                'command_timeout' : player.command_timeout,
+                'genmove_timeout' : player.genmove_timeout,
+                'use_pipelining' : player.use_pipelining,
+                'connect_timeout' : connect_timeout,
+                }
+            return None, key, subprocess_kwargs
         if stderr_pathname is not None:
             stderr = open(stderr_pathname, "a")
             self._files_to_close.append(stderr)
         else:
             stderr = None
-        if not self.use_internal_scorer and player.is_reliable_scorer:
-            game.allow_scorer(colour)
-        if player.allow_claim:
-            game.set_claim_allowed(colour)
         env = player.make_environ()
         env['GOMILL_GAME_ID'] = self.game_id
         if self._worker_id is not None:
             env['GOMILL_SLOT'] = str(self._worker_id)
-        game_controller.set_player_subprocess(
-            colour, player.cmd_args,
-            env=env, cwd=player.cwd, stderr=stderr)
+        subprocess_kwargs = {
+            'command_timeout' : player.command_timeout,
+            'genmove_timeout' : player.genmove_timeout,
+            'use_pipelining' : player.use_pipelining,
+            'env' : env,
+            'cwd' : player.cwd,
+            'stderr' : stderr,
+            }
+        return None, key, subprocess_kwargs
+
+    def _set_up_player_controller(self, game_controller, colour, player,
+                                  pooled_engine, engine_key, gtp_log_file):
+        """Common code for _start_player() and _start_player_async().
+
+        This is called after the player's controller has been set.
+
+        Returns the list of startup commands to send.
+
+        """
         controller = game_controller.get_controller(colour)
+        if pooled_engine is not None:
+            startup_gtp_commands = ([("clear_board", [])] +
+                                    player.startup_gtp_commands)
+        else:
+            if engine_key is not None:
+                pooled_engine = Pooled_engine(
+                    engine_key, controller,
+                    game_controller.engine_descriptions[colour],
+                    self._is_async)
+            startup_gtp_commands = player.startup_gtp_commands
+        self._pooled_engines[colour] = pooled_engine
         controller.set_gtp_aliases(player.gtp_aliases)
         if gtp_log_file is not None:
             controller.channel.enable_logging(
                 gtp_log_file, prefix="%s: " % colour)
-        for command, arguments in player.startup_gtp_commands:
-            game_controller.send_command(colour, command, *arguments)
+        return startup_gtp_commands
 
-    def _run(self):
-        warnings = []
-        log_entries = []
+    def _start_player(self, game_controller, game,
+                      colour, player, gtp_log_file):
+        pooled_engine, engine_key, subprocess_kwargs = \
+            self._prepare_player(game, colour, player)
+        if pooled_engine is not None:
+            game_controller.set_player_controller(
+                colour, pooled_engine.controller,
+                engine_description=pooled_engine.engine_description)
+        elif player.address is not None:
+            game_controller.set_player_socket(
+                colour, player.address, **subprocess_kwargs)
+        else:
+            game_controller.set_player_subprocess(
+                colour, player.cmd_args, **subprocess_kwargs)
+        startup_gtp_commands = self._set_up_player_controller(
+            game_controller, colour, player,
+            pooled_engine, engine_key, gtp_log_file)
+        if startup_gtp_commands:
+            game_controller.send_commands(colour, startup_gtp_commands)
+
+    def _start_player_async(self, game_controller, game,
+                            colour, player, gtp_log_file):
+        """Coroutine variant of _start_player()."""
+        pooled_engine, engine_key, subprocess_kwargs = \
+            self._prepare_player(game, colour, player)
+        if pooled_engine is not None:
+            yield game_controller.set_player_controller(
+                colour, pooled_engine.controller,
+                engine_description=pooled_engine.engine_description)
+        elif player.address is not None:
+            yield game_controller.set_player_socket(
+                colour, player.address, **subprocess_kwargs)
+        else:
+            yield game_controller.set_player_subprocess(
+                colour, player.cmd_args, **subprocess_kwargs)
+        startup_gtp_commands = self._set_up_player_controller(
+            game_controller, colour, player,
+            pooled_engine, engine_key, gtp_log_file)
+        if startup_gtp_commands:
+            yield game_controller.send_commands(colour, startup_gtp_commands)
+
+    def _release_pooled_engines(self, game_controller, game):
+        """Deal with pooled engines at the end of a successful game.
+
+        Corrects the game result's CPU times for engines which have played an
+        earlier game, and releases engines which may be reused from the game
+        controller.
+
+        Returns a pair (reused_colours, released_engines)
+
+        reused_colours is a set of colours whose engines have played an earlier
+        game (their resource-usage CPU times cover more than this game).
+
+        released_engines is a list of Pooled_engines which the caller should
+        return to the pool.
+
+        """
+        reused = set()
+        released = []
+        for colour, player in (('b', self.player_b), ('w', self.player_w)):
+            engine = self._pooled_engines[colour]
+            if engine is None:
+                continue
+            engine.games_played += 1
+            if colour in game.cpu_time_errors:
+                reported = None
+            else:
+                reported = game.result.cpu_times[player.code]
+            if engine.games_played > 1:
+                reused.add(colour)
+                if reported is None or engine.cpu_time_baseline is None:
+                    game.result.cpu_times[player.code] = None
+                else:
+                    game.result.cpu_times[player.code] = \
+                        reported - engine.cpu_time_baseline
+            engine.cpu_time_baseline = reported
+            controller = engine.controller
+            if (engine.games_played < player.games_per_engine and
+                not controller.channel_is_bad and
+                not controller.retrieve_error_messages() and
+                colour not in game.cpu_time_errors):
+                game_controller.release_player(colour)
+                # The log file is closed at the end of this job
+                controller.channel.log_dest = None
+                released.append(engine)
+        return reused, released
+
+    def _make_game(self, game_controller_class, game_class):
+        """Common setup code for _run() and _run_async().
+
+        Returns a tuple (game_controller, game, gtp_log_file)
+
+        """
         try:
-            game_controller = gtp_controller.Game_controller(
+            game_controller = game_controller_class(
                 self.player_b.code, self.player_w.code)
-            game = gtp_games.Gtp_game(
-                game_controller, self.board_size, self.komi, self.move_limit)
+            if self.record_command_timings:
+                game_controller.enable_command_timings()
+            game = game_class(
+                game_controller, self.board_size, self.komi, self.move_limit,
+                self.superko_rule)
             game.set_game_id(self.game_id)
         except ValueError, e:
             raise job_manager.JobFailed("error creating game: %s" % e)
@@ -243,7 +649,11 @@ class Game_job(object):
             self._files_to_close.append(gtp_log_file)
         else:
             gtp_log_file = None
+        return game_controller, game, gtp_log_file
 
+    def _run(self):
+        game_controller, game, gtp_log_file = self._make_game(
+            gtp_controller.Game_controller, gtp_games.Gtp_game)
         try:
             self._start_player(game_controller, game,
                                'b', self.player_b, gtp_log_file)
@@ -258,17 +668,68 @@ class Game_job(object):
             game.run()
         except (GtpChannelError, BadGtpResponse), e:
             game_controller.close_players()
-            msg = "aborting game due to error:\n%s" % e
-            self._record_void_game(game_controller, game, msg)
-            late_error_messages = game_controller.describe_late_errors()
-            if late_error_messages is not None:
-                msg += "\nalso:\n" + late_error_messages
-            raise job_manager.JobFailed(msg)
+            self._fail_game(game_controller, game, e)
+        reused_colours, released_engines = \
+            self._release_pooled_engines(game_controller, game)
+        for engine in released_engines:
+            get_engine_pool(self.max_idle_engines).give_back(engine)
+        game_controller.close_players()
+        return self._make_response(game_controller, game, reused_colours)
+
+    def _run_async(self):
+        """Coroutine variant of _run()."""
+        game_controller, game, gtp_log_file = self._make_game(
+            gtp_controller.Async_game_controller, gtp_games.Async_gtp_game)
+        try:
+            yield self._start_player_async(game_controller, game,
+                                           'b', self.player_b, gtp_log_file)
+            yield self._start_player_async(game_controller, game,
+                                           'w', self.player_w, gtp_log_file)
+            yield game.prepare()
+            if self.handicap:
+                try:
+                    yield game.set_handicap(
+                        self.handicap, self.handicap_is_free)
+                except ValueError:
+                    raise BadGtpResponse("invalid handicap")
+            yield game.run()
+        except (GtpChannelError, BadGtpResponse), e:
+            yield game_controller.close_players()
+            self._fail_game(game_controller, game, e)
+        reused_colours, released_engines = \
+            self._release_pooled_engines(game_controller, game)
+        for engine in released_engines:
+            engine_pool = get_engine_pool(self.max_idle_engines)
+            yield engine_pool.give_back_async(engine)
+        yield game_controller.close_players()
+        raise Return(
+            self._make_response(game_controller, game, reused_colours))
+
+    def _fail_game(self, game_controller, game, e):
+        """Record a void game and raise JobFailed.
+
+        This is called after the players have been closed.
+
+        """
+        msg = "aborting game due to error:\n%s" % e
+        self._record_void_game(game_controller, game, msg)
+        late_error_messages = game_controller.describe_late_errors()
+        if late_error_messages is not None:
+            msg += "\nalso:\n" + late_error_messages
+        raise job_manager.JobFailed(msg)
+
+    def _make_response(self, game_controller, game, reused_colours):
+        """Finish off a completed game and return the Game_job_result.
+
+        This is called after the players have been closed.
+
+        """
+        warnings = []
+        log_entries = []
         if game.result.is_forfeit:
             warnings.append(game.result.detail)
-        game_controller.close_players()
         ru_cpu_times = game_controller.get_resource_usage_cpu_times()
-        for colour in game.cpu_time_errors:
+        for colour in game.cpu_time_errors | reused_colours:
             del ru_cpu_times[colour]
         game.result.soft_update_cpu_times(ru_cpu_times)
         late_error_messages = game_controller.describe_late_errors()
@@ -285,6 +746,14 @@ class Game_job(object):
             self.player_b.code : game_controller.engine_descriptions['b'],
             self.player_w.code : game_controller.engine_descriptions['w'],
             }
+        command_timings = game_controller.get_command_timings()
+        if command_timings is None:
+            response.command_timings = None
+        else:
+            response.command_timings = {
+                self.player_b.code : command_timings['b'],
+                self.player_w.code : command_timings['w'],
+                }
         response.game_data = self.game_data
         return response
 
@@ -409,8 +878,8 @@ def check_player(player_check, discard_stderr=False):
 
     player_check -- Player_check object
 
-    This starts an engine subprocess, sends it some GTP commands, and ends the
-    process again.
+    This starts an engine subprocess (or connects to the player's address),
+    sends it some GTP commands, and ends the process (or connection) again.
 
     Raises CheckFailed if the player doesn't pass the checks.
 
@@ -418,7 +887,8 @@ def check_player(player_check, discard_stderr=False):
 
     Currently checks:
      - any explicitly specified cwd exists and is a directory
-     - the engine subprocess starts, and replies to GTP commands
+     - the engine subprocess starts (or the connection succeeds), and the
+       engine replies to GTP commands
      - the engine reports protocol version 2 (if it supports protocol_version)
      - the engine accepts any startup_gtp_commands
      - the engine accepts the specified board size and komi
@@ -437,14 +907,26 @@ def check_player(player_check, discard_stderr=False):
     try:
         env = player.make_environ()
         env['GOMILL_GAME_ID'] = 'startup-check'
-        try:
-            channel = gtp_controller.Subprocess_gtp_channel(
-                player.cmd_args,
-                env=env, cwd=player.cwd, stderr=stderr)
-        except GtpChannelError, e:
-            raise GtpChannelError(
-                "error starting subprocess for %s:\n%s" % (player.code, e))
+        if player.address is not None:
+            try:
+                channel = gtp_controller.Socket_gtp_channel(
+                    player.address, connect_timeout=connect_timeout)
+            except GtpChannelError, e:
+                raise GtpChannelError(
+                    "error connecting to %s for %s:\n%s" %
+                    (gtp_controller.describe_engine_address(player.address),
+                     player.code, e))
+        else:
+            try:
+                channel = gtp_controller.Subprocess_gtp_channel(
+                    player.cmd_args,
+                    env=env, cwd=player.cwd, stderr=stderr)
+            except GtpChannelError, e:
+                raise GtpChannelError(
+                    "error starting subprocess for %s:\n%s" % (player.code, e))
         controller = gtp_controller.Gtp_controller(channel, player.code)
+        controller.set_timeouts(player.command_timeout, player.genmove_timeout)
+        controller.enable_pipelining(player.use_pipelining)
         controller.set_gtp_aliases(player.gtp_aliases)
         controller.check_protocol_version()
         for command, arguments in player.startup_gtp_commands:
@@ -23,7 +23,8 @@ class Game(object):
        board        -- the Board to play on (doesn't have to be empty)
        first_player -- colour (default 'b')
 
-    This enforces a simple ko rule, but no superko rule.
+    This enforces a simple ko rule, and optionally a superko rule (see
+    set_superko_rule()).
     It accepts self-capture moves.
     Two consecutive passes end the game.
 
@@ -32,6 +33,7 @@ class Game(object):
       board            -- the Board
       is_over          -- bool
       move_limit       -- int or None
+      superko_rule     -- 'positional', 'situational', or None
       move_count       -- int
 
     Meaningful before the game is over:
@@ -46,8 +48,10 @@ class Game(object):
       hit_move_limit   -- bool
       winner           -- colour or None
       forfeit_reason   -- string or None
+      forfeit_on_time  -- bool
 
-    When is_over is true, exactly one of the other boolean attributes is true.
+    When is_over is true, exactly one of the other boolean attributes (apart
+    from forfeit_on_time) is true.
     winner is set for seen_resignation, seen_claim, and seen_forfeit, but not
     for passed_out or hit_move_limit.
 
@@ -59,6 +63,7 @@ class Game(object):
         self.board = board
 
         self.move_limit = None
+        self.superko_rule = None
         self.next_player = first_player
 
         self.move_count = 0
@@ -73,9 +78,16 @@ class Game(object):
         self.hit_move_limit = False
         self.winner = None
         self.forfeit_reason = None
+        self.forfeit_on_time = False
 
         self.game_over_callback = None
 
+        # Zobrist hashes of the positions, and pairs (hash, player to move)
+        # for the situations, which have arisen in this game.
+        initial_position = board.get_zobrist_hash()
+        self._positions_seen = set([initial_position])
+        self._situations_seen = set([(initial_position, first_player)])
+
     def set_move_limit(self, move_limit):
         """Set or clear the move limit.
 
@@ -86,6 +98,27 @@ class Game(object):
         """
         self.move_limit = move_limit
 
+    def set_superko_rule(self, superko_rule):
+        """Set or clear the superko rule.
+
+        superko_rule -- 'positional', 'situational', or None
+
+        If this isn't called, the superko rule is None (only simple ko is
+        enforced).
+
+        'positional' forbids a move which recreates any earlier position in
+        the game. 'situational' forbids a move which recreates an earlier
+        position with the same player to move.
+
+        Positions are compared using the Board's Zobrist hash, so each check
+        is O(1). All positions since the Game was created are taken into
+        account, whenever this is called.
+
+        """
+        if superko_rule not in ('positional', 'situational', None):
+            raise ValueError("unknown superko rule: %s" % superko_rule)
+        self.superko_rule = superko_rule
+
     def set_game_over_callback(self, fn):
         """Specify a function to be called when the game is over.
 
@@ -128,11 +161,12 @@ class Game(object):
         self.seen_claim = True
         self._set_over()
 
-    def record_forfeit_by(self, loser, reason):
+    def record_forfeit_by(self, loser, reason, on_time=False):
         """Record that a player has forfeited the game.
 
-        loser  -- colour
-        reason -- string: human-readable explanation of the forfeit
+        loser   -- colour
+        reason  -- string: human-readable explanation of the forfeit
+        on_time -- bool: the forfeit is because the player ran out of time
 
         """
         if self.is_over:
@@ -140,6 +174,7 @@ class Game(object):
         self.winner = opponent_of(loser)
         self.seen_forfeit = True
         self.forfeit_reason = reason
+        self.forfeit_on_time = bool(on_time)
         self._set_over()
 
     def record_move(self, colour, move):
@@ -158,6 +193,9 @@ class Game(object):
         This method causes the game to end if the move is a second consecutive
         pass, if the move is illegal, or the move limit is reached.
 
+        A move forbidden by the superko rule is illegal. If such a move is
+        played, the board is left showing the forbidden position.
+
         The move limit is considered reached if move_limit is set, move_count
         >= move_limit after the move is played, and the game has not been
         passed out.
@@ -167,6 +205,7 @@ class Game(object):
             raise GameStateError("game is already over")
         if colour != self.next_player:
             raise GameStateError("%s is next to play" % self.next_player)
+        opponent = opponent_of(colour)
         if move is not None:
             self.pass_count = 0
             if move == self.simple_ko_point:
@@ -176,18 +215,34 @@ class Game(object):
                 return
             row, col = move
             try:
-                self.simple_ko_point = self.board.play(row, col, colour)
+                simple_ko_point = self.board.play(row, col, colour)
             except ValueError:
                 self.record_forfeit_by(
                     colour, "attempted move to occupied point %s" %
                     format_vertex(move))
                 return
+            position = self.board.get_zobrist_hash()
+            if self.superko_rule == 'positional':
+                repeated = position in self._positions_seen
+            elif self.superko_rule == 'situational':
+                repeated = (position, opponent) in self._situations_seen
+            else:
+                repeated = False
+            if repeated:
+                self.record_forfeit_by(
+                    colour, "attempted move to %s violating %s superko" %
+                    (format_vertex(move), self.superko_rule))
+                return
+            self.simple_ko_point = simple_ko_point
+            self._positions_seen.add(position)
         else:
             self.pass_count += 1
             self.simple_ko_point = None
+            position = self.board.get_zobrist_hash()
+        self._situations_seen.add((position, opponent))
 
         self.move_count += 1
-        self.next_player = opponent_of(colour)
+        self.next_player = opponent
         if self.pass_count == 2:
             self.passed_out = True
             self._set_over()
@@ -403,7 +458,10 @@ class Result(object):
             # Leave SGF result in form 'B+'
             result.detail = "claim"
         elif game.seen_forfeit:
-            result.sgf_result += "F"
+            if game.forfeit_on_time:
+                result.sgf_result += "T"
+            else:
+                result.sgf_result += "F"
             result.is_forfeit = True
             result.detail = game.forfeit_reason
         else:
@@ -498,6 +556,8 @@ class Backend(object):
         'action' is a string:
           "move"    -- player plays or passes; 'detail' is (row, col) or None
           "forfeit" -- player forfeits; 'detail' is a string explanation
+          "timeout" -- player forfeits on time; 'detail' is a string
+                       explanation
           "resign"  -- player resigns; 'detail' is None
           "claim"   -- player claims the win; 'detail' is None
 
@@ -557,10 +617,11 @@ class Game_runner(object):
     """Run a single Go game, with the players controlled by a Backend.
 
     Instantiate with:
-      backend    -- the Backend
-      board_size -- int
-      komi       -- int or float (default 0)
-      move_limit -- int or None  (default None)
+      backend      -- the Backend
+      board_size   -- int
+      komi         -- int or float (default 0)
+      move_limit   -- int or None  (default None)
+      superko_rule -- 'positional', 'situational', or None (default None)
 
     Order of operations:
       runner = Game_runner(...)
@@ -571,12 +632,17 @@ class Game_runner(object):
       runner.run()
       runner.make_sgf()
 
+    prepare(), set_handicap() and run() each have a variant which doesn't call
+    the backend itself (prepare_steps(), set_handicap_steps() and run_steps());
+    these are for backends whose operations have to be driven in some other
+    way (eg, by an event loop).
+
     Public attributes, useful after run() has been called:
       result -- Result, or None
 
-    Game_runner enforces a simple ko rule, but no superko rule. It accepts
-    self-capture moves. Two consecutive passes end the game and trigger
-    scoring.
+    Game_runner enforces a simple ko rule, and the superko rule given by
+    superko_rule (see Game.set_superko_rule()). It accepts self-capture moves.
+    Two consecutive passes end the game and trigger scoring.
 
     If move_limit is not None, the game ends (with result 'Void') when that
     number of moves (including passes) has been played.
@@ -586,11 +652,15 @@ class Game_runner(object):
 
     """
 
-    def __init__(self, backend, board_size, komi=0, move_limit=None):
+    def __init__(self, backend, board_size, komi=0, move_limit=None,
+                 superko_rule=None):
+        if superko_rule not in ('positional', 'situational', None):
+            raise ValueError("unknown superko rule: %s" % superko_rule)
         self.backend = backend
         self.board_size = board_size
         self.komi = float(komi)
         self.move_limit = move_limit
+        self.superko_rule = superko_rule
         self.after_move_callback = None
         self.result_class = Result
         self.additional_sgf_props = []
@@ -638,10 +708,41 @@ class Game_runner(object):
 
         Propagates any exceptions from the backend start_new_game() method.
 
+        """
+        self._call_backend(self.prepare_steps())
+
+    def _call_backend(self, steps):
+        """Run one of the *_steps() generators, calling the backend directly.
+
+        Propagates any exceptions from the backend.
+
+        """
+        result = None
+        while True:
+            try:
+                method_name, args = steps.send(result)
+            except StopIteration:
+                return
+            result = getattr(self.backend, method_name)(*args)
+
+    def prepare_steps(self):
+        """Variant of prepare() which leaves the backend calls to the caller.
+
+        Returns a generator which yields pairs (method_name, arguments). The
+        caller should call the named backend method with those arguments,
+        and send the result into the generator (or throw the exception into
+        it, or abandon it). The generator finishes when the operation is
+        complete.
+
+        The same applies to set_handicap_steps() and run_steps().
+
+        The backend's end_game() method is an exception: it's always called
+        directly.
+
         """
         if self._state != 0:
             raise GameRunnerStateError
-        self.backend.start_new_game(self.board_size, self.komi)
+        yield 'start_new_game', (self.board_size, self.komi)
         self._state = 1
 
     def set_handicap(self, handicap, is_free):
@@ -657,6 +758,15 @@ class Game_runner(object):
           notify_free_handicap()
           notify_fixed_handicap()
 
+        """
+        self._call_backend(self.set_handicap_steps(handicap, is_free))
+
+    def set_handicap_steps(self, handicap, is_free):
+        """Variant of set_handicap() which leaves the backend calls to the
+        caller.
+
+        See prepare_steps().
+
         """
         if self._state != 1:
             raise GameRunnerStateError
@@ -666,14 +776,14 @@ class Game_runner(object):
             if not 2 <= handicap <= max_points:
                 raise ValueError
             self._state = 2
-            points = self.backend.get_free_handicap(handicap)
-            self.backend.notify_free_handicap(points)
+            points = yield 'get_free_handicap', (handicap,)
+            yield 'notify_free_handicap', (points,)
         else:
             # May propagate ValueError
             points = handicap_layout.handicap_points(handicap, self.board_size)
             self._state = 2
             for colour in "b", "w":
-                self.backend.notify_fixed_handicap(colour, handicap, points)
+                yield 'notify_fixed_handicap', (colour, handicap, points)
         self.additional_sgf_props.append(('HA', handicap))
         self.handicap_stones = points
 
@@ -690,15 +800,18 @@ class Game_runner(object):
             first_player = 'b'
         game = Game(board, first_player)
         game.set_move_limit(self.move_limit)
+        game.set_superko_rule(self.superko_rule)
         game.set_game_over_callback(self.backend.end_game)
         return game
 
     def _do_move(self, game):
         colour = game.next_player
         opponent = opponent_of(colour)
-        action, detail = self.backend.get_move(colour)
+        action, detail = yield 'get_move', (colour,)
         if action == 'forfeit':
             game.record_forfeit_by(colour, detail)
+        elif action == 'timeout':
+            game.record_forfeit_by(colour, detail, on_time=True)
         elif action == 'resign':
             game.record_resignation_by(colour)
         elif action == 'claim':
@@ -709,20 +822,20 @@ class Game_runner(object):
             raise ValueError("bad get_move action: %s" % action)
 
         if game.is_over:
-            self._set_final_diagnostics(
-                colour, self.backend.get_last_move_comment(colour))
+            comment = yield 'get_last_move_comment', (colour,)
+            self._set_final_diagnostics(colour, comment)
             return
 
         # Record the move, and so call end_game() if the move ends the game,
         # before asking for the comment.
         game.record_move(colour, move)
-        comment = self.backend.get_last_move_comment(colour)
+        comment = yield 'get_last_move_comment', (colour,)
 
         if game.seen_forfeit:
             self._set_final_diagnostics(colour, comment)
             return
 
-        status, msg = self.backend.notify_move(opponent, move)
+        status, msg = yield 'notify_move', (opponent, move)
         if status not in ('reject', 'error', 'accept'):
             raise ValueError("bad notify_move status: %s" % status)
         # If the game is over (typically a game-ending pass), there's no need to
@@ -742,13 +855,6 @@ class Game_runner(object):
         if self.after_move_callback:
             self.after_move_callback(colour=colour, move=move, board=game.board)
 
-    def _set_result(self, game):
-        if game.passed_out:
-            self.game_score = self.backend.score_game(game.board)
-            self.result = self.result_class.from_game_score(self.game_score)
-        else:
-            self.result = self.result_class.from_unscored_game(game)
-
     def run(self):
         """Run the game, to completion.
 
@@ -766,14 +872,36 @@ class Game_runner(object):
         If an exception is propagated, 'result' will not be set, but
         get_moves() will reflect the moves which were completed.
 
+        """
+        self._call_backend(self.run_steps())
+
+    def run_steps(self):
+        """Variant of run() which leaves the backend calls to the caller.
+
+        See prepare_steps().
+
+        Exceptions from any after-move callback are raised from the
+        generator.
+
         """
         if self._state not in (1, 2):
             raise GameRunnerStateError
         game = self._make_game()
         self._state = 3
         while not game.is_over:
-            self._do_move(game)
-        self._set_result(game)
+            move_steps = self._do_move(game)
+            result = None
+            while True:
+                try:
+                    step = move_steps.send(result)
+                except StopIteration:
+                    break
+                result = yield step
+        if game.passed_out:
+            self.game_score = yield 'score_game', (game.board,)
+            self.result = self.result_class.from_game_score(self.game_score)
+        else:
+            self.result = self.result_class.from_unscored_game(game)
 
     def get_moves(self):
         """Retrieve a list of the moves played.
@@ -7,18 +7,23 @@ Based on GTP 'draft version 2' (see <http://www.lysator.liu.se/~gunnar/gtp/>).
 import errno
 import os
 import re
+import select
 import signal
+import socket
 import subprocess
+import time
 
 from gomill.utils import *
 from gomill.common import *
+from gomill.command_timings import Command_timings
+from gomill.event_loops import Return, Wait_readable
 
 
 class GtpChannelError(StandardError):
     """Low-level error trying to talk to a GTP engine.
 
     This is the base class for GtpProtocolError, GtpTransportError,
-    and GtpChannelClosed. It may also be raised directly.
+    GtpChannelClosed, and GtpTimeout. It may also be raised directly.
 
     """
 
@@ -31,6 +36,9 @@ class GtpTransportError(GtpChannelError):
 class GtpChannelClosed(GtpChannelError):
     """The (command or response) channel to a GTP engine has been closed."""
 
+class GtpTimeout(GtpChannelError):
+    """A GTP engine didn't send its response in time."""
+
 
 class BadGtpResponse(StandardError):
     """Unacceptable response from a GTP engine.
@@ -56,6 +64,9 @@ class BadGtpResponse(StandardError):
 
 _gtp_word_characters_re = re.compile(r"\A[\x21-\x7e\x80-\xff]+\Z")
 _remove_response_controls_re = re.compile(r"[\x00-\x08\x0b-\x1f\x7f]")
+# The same characters, for use with str.translate()
+_response_control_chars = "".join(
+    map(chr, range(0x00, 0x09) + range(0x0b, 0x20) + [0x7f]))
 
 def is_well_formed_gtp_word(s):
     """Check whether 's' is well-formed as a single GTP word.
@@ -86,12 +97,24 @@ class Gtp_channel(object):
     In practice these attributes are only available for subprocess-based
     channels, and only after they've been closed.
 
+    The supports_timeouts class attribute says whether the channel implements
+    the 'timeout' parameter of get_response().
+
+    The supports_pipelining class attribute says whether it's safe to send
+    further commands before reading the response to the previous one. Channels
+    which support pipelining return responses in the order the commands were
+    sent.
+
     """
+    supports_timeouts = False
+    supports_pipelining = False
+
     def __init__(self):
         self.exit_status = None
         self.resource_usage = None
         self.log_dest = None
         self.log_prefix = None
+        self.response_deadline = None
 
     def enable_logging(self, log_dest, prefix=""):
         """Log all messages sent and received over the channel.
@@ -118,31 +141,48 @@ class Gtp_channel(object):
         except Exception:
             pass
 
-    def send_command(self, command, arguments):
+    def send_command(self, command, arguments, command_id=None):
         """Send a GTP command over the channel.
 
-        command   -- string
-        arguments -- list of strings
+        command    -- string
+        arguments  -- list of strings
+        command_id -- nonnegative int or None
 
         May raise GtpChannelError.
 
         Raises ValueError if the command or an argument contains a character
         forbidden in GTP.
 
+        If command_id is specified, channels which send commands as text send
+        it as the GTP command id, and check that the response carries the same
+        id (an engine which omits the id from its response is tolerated, but
+        one which returns a different id causes GtpProtocolError).
+
         """
         if not is_well_formed_gtp_word(command):
             raise ValueError("bad command")
         for argument in arguments:
             if not is_well_formed_gtp_word(argument):
                 raise ValueError("bad argument")
+        if command_id is not None and command_id < 0:
+            raise ValueError("bad command id")
         if self.log_dest is not None:
-            self._log(">> ", command + ("".join(" " + a for a in arguments)))
-        self.send_command_impl(command, arguments)
+            if command_id is None:
+                prefix = ""
+            else:
+                prefix = "%d " % command_id
+            self._log(">> ", prefix + command +
+                      ("".join(" " + a for a in arguments)))
+        self.send_command_impl(command, arguments, command_id)
 
-    def get_response(self):
+    def get_response(self, timeout=None):
         """Read a GTP response from the channel.
 
-        Waits indefinitely for the response.
+        timeout -- float (seconds) or None
+
+        If timeout is None, waits indefinitely for the response. Otherwise, if
+        the complete response hasn't arrived within the specified time, raises
+        GtpTimeout. Channels which don't support timeouts ignore this parameter.
 
         Returns a pair (is_failure, response)
 
@@ -164,17 +204,59 @@ class Gtp_channel(object):
         May raise GtpChannelError. In particular, raises GtpProtocolError if the
         success/failure indicator can't be read from the engine's response.
 
+        After GtpTimeout, the channel is no longer usable (the engine may still
+        send the response later, so its responses would be out of step with
+        the commands); channels which can do so terminate the engine.
+
         """
-        result = self.get_response_impl()
+        if timeout is None or not self.supports_timeouts:
+            self.response_deadline = None
+        else:
+            self.response_deadline = time.time() + timeout
+        try:
+            result = self.get_response_impl()
+        except GtpTimeout, e:
+            if e.args:
+                raise
+            raise GtpTimeout("engine did not respond within %s seconds" %
+                             format_float(timeout))
         if self.log_dest is not None:
-            is_error, response = result
-            if is_error:
-                response = "? " + response
-            else:
-                response = "= " + response
-            self._log("<< ", response.rstrip())
+            self._log_response(result)
         return result
 
+    def _log_response(self, result):
+        is_error, response = result
+        if is_error:
+            response = "? " + response
+        else:
+            response = "= " + response
+        self._log("<< ", response.rstrip())
+
+    def get_response_async(self, timeout=None):
+        """Coroutine variant of get_response().
+
+        This is a coroutine for use with event_loops.Event_loop; its result is
+        as for get_response().
+
+        Channels which support waiting for the response without blocking the
+        event loop override this. The default implementation just calls
+        get_response() (so it's suitable for channels which never block).
+
+        """
+        result = self.get_response(timeout)
+        raise Return(result)
+        yield
+
+    def close_async(self):
+        """Coroutine variant of close().
+
+        The default implementation just calls close().
+
+        """
+        self.close()
+        return
+        yield
+
     # For subclasses to override:
 
     def close(self):
@@ -192,10 +274,17 @@ class Gtp_channel(object):
         """
         pass
 
-    def send_command_impl(self, command, arguments):
+    def send_command_impl(self, command, arguments, command_id):
         raise NotImplementedError
 
     def get_response_impl(self):
+        """Read a GTP response from the channel.
+
+        If the channel supports timeouts, it should raise GtpTimeout if the
+        response hasn't arrived by the time given by the response_deadline
+        attribute (a value as returned by time.time(), or None).
+
+        """
         raise NotImplementedError
 
 
@@ -207,14 +296,18 @@ class Internal_gtp_channel(Gtp_channel):
     This waits to invoke the engine's handler for each command until the
     correponding response is requested.
 
+    This channel supports pipelining (command ids are ignored).
+
     """
+    supports_pipelining = True
+
     def __init__(self, engine):
         Gtp_channel.__init__(self)
         self.engine = engine
         self.outstanding_commands = []
         self.session_is_ended = False
 
-    def send_command_impl(self, command, arguments):
+    def send_command_impl(self, command, arguments, command_id):
         if self.session_is_ended:
             raise GtpChannelClosed("engine has ended the session")
         self.outstanding_commands.append((command, arguments))
@@ -233,19 +326,93 @@ class Internal_gtp_channel(Gtp_channel):
         return is_error, response
 
 
+def _check_first_response_byte(byte):
+    """Check the first byte the engine sends, before reading any more.
+
+    byte -- string of length 0 or 1 (empty for end-of-file)
+
+    Raises GtpChannelClosed or GtpProtocolError if it isn't plausibly the start
+    of a GTP response.
+
+    """
+    if byte == "":
+        raise GtpChannelClosed("engine has closed the response channel")
+    if byte == "\x01":
+        raise GtpProtocolError("engine appears to be speaking GMP, not GTP!")
+    # These are the characters which could legitimately start a GTP
+    # response. In principle, we should be discarding other controls
+    # rather than treating them as errors, but it's more useful to
+    # report a protocol error.
+    if byte not in (' ', '\t', '\r', '\n', '#', '=', '?'):
+        raise GtpProtocolError(
+            "engine isn't speaking GTP: first byte is %s" % repr(byte))
+
+_response_id_re = re.compile(r"[0-9]+")
+
+def _interpret_response_text(text, command_id):
+    """Interpret the text of a GTP response.
+
+    text       -- the response's lines (with control characters removed), not
+                  including the terminating blank line; the first line must
+                  not be empty.
+    command_id -- int or None (the id sent with the command)
+
+    Returns a pair (is_failure, response), as for Gtp_channel.get_response().
+
+    If command_id is None, we don't look for an id in the response (so a
+    response like '=2' is read as '2').
+
+    """
+    if text[0] == "?":
+        is_error = True
+    elif text[0] == "=":
+        is_error = False
+    else:
+        raise GtpProtocolError(
+            "no success/failure indication from engine: "
+            "first line is `%s`" % text.split("\n", 1)[0].rstrip())
+    start = 1
+    if command_id is not None:
+        match = _response_id_re.match(text, 1)
+        if match:
+            if int(match.group()) != command_id:
+                raise GtpProtocolError(
+                    "response id %s doesn't match command id %d" %
+                    (match.group(), command_id))
+            start = match.end()
+    response = text[start:].lstrip(" \t").rstrip()
+    response = response.replace("\t", " ")
+    return is_error, response
+
+
 class Linebased_gtp_channel(Gtp_channel):
-    """Generic Gtp_channel based on line-by-line communication."""
+    """Generic Gtp_channel based on line-by-line communication.
+
+    This supports pipelining. Command ids are sent only if the caller supplies
+    them (see Gtp_channel.send_command()).
+
+    """
+    supports_pipelining = True
 
     def __init__(self):
         Gtp_channel.__init__(self)
         self.is_first_response = True
+        # Ids of the commands whose responses haven't been read yet
+        self.pending_command_ids = []
 
-    # Not using command ids; I don't see the need unless we see problems in
-    # practice with engines getting out of sync.
-
-    def send_command_impl(self, command, arguments):
+    def send_command_impl(self, command, arguments, command_id):
         words = [command] + arguments
+        if command_id is not None:
+            words.insert(0, str(command_id))
         self.send_command_line(" ".join(words) + "\n")
+        self.pending_command_ids.append(command_id)
+
+    def _get_expected_command_id(self):
+        """Return the id we should see in the next response, or None."""
+        try:
+            return self.pending_command_ids.pop(0)
+        except IndexError:
+            return None
 
     def get_response_impl(self):
         """Obtain response according to GTP protocol.
@@ -261,6 +428,7 @@ class Linebased_gtp_channel(Gtp_channel):
         particular, this lets us detect GMP).
 
         """
+        command_id = self._get_expected_command_id()
         lines = []
         seen_data = False
         peeked_byte = None
@@ -273,20 +441,7 @@ class Linebased_gtp_channel(Gtp_channel):
             except NotImplementedError:
                 pass
             else:
-                if peeked_byte == "":
-                    raise GtpChannelClosed(
-                        "engine has closed the response channel")
-                if peeked_byte == "\x01":
-                    raise GtpProtocolError(
-                        "engine appears to be speaking GMP, not GTP!")
-                # These are the characters which could legitimately start a GTP
-                # response. In principle, we should be discarding other controls
-                # rather than treating them as errors, but it's more useful to
-                # report a protocol error.
-                if peeked_byte not in (' ', '\t', '\r', '\n', '#', '=', '?'):
-                    raise GtpProtocolError(
-                        "engine isn't speaking GTP: "
-                        "first byte is %s" % repr(peeked_byte))
+                _check_first_response_byte(peeked_byte)
                 if peeked_byte == "\n":
                     peeked_byte = None
         while True:
@@ -317,20 +472,7 @@ class Linebased_gtp_channel(Gtp_channel):
         if not lines:
             # Means 'EOF and empty response'
             raise GtpChannelClosed("engine has closed the response channel")
-        first_line = lines[0]
-        # It's certain that first line isn't empty
-        if first_line[0] == "?":
-            is_error = True
-        elif first_line[0] == "=":
-            is_error = False
-        else:
-            raise GtpProtocolError(
-                "no success/failure indication from engine: "
-                "first line is `%s`" % first_line.rstrip())
-        lines[0] = first_line[1:].lstrip(" \t")
-        response = "".join(lines).rstrip()
-        response = response.replace("\t", " ")
-        return is_error, response
+        return _interpret_response_text("".join(lines), command_id)
 
 
     # For subclasses to override:
@@ -348,12 +490,13 @@ class Linebased_gtp_channel(Gtp_channel):
     def get_response_line(self):
         """Read a line of text from the channel.
 
-        May raise GtpTransportError
+        May raise GtpTransportError or GtpTimeout
 
         The result ends in a newline unless end-of-file was seen (ie, the same
         protocol to indicate end-of-file as Python's readline()).
 
-        This blocks until a line is available, or end-of-file is reached.
+        This blocks until a line is available, or end-of-file is reached, or
+        the response_deadline passes.
 
         """
         raise NotImplementedError
@@ -361,10 +504,11 @@ class Linebased_gtp_channel(Gtp_channel):
     def get_response_byte(self):
         """Read a single byte from the channel.
 
-        May raise GtpTransportError
+        May raise GtpTransportError or GtpTimeout
 
         This blocks until a byte is available, or end-of-file is reached (in
-        which case it returns an empty string).
+        which case it returns an empty string), or the response_deadline
+        passes.
 
         Subclasses don't have to implement this.
 
@@ -372,10 +516,253 @@ class Linebased_gtp_channel(Gtp_channel):
         raise NotImplementedError
 
 
+class Buffered_gtp_channel(Linebased_gtp_channel):
+    """Linebased_gtp_channel which reads responses in large chunks.
+
+    This reads as much as is available from the response file descriptor each
+    time, rather than a line (or a byte) at a time, and looks for the end of
+    the response in the buffered data as a whole.
+
+    This channel supports timeouts, and get_response_async() waits for the
+    response using the event loop.
+
+    Subclasses must implement send_command_line(), get_response_fd(),
+    abandon_engine(), close_command_stream() and close().
+
+    """
+    supports_timeouts = True
+
+    def __init__(self):
+        Linebased_gtp_channel.__init__(self)
+        # Data read from the response stream but not yet returned, with
+        # control characters already removed
+        self.response_buffer = bytearray()
+        # Position in the buffer up to which we know there's no blank line
+        self.response_scan_position = 0
+
+    def _wait_for_response_data(self, fd):
+        """Wait until the response stream is readable.
+
+        Raises GtpTimeout (having called abandon_engine()) if the
+        response_deadline passes first.
+
+        """
+        while True:
+            remaining = self.response_deadline - time.time()
+            if remaining <= 0:
+                self.abandon_engine()
+                raise GtpTimeout
+            try:
+                readable, _, _ = select.select([fd], [], [], remaining)
+            except select.error, e:
+                if e.args[0] == errno.EINTR:
+                    continue
+                raise GtpTransportError(str(e))
+            if readable:
+                return
+
+    def read_response_data(self):
+        """Read whatever data is available from the response stream.
+
+        Returns a nonempty string, or an empty string at end-of-file.
+
+        Blocks until some data is available, or end-of-file is reached, or the
+        response_deadline passes.
+
+        May raise GtpTransportError or GtpTimeout.
+
+        """
+        fd = self.get_response_fd()
+        if self.response_deadline is not None:
+            self._wait_for_response_data(fd)
+        while True:
+            try:
+                return os.read(fd, 4096)
+            except EnvironmentError, e:
+                if e.errno == errno.EINTR:
+                    continue
+                if e.errno == errno.ECONNRESET:
+                    # A socket whose peer has gone away; treat it like EOF
+                    return ""
+                raise GtpTransportError(str(e))
+
+    def _fill_response_buffer(self):
+        """Read more data from the response stream into the buffer.
+
+        Removes control characters as the data is added.
+
+        The first time this is called, checks the first byte (see
+        _check_first_response_byte()).
+
+        Returns False at end-of-file.
+
+        """
+        data = self.read_response_data()
+        if self.is_first_response:
+            self.is_first_response = False
+            try:
+                _check_first_response_byte(data[:1])
+            except GtpChannelError:
+                # Like the line-based implementation, consume only the
+                # rejected byte.
+                self.response_buffer.extend(
+                    data[1:].translate(None, _response_control_chars))
+                raise
+        if data == "":
+            return False
+        self.response_buffer.extend(
+            data.translate(None, _response_control_chars))
+        return True
+
+    def _extract_response_text(self, at_eof):
+        """Remove a complete response from the buffer, if there is one.
+
+        at_eof -- bool (whether the response stream has reached end-of-file)
+
+        Returns the response text (not including the terminating blank line),
+        or None if more data is needed.
+
+        Raises GtpChannelClosed if at_eof is true and the buffer holds nothing
+        but whitespace.
+
+        """
+        buf = self.response_buffer
+        # Discard lines with only whitespace before the response
+        start = 0
+        while True:
+            i = buf.find("\n", start)
+            if i == -1:
+                if buf[start:].strip():
+                    break
+                if at_eof:
+                    # Means 'EOF and empty response'
+                    del buf[:]
+                    raise GtpChannelClosed(
+                        "engine has closed the response channel")
+                del buf[:start]
+                return None
+            if buf[start:i].strip():
+                break
+            start = i + 1
+        if start:
+            del buf[:start]
+            self.response_scan_position = 0
+
+        # Find the blank line which ends the response
+        i = buf.find("\n\n", self.response_scan_position)
+        if i != -1:
+            end = i + 1
+            consumed = i + 2
+        elif at_eof:
+            # Use the data received anyway
+            end = consumed = len(buf)
+        else:
+            self.response_scan_position = max(0, len(buf) - 1)
+            return None
+        text = str(buf[:end])
+        del buf[:consumed]
+        self.response_scan_position = 0
+        return text
+
+    def get_response_impl(self):
+        """Obtain response according to GTP protocol.
+
+        This behaves in the same way as the Linebased_gtp_channel
+        implementation (including the handling of EOF and the check on the
+        first byte), but reads as much as is available each time.
+
+        """
+        command_id = self._get_expected_command_id()
+        at_eof = False
+        while True:
+            text = self._extract_response_text(at_eof)
+            if text is not None:
+                return _interpret_response_text(text, command_id)
+            at_eof = not self._fill_response_buffer()
+
+    def get_response_async(self, timeout=None):
+        """Coroutine variant of get_response().
+
+        This waits for the response stream using the event loop, so other
+        coroutines can run while the engine is thinking.
+
+        """
+        if timeout is None:
+            deadline = None
+        else:
+            deadline = time.time() + timeout
+        self.response_deadline = None
+        command_id = self._get_expected_command_id()
+        fd = self.get_response_fd()
+        at_eof = False
+        while True:
+            text = self._extract_response_text(at_eof)
+            if text is not None:
+                break
+            is_readable = yield Wait_readable(fd, deadline)
+            if not is_readable:
+                self.abandon_engine()
+                raise GtpTimeout("engine did not respond within %s seconds" %
+                                 format_float(timeout))
+            at_eof = not self._fill_response_buffer()
+        result = _interpret_response_text(text, command_id)
+        if self.log_dest is not None:
+            self._log_response(result)
+        raise Return(result)
+
+    # Time to wait for the engine to close its end of the response stream
+    # before close_async() falls back to close() (which may block).
+    close_async_grace_period = 5.0
+
+    def close_async(self):
+        """Coroutine variant of close().
+
+        This closes the command stream, and waits (using the event loop) for
+        the engine to close its end of the response stream before calling
+        close(), so normally close() doesn't have to wait for long.
+
+        """
+        deadline = time.time() + self.close_async_grace_period
+        self.close_command_stream()
+        try:
+            fd = self.get_response_fd()
+            while (yield Wait_readable(fd, deadline)):
+                if os.read(fd, 4096) == "":
+                    break
+        except (EnvironmentError, ValueError):
+            pass
+        self.close()
+
+
+    # For subclasses to override:
+
+    def get_response_fd(self):
+        """Return the file descriptor to read responses from."""
+        raise NotImplementedError
+
+    def abandon_engine(self):
+        """Give up on an engine which hasn't responded in time.
+
+        Subclasses should do what they can to make sure the engine doesn't
+        carry on working (eg, kill a subprocess). This mustn't raise
+        exceptions.
+
+        """
+        raise NotImplementedError
+
+    def close_command_stream(self):
+        """Close the command stream, so that the engine sees end-of-file.
+
+        This mustn't raise exceptions.
+
+        """
+        raise NotImplementedError
+
+
 def permit_sigpipe():
     signal.signal(signal.SIGPIPE, signal.SIG_DFL)
 
-class Subprocess_gtp_channel(Linebased_gtp_channel):
+class Subprocess_gtp_channel(Buffered_gtp_channel):
     """A GTP channel to a subprocess.
 
     Instantiate with
@@ -396,9 +783,15 @@ class Subprocess_gtp_channel(Linebased_gtp_channel):
 
     Closing the channel waits for the subprocess to exit.
 
+    This channel supports timeouts. If a response doesn't arrive in time, the
+    subprocess is killed (with SIGKILL) before GtpTimeout is raised.
+
+    Responses are read from the pipe in large chunks, rather than a line at a
+    time (see Buffered_gtp_channel).
+
     """
     def __init__(self, command, stderr=None, cwd=None, env=None):
-        Linebased_gtp_channel.__init__(self)
+        Buffered_gtp_channel.__init__(self)
         try:
             p = subprocess.Popen(
                 command,
@@ -421,17 +814,20 @@ class Subprocess_gtp_channel(Linebased_gtp_channel):
             else:
                 raise GtpTransportError(str(e))
 
-    def get_response_line(self):
+    def get_response_fd(self):
+        return self.response_pipe.fileno()
+
+    def abandon_engine(self):
         try:
-            return self.response_pipe.readline()
-        except EnvironmentError, e:
-            raise GtpTransportError(str(e))
+            self.subprocess.kill()
+        except EnvironmentError:
+            pass
 
-    def get_response_byte(self):
+    def close_command_stream(self):
         try:
-            return self.response_pipe.read(1)
-        except EnvironmentError, e:
-            raise GtpTransportError(str(e))
+            self.command_pipe.close()
+        except EnvironmentError:
+            pass
 
     def close(self):
         # Errors from closing pipes or wait4() are unlikely, but possible.
@@ -462,6 +858,149 @@ class Subprocess_gtp_channel(Linebased_gtp_channel):
             raise GtpTransportError("\n".join(errors))
 
 
+def parse_engine_address(s):
+    """Interpret a string describing where an engine is listening.
+
+    Accepts 'host:port' (the host may be an IPv6 address in square brackets),
+    or the pathname of a Unix-domain socket (which must contain a '/').
+
+    Returns a pair (host, port) or a pathname string, suitable for use with
+    Socket_gtp_channel.
+
+    Raises ValueError if the string isn't acceptable.
+
+    """
+    if "/" in s:
+        return s
+    host, sep, port = s.rpartition(":")
+    if not sep or not host:
+        raise ValueError("bad engine address %s (expected host:port)" % s)
+    if host.startswith("[") and host.endswith("]"):
+        host = host[1:-1]
+    try:
+        port = int(port, 10)
+    except ValueError:
+        port = -1
+    if not 0 < port < 65536:
+        raise ValueError("bad port number in engine address %s" % s)
+    return host, port
+
+def describe_engine_address(address):
+    """Return a string describing an address from parse_engine_address()."""
+    if isinstance(address, basestring):
+        return address
+    host, port = address
+    if ":" in host:
+        host = "[%s]" % host
+    return "%s:%d" % (host, port)
+
+def set_socket_keepalive(sock):
+    """Turn on TCP keepalive for a socket, with short-ish intervals.
+
+    This means that connections to engines on hosts which have gone away are
+    eventually reported as broken, even if the engine is thinking.
+
+    """
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    for option, value in (('TCP_KEEPIDLE', 60),
+                          ('TCP_KEEPINTVL', 10),
+                          ('TCP_KEEPCNT', 6)):
+        if hasattr(socket, option):
+            sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+
+class Socket_gtp_channel(Buffered_gtp_channel):
+    """A GTP channel to an engine listening on a TCP or Unix-domain socket.
+
+    Instantiate with
+      address         -- pair (host, port), or Unix-domain socket pathname
+      connect_timeout -- float (seconds) or None (default None)
+      keepalive       -- bool (default True)
+    Instantiation will raise GtpChannelError if the connection can't be made.
+
+    See parse_engine_address() for a convenient way to make 'address'.
+
+    This connects to the address and speaks GTP over the connection. Each
+    channel makes a new connection; gtp_proxy.Subprocess_engine_server starts
+    a new engine subprocess for each connection it accepts.
+
+    If connect_timeout is None, this uses the operating system's connection
+    timeout.
+
+    If keepalive is true, turns on TCP keepalive for the connection (see
+    set_socket_keepalive()), so that the channel eventually reports an error if
+    the engine's host goes away.
+
+    This channel supports timeouts. If a response doesn't arrive in time, the
+    connection is shut down before GtpTimeout is raised (an engine started by
+    gtp_proxy.Subprocess_engine_server is killed by SIGPIPE when it tries to
+    send the response).
+
+    exit_status and resource_usage are never set.
+
+    """
+    def __init__(self, address, connect_timeout=None, keepalive=True):
+        Buffered_gtp_channel.__init__(self)
+        self.address = address
+        try:
+            if isinstance(address, basestring):
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                try:
+                    sock.settimeout(connect_timeout)
+                    sock.connect(address)
+                except:
+                    sock.close()
+                    raise
+            else:
+                sock = socket.create_connection(address, connect_timeout)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                if keepalive:
+                    set_socket_keepalive(sock)
+            sock.settimeout(None)
+        except socket.timeout:
+            raise GtpChannelError("timed out")
+        except EnvironmentError, e:
+            raise GtpChannelError(str(e))
+        self.sock = sock
+
+    def send_command_line(self, command):
+        try:
+            self.sock.sendall(command)
+        except EnvironmentError, e:
+            if e.errno in (errno.EPIPE, errno.ECONNRESET):
+                raise GtpChannelClosed("engine has closed the command channel")
+            else:
+                raise GtpTransportError(str(e))
+
+    def get_response_fd(self):
+        return self.sock.fileno()
+
+    def abandon_engine(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except EnvironmentError:
+            pass
+
+    def close_command_stream(self):
+        try:
+            self.sock.shutdown(socket.SHUT_WR)
+        except EnvironmentError:
+            pass
+
+    def close(self):
+        try:
+            self.sock.close()
+        except EnvironmentError, e:
+            raise GtpTransportError("error closing socket:\n%s" % e)
+
+
+# Commands which are subject to Gtp_controller.genmove_timeout
+genmove_commands = frozenset([
+    'genmove',
+    'gomill-genmove_ex',
+    'reg_genmove',
+    'kgs-genmove_cleanup',
+    ])
+
 class Gtp_controller(object):
     """Implementation of the controller side of the GTP protocol.
 
@@ -473,6 +1012,10 @@ class Gtp_controller(object):
       name              -- short ascii string (used in error messages)
       channel_is_closed -- bool
       channel_is_bad    -- bool
+      command_timeout   -- float or None (see set_timeouts())
+      genmove_timeout   -- float or None (see set_timeouts())
+      command_timings   -- Command_timings or None (see set_command_timings())
+      use_pipelining    -- bool (see enable_pipelining())
 
     Instantiate with channel and name.
 
@@ -489,6 +1032,61 @@ class Gtp_controller(object):
         self.errors_seen = []
         self.channel_is_closed = False
         self.channel_is_bad = False
+        self.command_timeout = None
+        self.genmove_timeout = None
+        self.command_timings = None
+        self.use_pipelining = True
+        self.next_command_id = 1
+
+    def set_timeouts(self, command_timeout=None, genmove_timeout=None):
+        """Limit the time to wait for each response.
+
+        command_timeout -- float (seconds) or None
+        genmove_timeout -- float (seconds) or None
+
+        genmove_timeout applies to the move-generation commands listed in
+        genmove_commands; command_timeout applies to all other commands
+        (including 'quit').
+
+        None means wait indefinitely; that's the default for both.
+
+        The time limits only have an effect if the channel supports timeouts
+        (see Gtp_channel.get_response()).
+
+        """
+        self.command_timeout = command_timeout
+        self.genmove_timeout = genmove_timeout
+
+    def set_command_timings(self, timings):
+        """Record how long the engine takes to respond to each command.
+
+        timings -- command_timings.Command_timings, or None
+
+        After this is called, do_command() and do_pipelined_commands() record
+        the time taken for each response in 'timings' (keyed by the command
+        name passed to them, before gtp_aliases are applied). Pass None to
+        stop recording (this is the default).
+
+        Times are measured from sending the command until the response has
+        been read; for pipelined commands, each time after the first is
+        measured from reading the previous response. Commands which don't
+        get a response (because of a GtpChannelError) aren't recorded.
+
+        """
+        self.command_timings = timings
+
+    def enable_pipelining(self, b=True):
+        """Say whether do_pipelined_commands() may pipeline commands.
+
+        Pipelining is enabled by default, but do_pipelined_commands() only
+        pipelines if the channel supports it (see Gtp_channel).
+
+        Pipelined commands carry GTP command ids. Disable pipelining for
+        engines which don't accept command ids; do_pipelined_commands() then
+        sends the commands one at a time, without ids.
+
+        """
+        self.use_pipelining = bool(b)
 
     def do_command(self, command, *arguments):
         """Send a command to the engine and return the response.
@@ -514,7 +1112,8 @@ class Gtp_controller(object):
         If the engine returns a failure response, raises BadGtpResponse (use the
         gtp_error_message attribute to retrieve the text of the response).
 
-        This will wait indefinitely for the engine to produce the response.
+        This will wait indefinitely for the engine to produce the response,
+        unless time limits have been set using set_timeouts().
 
 
         Raises GtpChannelClosed if the engine has apparently closed its
@@ -527,6 +1126,9 @@ class Gtp_controller(object):
         layer between the controller and the engine (which may well mean that
         the engine has gone away).
 
+        Raises GtpTimeout if the response didn't arrive within the time limit
+        set using set_timeouts() (and the channel supports timeouts).
+
         If any of these GtpChannelError variants is raised, this also marks the
         channel as 'bad' (this has no effect on future do_command() calls, but
         see safe_do_command() below).
@@ -539,7 +1141,81 @@ class Gtp_controller(object):
         """
         if self.channel_is_closed:
             raise StandardError("channel is closed")
+        timings = self.command_timings
+        if timings is not None:
+            start_time = time.time()
+        prepared = self._prepare_command(command, arguments)
+        self._send_prepared_command(prepared, None)
+        result = self._read_prepared_response(prepared)
+        if timings is not None:
+            timings.record(command, time.time() - start_time)
+        if isinstance(result, BadGtpResponse):
+            raise result
+        return result
+
+    def do_pipelined_commands(self, commands):
+        """Send a batch of commands to the engine and collect the responses.
+
+        commands -- list of pairs (command, arguments)
+
+        command and arguments are as for do_command(), except that arguments
+        is a list.
+
+        Returns a list with an entry for each command, in the same order. Each
+        entry is either the response (as do_command() would return it), or a
+        BadGtpResponse (as do_command() would raise it).
+
+        Every command is sent, whether or not earlier commands in the batch
+        gave failure responses.
 
+        If pipelining is enabled (see enable_pipelining()) and the channel
+        supports it (see Gtp_channel), this sends all the commands (with GTP
+        command ids) before reading any of the responses, so the batch takes a
+        single round trip. Otherwise it runs the commands one at a time.
+        Batches should be small: the engine's responses aren't read until all
+        the commands have been sent.
+
+        Propagates GtpChannelError in the same way as do_command() (the
+        exception message describes the command which was being sent, or whose
+        response was being read).
+
+        """
+        if self.channel_is_closed:
+            raise StandardError("channel is closed")
+        timings = self.command_timings
+        if timings is not None:
+            last_time = time.time()
+        prepared_commands = [self._prepare_command(command, arguments)
+                             for command, arguments in commands]
+        if not (self.use_pipelining and self.channel.supports_pipelining):
+            results = []
+            for (command, _), prepared in zip(commands, prepared_commands):
+                self._send_prepared_command(prepared, None)
+                results.append(self._read_prepared_response(prepared))
+                if timings is not None:
+                    now = time.time()
+                    timings.record(command, now - last_time)
+                    last_time = now
+            return results
+        for prepared in prepared_commands:
+            self._send_prepared_command(prepared, self.next_command_id)
+            self.next_command_id += 1
+        results = []
+        for (command, _), prepared in zip(commands, prepared_commands):
+            results.append(self._read_prepared_response(prepared))
+            if timings is not None:
+                now = time.time()
+                timings.record(command, now - last_time)
+                last_time = now
+        return results
+
+    def _prepare_command(self, command, arguments):
+        """Common setup for do_command() and do_pipelined_commands().
+
+        Returns a tuple
+          (translated_command, fixed_arguments, is_first_command, timeout)
+
+        """
         def fix_argument(argument):
             if isinstance(argument, unicode):
                 return argument.encode("utf-8")
@@ -551,37 +1227,73 @@ class Gtp_controller(object):
         translated_command = self.gtp_aliases.get(fixed_command, fixed_command)
         is_first_command = self.is_first_command
         self.is_first_command = False
+        if fixed_command in genmove_commands:
+            timeout = self.genmove_timeout
+        else:
+            timeout = self.command_timeout
+        return translated_command, fixed_arguments, is_first_command, timeout
 
-        def format_command():
-            desc = "%s" % (" ".join([translated_command] + fixed_arguments))
-            if is_first_command:
-                return "first command (%s)" % desc
-            else:
-                return "'%s'" % desc
+    @staticmethod
+    def _format_command(prepared):
+        translated_command, fixed_arguments, is_first_command, _ = prepared
+        desc = "%s" % (" ".join([translated_command] + fixed_arguments))
+        if is_first_command:
+            return "first command (%s)" % desc
+        else:
+            return "'%s'" % desc
+
+    def _describe_channel_error(self, e, is_sending, prepared):
+        """Mark the channel as bad and rewrite a GtpChannelError's message."""
+        self.channel_is_bad = True
+        if isinstance(e, GtpTransportError):
+            error_label = "transport error"
+        elif isinstance(e, GtpProtocolError):
+            error_label = "GTP protocol error"
+        elif isinstance(e, GtpTimeout):
+            error_label = "timeout"
+        else:
+            error_label = "error"
+        if is_sending:
+            msg = "%s sending %s to %s:\n%s"
+        else:
+            msg = "%s reading response to %s from %s:\n%s"
+        e.args = (msg % (error_label, self._format_command(prepared),
+                         self.name, e),)
 
+    def _send_prepared_command(self, prepared, command_id):
+        translated_command, fixed_arguments, _, _ = prepared
         try:
-            is_sending = True
-            self.channel.send_command(translated_command, fixed_arguments)
-            is_sending = False
-            is_failure, response = self.channel.get_response()
+            self.channel.send_command(
+                translated_command, fixed_arguments, command_id)
         except GtpChannelError, e:
-            self.channel_is_bad = True
-            if isinstance(e, GtpTransportError):
-                error_label = "transport error"
-            elif isinstance(e, GtpProtocolError):
-                error_label = "GTP protocol error"
-            else:
-                error_label = "error"
-            if is_sending:
-                msg = "%s sending %s to %s:\n%s"
-            else:
-                msg = "%s reading response to %s from %s:\n%s"
-            e.args = (msg % (error_label, format_command(), self.name, e),)
+            self._describe_channel_error(e, True, prepared)
             raise
+
+    def _read_prepared_response(self, prepared):
+        """Read the response to a command.
+
+        Returns the response string, or a BadGtpResponse for a failure
+        response.
+
+        """
+        try:
+            result = self.channel.get_response(prepared[3])
+        except GtpChannelError, e:
+            self._describe_channel_error(e, False, prepared)
+            raise
+        return self._interpret_prepared_response(prepared, result)
+
+    def _interpret_prepared_response(self, prepared, result):
+        """Convert a channel response to the form _read_prepared_response()
+        returns.
+
+        """
+        translated_command, fixed_arguments, _, _ = prepared
+        is_failure, response = result
         if is_failure:
-            raise BadGtpResponse(
+            return BadGtpResponse(
                 "failure response from %s to %s:\n%s" %
-                (format_command(), self.name, response),
+                (self._format_command(prepared), self.name, response),
                 gtp_command=translated_command, gtp_arguments=fixed_arguments,
                 gtp_error_message=response)
         return response
@@ -591,13 +1303,26 @@ class Gtp_controller(object):
         result = self.known_commands.get(command)
         if result is not None:
             return result
-        translated_command = self.gtp_aliases.get(command, command)
+        query_command, query_arguments = self._make_known_command_query(command)
         try:
-            response = do_command("known_command", translated_command)
-        except BadGtpResponse:
-            known = False
-        else:
-            known = (response == 'true')
+            response = do_command(query_command, *query_arguments)
+        except BadGtpResponse, e:
+            response = e
+        return self._interpret_known_command_result(command, response)
+
+    def _make_known_command_query(self, command):
+        """Return the (command, arguments) pair which asks about 'command'."""
+        return "known_command", [self.gtp_aliases.get(command, command)]
+
+    def _interpret_known_command_result(self, command, result):
+        """Interpret and cache the result of a known_command query.
+
+        result -- result from the query (as for do_pipelined_commands())
+
+        Returns a bool.
+
+        """
+        known = (result == 'true')
         self.known_commands[command] = known
         return known
 
@@ -631,8 +1356,21 @@ class Gtp_controller(object):
         """
         try:
             protocol_version = self.do_command("protocol_version")
-        except BadGtpResponse:
+        except BadGtpResponse, e:
+            protocol_version = e
+        self._check_protocol_version_result(protocol_version)
+
+    def _check_protocol_version_result(self, result):
+        """Check the result of a protocol_version command.
+
+        result -- result from the command (as for do_pipelined_commands())
+
+        Raises BadGtpResponse if the engine declares a version other than 2.
+
+        """
+        if isinstance(result, BadGtpResponse):
             return
+        protocol_version = result
         # Engines returning "2.0" have been seen in the wild.
         # See https://github.com/mattheww/gomill/issues/5
         try:
@@ -653,7 +1391,11 @@ class Gtp_controller(object):
         May propagate GtpChannelError or BadGtpResponse
 
         """
-        response = self.do_command('list_commands')
+        return self._interpret_list_commands_response(
+            self.do_command('list_commands'))
+
+    @staticmethod
+    def _interpret_list_commands_response(response):
         stripped = [s for s in
                     (t.strip() for t in response.split("\n"))]
         return [s for s in stripped if is_well_formed_gtp_word(s)]
@@ -768,6 +1510,147 @@ class Gtp_controller(object):
         self.gtp_aliases = aliases
 
 
+class Async_gtp_controller(Gtp_controller):
+    """Variant of Gtp_controller for use with event_loops.Event_loop.
+
+    The following methods are coroutines (see event_loops), with the same
+    parameters, results and exceptions as the Gtp_controller methods:
+      do_command()
+      do_pipelined_commands()
+      known_command()
+      check_protocol_version()
+      list_commands()
+      close()
+      safe_do_command()
+      safe_known_command()
+      safe_close()
+
+    While one of these is waiting for the engine's response, other coroutines
+    in the same event loop can run (this depends on the channel implementing
+    get_response_async(); otherwise it blocks).
+
+    """
+    def do_command(self, command, *arguments):
+        if self.channel_is_closed:
+            raise StandardError("channel is closed")
+        timings = self.command_timings
+        if timings is not None:
+            start_time = time.time()
+        prepared = self._prepare_command(command, arguments)
+        self._send_prepared_command(prepared, None)
+        result = yield self._read_prepared_response_async(prepared)
+        if timings is not None:
+            timings.record(command, time.time() - start_time)
+        if isinstance(result, BadGtpResponse):
+            raise result
+        raise Return(result)
+
+    def do_pipelined_commands(self, commands):
+        if self.channel_is_closed:
+            raise StandardError("channel is closed")
+        timings = self.command_timings
+        if timings is not None:
+            last_time = time.time()
+        prepared_commands = [self._prepare_command(command, arguments)
+                             for command, arguments in commands]
+        results = []
+        if not (self.use_pipelining and self.channel.supports_pipelining):
+            for (command, _), prepared in zip(commands, prepared_commands):
+                self._send_prepared_command(prepared, None)
+                results.append(
+                    (yield self._read_prepared_response_async(prepared)))
+                if timings is not None:
+                    now = time.time()
+                    timings.record(command, now - last_time)
+                    last_time = now
+            raise Return(results)
+        for prepared in prepared_commands:
+            self._send_prepared_command(prepared, self.next_command_id)
+            self.next_command_id += 1
+        for (command, _), prepared in zip(commands, prepared_commands):
+            results.append(
+                (yield self._read_prepared_response_async(prepared)))
+            if timings is not None:
+                now = time.time()
+                timings.record(command, now - last_time)
+                last_time = now
+        raise Return(results)
+
+    def _read_prepared_response_async(self, prepared):
+        """Coroutine variant of _read_prepared_response()."""
+        try:
+            result = yield self.channel.get_response_async(prepared[3])
+        except GtpChannelError, e:
+            self._describe_channel_error(e, False, prepared)
+            raise
+        raise Return(self._interpret_prepared_response(prepared, result))
+
+    def _known_command_async(self, command, do_command):
+        """Common implementation for known_command and safe_known_command."""
+        result = self.known_commands.get(command)
+        if result is not None:
+            raise Return(result)
+        query_command, query_arguments = self._make_known_command_query(command)
+        try:
+            response = yield do_command(query_command, *query_arguments)
+        except BadGtpResponse, e:
+            response = e
+        raise Return(self._interpret_known_command_result(command, response))
+
+    def known_command(self, command):
+        return self._known_command_async(command, self.do_command)
+
+    def check_protocol_version(self):
+        try:
+            protocol_version = yield self.do_command("protocol_version")
+        except BadGtpResponse, e:
+            protocol_version = e
+        self._check_protocol_version_result(protocol_version)
+
+    def list_commands(self):
+        response = yield self.do_command('list_commands')
+        raise Return(self._interpret_list_commands_response(response))
+
+    def close(self):
+        if self.channel_is_closed:
+            raise StandardError("channel is closed")
+        try:
+            yield self.channel.close_async()
+        except GtpTransportError, e:
+            raise GtpTransportError(
+                "error closing %s:\n%s" % (self.name, e))
+        self.channel_is_closed = True
+
+    def safe_do_command(self, command, *arguments):
+        if self.channel_is_bad or self.channel_is_closed:
+            raise Return(None)
+        try:
+            result = yield self.do_command(command, *arguments)
+        except BadGtpResponse, e:
+            raise
+        except GtpChannelError, e:
+            self.errors_seen.append(str(e))
+            raise Return(None)
+        raise Return(result)
+
+    def safe_known_command(self, command):
+        return self._known_command_async(command, self.safe_do_command)
+
+    def safe_close(self):
+        if self.channel_is_closed:
+            return
+        if not self.channel_is_bad:
+            try:
+                yield self.safe_do_command("quit")
+            except BadGtpResponse, e:
+                self.errors_seen.append(str(e))
+        try:
+            yield self.channel.close_async()
+        except GtpTransportError, e:
+            self.errors_seen.append("error closing %s:\n%s" % (self.name, e))
+        self.channel_is_closed = True
+
+
 class Engine_description(object):
     """Data from GTP engine-description commands.
 
@@ -836,22 +1719,87 @@ class Engine_description(object):
 
         May propagate GtpChannelError.
 
+        The name, version, and known_command queries are sent as a single
+        pipelined batch (see Gtp_controller.do_pipelined_commands()).
+
         """
-        try:
-            gtp_name = controller.do_command("name")
-        except BadGtpResponse:
-            gtp_name = None
-        try:
-            gtp_version = controller.do_command("version")
-        except BadGtpResponse:
-            gtp_version = None
+        commands = cls._get_query_commands(controller)
+        return cls._from_query_results(
+            controller, controller.do_pipelined_commands(commands))
+
+    @classmethod
+    def from_controller_async(cls, controller):
+        """Coroutine variant of from_controller().
+
+        controller -- Async_gtp_controller
+
+        """
+        commands = cls._get_query_commands(controller)
+        results = yield controller.do_pipelined_commands(commands)
+        raise Return((yield cls._from_query_results_async(controller, results)))
+
+    @staticmethod
+    def _get_query_commands(controller):
+        """Return the commands to send for from_controller().
+
+        Returns a list of pairs (command, arguments), for use with
+        Gtp_controller.do_pipelined_commands().
+
+        """
+        commands = [("name", []), ("version", [])]
+        if "gomill-describe_engine" not in controller.known_commands:
+            commands.append(controller._make_known_command_query(
+                "gomill-describe_engine"))
+        return commands
+
+    @classmethod
+    def _from_query_results(cls, controller, results):
+        """Return a new Engine_description, given the query results.
+
+        results -- results from do_pipelined_commands(), for the commands
+                   returned by _get_query_commands()
+
+        This sends gomill-describe_engine if the engine supports it.
+
+        May propagate GtpChannelError.
+
+        """
+        if len(results) > 2:
+            controller._interpret_known_command_result(
+                "gomill-describe_engine", results[2])
         gtp_gde = None
         if controller.known_command("gomill-describe_engine"):
             try:
                 gtp_gde = controller.do_command("gomill-describe_engine")
             except BadGtpResponse:
                 pass
-        return cls(gtp_name, gtp_version, gtp_gde)
+        return cls._from_values(results, gtp_gde)
+
+    @classmethod
+    def _from_query_results_async(cls, controller, results):
+        """Coroutine variant of _from_query_results().
+
+        controller -- Async_gtp_controller
+
+        """
+        if len(results) > 2:
+            controller._interpret_known_command_result(
+                "gomill-describe_engine", results[2])
+        gtp_gde = None
+        if (yield controller.known_command("gomill-describe_engine")):
+            try:
+                gtp_gde = yield controller.do_command("gomill-describe_engine")
+            except BadGtpResponse:
+                pass
+        raise Return(cls._from_values(results, gtp_gde))
+
+    @classmethod
+    def _from_values(cls, results, gtp_gde):
+        def value(result):
+            if isinstance(result, BadGtpResponse):
+                return None
+            return result
+        return cls(value(results[0]), value(results[1]), gtp_gde)
 
     def get_short_description(self):
         """Return short description of the engine.
@@ -900,6 +1848,7 @@ class Game_controller(object):
 
     Order of operations:
       gc = Game_controller(...)
+      Optionally, gc.enable_command_timings()
       gc.set_player_subprocess('b', ...) or set_player_controller('b', ...)
       gc.set_player_subprocess('w', ...) or set_player_controller('w', ...)
       Any combination of:
@@ -907,9 +1856,11 @@ class Game_controller(object):
         gc.maybe_send_command(...)
         gc.known_command(...)
         higher-level helpers
+      Optionally, gc.release_player(...)
       gc.close_players()
       gc.describe_late_errors()
       gc.get_resource_usage_cpu_times()
+      gc.get_command_timings()
 
     Public attributes for reading:
       players             -- map colour -> player code
@@ -935,15 +1886,30 @@ class Game_controller(object):
         self.late_errors = []
         self.engine_descriptions = {'b' : None, 'w' : None}
         self.in_cautious_mode = False
+        # Map colour -> Command_timings, or None
+        self.command_timings = None
 
     ## Configuration API
 
+    def enable_command_timings(self):
+        """Record how long each player's engine takes to respond to commands.
+
+        Call this before specifying the players.
+
+        See get_command_timings().
+
+        """
+        self.command_timings = {'b' : Command_timings(),
+                                'w' : Command_timings()}
+
     def set_player_controller(self, colour, controller,
-                              check_protocol_version=True):
+                              check_protocol_version=True,
+                              engine_description=None):
         """Specify a player using a Gtp_controller.
 
         controller             -- Gtp_controller
         check_protocol_version -- bool (default True)
+        engine_description     -- Engine_description (optional)
 
         By convention, the controller's name should be 'player <player code>'.
 
@@ -953,28 +1919,59 @@ class Game_controller(object):
         Sets the engine_descriptions entry for the player, using GTP commands
         (see Engine_description).
 
+        The protocol_version and engine-description commands are sent as a
+        single pipelined batch (see Gtp_controller.do_pipelined_commands()).
+
+        If engine_description is specified, it's used as the engine_descriptions
+        entry and no commands are sent (this is for engines which have already
+        been checked, eg in an earlier game); check_protocol_version is ignored.
+
         Propagates GtpChannelError if there's a low-level error checking the
         protocol version or from the engine-description commands.
 
         """
         self.controllers[colour] = controller
+        if self.command_timings is not None:
+            controller.set_command_timings(self.command_timings[colour])
+        if engine_description is not None:
+            self.engine_descriptions[colour] = engine_description
+            return
+        commands = self._get_player_query_commands(
+            controller, check_protocol_version)
+        results = controller.do_pipelined_commands(commands)
         if check_protocol_version:
-            controller.check_protocol_version()
-        player_code = self.players[colour]
+            controller._check_protocol_version_result(results.pop(0))
         self.engine_descriptions[colour] = \
-            Engine_description.from_controller(controller)
+            Engine_description._from_query_results(controller, results)
+
+    @staticmethod
+    def _get_player_query_commands(controller, check_protocol_version):
+        """Return the commands to send from set_player_controller()."""
+        commands = Engine_description._get_query_commands(controller)
+        if check_protocol_version:
+            commands.insert(0, ("protocol_version", []))
+        return commands
 
     def set_player_subprocess(self, colour, command,
-                              check_protocol_version=True, **kwargs):
+                              check_protocol_version=True,
+                              command_timeout=None, genmove_timeout=None,
+                              use_pipelining=True, **kwargs):
         """Specify the a player as a subprocess.
 
         command                -- list of strings (as for subprocess.Popen)
         check_protocol_version -- bool (default True)
+        command_timeout        -- float or None (default None)
+        genmove_timeout        -- float or None (default None)
+        use_pipelining         -- bool (default True)
 
         Any additional keyword arguments are passed to the
         Subprocess_gtp_channel constructor.
 
-        Creates a Gtp_controller, named 'player <player code>'.
+        Creates a Gtp_controller, named 'player <player code>', and sets its
+        time limits (see Gtp_controller.set_timeouts()). If use_pipelining is
+        false, disables pipelining for the controller (see
+        Gtp_controller.enable_pipelining()); use this for engines which don't
+        accept GTP command ids.
 
         If check_protocol_version is true, rejects an engine that declares a
         GTP protocol version <> 2 (raises BadGtpResponse).
@@ -986,16 +1983,87 @@ class Game_controller(object):
         subprocess, checking the protocol version, or from the
         engine-description commands.
 
+        """
+        controller = self._make_subprocess_controller(
+            Gtp_controller, colour, command,
+            command_timeout, genmove_timeout, use_pipelining, kwargs)
+        self.set_player_controller(colour, controller, check_protocol_version)
+
+    def set_player_socket(self, colour, address,
+                          check_protocol_version=True,
+                          command_timeout=None, genmove_timeout=None,
+                          use_pipelining=True, **kwargs):
+        """Specify a player as an engine listening on a socket.
+
+        address                -- as for Socket_gtp_channel
+        check_protocol_version -- bool (default True)
+        command_timeout        -- float or None (default None)
+        genmove_timeout        -- float or None (default None)
+        use_pipelining         -- bool (default True)
+
+        Any additional keyword arguments are passed to the Socket_gtp_channel
+        constructor.
+
+        This behaves in the same way as set_player_subprocess(), except that
+        it connects to the socket rather than starting a subprocess.
+
+        """
+        controller = self._make_socket_controller(
+            Gtp_controller, colour, address,
+            command_timeout, genmove_timeout, use_pipelining, kwargs)
+        self.set_player_controller(colour, controller, check_protocol_version)
+
+    def _make_player_controller(self, controller_class, colour, make_channel,
+                                failure_description,
+                                command_timeout, genmove_timeout,
+                                use_pipelining):
+        """Common code for _make_subprocess_controller() and similar.
+
+        make_channel        -- function returning a new Gtp_channel
+        failure_description -- string, eg "error starting subprocess"
+
+        Returns a new instance of controller_class.
+
         """
         player_code = self.players[colour]
         try:
-            channel = Subprocess_gtp_channel(command, **kwargs)
+            channel = make_channel()
         except GtpChannelError, e:
             raise GtpChannelError(
-                "error starting subprocess for player %s:\n%s" %
-                (player_code, e))
-        controller = Gtp_controller(channel, "player %s" % player_code)
-        self.set_player_controller(colour, controller, check_protocol_version)
+                "%s for player %s:\n%s" %
+                (failure_description, player_code, e))
+        controller = controller_class(channel, "player %s" % player_code)
+        controller.set_timeouts(command_timeout, genmove_timeout)
+        controller.enable_pipelining(use_pipelining)
+        return controller
+
+    def _make_subprocess_controller(self, controller_class, colour, command,
+                                    command_timeout, genmove_timeout,
+                                    use_pipelining, kwargs):
+        """Common code for set_player_subprocess() implementations.
+
+        Returns a new instance of controller_class.
+
+        """
+        return self._make_player_controller(
+            controller_class, colour,
+            lambda: Subprocess_gtp_channel(command, **kwargs),
+            "error starting subprocess",
+            command_timeout, genmove_timeout, use_pipelining)
+
+    def _make_socket_controller(self, controller_class, colour, address,
+                                command_timeout, genmove_timeout,
+                                use_pipelining, kwargs):
+        """Common code for set_player_socket() implementations.
+
+        Returns a new instance of controller_class.
+
+        """
+        return self._make_player_controller(
+            controller_class, colour,
+            lambda: Socket_gtp_channel(address, **kwargs),
+            "error connecting to %s" % describe_engine_address(address),
+            command_timeout, genmove_timeout, use_pipelining)
 
 
     ## Generic GTP controller API
@@ -1037,13 +2105,53 @@ class Game_controller(object):
         if self.in_cautious_mode:
             response = controller.safe_do_command(command, *arguments)
             if response is None:
-                raise BadGtpResponse(
-                    "late low-level error from player %s" %
-                    self.players[colour])
+                self._raise_late_error(colour)
             return response
         else:
             return controller.do_command(command, *arguments)
 
+    def _raise_late_error(self, colour):
+        raise BadGtpResponse(
+            "late low-level error from player %s" % self.players[colour])
+
+    def send_commands(self, colour, commands):
+        """Send several GTP commands to one of the players.
+
+        colour   -- player to talk to ('b' or 'w')
+        commands -- list of pairs (command, arguments)
+
+        Returns a list of the responses.
+
+        If any of the commands gives a failure response, raises BadGtpResponse
+        for the first of them (but all the commands are sent in any case).
+
+        Outside cautious mode, this uses Gtp_controller.do_pipelined_commands()
+        (so, if the channel supports it, this costs a single round trip).
+
+        In cautious mode the commands are sent one at a time, and low-level
+        errors are handled as for send_command().
+
+        """
+        controller = self.controllers[colour]
+        if self.in_cautious_mode:
+            results = []
+            for command, arguments in commands:
+                try:
+                    results.append(
+                        self.send_command(colour, command, *arguments))
+                except BadGtpResponse, e:
+                    results.append(e)
+        else:
+            results = controller.do_pipelined_commands(commands)
+        self._raise_first_failure(results)
+        return results
+
+    @staticmethod
+    def _raise_first_failure(results):
+        for result in results:
+            if isinstance(result, BadGtpResponse):
+                raise result
+
     def maybe_send_command(self, colour, command, *arguments):
         """Send the specified GTP command, if supported.
 
@@ -1083,6 +2191,24 @@ class Game_controller(object):
         else:
             return controller.known_command(command)
 
+    def release_player(self, colour):
+        """Stop managing the specified player's controller, without closing it.
+
+        Returns the Gtp_controller.
+
+        After this, the player is ignored by close_players() and
+        get_resource_usage_cpu_times(), and get_controller() raises KeyError for
+        it. The engine_descriptions entry is left in place.
+
+        This is for callers which want to keep an engine running for a later
+        game.
+
+        """
+        controller = self.controllers.pop(colour)
+        if self.command_timings is not None:
+            controller.set_command_timings(None)
+        return controller
+
     def close_players(self):
         """Close both controllers (if they're open).
 
@@ -1114,6 +2240,15 @@ class Game_controller(object):
             return None
         return "\n".join(self.late_errors)
 
+    def get_command_timings(self):
+        """Return the GTP command response times for each player.
+
+        Returns a dict colour -> command_timings.Command_timings, or None if
+        enable_command_timings() wasn't called.
+
+        """
+        return self.command_timings
+
     def get_resource_usage_cpu_times(self):
         """Return the measured CPU times of the engines.
 
@@ -1170,3 +2305,131 @@ class Game_controller(object):
         return result, errors
 
 
+class Async_game_controller(Game_controller):
+    """Variant of Game_controller for use with event_loops.Event_loop.
+
+    The player controllers must be Async_gtp_controllers.
+
+    The following methods are coroutines (see event_loops), with the same
+    parameters, results and exceptions as the Game_controller methods:
+      set_player_controller()
+      set_player_subprocess()
+      set_player_socket()
+      send_command()
+      send_commands()
+      maybe_send_command()
+      known_command()
+      close_players()
+      get_gtp_cpu_times()
+
+    set_player_subprocess() and set_player_socket() create
+    Async_gtp_controllers. Connecting to a socket blocks the event loop.
+
+    """
+    def set_player_controller(self, colour, controller,
+                              check_protocol_version=True,
+                              engine_description=None):
+        self.controllers[colour] = controller
+        if self.command_timings is not None:
+            controller.set_command_timings(self.command_timings[colour])
+        if engine_description is not None:
+            self.engine_descriptions[colour] = engine_description
+            return
+        commands = self._get_player_query_commands(
+            controller, check_protocol_version)
+        results = yield controller.do_pipelined_commands(commands)
+        if check_protocol_version:
+            controller._check_protocol_version_result(results.pop(0))
+        self.engine_descriptions[colour] = \
+            yield Engine_description._from_query_results_async(
+                controller, results)
+
+    def set_player_subprocess(self, colour, command,
+                              check_protocol_version=True,
+                              command_timeout=None, genmove_timeout=None,
+                              use_pipelining=True, **kwargs):
+        controller = self._make_subprocess_controller(
+            Async_gtp_controller, colour, command,
+            command_timeout, genmove_timeout, use_pipelining, kwargs)
+        return self.set_player_controller(
+            colour, controller, check_protocol_version)
+
+    def set_player_socket(self, colour, address,
+                          check_protocol_version=True,
+                          command_timeout=None, genmove_timeout=None,
+                          use_pipelining=True, **kwargs):
+        controller = self._make_socket_controller(
+            Async_gtp_controller, colour, address,
+            command_timeout, genmove_timeout, use_pipelining, kwargs)
+        return self.set_player_controller(
+            colour, controller, check_protocol_version)
+
+    def send_command(self, colour, command, *arguments):
+        controller = self.controllers[colour]
+        if self.in_cautious_mode:
+            response = yield controller.safe_do_command(command, *arguments)
+            if response is None:
+                self._raise_late_error(colour)
+        else:
+            response = yield controller.do_command(command, *arguments)
+        raise Return(response)
+
+    def send_commands(self, colour, commands):
+        controller = self.controllers[colour]
+        if self.in_cautious_mode:
+            results = []
+            for command, arguments in commands:
+                try:
+                    results.append(
+                        (yield self.send_command(colour, command, *arguments)))
+                except BadGtpResponse, e:
+                    results.append(e)
+        else:
+            results = yield controller.do_pipelined_commands(commands)
+        self._raise_first_failure(results)
+        raise Return(results)
+
+    def maybe_send_command(self, colour, command, *arguments):
+        controller = self.controllers[colour]
+        if self.in_cautious_mode:
+            known_command = controller.safe_known_command
+            do_command = controller.safe_do_command
+        else:
+            known_command = controller.known_command
+            do_command = controller.do_command
+        result = None
+        if (yield known_command(command)):
+            try:
+                result = yield do_command(command, *arguments)
+            except BadGtpResponse:
+                pass
+        raise Return(result)
+
+    def known_command(self, colour, command):
+        controller = self.controllers[colour]
+        if self.in_cautious_mode:
+            return controller.safe_known_command(command)
+        else:
+            return controller.known_command(command)
+
+    def close_players(self):
+        for colour in ("b", "w"):
+            controller = self.controllers.get(colour)
+            if controller is None:
+                continue
+            yield controller.safe_close()
+            self.late_errors += controller.retrieve_error_messages()
+
+    def get_gtp_cpu_times(self):
+        result = {}
+        errors = set()
+        for colour in 'b', 'w':
+            if (yield self.known_command(colour, 'gomill-cpu_time')):
+                s = yield self.maybe_send_command(colour, 'gomill-cpu_time')
+                try:
+                    result[colour] = float(s)
+                except (ValueError, TypeError):
+                    errors.add(colour)
+        raise Return((result, errors))
+
+
@@ -7,12 +7,15 @@ and gnugo 3.7 as 'reference implementation'.
 
 import errno
 import re
+import socket
 import sys
 import os
 
 from gomill.common import *
 from gomill.utils import isinf, isnan
 from gomill import compact_tracebacks
+from gomill import event_loops
+from gomill.event_loops import Wait_readable
 
 
 class GtpError(StandardError):
@@ -466,6 +469,221 @@ def run_gtp_session(engine, src, dst):
         dst.flush()
     _run_gtp_session(engine, read, write)
 
+def make_listening_socket(address, backlog=5):
+    """Create a socket listening for stream connections.
+
+    address -- pair (host, port), or Unix-domain socket pathname
+    backlog -- int
+
+    Returns a socket object.
+
+    An empty host means all interfaces. Port 0 means a port chosen by the
+    operating system (use getsockname() to find it).
+
+    Raises EnvironmentError if the address can't be used.
+
+    """
+    if isinstance(address, basestring):
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        family = socket.getaddrinfo(
+            address[0] or None, address[1], 0, socket.SOCK_STREAM,
+            0, socket.AI_PASSIVE)[0][0]
+        listener = socket.socket(family, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    try:
+        listener.bind(address)
+        listener.listen(backlog)
+    except:
+        listener.close()
+        raise
+    return listener
+
+class Gtp_engine_server(object):
+    """Serve GTP sessions to many controllers from a single process.
+
+    Instantiate with
+      make_engine    -- callable returning a Gtp_engine_protocol
+      address        -- pair (host, port), or Unix-domain socket pathname
+      release_engine -- callable taking a Gtp_engine_protocol (optional)
+    Instantiation will raise EnvironmentError if the address can't be used.
+
+    Public attributes:
+      address       -- the address being listened on
+      session_count -- number of connections accepted so far
+
+    This listens on the specified address, and runs a separate GTP session
+    for each connection it accepts, all in the same thread (using an
+    event_loops.Event_loop).
+
+    make_engine is called once for each new connection, and the session uses
+    the engine it returns. Resources which can be shared between sessions
+    (pattern tables and so on) should be loaded once, before creating the
+    server, and used by each engine.
+
+    If release_engine is specified, it's called with the engine when its
+    session ends. You can use this together with make_engine to keep a pool
+    of engines; the engine should be reset before it's reused.
+
+    Commands are handled one at a time, in the order they arrive; a slow
+    command handler (or a controller which doesn't read its responses)
+    holds up all the other sessions.
+
+    A session ends when the controller closes the connection, or when the
+    engine signals end of session (eg for the 'quit' command). Exceptions
+    from make_engine or release_engine are reported using
+    handle_session_error().
+
+    Use port 0 to listen on a port chosen by the operating system (the
+    'address' attribute gives the real port). A Unix-domain socket is removed
+    when the server is closed.
+
+    Sample use:
+      server = gtp_engine.Gtp_engine_server(make_engine, ("", 5000))
+      try:
+          server.serve_forever()
+      finally:
+          server.close()
+
+    """
+
+    # Maximum amount of data to read from a connection at a time
+    read_size = 65536
+
+    def __init__(self, make_engine, address, release_engine=None):
+        self.make_engine = make_engine
+        self.release_engine = release_engine
+        self.listener = make_listening_socket(address, backlog=64)
+        if isinstance(address, basestring):
+            self.unix_pathname = address
+        else:
+            self.unix_pathname = None
+        self.address = self.listener.getsockname()
+        self.session_count = 0
+        self._shutdown_pipe = os.pipe()
+
+    def handle_session_error(self, exc_info):
+        """Report an unexpected exception from a session.
+
+        exc_info -- triple as from sys.exc_info()
+
+        The default implementation writes a traceback to stderr. Override
+        this to report errors some other way.
+
+        """
+        print >>sys.stderr, "error in GTP session:"
+        compact_tracebacks.log_traceback_from_info(*exc_info)
+
+    def _accept_connections(self, loop):
+        listener = self.listener
+        while True:
+            yield Wait_readable(listener.fileno())
+            try:
+                connection, _ = listener.accept()
+            except socket.error, e:
+                if e.args[0] in (errno.EINTR, errno.EAGAIN,
+                                 errno.ECONNABORTED):
+                    continue
+                raise
+            if connection.family != socket.AF_UNIX:
+                connection.setsockopt(
+                    socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.session_count += 1
+            loop.start(self._run_session(connection))
+
+    def _run_session(self, connection):
+        try:
+            engine = self.make_engine()
+            try:
+                yield self._handle_commands(engine, connection)
+            finally:
+                if self.release_engine is not None:
+                    self.release_engine(engine)
+        finally:
+            connection.close()
+
+    def _handle_commands(self, engine, connection):
+        fd = connection.fileno()
+        buf = ""
+        while True:
+            yield Wait_readable(fd)
+            try:
+                data = connection.recv(self.read_size)
+            except socket.error, e:
+                if e.args[0] in (errno.EINTR, errno.EAGAIN):
+                    continue
+                if e.args[0] == errno.ECONNRESET:
+                    return
+                raise
+            if data == "":
+                # Treat a final unterminated line as a command
+                lines = [buf] if buf else []
+            else:
+                lines = (buf + data).split("\n")
+                buf = lines.pop()
+            for line in lines:
+                response, end_session = engine.handle_line(line)
+                if response is not None:
+                    try:
+                        connection.sendall(response)
+                    except socket.error, e:
+                        if e.args[0] in (errno.EPIPE, errno.ECONNRESET):
+                            return
+                        raise
+                if end_session:
+                    return
+            if data == "":
+                return
+
+    def _wait_for_shutdown(self):
+        yield Wait_readable(self._shutdown_pipe[0])
+        os.read(self._shutdown_pipe[0], 4096)
+
+    def serve_forever(self):
+        """Run GTP sessions until shutdown() is called.
+
+        Propagates any exception from accepting connections (and
+        KeyboardInterrupt).
+
+        When this returns, any sessions still in progress have been closed.
+
+        """
+        loop = event_loops.Event_loop()
+        try:
+            shutdown_task = loop.start(self._wait_for_shutdown())
+            accept_task = loop.start(self._accept_connections(loop))
+            while True:
+                for task in loop.run_until_some_finished():
+                    if task is shutdown_task:
+                        return
+                    if task is accept_task:
+                        task.get_result()
+                    elif task.exc_info is not None:
+                        self.handle_session_error(task.exc_info)
+        finally:
+            loop.close()
+
+    def shutdown(self):
+        """Make serve_forever() return.
+
+        This can be called from a command handler, or from another thread.
+
+        """
+        os.write(self._shutdown_pipe[1], "x")
+
+    def close(self):
+        """Stop listening for connections, and release resources."""
+        self.listener.close()
+        if self.unix_pathname is not None:
+            try:
+                os.remove(self.unix_pathname)
+            except EnvironmentError:
+                pass
+            self.unix_pathname = None
+        for fd in self._shutdown_pipe:
+            os.close(fd)
+        self._shutdown_pipe = ()
+
 def make_readline_completer(engine):
     """Return a readline completer function for the specified engine."""
     commands = engine.list_commands()
@@ -4,7 +4,8 @@ from gomill.utils import *
 from gomill.common import *
 from gomill import gameplay
 from gomill import gtp_controller
-from gomill.gtp_controller import BadGtpResponse
+from gomill.event_loops import Return
+from gomill.gtp_controller import BadGtpResponse, GtpTimeout
 
 class Game_result(gameplay.Result):
     """Description of a game result.
@@ -195,9 +196,14 @@ class _Gtp_backend(gameplay.Backend):
         assert komi == self.komi
         self.gc.set_cautious_mode(False)
         for colour in "b", "w":
-            self.gc.send_command(colour, "boardsize", str(board_size))
-            self.gc.send_command(colour, "clear_board")
-            self.gc.send_command(colour, "komi", str(komi))
+            self.gc.send_commands(colour, self._new_game_commands())
+
+    def _new_game_commands(self):
+        return [
+            ("boardsize", [str(self.board_size)]),
+            ("clear_board", []),
+            ("komi", [str(self.komi)]),
+            ]
 
     def end_game(self):
         self.gc.set_cautious_mode(True)
@@ -206,6 +212,9 @@ class _Gtp_backend(gameplay.Backend):
         assert handicap == self.handicap
         vertices = self.gc.send_command(
             "b", "place_free_handicap", str(handicap))
+        return self._interpret_free_handicap(vertices)
+
+    def _interpret_free_handicap(self, vertices):
         try:
             points = [move_from_vertex(vt, self.board_size)
                       for vt in vertices.split(" ")]
@@ -226,6 +235,9 @@ class _Gtp_backend(gameplay.Backend):
     def notify_fixed_handicap(self, colour, handicap, points):
         assert handicap == self.handicap
         vertices = self.gc.send_command(colour, "fixed_handicap", str(handicap))
+        self._check_fixed_handicap(colour, vertices, points)
+
+    def _check_fixed_handicap(self, colour, vertices, points):
         try:
             seen_points = [move_from_vertex(vt, self.board_size)
                            for vt in vertices.split(" ")]
@@ -237,17 +249,25 @@ class _Gtp_backend(gameplay.Backend):
                 "to %s: %s" % (self.gc.players[colour], vertices))
 
     def get_move(self, colour):
-        if (self.claim_allowed[colour] and
-            self.gc.known_command(colour, "gomill-genmove_ex")):
-            genmove_command = ["gomill-genmove_ex", colour, "claim"]
-            may_claim = True
-        else:
-            genmove_command = ["genmove", colour]
-            may_claim = False
+        may_claim = (self.claim_allowed[colour] and
+                     self.gc.known_command(colour, "gomill-genmove_ex"))
         try:
-            raw_move = self.gc.send_command(colour, *genmove_command)
+            raw_move = self.gc.send_command(
+                colour, *self._genmove_command(colour, may_claim))
         except BadGtpResponse, e:
             return 'forfeit', str(e)
+        except GtpTimeout, e:
+            return 'timeout', str(e)
+        return self._interpret_move(raw_move, may_claim)
+
+    @staticmethod
+    def _genmove_command(colour, may_claim):
+        if may_claim:
+            return ["gomill-genmove_ex", colour, "claim"]
+        else:
+            return ["genmove", colour]
+
+    def _interpret_move(self, raw_move, may_claim):
         move_s = raw_move.lower()
         if move_s == "resign":
             return 'resign', None
@@ -260,7 +280,11 @@ class _Gtp_backend(gameplay.Backend):
         return 'move', move
 
     def get_last_move_comment(self, colour):
-        comment = self.gc.maybe_send_command(colour, "gomill-explain_last_move")
+        return self._clean_comment(
+            self.gc.maybe_send_command(colour, "gomill-explain_last_move"))
+
+    @staticmethod
+    def _clean_comment(comment):
         comment = sanitise_utf8(comment)
         if comment == "":
             comment = None
@@ -271,24 +295,36 @@ class _Gtp_backend(gameplay.Backend):
         try:
             self.gc.send_command(colour, "play", opponent_of(colour), vertex)
         except BadGtpResponse, e:
-            if e.gtp_error_message == "illegal move":
-                return 'reject', ("%s claims move %s is illegal"
-                                  % (self.gc.players[colour], vertex))
-            else:
-                # If the game is over, this could be a channel error reported
-                # by cautious mode; that's fine (see test_pass_and_exit())
-                return 'error', str(e)
+            return self._describe_rejected_move(colour, vertex, e)
         return 'accept', None
 
+    def _describe_rejected_move(self, colour, vertex, e):
+        if e.gtp_error_message == "illegal move":
+            return 'reject', ("%s claims move %s is illegal"
+                              % (self.gc.players[colour], vertex))
+        else:
+            # If the game is over, this could be a channel error reported
+            # by cautious mode; that's fine (see test_pass_and_exit())
+            return 'error', str(e)
+
     def _score_game_gtp(self):
-        winners = []
-        margins = []
         raw_scores = []
         for colour in self.allowed_scorers:
             final_score = self.gc.maybe_send_command(colour, "final_score")
-            if final_score is None:
-                continue
-            raw_scores.append((colour, final_score))
+            if final_score is not None:
+                raw_scores.append((colour, final_score))
+        return self._make_gtp_score(raw_scores)
+
+    @staticmethod
+    def _make_gtp_score(raw_scores):
+        """Make a Gtp_game_score from the engines' final_score responses.
+
+        raw_scores -- list of pairs (colour, final_score response)
+
+        """
+        winners = []
+        margins = []
+        for colour, final_score in raw_scores:
             final_score = final_score.upper()
             if final_score == "0":
                 winners.append(None)
@@ -325,15 +361,88 @@ class _Gtp_backend(gameplay.Backend):
             score.player_scores[colour] = raw_score
         return score
 
+    def _score_game_internal(self, board):
+        return Gtp_game_score.from_position(
+            board, self.komi, self.handicap_compensation, self.handicap)
+
     def score_game(self, board):
         if self.internal_scorer:
-            game_score = Gtp_game_score.from_position(
-                board, self.komi, self.handicap_compensation, self.handicap)
+            game_score = self._score_game_internal(board)
         else:
             game_score = self._score_game_gtp()
         return game_score
 
 
+class _Async_gtp_backend(_Gtp_backend):
+    """Variant of _Gtp_backend whose methods are coroutines.
+
+    This is used by Async_gtp_game, with a gtp_controller.Async_game_controller.
+
+    end_game() is an ordinary method (it doesn't communicate with the engines).
+
+    """
+
+    def start_new_game(self, board_size, komi):
+        assert board_size == self.board_size
+        assert komi == self.komi
+        self.gc.set_cautious_mode(False)
+        for colour in "b", "w":
+            yield self.gc.send_commands(colour, self._new_game_commands())
+
+    def get_free_handicap(self, handicap):
+        assert handicap == self.handicap
+        vertices = yield self.gc.send_command(
+            "b", "place_free_handicap", str(handicap))
+        raise Return(self._interpret_free_handicap(vertices))
+
+    def notify_free_handicap(self, points):
+        vertices = [format_vertex(point) for point in points]
+        yield self.gc.send_command("w", "set_free_handicap", *vertices)
+
+    def notify_fixed_handicap(self, colour, handicap, points):
+        assert handicap == self.handicap
+        vertices = yield self.gc.send_command(
+            colour, "fixed_handicap", str(handicap))
+        self._check_fixed_handicap(colour, vertices, points)
+
+    def get_move(self, colour):
+        may_claim = (self.claim_allowed[colour] and
+                     (yield self.gc.known_command(colour, "gomill-genmove_ex")))
+        try:
+            raw_move = yield self.gc.send_command(
+                colour, *self._genmove_command(colour, may_claim))
+        except BadGtpResponse, e:
+            raise Return(('forfeit', str(e)))
+        except GtpTimeout, e:
+            raise Return(('timeout', str(e)))
+        raise Return(self._interpret_move(raw_move, may_claim))
+
+    def get_last_move_comment(self, colour):
+        comment = yield self.gc.maybe_send_command(
+            colour, "gomill-explain_last_move")
+        raise Return(self._clean_comment(comment))
+
+    def notify_move(self, colour, move):
+        vertex = format_vertex(move)
+        try:
+            yield self.gc.send_command(
+                colour, "play", opponent_of(colour), vertex)
+        except BadGtpResponse, e:
+            raise Return(self._describe_rejected_move(colour, vertex, e))
+        raise Return(('accept', None))
+
+    def score_game(self, board):
+        if self.internal_scorer:
+            raise Return(self._score_game_internal(board))
+        raw_scores = []
+        for colour in self.allowed_scorers:
+            final_score = yield self.gc.maybe_send_command(
+                colour, "final_score")
+            if final_score is not None:
+                raw_scores.append((colour, final_score))
+        raise Return(self._make_gtp_score(raw_scores))
+
+
 class Gtp_game(object):
     """Manage a single game between two GTP engines.
 
@@ -342,6 +451,7 @@ class Gtp_game(object):
       board_size      -- int
       komi            -- int or float (default 0)
       move_limit      -- int or None  (default None)
+      superko_rule    -- 'positional', 'situational', or None (default None)
 
     Normal use:
       game = Gtp_game(...)
@@ -377,15 +487,20 @@ class Gtp_game(object):
     resource-usage cpu time for other engines, without doing so if
     gomill-cpu_time gives an error.)
 
-    See Game_runner for the Go rules that are used, and details of move_limit.
+    See Game_runner for the Go rules that are used, and details of move_limit
+    and superko_rule.
 
     """
 
-    def __init__(self, game_controller, board_size, komi=0.0, move_limit=None):
+    _backend_class = _Gtp_backend
+
+    def __init__(self, game_controller, board_size, komi=0.0, move_limit=None,
+                 superko_rule=None):
         self.game_controller = game_controller
-        self.backend = _Gtp_backend(self.game_controller, board_size, komi)
+        self.backend = self._backend_class(
+            self.game_controller, board_size, komi)
         self.game_runner = gameplay.Game_runner(
-            self.backend, board_size, komi, move_limit)
+            self.backend, board_size, komi, move_limit, superko_rule)
         self.game_runner.set_result_class(Game_result)
         self.game_id = None
         self.result = None
@@ -491,6 +606,10 @@ class Gtp_game(object):
         Won't propagate BadGtpResponse (if engine returns an invalid or failure
         response, the game will be forfeited).
 
+        If an engine doesn't respond to a move-generation command within its
+        controller's genmove_timeout, the game is forfeited on time (SGF
+        result 'B+T' or 'W+T').
+
         Propagates GtpChannelError if there is trouble communicating with an
         engine before the result has been determined. Afterwards, sets errors
         aside; retrieve them with game_controller.describe_late_errors().
@@ -505,13 +624,16 @@ class Gtp_game(object):
 
         """
         self.game_runner.run()
-        self.result = self.game_runner.result
-        self.result.set_players(self.game_controller.players)
-        self.result.game_id = self.game_id
+        self._set_result()
         cpu_times, self.cpu_time_errors = \
             self.game_controller.get_gtp_cpu_times()
         self.result.soft_update_cpu_times(cpu_times)
 
+    def _set_result(self):
+        self.result = self.game_runner.result
+        self.result.set_players(self.game_controller.players)
+        self.result.game_id = self.game_id
+
     def get_moves(self):
         """Retrieve a list of the moves played.
 
@@ -576,3 +698,48 @@ class Gtp_game(object):
             last_node.add_comment_text(self.describe_scoring())
         return sgf_game
 
+
+
+class Async_gtp_game(Gtp_game):
+    """Variant of Gtp_game for use with event_loops.Event_loop.
+
+    Instantiate with a gtp_controller.Async_game_controller, and other
+    parameters as for Gtp_game.
+
+    prepare(), set_handicap() and run() are coroutines (see event_loops);
+    otherwise this behaves in the same way as Gtp_game.
+
+    To play several games at once, run a coroutine for each game in the same
+    event loop (eg, using event_loops.run_all()).
+
+    """
+    _backend_class = _Async_gtp_backend
+
+    def _drive(self, steps):
+        """Run one of the Game_runner *_steps() generators.
+
+        This is a coroutine. It uses the (coroutine) backend methods.
+
+        """
+        result = None
+        while True:
+            try:
+                method_name, args = steps.send(result)
+            except StopIteration:
+                return
+            result = yield getattr(self.backend, method_name)(*args)
+
+    def prepare(self):
+        return self._drive(self.game_runner.prepare_steps())
+
+    def set_handicap(self, handicap, is_free):
+        self.backend.handicap = handicap
+        return self._drive(
+            self.game_runner.set_handicap_steps(handicap, is_free))
+
+    def run(self):
+        yield self._drive(self.game_runner.run_steps())
+        self._set_result()
+        cpu_times, self.cpu_time_errors = \
+            yield self.game_controller.get_gtp_cpu_times()
+        self.result.soft_update_cpu_times(cpu_times)
@@ -3,8 +3,17 @@
 That is, engines which implement some or all of their commands by sending them
 on to another engine (the _back end_).
 
+Also provides Subprocess_engine_server, for making an engine available over
+the network.
+
 """
 
+import errno
+import os
+import socket
+import subprocess
+import time
+
 from gomill import gtp_controller
 from gomill import gtp_engine
 from gomill.gtp_controller import (
@@ -260,3 +269,144 @@ class Gtp_proxy(object):
         except IndexError:
             gtp_engine.report_bad_arguments()
         return self.handle_command(command, args[1:])
+
+
+class Subprocess_engine_server(object):
+    """Make a GTP engine available to controllers on other hosts.
+
+    Instantiate with
+      command     -- list of strings (as for subprocess.Popen)
+      address     -- pair (host, port), or Unix-domain socket pathname
+      max_engines -- int (default 1)
+      stderr      -- as for Subprocess_gtp_channel (optional)
+      cwd         -- as for Subprocess_gtp_channel (optional)
+      env         -- as for Subprocess_gtp_channel (optional)
+    Instantiation will raise EnvironmentError if the address can't be used.
+
+    Public attributes:
+      address -- the address being listened on
+
+    This listens on the specified address. For each connection it accepts, it
+    starts a new engine subprocess, whose standard input and output are the
+    connection itself. So the controller (normally a
+    gtp_controller.Socket_gtp_channel) speaks GTP directly to the engine, and
+    the engine exits when the controller closes the connection.
+
+    At most max_engines engines run at once; further connections wait until
+    an engine has exited.
+
+    Use port 0 to listen on a port chosen by the operating system (the
+    'address' attribute gives the real port). A Unix-domain socket is removed
+    when the server is closed.
+
+    Sample use:
+      server = gtp_proxy.Subprocess_engine_server(
+          [<command>, <arg>, ...], ("", 5000))
+      try:
+          server.serve_forever()
+      finally:
+          server.close()
+
+    """
+    def __init__(self, command, address, max_engines=1,
+                 stderr=None, cwd=None, env=None):
+        if max_engines < 1:
+            raise ValueError("max_engines must be positive")
+        self.command = command
+        self.max_engines = max_engines
+        self.stderr = stderr
+        self.cwd = cwd
+        self.env = env
+        # Map pid -> Popen object
+        self.engines = {}
+        self.listener = gtp_engine.make_listening_socket(
+            address, backlog=max(5, max_engines))
+        if isinstance(address, basestring):
+            self.unix_pathname = address
+        else:
+            self.unix_pathname = None
+        self.address = self.listener.getsockname()
+
+    # Interval between checks while waiting for an engine to exit
+    reap_interval = 0.05
+
+    def _reap_engines(self, block):
+        """Forget engines which have exited.
+
+        If block is true, waits for at least one engine to exit (there must
+        be at least one engine running).
+
+        This doesn't use os.wait(), so it doesn't interfere with any other
+        child processes.
+
+        """
+        while True:
+            for pid, p in self.engines.items():
+                if p.poll() is not None:
+                    del self.engines[pid]
+                    block = False
+            if not block:
+                return
+            time.sleep(self.reap_interval)
+
+    def handle_connection(self):
+        """Wait for a connection, and start an engine subprocess for it.
+
+        Waits for an engine to exit first if max_engines are running.
+
+        Raises BackEndError if the engine can't be started.
+
+        """
+        self._reap_engines(block=False)
+        while len(self.engines) >= self.max_engines:
+            self._reap_engines(block=True)
+        while True:
+            try:
+                connection, _ = self.listener.accept()
+            except socket.error, e:
+                if e.args[0] == errno.EINTR:
+                    continue
+                raise
+            break
+        try:
+            if connection.family != socket.AF_UNIX:
+                connection.setsockopt(
+                    socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                gtp_controller.set_socket_keepalive(connection)
+            try:
+                p = subprocess.Popen(
+                    self.command,
+                    preexec_fn=gtp_controller.permit_sigpipe, close_fds=True,
+                    stdin=connection, stdout=connection,
+                    stderr=self.stderr, cwd=self.cwd, env=self.env)
+            except EnvironmentError, e:
+                raise BackEndError("can't launch back end command\n%s" % e,
+                                   cause=e)
+        finally:
+            # The subprocess has its own copy
+            connection.close()
+        self.engines[p.pid] = p
+
+    def serve_forever(self):
+        """Accept connections until an exception (eg KeyboardInterrupt)."""
+        while True:
+            self.handle_connection()
+
+    def close(self, wait=True):
+        """Stop listening for connections.
+
+        wait -- bool (default True)
+
+        If wait is true, waits for all engine subprocesses to exit.
+
+        """
+        self.listener.close()
+        if self.unix_pathname is not None:
+            try:
+                os.remove(self.unix_pathname)
+            except EnvironmentError:
+                pass
+            self.unix_pathname = None
+        if wait:
+            while self.engines:
+                self._reap_engines(block=True)
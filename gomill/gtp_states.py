@@ -182,7 +182,7 @@ class Gtp_state(object):
         self.reset()
 
     def reset(self):
-        self.board = boards.Board(self.board_size)
+        self.board = boards.Board(self.board_size, keep_undo_journal=True)
         # None, or a small integer
         self.handicap = None
         self.simple_ko_point = None
@@ -191,6 +191,9 @@ class Gtp_state(object):
         self.history_base = boards.Board(self.board_size)
         # list of History_move objects
         self.move_history = []
+        # list of pairs (simple_ko_point, simple_ko_player) from before each
+        # move in move_history, for undo
+        self._ko_history = []
 
     def set_history_base(self, board):
         """Change the history base to a new position.
@@ -202,6 +205,18 @@ class Gtp_state(object):
         """
         self.history_base = board
         self.move_history = []
+        self._ko_history = []
+
+    def _record_move(self, history_move, ko_state):
+        """Add a move which has been played to the move history.
+
+        history_move -- History_move
+        ko_state     -- pair (simple_ko_point, simple_ko_player) from before
+                        the move was played
+
+        """
+        self.move_history.append(history_move)
+        self._ko_history.append(ko_state)
 
     def reset_to_moves(self, history_moves):
         """Reset to history base and play the specified moves.
@@ -214,20 +229,24 @@ class Gtp_state(object):
         Raises ValueError if there is an invalid move in the list.
 
         """
-        self.board = self.history_base.copy()
+        board = self.history_base.copy(keep_undo_journal=True)
         simple_ko_point = None
         simple_ko_player = None
+        ko_history = []
         for history_move in history_moves:
+            ko_history.append((simple_ko_point, simple_ko_player))
             if history_move.is_pass():
-                self.simple_ko_point = None
+                simple_ko_point = None
                 continue
             row, col = history_move.move
             # Propagates ValueError if the move is bad
-            simple_ko_point = self.board.play(row, col, history_move.colour)
+            simple_ko_point = board.play(row, col, history_move.colour)
             simple_ko_player = opponent_of(history_move.colour)
+        self.board = board
         self.simple_ko_point = simple_ko_point
         self.simple_ko_player = simple_ko_player
         self.move_history = history_moves
+        self._ko_history = ko_history
 
     def set_komi(self, f):
         max_komi = 625.0
@@ -346,9 +365,10 @@ class Gtp_state(object):
             gtp_engine.report_bad_arguments()
         colour = gtp_engine.interpret_colour(colour_s)
         move = gtp_engine.interpret_vertex(vertex_s, self.board_size)
+        ko_state = (self.simple_ko_point, self.simple_ko_player)
         if move is None:
             self.simple_ko_point = None
-            self.move_history.append(History_move(colour, None))
+            self._record_move(History_move(colour, None), ko_state)
             return
         row, col = move
         try:
@@ -356,7 +376,7 @@ class Gtp_state(object):
             self.simple_ko_player = opponent_of(colour)
         except ValueError:
             raise GtpError("illegal move")
-        self.move_history.append(History_move(colour, move))
+        self._record_move(History_move(colour, move), ko_state)
 
     def handle_showboard(self, args):
         return "\n%s\n" % ascii_boards.render_board(self.board)
@@ -387,10 +407,14 @@ class Gtp_state(object):
             return 'claim'
         if generated.resign:
             return 'resign'
+        ko_state = (self.simple_ko_point, self.simple_ko_player)
         if generated.pass_move:
             if not for_regression:
-                self.move_history.append(History_move(
-                    colour, None, generated.comments, generated.cookie))
+                self.simple_ko_point = None
+                self._record_move(
+                    History_move(colour, None,
+                                 generated.comments, generated.cookie),
+                    ko_state)
             return 'pass'
         row, col = generated.move
         vertex = format_vertex((row, col))
@@ -400,9 +424,10 @@ class Gtp_state(object):
                 self.simple_ko_player = opponent_of(colour)
             except ValueError:
                 raise GtpError("engine error: tried to play %s" % vertex)
-            self.move_history.append(
+            self._record_move(
                 History_move(colour, generated.move,
-                             generated.comments, generated.cookie))
+                             generated.comments, generated.cookie),
+                ko_state)
         return vertex
 
     def handle_genmove(self, args):
@@ -423,10 +448,13 @@ class Gtp_state(object):
     def handle_undo(self, args):
         if not self.move_history:
             raise GtpError("cannot undo")
-        try:
-            self.reset_to_moves(self.move_history[:-1])
-        except ValueError:
-            raise GtpError("corrupt history")
+        history_move = self.move_history.pop()
+        self.simple_ko_point, self.simple_ko_player = self._ko_history.pop()
+        if not history_move.is_pass():
+            try:
+                self.board.undo()
+            except ValueError:
+                raise GtpError("corrupt history")
 
     def _load_file(self, pathname):
         """Read the specified file and return its contents as a string.
@@ -455,7 +483,7 @@ class Gtp_state(object):
         except EnvironmentError:
             raise GtpError("cannot load file")
         try:
-            sgf_game = sgf.Sgf_game.from_string(s)
+            sgf_game = sgf.Sgf_game.from_string(s, main_line_only=True)
         except ValueError:
             raise GtpError("cannot load file")
         new_size = sgf_game.get_size()
@@ -483,17 +511,16 @@ class Gtp_state(object):
             # gtp spec says we want the "position before move_number"
             move_number = max(0, move_number-1)
             new_move_history = history_moves[:move_number]
-        old_history_base = self.history_base
-        old_move_history = self.move_history
+        old_state = (self.board, self.history_base, self.move_history,
+                     self._ko_history, self.simple_ko_point,
+                     self.simple_ko_player)
         try:
             self.set_history_base(sgf_board)
             self.reset_to_moves(new_move_history)
         except ValueError:
-            try:
-                self.set_history_base(old_history_base)
-                self.reset_to_moves(old_move_history)
-            except ValueError:
-                raise GtpError("bad move in file and corrupt history")
+            (self.board, self.history_base, self.move_history,
+             self._ko_history, self.simple_ko_point,
+             self.simple_ko_player) = old_state
             raise GtpError("bad move in file")
         self.set_komi(komi)
         self.handicap = handicap
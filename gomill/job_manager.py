@@ -3,6 +3,7 @@
 import sys
 
 from gomill import compact_tracebacks
+from gomill import event_loops
 
 multiprocessing = None
 
@@ -29,6 +30,38 @@ def _initialise_multiprocessing():
     except ImportError:
         multiprocessing = None
 
+_cleanup_functions = []
+
+def register_cleanup_function(fn):
+    """Arrange for fn to be called when this process stops running jobs.
+
+    fn -- callable taking no arguments
+
+    This is for jobs which keep resources (eg, subprocesses) between one job
+    and the next. It's called from within the job, so fn is called in the
+    process which ran the job (a worker process, or the main process if jobs
+    are being run in-process).
+
+    Registering the same function more than once has no further effect.
+
+    """
+    if fn not in _cleanup_functions:
+        _cleanup_functions.append(fn)
+
+def run_cleanup_functions():
+    """Call (and forget) the functions given to register_cleanup_function().
+
+    Exceptions from the functions are reported to stderr and otherwise ignored.
+
+    """
+    while _cleanup_functions:
+        fn = _cleanup_functions.pop(0)
+        try:
+            fn()
+        except Exception:
+            print >>sys.stderr, "error from cleanup function:\n%s" % (
+                compact_tracebacks.format_traceback(skip=1))
+
 class Worker_finish_signal(object):
     pass
 worker_finish_signal = Worker_finish_signal()
@@ -53,6 +86,7 @@ def worker_run_jobs(job_queue, response_queue, worker_id):
                     job, compact_tracebacks.format_traceback(skip=1))
                 sys.exc_clear()
             response_queue.put(response)
+        run_cleanup_functions()
         #sys.stderr.write("worker %d finishing\n" % pid)
         response_queue.cancel_join_thread()
     # Unfortunately, there will be places in the child that this doesn't cover.
@@ -188,20 +222,131 @@ class In_process_job_manager(Job_manager):
                         compact_tracebacks.format_traceback(skip=1))
 
     def finish(self):
-        pass
+        run_cleanup_functions()
+
+class Event_loop_job_manager(Job_manager):
+    """Job manager which runs many jobs at once in the calling process.
+
+    Instantiate with the maximum number of jobs to run at once.
+
+    Jobs are run as coroutines in an event_loops.Event_loop, using their
+    run_async() method (see Game_job.run_async()). The worker_id passed to
+    run_async() is a 'slot number' in the range 0 to max_jobs - 1, not shared
+    with any other job which is running at the same time.
+
+    Jobs without a run_async() method are run using run(); in that case no
+    other jobs make progress until run() returns.
+
+    """
+    def __init__(self, max_jobs):
+        Job_manager.__init__(self)
+        if not 1 <= max_jobs < 65536:
+            raise ValueError
+        self.max_jobs = max_jobs
+        self.event_loop = None
+
+    def start_workers(self):
+        self.event_loop = event_loops.Event_loop()
+
+    def _call_job_source(self, fn, *args):
+        try:
+            return fn(*args)
+        except Exception, e:
+            for cls in self.passed_exceptions:
+                if isinstance(e, cls):
+                    raise
+            raise JobSourceError(
+                "error from %s()\n%s" %
+                (fn.__name__, compact_tracebacks.format_traceback(skip=1)))
+
+    @staticmethod
+    def _run_sync_job(job, slot):
+        result = job.run(slot)
+        raise event_loops.Return(result)
+        yield
+
+    def run_jobs(self, job_source):
+        # Map Task -> (job, slot)
+        active_tasks = {}
+        free_slots = range(self.max_jobs-1, -1, -1)
+        while True:
+            if free_slots:
+                job = self._call_job_source(job_source.get_job)
+                if job is not NoJobAvailable:
+                    slot = free_slots.pop()
+                    if hasattr(job, 'run_async'):
+                        coroutine = job.run_async(slot)
+                    else:
+                        coroutine = self._run_sync_job(job, slot)
+                    task = self.event_loop.start(coroutine)
+                    active_tasks[task] = (job, slot)
+                    continue
+            if not active_tasks:
+                break
+
+            for task in self.event_loop.run_until_some_finished():
+                job, slot = active_tasks.pop(task)
+                free_slots.append(slot)
+                free_slots.sort(reverse=True)
+                if task.exc_info is None:
+                    self._call_job_source(
+                        job_source.process_response, task.result)
+                    continue
+                exception_type, e, tb = task.exc_info
+                task.exc_info = None
+                if isinstance(e, JobFailed):
+                    msg = str(e)
+                else:
+                    msg = compact_tracebacks.format_traceback_from_info(
+                        exception_type, e, tb)
+                del tb
+                self._call_job_source(
+                    job_source.process_error_response, job, msg)
+
+    def finish(self):
+        if self.event_loop is not None:
+            self.event_loop.close()
+            self.event_loop = None
+        run_cleanup_functions()
 
 def run_jobs(job_source, max_workers=None, allow_mp=True,
-             passed_exceptions=None):
-    if allow_mp:
+             passed_exceptions=None, use_event_loop=False):
+    """Run jobs from a job source until it has no more.
+
+    max_workers       -- int or None
+    allow_mp          -- bool (default True)
+    passed_exceptions -- list of exception classes (optional)
+    use_event_loop    -- bool (default False)
+
+    If allow_mp is true and use_event_loop is false, runs up to max_workers
+    jobs at a time in worker processes (by default, as many as there are
+    CPUs).
+
+    If allow_mp and use_event_loop are both true, runs up to max_workers jobs
+    at a time in the calling process, using an Event_loop_job_manager. In this
+    case max_workers must be specified.
+
+    Otherwise (or if multiprocessing isn't available and use_event_loop is
+    false), runs one job at a time in the calling process.
+
+    Exceptions of the classes in passed_exceptions are propagated unchanged
+    from the job source methods; others are reported as JobSourceError.
+
+    """
+    if allow_mp and not use_event_loop:
         _initialise_multiprocessing()
         if multiprocessing is None:
             allow_mp = False
-    if allow_mp:
+    if not allow_mp:
+        job_manager = In_process_job_manager()
+    elif use_event_loop:
+        if max_workers is None:
+            raise ValueError("use_event_loop requires max_workers")
+        job_manager = Event_loop_job_manager(max_workers)
+    else:
         if max_workers is None:
             max_workers = multiprocessing.cpu_count()
         job_manager = Multiprocessing_job_manager(max_workers)
-    else:
-        job_manager = In_process_job_manager()
     if passed_exceptions:
         for cls in passed_exceptions:
             job_manager.pass_exception(cls)
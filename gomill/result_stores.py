@@ -0,0 +1,332 @@
+"""Compact storage for large numbers of game results.
+
+A Result_store holds the same information as a list of gtp_games.Game_results,
+but keeps it in a set of arrays (one entry per game) rather than as a Python
+object (with several dicts and strings of its own) per game.
+
+Strings which are typically shared between many games (player codes, SGF
+results other than simple scores, result details, and the non-numeric part of
+game ids) are interned in per-store tables, and the arrays hold indexes into
+these tables.
+
+"""
+
+import sys
+from array import array
+from itertools import izip
+
+from gomill import gtp_games
+from gomill.utils import format_float, isnan
+
+NAN = float("nan")
+
+# Values for the 'winners' column
+NO_WINNER = 0
+BLACK_WINS = 1
+WHITE_WINS = 2
+
+# Bits for the 'flags' column
+JIGO = 1
+FORFEIT = 2
+
+_winner_codes = {None : NO_WINNER, 'b' : BLACK_WINS, 'w' : WHITE_WINS}
+_winner_colours = {NO_WINNER : None, BLACK_WINS : 'b', WHITE_WINS : 'w'}
+
+# Index used in the sgf_results column for a simple score (eg 'B+3.5'), which
+# is represented by the margin column instead.
+SCORED = -1
+
+_columns = [
+    ('players_b',    'H'),
+    ('players_w',    'H'),
+    ('winners',      'B'),
+    ('flags',        'B'),
+    ('margins',      'd'),
+    ('sgf_results',  'i'),
+    ('details',      'i'),
+    ('id_formats',   'i'),
+    ('game_numbers', 'i'),
+    ('cpu_times_b',  'd'),
+    ('cpu_times_w',  'd'),
+    ]
+
+_tables = ['player_codes', 'sgf_result_strings', 'detail_strings',
+           'id_format_table']
+
+
+class _Interned_table(object):
+    """Helper for interning strings (or other hashable values).
+
+    Public attributes:
+      values -- list
+
+    """
+    def __init__(self, values=()):
+        self.values = list(values)
+        self._index = dict((v, i) for (i, v) in enumerate(self.values))
+
+    def intern(self, value):
+        """Return the index of a value, adding it if necessary."""
+        try:
+            return self._index[value]
+        except KeyError:
+            i = len(self.values)
+            self.values.append(value)
+            self._index[value] = i
+            return i
+
+    def lookup(self, value):
+        """Return the index of a value, or -1 if it isn't present."""
+        return self._index.get(value, -1)
+
+
+def _split_game_id(game_id):
+    """Split a game id into an interning key and a game number.
+
+    Returns a pair (key, number)
+
+    key is a pair (prefix, width); for an id like '0_007' this is
+    (('0_', 3), 7).
+
+    If the game id doesn't end with a number, or the number isn't formatted as
+    we'd format it, the whole id goes in the key and number is -1.
+
+    """
+    if game_id is None:
+        return None, -1
+    digits = len(game_id)
+    while digits > 0 and game_id[digits-1].isdigit():
+        digits -= 1
+    prefix, number_s = game_id[:digits], game_id[digits:]
+    if number_s and len(number_s) < 10:
+        number = int(number_s)
+        width = len(number_s)
+        if "%0*d" % (width, number) == number_s:
+            return (prefix, width), number
+    return (game_id, None), -1
+
+def _join_game_id(key, number):
+    """Reverse _split_game_id()."""
+    if key is None:
+        return None
+    prefix, width = key
+    if width is None:
+        return prefix
+    return "%s%0*d" % (prefix, width, number)
+
+def _as_float(f):
+    return NAN if f is None else f
+
+def _as_optional_float(f):
+    return None if isnan(f) else f
+
+
+class Result_store(object):
+    """Compact sequence of game results.
+
+    A Result_store behaves like a list of gtp_games.Game_results, except that
+    it only supports appending, and the Game_results it returns are newly
+    created each time (modifying them has no effect on the store).
+
+    Public attributes for code which reads the columns directly (treat as
+    read-only):
+      player_codes -- list of player codes
+      players_b    -- array of indexes into player_codes
+      players_w    -- array of indexes into player_codes
+      winners      -- array of NO_WINNER, BLACK_WINS, or WHITE_WINS
+      flags        -- array of bitmasks of JIGO and FORFEIT
+      margins      -- array of floats (NaN if the result has no margin)
+      cpu_times_b  -- array of floats (NaN if unknown)
+      cpu_times_w  -- array of floats (NaN if unknown)
+
+    Running totals, kept up to date by append(), for code which needs summary
+    statistics (treat as read-only):
+      tally        -- map (player_b, player_w, winner, flags) -> int
+      cpu_totals   -- map player index -> pair (total time, number of games)
+    (player_b and player_w here are indexes into player_codes, and the
+    cpu_totals only include games where the time is known.)
+
+    Result_stores are suitable for pickling (the totals aren't stored, but
+    are recalculated when unpickling).
+
+    """
+    def __init__(self, results=()):
+        for name, typecode in _columns:
+            setattr(self, name, array(typecode))
+        self._init_tables([], [], [], [])
+        self.tally = {}
+        self.cpu_totals = {}
+        for result in results:
+            self.append(result)
+
+    def _init_tables(self, player_codes, sgf_result_strings,
+                     detail_strings, id_format_table):
+        self._player_codes = _Interned_table(player_codes)
+        self._sgf_result_strings = _Interned_table(sgf_result_strings)
+        self._detail_strings = _Interned_table(detail_strings)
+        self._id_format_table = _Interned_table(id_format_table)
+        self.player_codes = self._player_codes.values
+
+    def __getstate__(self):
+        return {
+            'byteorder' : sys.byteorder,
+            'columns' : dict((name, getattr(self, name).tostring())
+                             for name, _ in _columns),
+            'tables' : dict((name, getattr(self, "_" + name).values)
+                            for name in _tables),
+            }
+
+    def __setstate__(self, state):
+        for name, typecode in _columns:
+            a = array(typecode)
+            a.fromstring(state['columns'][name])
+            if state['byteorder'] != sys.byteorder:
+                a.byteswap()
+            setattr(self, name, a)
+        tables = state['tables']
+        self._init_tables(*[tables[name] for name in _tables])
+        self._recalculate_totals()
+
+    def _add_to_totals(self, player_b, player_w, winner, flags,
+                       cpu_time_b, cpu_time_w):
+        key = (player_b, player_w, winner, flags)
+        self.tally[key] = self.tally.get(key, 0) + 1
+        for player, cpu_time in ((player_b, cpu_time_b),
+                                 (player_w, cpu_time_w)):
+            if isnan(cpu_time):
+                continue
+            total, count = self.cpu_totals.get(player, (0, 0))
+            self.cpu_totals[player] = (total + cpu_time, count + 1)
+
+    def _recalculate_totals(self):
+        self.tally = {}
+        self.cpu_totals = {}
+        for row in izip(self.players_b, self.players_w, self.winners,
+                        self.flags, self.cpu_times_b, self.cpu_times_w):
+            self._add_to_totals(*row)
+
+    def __len__(self):
+        return len(self.winners)
+
+    def append(self, game_result):
+        """Add a result to the store.
+
+        game_result -- gtp_games.Game_result
+
+        """
+        player_b = self._player_codes.intern(game_result.player_b)
+        player_w = self._player_codes.intern(game_result.player_w)
+        self.players_b.append(player_b)
+        self.players_w.append(player_w)
+        winner = _winner_codes[game_result.winning_colour]
+        self.winners.append(winner)
+        flags = 0
+        if game_result.is_jigo:
+            flags |= JIGO
+        if game_result.is_forfeit:
+            flags |= FORFEIT
+        self.flags.append(flags)
+
+        sgf_result = game_result.sgf_result
+        margin = NAN
+        sgf_index = None
+        if winner != NO_WINNER and sgf_result[1:2] == "+":
+            try:
+                margin = float(sgf_result[2:])
+            except ValueError:
+                pass
+            else:
+                if ("%s+%s" % (game_result.winning_colour.upper(),
+                               format_float(margin)) == sgf_result):
+                    sgf_index = SCORED
+                else:
+                    margin = NAN
+        if sgf_index is None:
+            sgf_index = self._sgf_result_strings.intern(sgf_result)
+        self.margins.append(margin)
+        self.sgf_results.append(sgf_index)
+
+        if game_result.detail is None:
+            self.details.append(-1)
+        else:
+            self.details.append(
+                self._detail_strings.intern(game_result.detail))
+
+        key, number = _split_game_id(game_result.game_id)
+        self.id_formats.append(self._id_format_table.intern(key))
+        self.game_numbers.append(number)
+
+        cpu_times = game_result.cpu_times
+        cpu_time_b = _as_float(cpu_times.get(game_result.player_b))
+        cpu_time_w = _as_float(cpu_times.get(game_result.player_w))
+        self.cpu_times_b.append(cpu_time_b)
+        self.cpu_times_w.append(cpu_time_w)
+
+        self._add_to_totals(player_b, player_w, winner, flags,
+                            cpu_time_b, cpu_time_w)
+
+    def extend(self, game_results):
+        """Add a sequence of results to the store."""
+        for game_result in game_results:
+            self.append(game_result)
+
+    def get_player_index(self, player_code):
+        """Return the index of a player code in player_codes.
+
+        Returns -1 if the player doesn't appear in any result.
+
+        """
+        return self._player_codes.lookup(player_code)
+
+    def get_sgf_result(self, i):
+        """Return the SGF result string for the game with the specified index.
+
+        """
+        sgf_index = self.sgf_results[i]
+        if sgf_index == SCORED:
+            return "%s+%s" % (_winner_colours[self.winners[i]].upper(),
+                              format_float(self.margins[i]))
+        return self._sgf_result_strings.values[sgf_index]
+
+    def get_game_id(self, i):
+        """Return the game id for the game with the specified index."""
+        return _join_game_id(self._id_format_table.values[self.id_formats[i]],
+                             self.game_numbers[i])
+
+    def __getitem__(self, i):
+        """Return a Game_result for the game with the specified index."""
+        if isinstance(i, slice):
+            return [self[j] for j in xrange(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        player_b = self.player_codes[self.players_b[i]]
+        player_w = self.player_codes[self.players_w[i]]
+        detail_index = self.details[i]
+        if detail_index == -1:
+            detail = None
+        else:
+            detail = self._detail_strings.values[detail_index]
+        cpu_times = {
+            player_b : _as_optional_float(self.cpu_times_b[i]),
+            player_w : _as_optional_float(self.cpu_times_w[i]),
+            }
+        result = gtp_games.Game_result.__new__(gtp_games.Game_result)
+        result.__setstate__((
+            player_b,
+            player_w,
+            _winner_colours[self.winners[i]],
+            self.get_sgf_result(i),
+            detail,
+            bool(self.flags[i] & FORFEIT),
+            self.get_game_id(i),
+            cpu_times,
+            ))
+        return result
+
+    def __iter__(self):
+        for i in xrange(len(self)):
+            yield self[i]
+
+    def __repr__(self):
+        return "<Result_store: %d results>" % len(self)
+
@@ -28,6 +28,8 @@ def do_run(ringmaster, options):
         ringmaster.set_clean_status()
     if options.parallel is not None:
         ringmaster.set_parallel_worker_count(options.parallel)
+    if options.event_loop:
+        ringmaster.enable_event_loop()
     ringmaster.run(options.max_games)
     ringmaster.report()
 
@@ -76,6 +78,8 @@ def run(argv, ringmaster_class):
                       help="maximum number of games to play in this run")
     parser.add_option("--parallel", "-j", type="int",
                       help="number of worker processes")
+    parser.add_option("--event-loop", action="store_true",
+                      help="play the parallel games in a single process")
     parser.add_option("--quiet", "-q", action="store_true",
                       help="be silent except for warnings and errors")
     parser.add_option("--log-gtp", action="store_true",
@@ -5,9 +5,11 @@ from __future__ import division, with_statement
 import cPickle as pickle
 import datetime
 import errno
+import json
 import os
 import re
 import shutil
+import struct
 import sys
 
 try:
@@ -15,6 +17,7 @@ try:
 except ImportError:
     fcntl = None
 
+from gomill import command_timings
 from gomill import compact_tracebacks
 from gomill import game_jobs
 from gomill import job_manager
@@ -74,6 +77,13 @@ class Ringmaster(object):
     # Channel used for printing
     stdout = sys.stdout
 
+    # Number of journal records between calls to fsync()
+    journal_sync_interval = 20
+
+    # Number of journal records after which the journal is compacted into a
+    # new state file
+    journal_compaction_interval = 1000
+
     def __init__(self, control_pathname):
         """Instantiate and initialise a Ringmaster.
 
@@ -92,19 +102,25 @@ class Ringmaster(object):
         # Map game_id -> int
         self.game_error_counts = {}
         self.write_gtp_logs = False
+        self.use_event_loop = False
+        self.journal_file = None
+        # Map player code -> Command_timings (while running, if recording)
+        self.command_timings = None
 
         self.control_pathname = control_pathname
         self.base_directory, control_filename = os.path.split(control_pathname)
         self.competition_code, ext = os.path.splitext(control_filename)
-        if ext in (".log", ".status", ".cmd", ".hist",
-                   ".report", ".games", ".void", ".gtplogs"):
+        if ext in (".log", ".status", ".journal", ".cmd", ".hist",
+                   ".report", ".timings", ".games", ".void", ".gtplogs"):
             raise RingmasterError("forbidden control file extension: %s" % ext)
         stem = os.path.join(self.base_directory, self.competition_code)
         self.log_pathname = stem + ".log"
         self.status_pathname = stem + ".status"
+        self.journal_pathname = stem + ".journal"
         self.command_pathname = stem + ".cmd"
         self.history_pathname = stem + ".hist"
         self.report_pathname = stem + ".report"
+        self.timings_pathname = stem + ".timings"
         self.sgf_dir_pathname = stem + ".games"
         self.void_dir_pathname = stem + ".void"
         self.gtplog_dir_pathname = stem + ".gtplogs"
@@ -307,6 +323,8 @@ class Ringmaster(object):
     ringmaster_settings = [
         Setting('record_games', interpret_bool, True),
         Setting('stderr_to_log', interpret_bool, True),
+        Setting('max_idle_engines', interpret_positive_int, 2),
+        Setting('record_command_timings', interpret_bool, False),
         ]
 
     def _initialise_from_control_file(self, config):
@@ -328,6 +346,14 @@ class Ringmaster(object):
     def set_parallel_worker_count(self, n):
         self.worker_count = n
 
+    def enable_event_loop(self, b=True):
+        """Run parallel games in this process, rather than in workers.
+
+        This has an effect only if a parallel worker count is set.
+
+        """
+        self.use_event_loop = b
+
     def log(self, s):
         print >>self.logfile, s
         self.logfile.flush()
@@ -376,8 +402,18 @@ class Ringmaster(object):
     # State attributes (*: in persistent state):
     #  * void_game_count   -- int
     #  * comp              -- from Competition.get_status()
+    #  * journal_seq       -- int (sequence number for the next journal record)
+    #    journal_length    -- int (records in the journal file)
     #    games_in_progress -- dict game_id -> Game_job
     #    games_to_replay   -- dict game_id -> Game_job
+    #
+    # If the competition's uses_results_journal attribute is true, the state
+    # file isn't rewritten after every game. Instead, a record for each
+    # completed or void game is appended to the journal file, and the state
+    # file is rewritten (and the journal emptied) at the start and end of each
+    # run and after every journal_compaction_interval records. Loading the
+    # state replays any journal records whose sequence numbers show they
+    # aren't already included in the state file.
 
     def _write_status(self, value):
         """Write the pickled contents of the persistent state file."""
@@ -386,18 +422,99 @@ class Ringmaster(object):
         f.close()
         os.rename(self.status_pathname + ".new", self.status_pathname)
 
+    def _write_journal_record(self, value):
+        """Append a pickled record to the journal file."""
+        if self.journal_file is None:
+            self.journal_file = open(self.journal_pathname, "ab")
+        s = pickle.dumps(value, protocol=-1)
+        self.journal_file.write(struct.pack(">I", len(s)) + s)
+        self.journal_file.flush()
+
+    def _sync_journal(self):
+        """Make sure the journal file has been written to disk."""
+        if self.journal_file is not None:
+            os.fsync(self.journal_file.fileno())
+
+    def _close_journal(self):
+        """Sync and close the journal file, if it's open."""
+        if self.journal_file is not None:
+            try:
+                self._sync_journal()
+            finally:
+                self.journal_file.close()
+                self.journal_file = None
+
+    def _clear_journal(self):
+        """Remove the journal file, if it exists."""
+        self._close_journal()
+        if os.path.exists(self.journal_pathname):
+            os.remove(self.journal_pathname)
+
+    def _read_journal(self):
+        """Return the unpickled records from the journal file.
+
+        Returns an empty list if there is no journal file.
+
+        Ignores an incomplete record at the end of the file (as left by a
+        crash while it was being written).
+
+        """
+        if not os.path.exists(self.journal_pathname):
+            return []
+        with open(self.journal_pathname, "rb") as f:
+            data = f.read()
+        result = []
+        header_size = struct.calcsize(">I")
+        i = 0
+        while i + header_size <= len(data):
+            length, = struct.unpack(">I", data[i:i+header_size])
+            i += header_size
+            if i + length > len(data):
+                break
+            result.append(pickle.loads(data[i:i+length]))
+            i += length
+        return result
+
     def write_status(self):
-        """Write the persistent state file."""
+        """Write the persistent state file.
+
+        This also empties the journal.
+
+        """
         competition_status = self.competition.get_status()
         status = {
             'void_game_count' : self.void_game_count,
+            'journal_seq'     : self.journal_seq,
             'comp_vn'         : self.competition.status_format_version,
             'comp'            : competition_status,
             }
         try:
             self._write_status((self.status_format_version, status))
+            self._clear_journal()
         except EnvironmentError, e:
             raise RingmasterError("error writing persistent state:\n%s" % e)
+        self.journal_length = 0
+
+    def _append_to_journal(self, record_type, data):
+        """Append a record to the journal.
+
+        record_type -- 'result' or 'void'
+        data        -- for 'result', value from
+                       Competition.get_journal_record(); for 'void', game id
+
+        Compacts the journal into a new state file if it's long enough.
+
+        """
+        try:
+            self._write_journal_record((self.journal_seq, record_type, data))
+            self.journal_seq += 1
+            self.journal_length += 1
+            if self.journal_length % self.journal_sync_interval == 0:
+                self._sync_journal()
+        except EnvironmentError, e:
+            raise RingmasterError("error writing journal:\n%s" % e)
+        if self.journal_length >= self.journal_compaction_interval:
+            self.write_status()
 
     def _load_status(self):
         """Return the unpickled contents of the persistent state file."""
@@ -411,9 +528,8 @@ class Ringmaster(object):
             if (status_format_version != self.status_format_version or
                 status['comp_vn'] != self.competition.status_format_version):
                 raise StandardError
-            self.void_game_count = status['void_game_count']
-            self.games_in_progress = {}
-            self.games_to_replay = {}
+            void_game_count = status['void_game_count']
+            journal_seq = status.get('journal_seq', 0)
             competition_status = status['comp']
         except pickle.UnpicklingError:
             raise RingmasterError("corrupt status file")
@@ -425,6 +541,27 @@ class Ringmaster(object):
             # Probably an exception from __setstate__ somewhere
             raise RingmasterError("incompatible status file")
         try:
+            journal = self._read_journal()
+        except EnvironmentError, e:
+            raise RingmasterError("error loading journal file:\n%s" % e)
+        except Exception, e:
+            raise RingmasterError("corrupt journal file")
+        journal_length = 0
+        try:
+            for seq, record_type, data in journal:
+                if seq < journal_seq:
+                    # Already included in the state file
+                    continue
+                if seq != journal_seq:
+                    raise CompetitionError(
+                        "journal record %d is out of sequence" % seq)
+                if record_type == 'void':
+                    void_game_count += 1
+                else:
+                    self.competition.apply_journal_record(
+                        competition_status, data)
+                journal_seq += 1
+                journal_length += 1
             self.competition.set_status(competition_status)
         except CompetitionError, e:
             raise RingmasterError("error loading competition state: %s" % e)
@@ -434,11 +571,18 @@ class Ringmaster(object):
         except Exception, e:
             raise RingmasterError("error loading competition state:\n%s" %
                                   compact_tracebacks.format_traceback(skip=1))
+        self.void_game_count = void_game_count
+        self.journal_seq = journal_seq
+        self.journal_length = journal_length
+        self.games_in_progress = {}
+        self.games_to_replay = {}
         self.status_is_loaded = True
 
     def set_clean_status(self):
         """Reset persistent state to the initial values."""
         self.void_game_count = 0
+        self.journal_seq = 0
+        self.journal_length = 0
         self.games_in_progress = {}
         self.games_to_replay = {}
         try:
@@ -457,6 +601,10 @@ class Ringmaster(object):
         status_format_version, status = self._load_status()
         print >>self.stdout, "status_format_version:", status_format_version
         pprint(status, self.stdout)
+        journal = self._read_journal()
+        if journal:
+            print >>self.stdout, "journal:"
+            pprint(journal, self.stdout)
 
     def write_command(self, command):
         """Write a command to the command file.
@@ -490,10 +638,70 @@ class Ringmaster(object):
         except NotImplementedError:
             raise RingmasterError("competition is not a tournament")
 
+    def _read_timings_file(self):
+        """Return the contents of the command timings file, or None."""
+        if not os.path.exists(self.timings_pathname):
+            return None
+        with open(self.timings_pathname) as f:
+            return f.read()
+
+    def _write_timings_file(self, s):
+        """Replace the contents of the command timings file."""
+        with open(self.timings_pathname + ".new", "w") as f:
+            f.write(s)
+        os.rename(self.timings_pathname + ".new", self.timings_pathname)
+
+    def _load_command_timings(self):
+        """Read the command timings file.
+
+        Returns a dict player code -> Command_timings (empty if there is no
+        file).
+
+        """
+        try:
+            s = self._read_timings_file()
+        except EnvironmentError, e:
+            raise RingmasterError("error reading command timings file:\n%s" % e)
+        if s is None:
+            return {}
+        try:
+            return dict(
+                (str(player_code),
+                 command_timings.Command_timings.from_json_data(d))
+                for player_code, d in json.loads(s).iteritems())
+        except (ValueError, KeyError, TypeError, AttributeError), e:
+            raise RingmasterError("corrupt command timings file:\n%s" % e)
+
+    def _write_command_timings(self):
+        """Write the command timings file (in JSON format)."""
+        data = dict((player_code, timings.get_json_data())
+                    for player_code, timings
+                    in self.command_timings.iteritems())
+        self._write_timings_file(json.dumps(data, indent=1, sort_keys=True))
+
+    def _write_command_timings_report(self, out):
+        """Write the report section describing GTP command timings."""
+        timings_by_player = self._load_command_timings()
+        if not timings_by_player:
+            return
+        print >>out
+        print >>out, "GTP command response times:"
+        for player_code, timings in sorted(timings_by_player.items()):
+            print >>out
+            print >>out, "player %s" % player_code
+            table = command_timings.make_timings_table(timings)
+            print >>out, "\n".join(table.render())
+
     def report(self):
-        """Write the full competition report to the report file."""
+        """Write the full competition report to the report file.
+
+        If there is a command timings file, this also describes the GTP
+        command response times.
+
+        """
         f = open(self.report_pathname, "w")
         self.competition.write_full_report(f)
+        self._write_command_timings_report(f)
         f.close()
 
     def print_status_report(self):
@@ -570,6 +778,8 @@ class Ringmaster(object):
                     self.gtplog_dir_pathname, "%s.log" % job.game_id)
         if self.stderr_to_log:
             job.stderr_pathname = self.log_pathname
+        job.max_idle_engines = self.max_idle_engines
+        job.record_command_timings = self.record_command_timings
 
     def get_job(self):
         """Job supply function for the job manager."""
@@ -633,9 +843,19 @@ class Ringmaster(object):
             self.warn(warning)
         for log_entry in response.log_entries:
             self.log(log_entry)
+        if response.command_timings is not None:
+            for player_code, timings in response.command_timings.iteritems():
+                try:
+                    self.command_timings[player_code].merge(timings)
+                except KeyError:
+                    self.command_timings[player_code] = timings
         result_description = self.competition.process_game_result(response)
         del self.games_in_progress[response.game_id]
-        self.write_status()
+        if self.competition.uses_results_journal:
+            self._append_to_journal(
+                'result', self.competition.get_journal_record(response))
+        else:
+            self.write_status()
         if result_description is None:
             result_description = response.game_result.describe()
         self.say('results', "game %s: %s" % (
@@ -657,7 +877,10 @@ class Ringmaster(object):
             del self.games_in_progress[job.game_id]
             if previous_error_count != 0:
                 del self.game_error_counts[job.game_id]
-        self.write_status()
+        if self.competition.uses_results_journal:
+            self._append_to_journal('void', job.game_id)
+        else:
+            self.write_status()
         if stop_competition and not self.stopping:
             # No need to log: _halt competition will do so
             self.say('warnings', "halting run due to void games")
@@ -685,6 +908,8 @@ class Ringmaster(object):
             self.log(msg)
 
         self._open_files()
+        if self.record_command_timings:
+            self.command_timings = self._load_command_timings()
         self.competition.set_event_logger(self.log)
         self.competition.set_history_logger(self.log_history)
 
@@ -694,15 +919,34 @@ class Ringmaster(object):
         allow_mp = (self.worker_count is not None)
         self.log("run started at %s with max_games %s" % (now(), max_games))
         if allow_mp:
-            self.log("using %d worker processes" % self.worker_count)
+            if self.use_event_loop:
+                self.log("running up to %d games at once in this process" %
+                         self.worker_count)
+            else:
+                self.log("using %d worker processes" % self.worker_count)
         self.max_games_this_run = max_games
         self._update_display()
         try:
-            job_manager.run_jobs(
-                job_source=self,
-                allow_mp=allow_mp, max_workers=self.worker_count,
-                passed_exceptions=[RingmasterError, CompetitionError,
-                                   RingmasterInternalError])
+            if self.competition.uses_results_journal:
+                # Start each run with an empty journal
+                self.write_status()
+            try:
+                job_manager.run_jobs(
+                    job_source=self,
+                    allow_mp=allow_mp, max_workers=self.worker_count,
+                    use_event_loop=self.use_event_loop,
+                    passed_exceptions=[RingmasterError, CompetitionError,
+                                       RingmasterInternalError])
+            finally:
+                self._close_journal()
+                if self.command_timings:
+                    try:
+                        self._write_command_timings()
+                    except EnvironmentError, e:
+                        self.warn("error writing command timings file:\n%s"
+                                  % e)
+            if self.competition.uses_results_journal:
+                self.write_status()
         except KeyboardInterrupt:
             self.log("run interrupted at %s" % now())
             log_games_in_progress()
@@ -732,9 +976,11 @@ class Ringmaster(object):
         for pathname in [
             self.log_pathname,
             self.status_pathname,
+            self.journal_pathname,
             self.command_pathname,
             self.history_pathname,
             self.report_pathname,
+            self.timings_pathname,
             ]:
             if os.path.exists(pathname):
                 try:
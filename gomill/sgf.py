@@ -22,12 +22,30 @@ class Node(object):
 
     Changing the SZ property isn't allowed.
 
+    The property map may instead be an sgf_grammar.Unparsed_node, in which
+    case it isn't parsed until the properties are first used.
+
     """
+    # Map identifier -> tuple (raw values, property type, interpreted value)
+    # (None until get() first stores a value)
+    _interpreted_values = None
+
     def __init__(self, property_map, presenter):
-        # Map identifier (PropIdent) -> nonempty list of raw values
-        self._property_map = property_map
+        if isinstance(property_map, sgf_grammar.Unparsed_node):
+            self._unparsed_node = property_map
+        else:
+            # Map identifier (PropIdent) -> nonempty list of raw values
+            self._property_map = property_map
         self._presenter = presenter
 
+    def __getattr__(self, name):
+        # This is called only if the attribute isn't found normally
+        if name != '_property_map' or '_unparsed_node' not in self.__dict__:
+            raise AttributeError(name)
+        self._property_map = self._unparsed_node.get_property_map()
+        del self._unparsed_node
+        return self._property_map
+
     def get_size(self):
         """Return the board size used to interpret property values."""
         return self._presenter.size
@@ -173,9 +191,28 @@ class Node(object):
 
         See sgf_properties.Presenter.interpret() for details.
 
+        Values of properties which don't have list types are cached, so
+        repeated calls return the same object (these values are immutable).
+
         """
-        return self._presenter.interpret(
-            identifier, self._property_map[identifier])
+        raw_values = self._property_map[identifier]
+        presenter = self._presenter
+        property_type = presenter.get_effective_property_type(identifier)
+        cache = self._interpreted_values
+        if cache is not None:
+            cached = cache.get(identifier)
+            # The cache is valid if neither the raw values nor the property
+            # type have changed. The raw values are compared by content, as
+            # the list returned by get_raw_list() may have been modified.
+            if (cached is not None and cached[1] is property_type and
+                    cached[0] == raw_values):
+                return cached[2]
+        value = presenter.interpret_as_type(property_type, raw_values)
+        if not property_type.uses_list:
+            if cache is None:
+                cache = self._interpreted_values = {}
+            cache[identifier] = (raw_values[:], property_type, value)
+        return value
 
     def set(self, identifier, value):
         """Set the value of the specified property.
@@ -567,7 +604,8 @@ class Sgf_game(object):
         return game
 
     @classmethod
-    def from_string(cls, s, override_encoding=None):
+    def from_string(cls, s, override_encoding=None, main_line_only=False,
+                    lazy=False):
         """Alternative constructor: read a single Sgf_game from a string.
 
         s -- 8-bit string
@@ -577,8 +615,19 @@ class Sgf_game(object):
 
         See from_coarse_game_tree for details of size and encoding handling.
 
+        If main_line_only is true, the game contains only the leftmost
+        variation from the string (so it has no variations); this is faster
+        for games with many variations. This is enough for
+        sgf_moves.get_setup_and_moves().
+
+        If lazy is true, each node's raw property values are extracted from
+        the string only when the node's properties are first used (the
+        string's syntax is still fully checked). This saves time and memory
+        when only some nodes are examined. In this case 's' may be an mmap
+        object, which mustn't be closed while the game is in use.
+
         """
-        coarse_game = sgf_grammar.parse_sgf_game(s)
+        coarse_game = sgf_grammar.parse_sgf_game(s, main_line_only, lazy)
         return cls.from_coarse_game_tree(coarse_game, override_encoding)
 
     def serialise(self, wrap=79):
@@ -806,3 +855,63 @@ class Sgf_game(object):
             date = datetime.date.today()
         self.root.set('DT', date.strftime("%Y-%m-%d"))
 
+
+
+class Sgf_file_summary(object):
+    """Information about an SGF file, as returned by scan_sgf_file().
+
+    Public attributes:
+      pathname        -- string
+      file_size       -- int (bytes)
+      move_count      -- int, or None
+      root_properties -- raw property map for the game's root node
+
+    move_count is None unless scan_sgf_file() was asked to count moves.
+
+    Sgf_file_summary objects are suitable for pickling (so they can be
+    returned from worker processes).
+
+    """
+    def get_root_game(self, override_encoding=None):
+        """Return an Sgf_game containing only the root node.
+
+        This can be used to interpret the root properties (eg, with
+        get_komi() or get_player_name()).
+
+        Raises ValueError if the SZ or CA properties are unacceptable. See
+        Sgf_game.from_coarse_game_tree for details of size and encoding
+        handling.
+
+        """
+        coarse_game = sgf_grammar.Coarse_game_tree()
+        coarse_game.sequence = [dict(self.root_properties)]
+        return Sgf_game.from_coarse_game_tree(coarse_game, override_encoding)
+
+def scan_sgf_file(pathname, count_moves=False):
+    """Read the root properties of the first game in an SGF file.
+
+    pathname    -- string
+    count_moves -- bool (default False)
+
+    Returns an Sgf_file_summary.
+
+    This reads only as far as the end of the root node, so it's much quicker
+    than loading the whole game. If count_moves is true, it also counts the
+    moves in the game's leftmost variation (see sgf_grammar.scan_sgf_root()),
+    which is slower but still doesn't fully parse the game.
+
+    This is suitable for use with multiprocessing.Pool.imap() and similar.
+
+    Raises ValueError if the root node can't be parsed.
+
+    Propagates EnvironmentError if the file can't be read.
+
+    """
+    root_properties, file_size, move_count = sgf_grammar.scan_sgf_root(
+        pathname, count_moves)
+    summary = Sgf_file_summary()
+    summary.pathname = pathname
+    summary.file_size = file_size
+    summary.move_count = move_count
+    summary.root_properties = root_properties
+    return summary
@@ -19,6 +19,7 @@ values should pass is_valid_property_value().
 
 """
 
+import mmap
 import re
 import string
 
@@ -37,6 +38,27 @@ _tokenise_re = re.compile(r"""
     (?P<D> [;()] )                                # delimiter
 )
 """, re.VERBOSE | re.DOTALL)
+_node_re = re.compile(r"""
+\s* ; \s*
+(?P<N>                                            # node contents
+  (?: [^\[();]+ | \[ [^\\\]]* (?: \\. [^\\\]]* )* \] )*
+)
+""", re.VERBOSE | re.DOTALL)
+_lazy_node_re = re.compile(r"""
+\s* ;
+(?P<N>                                            # node contents
+  (?: \s* [A-Za-z]{1,64} (?: \s* \[ [^\\\]]* (?: \\. [^\\\]]* )* \] )+ )*
+)
+""", re.VERBOSE | re.DOTALL)
+_paren_re = re.compile(r"\s*([()])")
+_skip_re = re.compile(r"""
+(?:
+    [^\[()]+                                      # anything else
+    |
+    \[ [^\\\]]* (?: \\. [^\\\]]* )* \]            # PropValue
+)*
+""", re.VERBOSE | re.DOTALL)
+
 
 
 def is_valid_property_identifier(s):
@@ -70,6 +92,49 @@ def is_valid_property_value(s):
 
 _lcchars = string.ascii_lowercase
 
+def tokenise_iter(s, start_position=0):
+    """Tokenise a string containing SGF data, generating the tokens lazily.
+
+    s              -- 8-bit string
+    start_position -- index into 's'
+
+    Skips leading junk.
+
+    Returns an iterator of triples (token type, contents, end index), where
+    'end index' is the index in 's' just after the token.
+
+    Token types and contents, and the rules for when to stop, are as for
+    tokenise().
+
+    This produces each token only when it's asked for, so a caller can
+    process a game without keeping a list of all its tokens.
+
+    """
+    m = _find_start_re.search(s, start_position)
+    if not m:
+        return
+    i = m.start()
+    depth = 0
+    match = _tokenise_re.match
+    while True:
+        m = match(s, i)
+        if not m:
+            return
+        group = m.lastgroup
+        token = m.group(m.lastindex)
+        i = m.end()
+        if group == 'I':
+            token = token.translate(None, _lcchars)
+        elif group == 'D':
+            if token == '(':
+                depth += 1
+            elif token == ')':
+                depth -= 1
+                if depth == 0:
+                    yield group, token, i
+                    return
+        yield group, token, i
+
 def tokenise(s, start_position=0):
     """Tokenise a string containing SGF data.
 
@@ -97,31 +162,14 @@ def tokenise(s, start_position=0):
     PropIdent has the lower-case letters removed (for example, 'AddBlack' is
     returned as 'AB'), and therefore passes is_valid_property_identifier().
 
+    See also tokenise_iter().
+
     """
     result = []
-    m = _find_start_re.search(s, start_position)
-    if not m:
-        return [], 0
-    i = m.start()
-    depth = 0
-    while True:
-        m = _tokenise_re.match(s, i)
-        if not m:
-            break
-        group = m.lastgroup
-        token = m.group(m.lastindex)
-        if group == 'I':
-            token = token.translate(None, _lcchars)
-        result.append((group, token))
-        i = m.end()
-        if group == 'D':
-            if token == '(':
-                depth += 1
-            elif token == ')':
-                depth -= 1
-                if depth == 0:
-                    break
-    return result, i
+    end_position = 0
+    for token_type, token, end_position in tokenise_iter(s, start_position):
+        result.append((token_type, token))
+    return result, end_position
 
 class Coarse_game_tree(object):
     """An SGF GameTree.
@@ -136,79 +184,403 @@ class Coarse_game_tree(object):
 
     The sequence represents the nodes before the variations.
 
+    In trees from the lazy parser, each node except the root may be
+    represented by an Unparsed_node rather than a property map.
+
     """
     def __init__(self):
         self.sequence = [] # must be at least one node
         self.children = [] # may be empty
 
+class Unparsed_node(object):
+    """A node whose properties haven't been parsed yet.
+
+    Instantiate with
+      s     -- 8-bit string (or mmap object)
+      start -- index in 's' of the start of the node's properties
+      end   -- index in 's' just after the end of the node's properties
+
+    The properties must be syntactically valid.
+
+    This keeps a reference to 's' until the properties are parsed.
+
+    """
+    __slots__ = ('_source', '_start', '_end', '_property_map')
+
+    def __init__(self, s, start, end):
+        self._source = s
+        self._start = start
+        self._end = end
+
+    def get_property_map(self):
+        """Return the node's property map, parsing the properties if necessary.
+
+        Returns the same dict each time it's called.
+
+        """
+        try:
+            return self._property_map
+        except AttributeError:
+            pass
+        self._property_map = _parse_node_properties(
+            self._source, self._start, self._end)
+        self._source = None
+        return self._property_map
+
+def get_property_map(node):
+    """Return the property map for an entry in a Coarse_game_tree's sequence.
+
+    node -- property map or Unparsed_node
+
+    """
+    if isinstance(node, Unparsed_node):
+        return node.get_property_map()
+    return node
+
 def _parse_sgf_game(s, start_position):
-    """Common implementation for parse_sgf_game and parse_sgf_games."""
-    tokens, end_position = tokenise(s, start_position)
-    if not tokens:
-        return None, None
+    """Common implementation for parse_sgf_game and parse_sgf_games.
+
+    Returns a pair (Coarse_game_tree, end position), or (None, None) if no
+    game was found.
+
+    This consumes tokens from tokenise_iter() as they're produced, so there's
+    never a list of all the game's tokens.
+
+    """
     stack = []
     game_tree = None
     sequence = None
     properties = None
-    index = 0
-    try:
-        while True:
-            token_type, token = tokens[index]
-            index += 1
-            if token_type == 'V':
+    # The property being read, and its values so far
+    prop_ident = None
+    prop_values = None
+    end_position = None
+    for token_type, token, end_position in tokenise_iter(s, start_position):
+        if token_type == 'V':
+            if prop_values is None:
+                raise ValueError("unexpected value")
+            prop_values.append(token)
+            continue
+        if prop_values is not None:
+            if not prop_values:
+                raise ValueError("property with no values")
+            if properties is None:
+                raise ValueError("property value outside a node")
+            if prop_ident in properties:
+                properties[prop_ident] += prop_values
+            else:
+                properties[prop_ident] = prop_values
+            prop_values = None
+        if token_type == 'I':
+            prop_ident = token
+            prop_values = []
+        elif token == ';':
+            if sequence is None:
+                raise ValueError("unexpected node")
+            properties = {}
+            sequence.append(properties)
+        else:
+            if sequence is not None:
+                if not sequence:
+                    raise ValueError("empty sequence")
+                game_tree.sequence = sequence
+                sequence = None
+            if token == '(':
+                stack.append(game_tree)
+                game_tree = Coarse_game_tree()
+                sequence = []
+            else:
+                # token == ')'
+                variation = game_tree
+                game_tree = stack.pop()
+                if game_tree is None:
+                    return variation, end_position
+                game_tree.children.append(variation)
+            properties = None
+    if end_position is None:
+        return None, None
+    raise ValueError("unexpected end of SGF data")
+
+def _skip_game_trees(s, i, depth):
+    """Skip to the end of the game trees enclosing a position.
+
+    i     -- index into 's'
+    depth -- number of unclosed game trees enclosing i
+
+    Returns the index just after the closing paren of the outermost of those
+    game trees.
+
+    This checks only that value brackets and parens are properly matched.
+
+    """
+    match = _skip_re.match
+    while True:
+        i = match(s, i).end()
+        c = s[i:i+1]
+        if c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        else:
+            raise ValueError("unexpected end of SGF data")
+        i += 1
+
+def _parse_sgf_main_line(s, start_position):
+    """Variant of _parse_sgf_game which reads only the leftmost variation.
+
+    Returns a pair (Coarse_game_tree, end position), or (None, None) if no
+    game was found. The Coarse_game_tree has no children.
+
+    Once the end of the leftmost variation is reached, the rest of the game
+    is passed over with _skip_game_trees(), without tokenising it.
+
+    """
+    m = _find_start_re.search(s, start_position)
+    if not m:
+        return None, None
+    sequence = []
+    properties = None
+    # The property being read, and its values so far
+    prop_ident = None
+    prop_values = None
+    depth = 1
+    i = m.start() + 1
+    match = _tokenise_re.match
+    while True:
+        m = match(s, i)
+        if not m:
+            raise ValueError("unexpected end of SGF data")
+        group = m.lastgroup
+        token = m.group(m.lastindex)
+        i = m.end()
+        if group == 'V':
+            if prop_values is None:
+                raise ValueError("unexpected value")
+            prop_values.append(token)
+            continue
+        if prop_values is not None:
+            if not prop_values:
+                raise ValueError("property with no values")
+            if properties is None:
+                raise ValueError("property value outside a node")
+            if prop_ident in properties:
+                properties[prop_ident] += prop_values
+            else:
+                properties[prop_ident] = prop_values
+            prop_values = None
+        if group == 'I':
+            prop_ident = token.translate(None, _lcchars)
+            prop_values = []
+        elif token == ';':
+            properties = {}
+            sequence.append(properties)
+        elif properties is None:
+            raise ValueError("empty sequence")
+        elif token == '(':
+            # The first variation continues the main line
+            depth += 1
+            properties = None
+        else:
+            # token == ')': this is the end of the main line
+            game_tree = Coarse_game_tree()
+            game_tree.sequence = sequence
+            if depth > 1:
+                i = _skip_game_trees(s, i, depth - 1)
+            return game_tree, i
+
+def _parse_sgf_root(s, start_position):
+    """Read the root node of the first game at or after start_position.
+
+    Returns a pair (property map, end position), or (None, None) if no game
+    was found.
+
+    The end position is the index of the delimiter following the root node.
+
+    """
+    m = _find_start_re.search(s, start_position)
+    if not m:
+        return None, None
+    properties = {}
+    # The property being read, and its values so far
+    prop_ident = None
+    prop_values = None
+    i = m.end()
+    match = _tokenise_re.match
+    while True:
+        m = match(s, i)
+        if not m:
+            raise ValueError("unexpected end of SGF data")
+        group = m.lastgroup
+        token = m.group(m.lastindex)
+        if group == 'V':
+            if prop_values is None:
                 raise ValueError("unexpected value")
-            if token_type == 'D':
-                if token == ';':
-                    if sequence is None:
-                        raise ValueError("unexpected node")
-                    properties = {}
-                    sequence.append(properties)
-                else:
-                    if sequence is not None:
-                        if not sequence:
-                            raise ValueError("empty sequence")
-                        game_tree.sequence = sequence
-                        sequence = None
-                    if token == '(':
-                        stack.append(game_tree)
-                        game_tree = Coarse_game_tree()
-                        sequence = []
-                    else:
-                        # token == ')'
-                        variation = game_tree
-                        game_tree = stack.pop()
-                        if game_tree is None:
-                            break
-                        game_tree.children.append(variation)
-                    properties = None
+            prop_values.append(token)
+            i = m.end()
+            continue
+        if prop_values is not None:
+            if not prop_values:
+                raise ValueError("property with no values")
+            if prop_ident in properties:
+                properties[prop_ident] += prop_values
             else:
-                # token_type == 'I'
-                prop_ident = token
-                prop_values = []
-                while True:
-                    token_type, token = tokens[index]
-                    if token_type != 'V':
-                        break
-                    index += 1
-                    prop_values.append(token)
-                if not prop_values:
-                    raise ValueError("property with no values")
-                try:
-                    if prop_ident in properties:
-                        properties[prop_ident] += prop_values
-                    else:
-                        properties[prop_ident] = prop_values
-                except TypeError:
-                    raise ValueError("property value outside a node")
-    except IndexError:
-        raise ValueError("unexpected end of SGF data")
-    assert index == len(tokens)
-    return variation, end_position
-
-def parse_sgf_game(s):
+                properties[prop_ident] = prop_values
+            prop_values = None
+        if group == 'D':
+            return properties, m.start()
+        prop_ident = token.translate(None, _lcchars)
+        prop_values = []
+        i = m.end()
+
+def _node_has_move(s):
+    """Check whether a node's contents include a B or W property."""
+    for m in _tokenise_re.finditer(s):
+        if (m.lastgroup == 'I' and
+                m.group('I').translate(None, _lcchars) in ('B', 'W')):
+            return True
+    return False
+
+def _count_main_line_moves(s, i, depth):
+    """Count the moves in the rest of a game's leftmost variation.
+
+    i     -- index into 's' of the start of a node or variation
+    depth -- number of unclosed game trees enclosing i
+
+    Returns a pair (number of nodes with a B or W property, end position)
+
+    This matches each node as a whole using _node_re, and looks inside it
+    only if it doesn't start with a move, so it's much less careful than the
+    parser about checking syntax.
+
+    """
+    count = 0
+    node_match = _node_re.match
+    match = _tokenise_re.match
+    while True:
+        m = node_match(s, i)
+        if m:
+            i = m.end()
+            contents = m.group('N')
+            if contents[:2] in ('B[', 'W[') or _node_has_move(contents):
+                count += 1
+            continue
+        m = match(s, i)
+        if not m:
+            raise ValueError("unexpected end of SGF data")
+        if m.lastgroup != 'D':
+            raise ValueError("property value outside a node")
+        i = m.end()
+        if m.group('D') == '(':
+            depth += 1
+        else:
+            if depth > 1:
+                i = _skip_game_trees(s, i, depth - 1)
+            return count, i
+
+def _parse_node_properties(s, start, end):
+    """Make a property map from a node's properties.
+
+    s     -- 8-bit string
+    start -- index in 's' of the start of the node's properties
+    end   -- index in 's' just after the end of the node's properties
+
+    The properties must be syntactically valid (as checked by _lazy_node_re).
+
+    """
+    properties = {}
+    prop_values = None
+    for m in _tokenise_re.finditer(s, start, end):
+        if m.lastgroup == 'V':
+            prop_values.append(m.group('V'))
+        else:
+            prop_values = properties.setdefault(
+                m.group('I').translate(None, _lcchars), [])
+    return properties
+
+def _parse_sgf_game_lazily(s, start_position, main_line_only):
+    """Variant of _parse_sgf_game which leaves most nodes unparsed.
+
+    Returns a pair (Coarse_game_tree, end position), or (None, None) if no
+    game was found.
+
+    The root node is represented by a property map, and the other nodes by
+    Unparsed_nodes.
+
+    This checks each node's syntax using _lazy_node_re. If it finds any
+    problem, it hands over to the normal parser (_parse_sgf_main_line if
+    main_line_only is true, otherwise _parse_sgf_game), so that the error is
+    reported in the usual way.
+
+    """
+    m = _find_start_re.search(s, start_position)
+    if not m:
+        return None, None
+    game_start = m.start()
+    node_match = _lazy_node_re.match
+    paren_match = _paren_re.match
+    stack = []
+    game_tree = None
+    # The nodes since the last paren (None after a closing paren)
+    sequence = None
+    seen_root = False
+    depth = 0
+    i = game_start
+    while True:
+        m = node_match(s, i)
+        if m:
+            if sequence is None:
+                break
+            start, end = m.span('N')
+            if seen_root:
+                sequence.append(Unparsed_node(s, start, end))
+            else:
+                sequence.append(_parse_node_properties(s, start, end))
+                seen_root = True
+            i = m.end()
+            continue
+        m = paren_match(s, i)
+        if not m or sequence == []:
+            break
+        i = m.end()
+        token = m.group(1)
+        if token == '(':
+            depth += 1
+        else:
+            depth -= 1
+        if main_line_only and game_tree is not None:
+            # Keep adding to the root sequence until the main line ends
+            game_tree.sequence += sequence
+            if token == ')':
+                if depth > 0:
+                    i = _skip_game_trees(s, i, depth)
+                return game_tree, i
+            sequence = []
+            continue
+        if sequence is not None:
+            game_tree.sequence = sequence
+            sequence = None
+        if token == '(':
+            stack.append(game_tree)
+            game_tree = Coarse_game_tree()
+            sequence = []
+        else:
+            variation = game_tree
+            game_tree = stack.pop()
+            if game_tree is None:
+                return variation, i
+            game_tree.children.append(variation)
+    if main_line_only:
+        return _parse_sgf_main_line(s, game_start)
+    return _parse_sgf_game(s, game_start)
+
+def parse_sgf_game(s, main_line_only=False, lazy=False):
     """Read a single SGF game from a string, returning the parse tree.
 
-    s -- 8-bit string
+    s              -- 8-bit string
+    main_line_only -- bool (default False)
+    lazy           -- bool (default False)
 
     Returns a Coarse_game_tree.
 
@@ -224,16 +596,36 @@ def parse_sgf_game(s):
     whitespace between); ignores everything preceding that. Ignores everything
     following the first game.
 
+    If main_line_only is true, the returned tree represents only the game's
+    leftmost variation: all its nodes are in the root Coarse_game_tree's
+    sequence, and it has no children. The other variations are skipped
+    quickly, without building property maps; they're checked only for
+    properly-matched brackets and parens, so some syntax errors in them
+    aren't reported.
+
+    If lazy is true, nodes other than the root are represented by
+    Unparsed_nodes, which refer back to 's' and don't make property maps
+    until they're needed (use get_property_map() to retrieve them). The
+    nodes' syntax is still checked, and errors are reported in the same way.
+    In this case 's' may also be an mmap object (which mustn't be closed
+    while the Unparsed_nodes are still in use).
+
     """
-    game_tree, _ = _parse_sgf_game(s, 0)
+    if lazy:
+        game_tree, _ = _parse_sgf_game_lazily(s, 0, main_line_only)
+    elif main_line_only:
+        game_tree, _ = _parse_sgf_main_line(s, 0)
+    else:
+        game_tree, _ = _parse_sgf_game(s, 0)
     if game_tree is None:
         raise ValueError("no SGF data found")
     return game_tree
 
-def parse_sgf_collection(s):
+def parse_sgf_collection(s, lazy=False):
     """Read an SGF game collection, returning the parse trees.
 
-    s -- 8-bit string
+    s    -- 8-bit string
+    lazy -- bool (default False)
 
     Returns a nonempty list of Coarse_game_trees.
 
@@ -247,12 +639,19 @@ def parse_sgf_collection(s):
     final game. Identifies the start of each game in the same way as
     parse_sgf_game().
 
+    If lazy is true, nodes other than the roots are represented by
+    Unparsed_nodes, as for parse_sgf_game().
+
     """
     position = 0
     result = []
     while True:
         try:
-            game_tree, position = _parse_sgf_game(s, position)
+            if lazy:
+                game_tree, position = _parse_sgf_game_lazily(
+                    s, position, False)
+            else:
+                game_tree, position = _parse_sgf_game(s, position)
         except ValueError, e:
             raise ValueError("error parsing game %d: %s" % (len(result), e))
         if game_tree is None:
@@ -263,6 +662,150 @@ def parse_sgf_collection(s):
     return result
 
 
+def _map_sgf_source(source):
+    """Return an object which iter_sgf_collection() can search.
+
+    Returns a pair (buffer, list of objects to close).
+
+    """
+    if isinstance(source, basestring):
+        f = open(source, "rb")
+        to_close = [f]
+    else:
+        f = source
+        to_close = []
+    try:
+        fileno = f.fileno
+    except AttributeError:
+        return f.read(), to_close
+    try:
+        mapping = mmap.mmap(fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+        # Empty file
+        return "", to_close
+    except:
+        for obj in to_close:
+            obj.close()
+        raise
+    return mapping, [mapping] + to_close
+
+def iter_sgf_collection(source, start_position=0, end_position=None,
+                        main_line_only=False):
+    """Read the games in an SGF collection one at a time.
+
+    source         -- pathname or file object
+    start_position -- byte offset (default 0)
+    end_position   -- byte offset (default None)
+    main_line_only -- bool (default False)
+
+    Returns an iterator of triples (start offset, end offset, game tree)
+
+    start offset -- offset of the game's opening parenthesis
+    end offset   -- offset just after the game's closing parenthesis
+    game tree    -- Coarse_game_tree
+
+    If source is a pathname, or a file object which has a fileno() method,
+    the file is memory-mapped, and games are parsed only as they're asked
+    for. So a large collection can be processed without reading it all into
+    memory. Offsets are from the start of the file (whatever the file
+    object's current position). Other file objects (eg StringIO) are read()
+    in full.
+
+    Parsing starts at start_position, and stops before any game starting at
+    or after end_position; a game which starts before end_position is
+    returned in full. So to resume reading a collection, pass the end offset
+    of the last game processed as start_position. To divide a collection
+    into shards, use game start offsets (as found by an earlier pass) as the
+    boundaries: a shard starting in the middle of a game may mistake part of
+    that game for the start of another one.
+
+    Ignores non-SGF data between games in the same way as
+    parse_sgf_collection(), but (unlike parse_sgf_collection()) doesn't
+    complain if there are no games.
+
+    Raises ValueError if there is an error parsing a game (the message
+    includes the game's start offset); the games before it will already
+    have been returned.
+
+    If main_line_only is true, each game tree represents only the game's
+    leftmost variation, as for parse_sgf_game().
+
+    Propagates EnvironmentError if a file can't be opened or mapped.
+
+    If the iterator opened or mapped a file, it's closed when the iterator is
+    exhausted or closed.
+
+    """
+    if main_line_only:
+        parse_game = _parse_sgf_main_line
+    else:
+        parse_game = _parse_sgf_game
+    buf, to_close = _map_sgf_source(source)
+    try:
+        position = start_position
+        while True:
+            m = _find_start_re.search(buf, position)
+            if not m:
+                break
+            game_start = m.start()
+            if end_position is not None and game_start >= end_position:
+                break
+            try:
+                game_tree, position = parse_game(buf, game_start)
+            except ValueError, e:
+                raise ValueError("error parsing game at offset %d: %s" %
+                                 (game_start, e))
+            yield game_start, position, game_tree
+    finally:
+        for obj in to_close:
+            obj.close()
+
+def scan_sgf_root(source, count_moves=False):
+    """Read the root node of the first game in an SGF file.
+
+    source      -- pathname or file object
+    count_moves -- bool (default False)
+
+    Returns a tuple (property map, data size, move count)
+
+    property map -- as in a Coarse_game_tree's sequence
+    data size    -- int (the file's length in bytes)
+    move count   -- int, or None
+
+    This parses only as far as the end of the root node, so it's much faster
+    than parse_sgf_game() for large files. The file is memory-mapped if
+    possible, as for iter_sgf_collection(), so usually only the start of it
+    is read.
+
+    If count_moves is true, move count is the number of nodes with a B or W
+    property in the game's leftmost variation (including the root node);
+    this means scanning the rest of the game, but without building any
+    property maps. Otherwise move count is None.
+
+    Raises ValueError if there is no game, or if the root node can't be
+    parsed (or, if count_moves is true, if the game isn't properly
+    terminated).
+
+    Propagates EnvironmentError if the file can't be opened or mapped.
+
+    """
+    buf, to_close = _map_sgf_source(source)
+    try:
+        properties, position = _parse_sgf_root(buf, 0)
+        if properties is None:
+            raise ValueError("no SGF data found")
+        if count_moves:
+            move_count, _ = _count_main_line_moves(buf, position, 1)
+            if 'B' in properties or 'W' in properties:
+                move_count += 1
+        else:
+            move_count = None
+        return properties, len(buf), move_count
+    finally:
+        for obj in to_close:
+            obj.close()
+
+
 def block_format(pieces, width=79):
     """Concatenate strings, adding newlines.
 
@@ -308,8 +851,9 @@ def serialise_game_tree(game_tree, wrap=79):
             l.append(")")
             continue
         l.append("(")
-        for properties in game_tree.sequence:
+        for node in game_tree.sequence:
             l.append(";")
+            properties = get_property_map(node)
             # Force FF to the front, largely to work around a Quarry bug which
             # makes it ignore the first few bytes of the file.
             for prop_ident, prop_values in sorted(
@@ -336,7 +880,8 @@ def make_tree(game_tree, root, node_builder, node_adder):
     game_tree    -- Coarse_game_tree
     root         -- node
     node_builder -- function taking parameters (parent node, property map)
-                    returning a node
+                    returning a node (the property map may instead be an
+                    Unparsed_node, for trees from the lazy parser)
     node_adder   -- function taking a pair (parent node, child node)
 
     Builds a tree of nodes corresponding to this GameTree, calling
@@ -399,7 +944,8 @@ def main_sequence_iter(game_tree):
 
     game_tree -- Coarse_game_tree
 
-    Returns an iterable of property maps.
+    Returns an iterable of property maps (or Unparsed_nodes, for trees from
+    the lazy parser).
 
     If the game has no variations, this provides the complete game. Otherwise,
     it chooses the first variation each time it has a choice.
@@ -633,7 +633,15 @@ class Presenter(_Context):
         """
         self.default_property_type = property_type
 
-    def _get_effective_property_type(self, identifier):
+    def get_effective_property_type(self, identifier):
+        """Return the Property_type used for the specified PropIdent.
+
+        For unknown properties, returns the private property type.
+
+        Raises ValueError if the property is unknown and there is no private
+        property type.
+
+        """
         try:
             return self.property_types_by_ident[identifier]
         except KeyError:
@@ -684,7 +692,7 @@ class Presenter(_Context):
 
         """
         return self.interpret_as_type(
-            self._get_effective_property_type(identifier), raw_values)
+            self.get_effective_property_type(identifier), raw_values)
 
     def serialise_as_type(self, property_type, value):
         """Variant of serialise() for explicitly specified type.
@@ -727,4 +735,4 @@ class Presenter(_Context):
 
         """
         return self.serialise_as_type(
-            self._get_effective_property_type(identifier), value)
+            self.get_effective_property_type(identifier), value)
@@ -3,6 +3,8 @@
 from __future__ import division
 
 from gomill import ascii_tables
+from gomill import result_stores
+from gomill.result_stores import BLACK_WINS, WHITE_WINS
 from gomill.utils import format_float, format_percent
 from gomill.common import colour_name
 
@@ -20,6 +22,7 @@ class Matchup_description(object):
       handicap        -- int or None
       handicap_style  -- 'fixed' or 'free'
       move_limit      -- int
+      superko_rule    -- 'positional', 'situational', or None
       scorer          -- 'internal' or 'players'
       number_of_games -- int or None
 
@@ -80,8 +83,11 @@ class Tournament_results(object):
 
         The Game_results all have game_id set.
 
+        The Game_results are newly created for each call; modifying them has
+        no effect on the stored results.
+
         """
-        return self.results[matchup_id][:]
+        return list(self.results[matchup_id])
 
     def get_matchup_stats(self, matchup_id):
         """Return statistics for the specified matchup.
@@ -101,7 +107,7 @@ class Matchup_stats(object):
     """Result statistics for games between a pair of players.
 
     Instantiate with
-      results  -- list of gtp_games.Game_results
+      results  -- Result_store, or list of gtp_games.Game_results
       player_1 -- player code
       player_2 -- player code
     The game results should all be for games between player_1 and player_2.
@@ -120,22 +126,60 @@ class Matchup_stats(object):
 
     """
     def __init__(self, results, player_1, player_2):
-        self._results = results
+        if not isinstance(results, result_stores.Result_store):
+            results = result_stores.Result_store(results)
+        self._store = store = results
         self.player_1 = player_1
         self.player_2 = player_2
-
-        self.total = len(results)
-
-        js = self._jigo_score = 0.5 * sum(r.is_jigo for r in results)
-        self.unknown = sum(r.is_unknown for r in results)
-
-        self.wins_1 = sum(r.winning_player == player_1 for r in results) + js
-        self.wins_2 = sum(r.winning_player == player_2 for r in results) + js
-
-        self.forfeits_1 = sum(r.winning_player == player_2 and r.is_forfeit
-                              for r in results)
-        self.forfeits_2 = sum(r.winning_player == player_1 and r.is_forfeit
-                              for r in results)
+        self._index_1 = i1 = store.get_player_index(player_1)
+        self._index_2 = i2 = store.get_player_index(player_2)
+
+        # The stats are derived from the store's running tally, which has an
+        # entry for each distinct combination of players, winner and flags
+        # (so a handful of entries, however many games have been played).
+        # self._wins is a map (winning player index, winning colour) -> count
+        self._wins = wins = {}
+        total = jigos = unknown = forfeits_1 = forfeits_2 = 0
+        for (pb, pw, winner, flags), count in store.tally.iteritems():
+            total += count
+            if flags & result_stores.JIGO:
+                jigos += count
+                continue
+            if winner == BLACK_WINS:
+                winning_player = pb
+            elif winner == WHITE_WINS:
+                winning_player = pw
+            else:
+                unknown += count
+                continue
+            key = (winning_player, winner)
+            wins[key] = wins.get(key, 0) + count
+            if flags & result_stores.FORFEIT:
+                if winning_player == i2:
+                    forfeits_1 += count
+                elif winning_player == i1:
+                    forfeits_2 += count
+
+        self.total = total
+        js = self._jigo_score = 0.5 * jigos
+        self.unknown = unknown
+        self.wins_1 = self._count_wins(i1) + js
+        self.wins_2 = self._count_wins(i2) + js
+        self.forfeits_1 = forfeits_1
+        self.forfeits_2 = forfeits_2
+
+    def _count_wins(self, player_index=None, winner=None):
+        return sum(count for (p, w), count in self._wins.iteritems()
+                   if (player_index is None or p == player_index) and
+                      (winner is None or w == winner))
+
+    def _count_played(self, player_index, colour):
+        if colour == 'b':
+            return sum(count for (pb, _, _, _), count
+                       in self._store.tally.iteritems() if pb == player_index)
+        else:
+            return sum(count for (_, pw, _, _), count
+                       in self._store.tally.iteritems() if pw == player_index)
 
     def calculate_colour_breakdown(self):
         """Calculate futher statistics, broken down by colour played.
@@ -159,15 +203,14 @@ class Matchup_stats(object):
             colour_2 -- 'b' or 'w'
 
         """
-        results = self._results
-        player_1 = self.player_1
-        player_2 = self.player_2
+        i1 = self._index_1
+        i2 = self._index_2
         js = self._jigo_score
 
-        self.played_1b = sum(r.player_b == player_1 for r in results)
-        self.played_1w = sum(r.player_w == player_1 for r in results)
-        self.played_2b = sum(r.player_b == player_2 for r in results)
-        self.played_y2 = sum(r.player_w == player_2 for r in results)
+        self.played_1b = self._count_played(i1, 'b')
+        self.played_1w = self._count_played(i1, 'w')
+        self.played_2b = self._count_played(i2, 'b')
+        self.played_y2 = self._count_played(i2, 'w')
 
         if self.played_1w == 0 and self.played_2b == 0:
             self.alternating = False
@@ -179,20 +222,18 @@ class Matchup_stats(object):
             self.colour_2 = 'b'
         else:
             self.alternating = True
-            self.wins_b = sum(r.winning_colour == 'b' for r in results) + js
-            self.wins_w = sum(r.winning_colour == 'w' for r in results) + js
-            self.wins_1b = sum(
-                r.winning_player == player_1 and r.winning_colour == 'b'
-                for r in results) + js
-            self.wins_1w = sum(
-                r.winning_player == player_1 and r.winning_colour == 'w'
-                for r in results) + js
-            self.wins_2b = sum(
-                r.winning_player == player_2 and r.winning_colour == 'b'
-                for r in results) + js
-            self.wins_2w = sum(
-                r.winning_player == player_2 and r.winning_colour == 'w'
-                for r in results) + js
+            self.wins_b = self._count_wins(winner=BLACK_WINS) + js
+            self.wins_w = self._count_wins(winner=WHITE_WINS) + js
+            self.wins_1b = self._count_wins(i1, BLACK_WINS) + js
+            self.wins_1w = self._count_wins(i1, WHITE_WINS) + js
+            self.wins_2b = self._count_wins(i2, BLACK_WINS) + js
+            self.wins_2w = self._count_wins(i2, WHITE_WINS) + js
+
+    def _get_average_time(self, player_index):
+        total, count = self._store.cpu_totals.get(player_index, (0, 0))
+        if not count:
+            return None
+        return total / count
 
     def calculate_time_stats(self):
         """Calculate CPU time statistics.
@@ -201,20 +242,8 @@ class Matchup_stats(object):
         average_time_2 -- float or None
 
         """
-        player_1 = self.player_1
-        player_2 = self.player_2
-        times_1 = [r.cpu_times[player_1] for r in self._results]
-        known_times_1 = [t for t in times_1 if t is not None]
-        times_2 = [r.cpu_times[player_2] for r in self._results]
-        known_times_2 = [t for t in times_2 if t is not None]
-        if known_times_1:
-            self.average_time_1 = sum(known_times_1) / len(known_times_1)
-        else:
-            self.average_time_1 = None
-        if known_times_2:
-            self.average_time_2 = sum(known_times_2) / len(known_times_2)
-        else:
-            self.average_time_2 = None
+        self.average_time_1 = self._get_average_time(self._index_1)
+        self.average_time_2 = self._get_average_time(self._index_2)
 
 
 def make_matchup_stats_table(ms):
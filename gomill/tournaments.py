@@ -4,6 +4,7 @@ from collections import defaultdict
 
 from gomill import game_jobs
 from gomill import competition_schedulers
+from gomill import result_stores
 from gomill import tournament_results
 from gomill import competitions
 from gomill.competitions import (
@@ -122,7 +123,7 @@ class Tournament(Competition):
 
 
     # State attributes (*: in persistent state):
-    #  *results               -- map matchup id -> list of Game_results
+    #  *results               -- map matchup id -> Result_store
     #  *scheduler             -- Group_scheduler (group codes are matchup ids)
     #  *engine_names          -- map player code -> string
     #  *engine_descriptions   -- map player code -> string
@@ -181,7 +182,7 @@ class Tournament(Competition):
             [(id, 0) for id in self.ghost_matchups])
 
     def set_clean_status(self):
-        self.results = defaultdict(list)
+        self.results = defaultdict(result_stores.Result_store)
         self.engine_names = {}
         self.engine_descriptions = {}
         self.scheduler = competition_schedulers.Group_scheduler()
@@ -197,7 +198,13 @@ class Tournament(Competition):
             }
 
     def set_status(self, status):
-        self.results = status['results']
+        # Status files from gomill 0.8.2 and earlier have lists of
+        # Game_results.
+        self.results = defaultdict(result_stores.Result_store)
+        for matchup_id, results in status['results'].iteritems():
+            if not isinstance(results, result_stores.Result_store):
+                results = result_stores.Result_store(results)
+            self.results[matchup_id] = results
         self._check_results()
         self._set_ghost_matchups()
         self.scheduler = status['scheduler']
@@ -226,6 +233,7 @@ class Tournament(Competition):
         job.board_size = matchup.board_size
         job.komi = matchup.komi
         job.move_limit = matchup.move_limit
+        job.superko_rule = matchup.superko_rule
         job.handicap = matchup.handicap
         job.handicap_is_free = (matchup.handicap_style == 'free')
         job.use_internal_scorer = (matchup.scorer == 'internal')
@@ -234,12 +242,22 @@ class Tournament(Competition):
         job.sgf_event = matchup.event_description
         return job
 
+    def _describe_engines(self, response):
+        """Return engine names and descriptions from a Game_job_result.
+
+        Returns a list of tuples (player code, name, description).
+
+        """
+        return [
+            (player_code,
+             ed.get_short_description() or "[no name available]",
+             ed.get_long_description() or "[no description available]")
+            for player_code, ed in response.engine_descriptions.iteritems()]
+
     def process_game_result(self, response):
-        for player_code, ed in response.engine_descriptions.iteritems():
-            self.engine_names[player_code] = \
-                ed.get_short_description() or "[no name available]"
-            self.engine_descriptions[player_code] = \
-                ed.get_long_description() or "[no description available]"
+        for player_code, name, description in self._describe_engines(response):
+            self.engine_names[player_code] = name
+            self.engine_descriptions[player_code] = description
         matchup_id, game_number = response.game_data
         game_id = response.game_id
         self.working_matchups.add(matchup_id)
@@ -248,6 +266,25 @@ class Tournament(Competition):
         self.results[matchup_id].append(response.game_result)
         self.log_history("%7s %s" % (game_id, response.game_result.describe()))
 
+    uses_results_journal = True
+
+    def get_journal_record(self, response):
+        return (response.game_data, response.game_result,
+                self._describe_engines(response))
+
+    def apply_journal_record(self, status, record):
+        (matchup_id, game_number), game_result, engine_info = record
+        for player_code, name, description in engine_info:
+            status['engine_names'][player_code] = name
+            status['engine_descriptions'][player_code] = description
+        try:
+            status['scheduler'].replay_fix(matchup_id, game_number)
+        except ValueError:
+            raise CompetitionError(
+                "journal has a second result for game %s of matchup %s" %
+                (game_number, matchup_id))
+        status['results'][matchup_id].append(game_result)
+
     def process_game_error(self, job, previous_error_count):
         # ignoring previous_error_count, as we can consider all jobs for the
         # same matchup to be equivalent.
@@ -265,7 +302,7 @@ class Tournament(Competition):
     def write_matchup_report(self, out, matchup, results):
         """Write the summary block for the specified matchup to 'out'
 
-        results -- nonempty list of Game_results
+        results -- nonempty Result_store
 
         """
         # The control file might have changed since the results were recorded.
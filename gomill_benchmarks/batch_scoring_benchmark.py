@@ -0,0 +1,79 @@
+"""Compare batch_scoring.area_scores() with Board.area_score().
+
+Run with
+  python -m gomill_benchmarks.batch_scoring_benchmark [options]
+
+"""
+
+import random
+import sys
+import time
+from optparse import OptionParser
+
+from gomill import boards
+from gomill import batch_scoring
+
+
+def make_final_positions(rnd, size, count):
+    """Make a list of Boards resembling the final positions of games.
+
+    Each board is mostly full, with a few empty regions of various sizes.
+
+    """
+    result = []
+    points = [(row, col) for row in xrange(size) for col in xrange(size)]
+    for i in xrange(count):
+        board = boards.Board(size)
+        density = rnd.uniform(0.6, 0.95)
+        for row, col in points:
+            if rnd.random() < density:
+                board.play(row, col, rnd.choice('bw'))
+        result.append(board)
+    return result
+
+def time_loop(board_list):
+    start = time.time()
+    scores = [board.area_score() for board in board_list]
+    return time.time() - start, scores
+
+def time_batch(board_list):
+    start = time.time()
+    positions = batch_scoring.stack_boards(board_list)
+    stacked = time.time()
+    scores = batch_scoring.area_scores(positions)
+    return stacked - start, time.time() - stacked, list(scores)
+
+
+_description = """\
+Score a set of random final positions using Board.area_score() and
+batch_scoring.area_scores(), and report the times taken.
+"""
+
+def main(argv):
+    parser = OptionParser(usage="%prog [options]",
+                          description=_description)
+    parser.add_option("--size", type="int", default=19,
+                      help="board size (default 19)")
+    parser.add_option("--positions", type="int", default=2000,
+                      metavar="N", help="number of positions (default 2000)")
+    parser.add_option("--seed", type="int", default=1,
+                      help="random seed (default 1)")
+    opts, args = parser.parse_args(argv)
+    if args:
+        parser.error("too many arguments")
+    rnd = random.Random(opts.seed)
+    print "generating %d positions at %dx%d" % (
+        opts.positions, opts.size, opts.size)
+    board_list = make_final_positions(rnd, opts.size, opts.positions)
+    loop_time, loop_scores = time_loop(board_list)
+    stack_time, batch_time, batch_scores = time_batch(board_list)
+    if batch_scores != loop_scores:
+        print >>sys.stderr, "batch scores differ from area_score()"
+        sys.exit(1)
+    print "area_score() loop:   %8.3fs" % loop_time
+    print "stack_boards():      %8.3fs" % stack_time
+    print "area_scores():       %8.3fs" % batch_time
+    print "speedup (scoring):   %8.1fx" % (loop_time / batch_time)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,164 @@
+"""Support for running benchmarks and comparing their results."""
+
+import inspect
+import json
+import time
+
+
+class Benchmark(object):
+    """A named workload to be timed.
+
+    Instantiate with
+      name     -- short string identifying the benchmark
+      run      -- callable taking the value returned by setup()
+      setup    -- callable returning a value to pass to run() (optional)
+      teardown -- callable taking the value returned by setup() (optional)
+      units    -- number of operations performed by each call to run()
+                  (optional; used to report a per-operation time)
+
+    Only run() is timed. The setup() callable is called once, before all the
+    timed runs. Workloads should be deterministic (use a seeded
+    random.Random), so that results from different versions of gomill can be
+    compared.
+
+    """
+    def __init__(self, name, run, setup=None, teardown=None, units=1):
+        self.name = name
+        self.run = run
+        self.setup = setup
+        self.teardown = teardown
+        self.units = units
+
+def accepts_argument(fn, name):
+    """Check whether a function has a parameter with the specified name.
+
+    Benchmark modules use this (like hasattr()) to leave out benchmarks for
+    features which the version of gomill being measured doesn't have.
+
+    """
+    try:
+        return name in inspect.getargspec(fn).args
+    except TypeError:
+        return False
+
+def time_benchmark(benchmark, repeat):
+    """Run a benchmark repeatedly.
+
+    Returns a list of times in seconds, one for each run.
+
+    """
+    if benchmark.setup is None:
+        arg = None
+    else:
+        arg = benchmark.setup()
+    times = []
+    try:
+        for i in xrange(repeat):
+            start = time.time()
+            benchmark.run(arg)
+            times.append(time.time() - start)
+    finally:
+        if benchmark.teardown is not None:
+            benchmark.teardown(arg)
+    return times
+
+def summarise_times(benchmark, times):
+    """Make a result dict for a benchmark.
+
+    The dict has keys
+      best      -- shortest time for a single run
+      mean      -- mean time for a single run
+      units     -- benchmark.units
+      best_unit -- best / units
+      times     -- list of all the times
+
+    """
+    best = min(times)
+    return {
+        'best'      : best,
+        'mean'      : sum(times) / len(times),
+        'units'     : benchmark.units,
+        'best_unit' : best / benchmark.units,
+        'times'     : times,
+        }
+
+def run_benchmarks(benchmarks, repeat, report=None):
+    """Run a list of benchmarks.
+
+    benchmarks -- list of Benchmark objects
+    repeat     -- number of timed runs for each benchmark
+    report     -- callable taking (benchmark, result dict) (optional)
+
+    Returns a dict benchmark name -> result dict (see summarise_times()).
+
+    """
+    results = {}
+    for benchmark in benchmarks:
+        times = time_benchmark(benchmark, repeat)
+        result = summarise_times(benchmark, times)
+        results[benchmark.name] = result
+        if report is not None:
+            report(benchmark, result)
+    return results
+
+def write_results(f, results, description=None):
+    """Write benchmark results as JSON.
+
+    f           -- writable file object
+    results     -- dict as returned by run_benchmarks()
+    description -- string (eg, identifying the gomill version), or None
+
+    """
+    json.dump({'description' : description, 'results' : results},
+              f, indent=1, sort_keys=True)
+    f.write("\n")
+
+def read_results(f):
+    """Read benchmark results written by write_results().
+
+    Returns a pair (description, results dict)
+
+    Raises ValueError if the file isn't in the expected format.
+
+    """
+    try:
+        data = json.load(f)
+        return data['description'], data['results']
+    except (ValueError, KeyError, TypeError), e:
+        raise ValueError("bad results file: %s" % e)
+
+def compare_results(old_results, new_results, threshold):
+    """Compare two sets of benchmark results.
+
+    old_results -- dict as returned by run_benchmarks() or read_results()
+    new_results -- dict as returned by run_benchmarks() or read_results()
+    threshold   -- float (eg 0.1 for 10%)
+
+    Compares the best time per operation for each benchmark present in both
+    sets of results.
+
+    Returns a list of tuples
+      (benchmark name, old time, new time, ratio, is_regression)
+
+    sorted by benchmark name; ratio is new time / old time, and
+    is_regression is true if ratio is greater than 1 + threshold.
+
+    If the two results for a benchmark have different numbers of units (eg,
+    because one was run with the smaller 'quick' workloads), ratio is None
+    and is_regression is false.
+
+    """
+    comparisons = []
+    for name in sorted(set(old_results) & set(new_results)):
+        old_time = old_results[name]['best_unit']
+        new_time = new_results[name]['best_unit']
+        if old_results[name]['units'] != new_results[name]['units']:
+            comparisons.append((name, old_time, new_time, None, False))
+            continue
+        if old_time > 0:
+            ratio = new_time / old_time
+        else:
+            ratio = 1.0
+        comparisons.append(
+            (name, old_time, new_time, ratio, ratio > 1.0 + threshold))
+    return comparisons
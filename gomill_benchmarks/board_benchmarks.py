@@ -0,0 +1,203 @@
+"""Benchmarks for boards.py"""
+
+import random
+
+from gomill import boards
+from gomill.common import opponent_of
+
+from gomill_benchmarks.benchmark_framework import Benchmark
+
+
+def _is_own_eye(board, row, col, colour):
+    """Check whether a point is surrounded by stones of the specified colour."""
+    side = board.side
+    for r, c in ((row-1, col), (row+1, col), (row, col-1), (row, col+1)):
+        if 0 <= r < side and 0 <= c < side and board.get(r, c) != colour:
+            return False
+    return True
+
+def _get_liberties(board, row, col, cache):
+    """Return the liberties of the chain containing the stone at (row, col).
+
+    cache -- dict, remembering results for the board's current position
+
+    Returns a set of points.
+
+    """
+    try:
+        return cache[row, col]
+    except KeyError:
+        pass
+    side = board.side
+    colour = board.get(row, col)
+    chain = set([(row, col)])
+    liberties = set()
+    to_visit = [(row, col)]
+    while to_visit:
+        r, c = to_visit.pop()
+        for point in ((r-1, c), (r+1, c), (r, c-1), (r, c+1)):
+            r1, c1 = point
+            if not (0 <= r1 < side and 0 <= c1 < side) or point in chain:
+                continue
+            contents = board.get(r1, c1)
+            if contents is None:
+                liberties.add(point)
+            elif contents == colour:
+                chain.add(point)
+                to_visit.append(point)
+    for point in chain:
+        cache[point] = liberties
+    return liberties
+
+def _is_self_capture(board, row, col, colour, liberty_cache):
+    """Check whether playing on an empty point would capture its own stone.
+
+    liberty_cache -- dict for _get_liberties()
+
+    """
+    side = board.side
+    neighbours = [(r, c) for (r, c)
+                  in ((row-1, col), (row+1, col), (row, col-1), (row, col+1))
+                  if 0 <= r < side and 0 <= c < side]
+    for r, c in neighbours:
+        if board.get(r, c) is None:
+            return False
+    for r, c in neighbours:
+        liberties = _get_liberties(board, r, c, liberty_cache)
+        has_other_liberty = (len(liberties) > 1 or
+                             (row, col) not in liberties)
+        if board.get(r, c) == colour:
+            if has_other_liberty:
+                return False
+        elif not has_other_liberty:
+            return False
+    return True
+
+def _occupied_neighbours(board, row, col):
+    """Return the neighbours of a point which have stones on them."""
+    side = board.side
+    return [(r, c) for (r, c)
+            in ((row-1, col), (row+1, col), (row, col-1), (row, col+1))
+            if 0 <= r < side and 0 <= c < side and board.get(r, c) is not None]
+
+def make_random_game(rnd, size):
+    """Play a random game, returning its moves.
+
+    rnd  -- random.Random
+    size -- board size
+
+    Returns a list of pairs (colour, move), with move a pair (row, col) or
+    None for a pass.
+
+    Each player chooses uniformly from the legal moves which don't fill one
+    of their own single-point eyes (not allowing self-capture or simple ko
+    violations), passing if there are none. The game ends after two
+    consecutive passes, or after size*size*3 moves.
+
+    This uses only Board methods which have been in gomill since its first
+    release, and finds self-captures itself rather than using legal_moves(),
+    so the games are the same whichever version of gomill is being measured.
+
+    """
+    board = boards.Board(size)
+    empty_points = list(board.board_points)
+    moves = []
+    colour = 'b'
+    ko_point = None
+    passes = 0
+    while passes < 2 and len(moves) < size * size * 3:
+        candidates = empty_points[:]
+        liberty_cache = {}
+        move = None
+        while candidates:
+            row, col = candidates.pop(rnd.randrange(len(candidates)))
+            if ((row, col) != ko_point and
+                not _is_own_eye(board, row, col, colour) and
+                not _is_self_capture(board, row, col, colour, liberty_cache)):
+                move = (row, col)
+                break
+        if move is not None:
+            neighbours = _occupied_neighbours(board, row, col)
+            ko_point = board.play(row, col, colour)
+            moves.append((colour, move))
+            empty_points.remove(move)
+            if any(board.get(r, c) is None for (r, c) in neighbours):
+                # stones were captured
+                empty_points = [(r, c) for (r, c) in board.board_points
+                                if board.get(r, c) is None]
+            passes = 0
+        else:
+            ko_point = None
+            moves.append((colour, None))
+            passes += 1
+        colour = opponent_of(colour)
+    return moves
+
+_random_game_cache = {}
+
+def make_random_games(seed, size, count):
+    """Make a list of random games, as returned by make_random_game().
+
+    Each game is generated from its own random.Random, seeded from 'seed' and
+    the game's index, so a shorter list is a prefix of a longer one.
+
+    The games are cached, as several benchmarks use the same games.
+
+    """
+    games = []
+    for i in xrange(count):
+        key = (seed, size, i)
+        try:
+            game = _random_game_cache[key]
+        except KeyError:
+            game = make_random_game(random.Random(seed * 100003 + i), size)
+            _random_game_cache[key] = game
+        games.append(game)
+    return games
+
+def replay_games(size, games):
+    """Play out a list of games on fresh boards, scoring the results."""
+    for moves in games:
+        board = boards.Board(size)
+        for colour, move in moves:
+            if move is not None:
+                board.play(move[0], move[1], colour)
+        board.area_score()
+
+def make_play_benchmark(size, count):
+    def setup():
+        return make_random_games(1, size, count)
+    def run(games):
+        replay_games(size, games)
+    return Benchmark("board_play_%dx%d" % (size, size),
+                     run, setup, units=count)
+
+def make_legal_moves_benchmark(size, count):
+    def setup():
+        return make_random_games(1, size, count)
+    def run(games):
+        for moves in games:
+            board = boards.Board(size)
+            for colour, move in moves:
+                board.legal_moves(colour)
+                if move is not None:
+                    board.play(move[0], move[1], colour)
+    return Benchmark("board_legal_moves_%dx%d" % (size, size),
+                     run, setup, units=count)
+
+def make_benchmarks(quick=False):
+    if quick:
+        count = 5
+    else:
+        count = 50
+    benchmarks = [
+        make_play_benchmark(9, count * 4),
+        make_play_benchmark(13, count * 2),
+        make_play_benchmark(19, count),
+        ]
+    if hasattr(boards.Board, 'legal_moves'):
+        benchmarks += [
+            make_legal_moves_benchmark(9, count // 5),
+            make_legal_moves_benchmark(19, count // 5),
+            ]
+    return benchmarks
@@ -0,0 +1,118 @@
+"""Benchmarks for GTP round-trips using gtp_controller.py"""
+
+import os
+import sys
+
+from gomill import gtp_controller
+from gomill import gtp_engine
+from gomill import gtp_states
+from gomill.common import format_vertex
+
+from gomill_benchmarks.benchmark_framework import Benchmark
+from gomill_benchmarks.board_benchmarks import make_random_games
+
+
+_gomill_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def make_command_list(seed, count):
+    """Make a list of GTP commands playing through random 19x19 games.
+
+    Returns a list of pairs (command, arguments).
+
+    """
+    commands = []
+    for moves in make_random_games(seed, 19, count):
+        commands.append(('boardsize', ["19"]))
+        commands.append(('clear_board', []))
+        commands.append(('komi', ["7.5"]))
+        for colour, move in moves:
+            commands.append(('play', [colour, format_vertex(move)]))
+    return commands
+
+def run_commands(controller, commands):
+    for command, arguments in commands:
+        controller.do_command(command, *arguments)
+
+def _genmove_pass(game_state, player):
+    result = gtp_states.Move_generator_result()
+    result.pass_move = True
+    return result
+
+def make_internal_engine():
+    """Return a Gtp_engine_protocol which keeps track of the board."""
+    gtp_state = gtp_states.Gtp_state(
+        move_generator=_genmove_pass, acceptable_sizes=(19,))
+    engine = gtp_engine.Gtp_engine_protocol()
+    engine.add_protocol_commands()
+    engine.add_commands(gtp_state.get_handlers())
+    return engine
+
+def make_internal_benchmark(count):
+    def setup():
+        channel = gtp_controller.Internal_gtp_channel(make_internal_engine())
+        controller = gtp_controller.Gtp_controller(channel, "internal")
+        return controller, make_command_list(1, count)
+    def run(arg):
+        controller, commands = arg
+        run_commands(controller, commands)
+    def teardown(arg):
+        controller, commands = arg
+        controller.close()
+    return Benchmark("gtp_internal_roundtrip", run, setup, teardown,
+                     units=count)
+
+def make_subprocess_controller(command):
+    """Return a Gtp_controller for an engine from the gomill tree.
+
+    command -- list of arguments to pass to the Python interpreter
+
+    """
+    env = os.environ.copy()
+    if env.get('PYTHONPATH'):
+        env['PYTHONPATH'] = _gomill_dir + os.pathsep + env['PYTHONPATH']
+    else:
+        env['PYTHONPATH'] = _gomill_dir
+    channel = gtp_controller.Subprocess_gtp_channel(
+        [sys.executable] + command, env=env)
+    return gtp_controller.Gtp_controller(channel, "subprocess")
+
+def make_subprocess_benchmark(count):
+    def setup():
+        controller = make_subprocess_controller(
+            [os.path.join(_gomill_dir, "gomill_examples", "gtp_test_player")])
+        return controller, make_command_list(1, count)
+    def run(arg):
+        controller, commands = arg
+        run_commands(controller, commands)
+    def teardown(arg):
+        controller, commands = arg
+        controller.close()
+    return Benchmark("gtp_subprocess_roundtrip", run, setup, teardown,
+                     units=count)
+
+def make_large_response_benchmark(count):
+    # showboard on a position part way through a game gives a response of
+    # about 1KB, over 22 lines.
+    def setup():
+        controller = make_subprocess_controller(
+            ["-m", "gomill_benchmarks.instant_gtp_player"])
+        run_commands(controller, make_command_list(1, 1)[:100])
+        return controller
+    def run(controller):
+        for i in xrange(count):
+            controller.do_command("showboard")
+    def teardown(controller):
+        controller.close()
+    return Benchmark("gtp_subprocess_large_response", run, setup, teardown,
+                     units=count)
+
+def make_benchmarks(quick=False):
+    if quick:
+        count = 2
+    else:
+        count = 10
+    return [
+        make_internal_benchmark(count),
+        make_subprocess_benchmark(count),
+        make_large_response_benchmark(count * 20),
+        ]
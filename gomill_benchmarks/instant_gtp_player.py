@@ -0,0 +1,77 @@
+"""GTP engine which chooses its moves almost instantly.
+
+This is used by ringmaster_benchmark to measure the ringmaster's own
+overhead.
+
+It plays random legal moves, resigning with a fixed probability at each move,
+so games are short and have varied results.
+
+"""
+
+import random
+import sys
+from optparse import OptionParser
+
+from gomill import gtp_engine
+from gomill import gtp_states
+
+
+class Instant_player(object):
+    """Player for use with gtp_state."""
+    def __init__(self, resign_probability, seed):
+        self.resign_probability = resign_probability
+        self.random = random.Random(seed)
+
+    def genmove(self, game_state, player):
+        result = gtp_states.Move_generator_result()
+        if self.random.random() < self.resign_probability:
+            result.resign = True
+            return result
+        choices = game_state.board.legal_moves(player, game_state.ko_point)
+        if choices:
+            result.move = self.random.choice(choices)
+        else:
+            result.pass_move = True
+        return result
+
+    def handle_name(self, args):
+        return "instant player"
+
+    def handle_version(self, args):
+        return ""
+
+    def get_handlers(self):
+        return {
+            'name'    : self.handle_name,
+            'version' : self.handle_version,
+            }
+
+def make_engine(player):
+    """Return a Gtp_engine_protocol which runs the specified player."""
+    gtp_state = gtp_states.Gtp_state(
+        move_generator=player.genmove,
+        acceptable_sizes=(9, 13, 19))
+    engine = gtp_engine.Gtp_engine_protocol()
+    engine.add_protocol_commands()
+    engine.add_commands(gtp_state.get_handlers())
+    engine.add_commands(player.get_handlers())
+    return engine
+
+def main(argv):
+    parser = OptionParser()
+    parser.add_option("--resign-p", type="float", default=0.1,
+                      help="probability of resigning at each move")
+    parser.add_option("--seed", type="int", default=None,
+                      help="random seed")
+    (options, args) = parser.parse_args(argv)
+    if args:
+        parser.error("too many arguments")
+    try:
+        player = Instant_player(options.resign_p, options.seed)
+        engine = make_engine(player)
+        gtp_engine.run_interactive_gtp_session(engine)
+    except (KeyboardInterrupt, gtp_engine.ControllerDisconnected):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
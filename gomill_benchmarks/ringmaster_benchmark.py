@@ -0,0 +1,336 @@
+"""Measure the ringmaster's own overhead per game.
+
+Run with
+  python -m gomill_benchmarks.ringmaster_benchmark [options]
+
+This runs competitions of each type using instant_gtp_player (which takes
+almost no time to choose its moves), in a temporary directory, and reports:
+  - games per second
+  - CPU time per game used by the manager (ringmaster) process
+  - mean time per game spent in Game_job.run (which runs in the workers, if
+    there are any)
+  - mean time per game spent in Ringmaster.process_response, and in the
+    write_status() call which it makes
+
+Each competition is run in several stages, each a separate ringmaster 'run'
+which continues from the status file left by the previous one, so you can see
+how the costs change as the number of stored results grows.
+
+"""
+
+from __future__ import with_statement
+
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from optparse import OptionParser
+
+from gomill import game_jobs
+from gomill import ringmasters
+
+from gomill_benchmarks import benchmark_framework
+
+
+_gomill_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_common_ctl = """
+competition_type = %(competition_type)r
+description = 'ringmaster benchmark'
+board_size = 9
+komi = 7.5
+move_limit = 200
+scorer = 'internal'
+record_games = %(record_games)r
+
+def instant_player(resign_p=0.1):
+    return Player(
+        [%(python)r, '-m', 'gomill_benchmarks.instant_gtp_player',
+         '--resign-p=%%f' %% resign_p],
+        environ={'PYTHONPATH' : %(gomill_dir)r},
+        games_per_engine=%(games_per_engine)d)
+"""
+
+competition_ctls = {
+
+'playoff' : """
+players = {
+    'p1' : instant_player(),
+    'p2' : instant_player(),
+    }
+matchups = [
+    Matchup('p1', 'p2'),
+    ]
+""",
+
+'allplayall' : """
+players = dict(('p%d' % i, instant_player()) for i in range(1, 7))
+competitors = sorted(players)
+""",
+
+'mc_tuner' : """
+players = {
+    'opp' : instant_player(),
+    }
+candidate_colour = 'w'
+opponent = 'opp'
+exploration_coefficient = 0.45
+initial_visits = 10
+initial_wins = 5
+parameters = [
+    Parameter('resign_p',
+              scale = LINEAR(0.05, 0.3),
+              split = 8,
+              format = "rp %.2f"),
+    ]
+def make_candidate(resign_p):
+    return instant_player(resign_p)
+""",
+
+'ce_tuner' : """
+players = {
+    'opp' : instant_player(),
+    }
+candidate_colour = 'w'
+opponent = 'opp'
+parameters = [
+    Parameter('resign_p',
+              initial_mean = 0.15,
+              initial_variance = 0.01,
+              transform = lambda f: min(max(f, 0.02), 0.5),
+              format = "rp %.2f"),
+    ]
+batch_size = 4
+samples_per_generation = 10
+number_of_generations = 1000
+elite_proportion = 0.2
+step_size = 0.8
+def make_candidate(resign_p):
+    return instant_player(resign_p)
+""",
+
+}
+
+competition_types = ['playoff', 'allplayall', 'mc_tuner', 'ce_tuner']
+
+
+class Timings(object):
+    """Times recorded by the instrumentation wrappers.
+
+    Public attributes:
+      job_times              -- list of floats (Game_job.run)
+      process_response_times -- list of floats
+      write_status_times     -- list of floats
+
+    """
+    def __init__(self):
+        self.job_times = []
+        self.process_response_times = []
+        self.write_status_times = []
+
+def install_instrumentation(timings):
+    """Wrap the methods we're interested in with timing code.
+
+    timings -- Timings
+
+    Returns a function which removes the wrappers.
+
+    Game_job.run usually runs in a worker process, so the time it takes is
+    sent back to the manager as an extra attribute of the job result.
+
+    """
+    original_run = game_jobs.Game_job.run
+    original_process_response = ringmasters.Ringmaster.process_response
+    original_write_status = ringmasters.Ringmaster.write_status
+
+    def run(self, worker_id=None):
+        start = time.time()
+        response = original_run(self, worker_id)
+        response.benchmark_job_time = time.time() - start
+        return response
+
+    def process_response(self, response):
+        timings.job_times.append(response.benchmark_job_time)
+        start = time.time()
+        original_process_response(self, response)
+        timings.process_response_times.append(time.time() - start)
+
+    def write_status(self):
+        start = time.time()
+        original_write_status(self)
+        timings.write_status_times.append(time.time() - start)
+
+    game_jobs.Game_job.run = run
+    ringmasters.Ringmaster.process_response = process_response
+    ringmasters.Ringmaster.write_status = write_status
+
+    def uninstall():
+        game_jobs.Game_job.run = original_run
+        ringmasters.Ringmaster.process_response = original_process_response
+        ringmasters.Ringmaster.write_status = original_write_status
+    return uninstall
+
+def _mean(l):
+    if not l:
+        return 0.0
+    return sum(l) / len(l)
+
+def _cpu_time():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+def run_stage(ctl_pathname, worker_count, games):
+    """Run one stage of a competition, continuing from any saved status.
+
+    worker_count -- int or None (None means run games in-process)
+    games        -- number of games to start
+
+    Returns a dict of measurements.
+
+    """
+    ringmaster = ringmasters.Ringmaster(ctl_pathname)
+    ringmaster.set_display_mode('quiet')
+    if ringmaster.status_file_exists():
+        ringmaster.load_status()
+    else:
+        ringmaster.set_clean_status()
+    ringmaster.set_parallel_worker_count(worker_count)
+    timings = Timings()
+    uninstall = install_instrumentation(timings)
+    try:
+        start_cpu = _cpu_time()
+        start = time.time()
+        ringmaster.run(games)
+        elapsed = time.time() - start
+        cpu = _cpu_time() - start_cpu
+    finally:
+        uninstall()
+    played = len(timings.process_response_times)
+    if played == 0:
+        raise RuntimeError("no games completed: see %s" %
+                           ringmaster.log_pathname)
+    return {
+        'games_played'              : played,
+        'games_per_second'          : played / elapsed,
+        'manager_cpu_per_game'      : cpu / played,
+        'job_run_per_game'          : _mean(timings.job_times),
+        'process_response_per_game' : _mean(timings.process_response_times),
+        'write_status_per_game'     : _mean(timings.write_status_times),
+        }
+
+def run_competition(competition_type, worker_count, games, stages,
+                    record_games, report, games_per_engine=1):
+    """Run the stages of a competition in a fresh directory.
+
+    Returns a list of dicts, as returned by run_stage() with an additional
+    'games_stored_before' entry.
+
+    """
+    dirname = tempfile.mkdtemp(prefix="gomill-benchmark-")
+    try:
+        ctl_pathname = os.path.join(dirname, "bench.ctl")
+        with open(ctl_pathname, "w") as f:
+            f.write(_common_ctl % {
+                'competition_type' : competition_type,
+                'record_games'     : record_games,
+                'python'           : sys.executable,
+                'gomill_dir'       : _gomill_dir,
+                'games_per_engine' : games_per_engine,
+                })
+            f.write(competition_ctls[competition_type])
+        results = []
+        stored = 0
+        for stage in xrange(stages):
+            result = run_stage(ctl_pathname, worker_count, games)
+            result['games_stored_before'] = stored
+            stored += result['games_played']
+            report(competition_type, worker_count, result)
+            results.append(result)
+        return results
+    finally:
+        shutil.rmtree(dirname)
+
+_header = ("%-11s %7s %7s %7s %8s %9s %9s %9s %9s" % (
+    "competition", "workers", "stored", "played", "games/s",
+    "mgr cpu", "job.run", "proc_resp", "wr_status"))
+
+def report_stage(competition_type, worker_count, result):
+    def ms(key):
+        return "%7.2fms" % (result[key] * 1000)
+    print "%-11s %7s %7d %7d %8.1f %9s %9s %9s %9s" % (
+        competition_type,
+        "-" if worker_count is None else worker_count,
+        result['games_stored_before'],
+        result['games_played'],
+        result['games_per_second'],
+        ms('manager_cpu_per_game'),
+        ms('job_run_per_game'),
+        ms('process_response_per_game'),
+        ms('write_status_per_game'))
+    sys.stdout.flush()
+
+def interpret_worker_counts(s):
+    """Interpret the --workers option.
+
+    Returns a list of ints or None (0 is returned as None, meaning in-process).
+
+    """
+    result = []
+    for item in s.split(","):
+        n = int(item)
+        if n < 0:
+            raise ValueError
+        result.append(n or None)
+    return result
+
+
+_description = """\
+Run competitions using near-instant players, and report the ringmaster's
+overhead per game.
+"""
+
+def main(argv):
+    parser = OptionParser(usage="%prog [options] [competition type] ...",
+                          description=_description)
+    parser.add_option("--workers", default="0,1,4", metavar="N,N,...",
+                      help="worker counts to try; 0 means in-process "
+                           "(default 0,1,4)")
+    parser.add_option("--games", type="int", default=100,
+                      help="games per stage (default 100)")
+    parser.add_option("--stages", type="int", default=3,
+                      help="number of stages (default 3)")
+    parser.add_option("--record-games", action="store_true",
+                      help="write SGF files")
+    parser.add_option("--games-per-engine", type="int", default=1,
+                      metavar="N",
+                      help="reuse each engine for up to N games (default 1)")
+    parser.add_option("-o", "--output", metavar="FILE",
+                      help="write results as JSON to FILE")
+    (options, args) = parser.parse_args(argv)
+    try:
+        worker_counts = interpret_worker_counts(options.workers)
+    except ValueError:
+        parser.error("bad --workers value")
+    for arg in args:
+        if arg not in competition_types:
+            parser.error("unknown competition type: %s" % arg)
+    types = args or competition_types
+    print _header
+    all_results = {}
+    for competition_type in types:
+        for worker_count in worker_counts:
+            results = run_competition(
+                competition_type, worker_count, options.games,
+                options.stages, bool(options.record_games), report_stage,
+                options.games_per_engine)
+            for stage, result in enumerate(results):
+                all_results["%s/%s/%d" % (
+                    competition_type, worker_count or 0, stage)] = result
+    if options.output is not None:
+        with open(options.output, "w") as f:
+            benchmark_framework.write_results(f, all_results)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
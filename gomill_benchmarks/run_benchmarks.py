@@ -0,0 +1,126 @@
+"""Run the gomill benchmarks, or compare two sets of results.
+
+Run with
+  python -m gomill_benchmarks.run_benchmarks [options] [benchmark ...]
+  python -m gomill_benchmarks.run_benchmarks --compare OLD NEW
+
+"""
+
+import sys
+from optparse import OptionParser
+
+from gomill_benchmarks import benchmark_framework
+
+benchmark_modules = [
+    'board_benchmarks',
+    'sgf_benchmarks',
+    'gtp_benchmarks',
+    ]
+
+def get_benchmark_module(name):
+    """Import the specified gomill_benchmarks module and return it."""
+    dotted_name = "gomill_benchmarks." + name
+    __import__(dotted_name)
+    return sys.modules[dotted_name]
+
+def get_benchmarks(quick):
+    """Return a list of all the Benchmarks."""
+    result = []
+    for module_name in benchmark_modules:
+        mdl = get_benchmark_module(module_name)
+        result += mdl.make_benchmarks(quick)
+    return result
+
+def report_result(benchmark, result):
+    print "%-28s %9.4fs  %9.3fms per op (best of %d)" % (
+        benchmark.name, result['best'], result['best_unit'] * 1000,
+        len(result['times']))
+    sys.stdout.flush()
+
+def do_run(parser, options, args):
+    benchmarks = get_benchmarks(options.quick)
+    if args:
+        known = set(benchmark.name for benchmark in benchmarks)
+        for name in args:
+            if name not in known:
+                parser.error("unknown benchmark: %s" % name)
+        benchmarks = [benchmark for benchmark in benchmarks
+                      if benchmark.name in args]
+    results = benchmark_framework.run_benchmarks(
+        benchmarks, options.repeat, report_result)
+    if options.output is not None:
+        f = open(options.output, "w")
+        try:
+            benchmark_framework.write_results(
+                f, results, options.description)
+        finally:
+            f.close()
+
+def read_results_file(parser, pathname):
+    try:
+        f = open(pathname)
+        try:
+            return benchmark_framework.read_results(f)
+        finally:
+            f.close()
+    except EnvironmentError, e:
+        parser.error("can't read %s: %s" % (pathname, e))
+    except ValueError, e:
+        parser.error("%s: %s" % (pathname, e))
+
+def do_compare(parser, options, args):
+    if len(args) != 2:
+        parser.error("--compare needs two results files")
+    old_description, old_results = read_results_file(parser, args[0])
+    new_description, new_results = read_results_file(parser, args[1])
+    if old_description:
+        print "old: %s" % old_description
+    if new_description:
+        print "new: %s" % new_description
+    comparisons = benchmark_framework.compare_results(
+        old_results, new_results, options.threshold)
+    regressions = 0
+    for name, old_time, new_time, ratio, is_regression in comparisons:
+        if ratio is None:
+            print "%-28s %9.3fms %9.3fms  (different workloads)" % (
+                name, old_time * 1000, new_time * 1000)
+            continue
+        if is_regression:
+            regressions += 1
+            flag = "  REGRESSION"
+        else:
+            flag = ""
+        print "%-28s %9.3fms %9.3fms %7.2fx%s" % (
+            name, old_time * 1000, new_time * 1000, ratio, flag)
+    if regressions:
+        print "%d regression(s) beyond %d%%" % (
+            regressions, options.threshold * 100)
+        sys.exit(1)
+
+def main(argv):
+    parser = OptionParser(
+        usage="%prog [options] [benchmark] ...\n"
+              "       %prog --compare [options] <old.json> <new.json>")
+    parser.add_option("-o", "--output", metavar="FILE",
+                      help="write results as JSON to FILE")
+    parser.add_option("-d", "--description",
+                      help="description to store with the results")
+    parser.add_option("-r", "--repeat", type="int", default=5,
+                      help="number of timed runs (default 5)")
+    parser.add_option("-q", "--quick", action="store_true",
+                      help="use smaller workloads")
+    parser.add_option("-c", "--compare", action="store_true",
+                      help="compare two results files")
+    parser.add_option("-t", "--threshold", type="float", default=0.1,
+                      help="slowdown to report as a regression, "
+                           "as a fraction (default 0.1)")
+    (options, args) = parser.parse_args(argv)
+    if options.repeat < 1:
+        parser.error("--repeat must be at least 1")
+    if options.compare:
+        do_compare(parser, options, args)
+    else:
+        do_run(parser, options, args)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
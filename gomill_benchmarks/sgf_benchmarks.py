@@ -0,0 +1,156 @@
+"""Benchmarks for sgf.py and sgf_grammar.py"""
+
+import random
+from cStringIO import StringIO
+
+from gomill import sgf
+from gomill import sgf_grammar
+
+from gomill_benchmarks.benchmark_framework import Benchmark, accepts_argument
+from gomill_benchmarks.board_benchmarks import make_random_games
+
+
+def make_sgf_game(rnd, game_number, moves, variation_count=1):
+    """Make an Sgf_game from a list of moves from make_random_game().
+
+    Adds some root properties, occasional comments, and a short variation.
+
+    If variation_count is more than 1, adds that many variations (each a
+    sequence of ten moves, as in a reviewed game) at points spread through
+    the game.
+
+    """
+    sgf_game = sgf.Sgf_game(19)
+    root = sgf_game.get_root()
+    root.set('PB', "player %d" % (game_number % 7))
+    root.set('PW', "player %d" % (game_number % 5))
+    root.set('KM', 7.5)
+    root.set('RE', rnd.choice(["B+R", "W+R", "B+3.5", "W+12.5"]))
+    node = root
+    branch_point = None
+    for i, (colour, move) in enumerate(moves):
+        node = node.new_child()
+        node.set_move(colour, move)
+        if rnd.random() < 0.05:
+            node.add_comment_text("comment on move %d: [%s]" % (i, move))
+        if i == len(moves) // 2:
+            branch_point = node
+    if variation_count > 1:
+        main_sequence = sgf_game.get_main_sequence()
+        for i in range(variation_count):
+            node = rnd.choice(main_sequence[:-10])
+            node.add_comment_text("variation %d" % i)
+            for colour, move in rnd.sample(moves, 10):
+                node = node.new_child()
+                node.set_move(colour, move)
+    elif branch_point is not None:
+        variation = branch_point.new_child()
+        variation.set_move('w', (0, 0))
+        variation.add_comment_text("variation")
+    return sgf_game
+
+def make_sgf_games(seed, count, variation_count=1):
+    """Make a list of Sgf_games based on random 19x19 games."""
+    rnd = random.Random(seed)
+    return [make_sgf_game(rnd, i, moves, variation_count)
+            for (i, moves) in enumerate(make_random_games(seed, 19, count))]
+
+def make_collection(seed, count, variation_count=1):
+    """Make a string containing an SGF collection of random games."""
+    sgf_games = make_sgf_games(seed, count, variation_count)
+    return "".join(sgf_game.serialise() for sgf_game in sgf_games)
+
+def make_tokenise_benchmark(count):
+    def setup():
+        return make_collection(1, count)
+    def run(s):
+        position = 0
+        while position < len(s):
+            tokens, position = sgf_grammar.tokenise(s, position)
+            if not tokens:
+                break
+    return Benchmark("sgf_tokenise", run, setup, units=count)
+
+def make_parse_benchmark(count):
+    def setup():
+        return make_collection(1, count)
+    def run(s):
+        for coarse_game in sgf_grammar.parse_sgf_collection(s):
+            sgf_game = sgf.Sgf_game.from_coarse_game_tree(coarse_game)
+            for node in sgf_game.get_main_sequence():
+                node.get_move()
+    return Benchmark("sgf_parse_collection", run, setup, units=count)
+
+def make_grammar_parse_benchmark(count):
+    def setup():
+        return make_collection(1, count)
+    def run(s):
+        sgf_grammar.parse_sgf_collection(s)
+    return Benchmark("sgf_grammar_parse", run, setup, units=count)
+
+def make_lazy_parse_benchmark(count):
+    def setup():
+        return make_collection(1, count)
+    def run(s):
+        sgf_grammar.parse_sgf_collection(s, lazy=True)
+    return Benchmark("sgf_grammar_parse_lazy", run, setup, units=count)
+
+def make_node_get_benchmark(count):
+    def setup():
+        sgf_game = make_sgf_games(1, 1)[0]
+        for node in sgf_game.get_main_sequence():
+            if not node.has_property('C'):
+                node.add_comment_text("comment")
+        return sgf_game.get_main_sequence()[1:]
+    def run(nodes):
+        for i in xrange(count):
+            for node in nodes:
+                node.get('C')
+                node.get('B' if node.has_property('B') else 'W')
+    return Benchmark("sgf_node_get", run, setup, units=count)
+
+def make_variations_parse_benchmark(count):
+    def setup():
+        return make_collection(1, count, variation_count=20)
+    def run(s):
+        sgf_grammar.parse_sgf_collection(s)
+    return Benchmark("sgf_grammar_parse_variations", run, setup, units=count)
+
+def make_main_line_parse_benchmark(count):
+    def setup():
+        return make_collection(1, count, variation_count=20)
+    def run(s):
+        for game in sgf_grammar.iter_sgf_collection(StringIO(s),
+                                                    main_line_only=True):
+            pass
+    return Benchmark("sgf_main_line_parse", run, setup, units=count)
+
+def make_serialise_benchmark(count):
+    def setup():
+        return make_sgf_games(1, count)
+    def run(sgf_games):
+        for sgf_game in sgf_games:
+            sgf_game.serialise()
+    return Benchmark("sgf_serialise", run, setup, units=count)
+
+def make_benchmarks(quick=False):
+    if quick:
+        count = 5
+    else:
+        count = 50
+    benchmarks = [
+        make_tokenise_benchmark(count),
+        make_grammar_parse_benchmark(count),
+        ]
+    if accepts_argument(sgf_grammar.parse_sgf_collection, 'lazy'):
+        benchmarks.append(make_lazy_parse_benchmark(count))
+    benchmarks.append(make_variations_parse_benchmark(count))
+    if (hasattr(sgf_grammar, 'iter_sgf_collection') and
+        accepts_argument(sgf_grammar.iter_sgf_collection, 'main_line_only')):
+        benchmarks.append(make_main_line_parse_benchmark(count))
+    benchmarks += [
+        make_parse_benchmark(count),
+        make_node_get_benchmark(count),
+        make_serialise_benchmark(count),
+        ]
+    return benchmarks
@@ -0,0 +1,98 @@
+"""Make an index of the SGF files in a directory tree.
+
+This demonstrates sgf.scan_sgf_file(), which reads only the root node of each
+game, using a pool of worker processes.
+
+"""
+
+import multiprocessing
+import os
+import sys
+from optparse import OptionParser
+
+from gomill import sgf
+
+_fields = ['PB', 'PW', 'RE', 'KM', 'SZ', 'HA', 'DT', 'RU']
+
+def find_sgf_files(dirname):
+    for dirpath, dirnames, filenames in os.walk(dirname):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith(".sgf"):
+                yield os.path.join(dirpath, filename)
+
+def scan_file(args):
+    """Scan a single file (this runs in a worker process).
+
+    Returns a pair (Sgf_file_summary or None, error message or None).
+
+    """
+    pathname, count_moves = args
+    try:
+        return sgf.scan_sgf_file(pathname, count_moves), None
+    except (ValueError, EnvironmentError), e:
+        return None, "%s: %s" % (pathname, e)
+
+def describe_summary(summary):
+    """Return a list of strings describing an Sgf_file_summary."""
+    root = summary.get_root_game().get_root()
+    result = [summary.pathname]
+    for identifier in _fields:
+        try:
+            value = root.get(identifier)
+        except (KeyError, ValueError):
+            value = ""
+        if isinstance(value, unicode):
+            value = value.encode("utf-8")
+        result.append(str(value).replace("\t", " ").replace("\n", " "))
+    if summary.move_count is not None:
+        result.append(str(summary.move_count))
+    return result
+
+def index_sgf_files(dirname, processes, count_moves):
+    pool = multiprocessing.Pool(processes)
+    try:
+        jobs = ((pathname, count_moves)
+                for pathname in find_sgf_files(dirname))
+        for summary, error in pool.imap(scan_file, jobs, chunksize=64):
+            if error is not None:
+                print >>sys.stderr, error
+                continue
+            try:
+                description = describe_summary(summary)
+            except ValueError, e:
+                print >>sys.stderr, "%s: %s" % (summary.pathname, e)
+                continue
+            print "\t".join(description)
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+_description = """\
+Print a tab-separated line for each SGF file in a directory tree, showing the
+main root properties.
+"""
+
+def main(argv):
+    parser = OptionParser(usage="%prog [options] <directory>",
+                          description=_description)
+    parser.add_option("--processes", "-j", type="int",
+                      help="number of worker processes (default one per CPU)")
+    parser.add_option("--count-moves", action="store_true",
+                      help="show the number of moves in each game")
+    opts, args = parser.parse_args(argv)
+    if not args:
+        parser.error("not enough arguments")
+    if len(args) > 1:
+        parser.error("too many arguments")
+    if opts.processes is not None and opts.processes < 1:
+        parser.error("--processes must be at least 1")
+    try:
+        index_sgf_files(args[0], opts.processes, opts.count_moves)
+    except Exception, e:
+        print >>sys.stderr, "index_sgf_files:", str(e)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
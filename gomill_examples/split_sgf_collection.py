@@ -12,22 +12,27 @@ from gomill import sgf_grammar
 from gomill import sgf
 
 def split_sgf_collection(pathname):
-    f = open(pathname)
-    sgf_src = f.read()
-    f.close()
     dirname, basename = os.path.split(pathname)
     root, ext = os.path.splitext(basename)
-    try:
-        coarse_games = sgf_grammar.parse_sgf_collection(sgf_src)
-    except ValueError, e:
-        raise StandardError("error parsing file: %s" % e)
-    for i, coarse_game in enumerate(coarse_games):
+    # Games are parsed one at a time, so the collection needn't fit in memory
+    games = sgf_grammar.iter_sgf_collection(pathname)
+    i = 0
+    while True:
+        try:
+            _, _, coarse_game = games.next()
+        except StopIteration:
+            break
+        except ValueError, e:
+            raise StandardError("error parsing file: %s" % e)
+        i += 1
         sgf_game = sgf.Sgf_game.from_coarse_game_tree(coarse_game)
         sgf_game.get_root().add_comment_text(
-            "Split from %s (game %d)" % (basename, i+1))
-        split_pathname = os.path.join(dirname, "%s_%d%s" % (root, i+1, ext))
+            "Split from %s (game %d)" % (basename, i))
+        split_pathname = os.path.join(dirname, "%s_%d%s" % (root, i, ext))
         with open(split_pathname, "wb") as f:
             f.write(sgf_game.serialise())
+    if i == 0:
+        raise StandardError("error parsing file: no SGF data found")
 
 
 _description = """\
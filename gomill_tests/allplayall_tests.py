@@ -220,7 +220,7 @@ def test_play(tc):
     fx.check_short_report(expected_grid, expected_matchups, expected_players)
 
     avb_results = fx.comp.get_tournament_results().get_matchup_results('AvB')
-    tc.assertEqual(avb_results, [response1.game_result])
+    tc.assertGameResultListEqual(avb_results, [response1.game_result])
 
 def test_play_many(tc):
     config = default_config()
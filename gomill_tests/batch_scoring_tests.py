@@ -0,0 +1,72 @@
+"""Tests for batch_scoring.py"""
+
+import random
+
+from gomill import ascii_boards
+from gomill import boards
+
+from gomill_tests import gomill_test_support
+from gomill_tests import board_test_data
+
+try:
+    from gomill import batch_scoring
+except ImportError:
+    batch_scoring = None
+
+def make_tests(suite):
+    suite.addTests(gomill_test_support.make_simple_tests(globals()))
+
+def check_available(tc):
+    if batch_scoring is None:
+        tc.skipTest("numpy not available")
+
+def random_board(rnd, size, density):
+    b = boards.Board(size)
+    for row, col in b.board_points:
+        if rnd.random() < density:
+            b.play(row, col, rnd.choice('bw'))
+    return b
+
+def test_stack_boards(tc):
+    check_available(tc)
+    b1 = boards.Board(5)
+    b1.play(0, 0, 'b')
+    b1.play(4, 3, 'w')
+    b2 = boards.Board(5)
+    b2.play(2, 1, 'w')
+    positions = batch_scoring.stack_boards([b1, b2])
+    tc.assertEqual(positions.shape, (2, 5, 5))
+    tc.assertEqual(positions[0, 0, 0], batch_scoring.BLACK)
+    tc.assertEqual(positions[0, 4, 3], batch_scoring.WHITE)
+    tc.assertEqual(positions[1, 2, 1], batch_scoring.WHITE)
+    tc.assertEqual(positions.sum(), 1 + 2 + 2)
+    tc.assertRaisesRegexp(ValueError, "no boards",
+                          batch_scoring.stack_boards, [])
+    tc.assertRaisesRegexp(ValueError, "different sizes",
+                          batch_scoring.stack_boards, [b1, boards.Board(7)])
+
+def test_area_scores(tc):
+    check_available(tc)
+    board_list = [ascii_boards.interpret_diagram(diagram, 9)
+                  for (code, diagram, score) in board_test_data.score_tests]
+    scores = batch_scoring.area_scores(batch_scoring.stack_boards(board_list))
+    tc.assertEqual(list(scores),
+                   [score for (code, diagram, score)
+                    in board_test_data.score_tests])
+
+def test_area_scores_random(tc):
+    check_available(tc)
+    rnd = random.Random(3)
+    for size in (2, 5, 9, 19):
+        board_list = [random_board(rnd, size, rnd.random())
+                      for i in xrange(20)]
+        scores = batch_scoring.area_scores(
+            batch_scoring.stack_boards(board_list))
+        tc.assertEqual(list(scores), [b.area_score() for b in board_list])
+
+def test_area_scores_bad_shape(tc):
+    check_available(tc)
+    tc.assertRaisesRegexp(ValueError, "wrong shape",
+                          batch_scoring.area_scores, [[0, 1], [1, 0]])
+    tc.assertRaisesRegexp(ValueError, "wrong shape",
+                          batch_scoring.area_scores, [[[0, 1, 0], [1, 0, 0]]])
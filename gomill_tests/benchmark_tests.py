@@ -0,0 +1,63 @@
+"""Tests for the gomill_benchmarks suite."""
+
+from __future__ import with_statement
+
+from gomill_benchmarks import benchmark_framework
+from gomill_benchmarks import board_benchmarks
+from gomill_benchmarks import sgf_benchmarks
+
+from gomill_tests import gomill_test_support
+
+def make_tests(suite):
+    suite.addTests(gomill_test_support.make_simple_tests(globals()))
+
+
+def test_accepts_argument(tc):
+    def fn(s, lazy=False):
+        pass
+    tc.assertTrue(benchmark_framework.accepts_argument(fn, 'lazy'))
+    tc.assertFalse(benchmark_framework.accepts_argument(fn, 'main_line_only'))
+    tc.assertFalse(benchmark_framework.accepts_argument(len, 'lazy'))
+
+def _benchmark_names(module):
+    return [benchmark.name for benchmark in module.make_benchmarks(quick=True)]
+
+def test_optional_benchmarks(tc):
+    tc.assertIn('board_legal_moves_9x9', _benchmark_names(board_benchmarks))
+    sgf_names = _benchmark_names(sgf_benchmarks)
+    tc.assertIn('sgf_grammar_parse_lazy', sgf_names)
+    tc.assertIn('sgf_main_line_parse', sgf_names)
+
+def test_benchmarks_for_older_gomill(tc):
+    # Stand-ins for modules from a gomill release which doesn't have
+    # Board.legal_moves(), lazy parsing, or iter_sgf_collection().
+    class Old_board(object):
+        def __init__(self, side):
+            pass
+    class Old_boards_module(object):
+        Board = Old_board
+    class Old_sgf_grammar_module(object):
+        @staticmethod
+        def parse_sgf_collection(s):
+            pass
+    def restore(module, name, value):
+        setattr(module, name, value)
+    tc.addCleanup(restore, board_benchmarks, 'boards', board_benchmarks.boards)
+    tc.addCleanup(restore, sgf_benchmarks, 'sgf_grammar',
+                  sgf_benchmarks.sgf_grammar)
+    board_benchmarks.boards = Old_boards_module
+    sgf_benchmarks.sgf_grammar = Old_sgf_grammar_module
+
+    tc.assertEqual(_benchmark_names(board_benchmarks), [
+        'board_play_9x9',
+        'board_play_13x13',
+        'board_play_19x19',
+        ])
+    tc.assertEqual(_benchmark_names(sgf_benchmarks), [
+        'sgf_tokenise',
+        'sgf_grammar_parse',
+        'sgf_grammar_parse_variations',
+        'sgf_parse_collection',
+        'sgf_node_get',
+        'sgf_serialise',
+        ])
@@ -7,7 +7,10 @@ ascii_boards facilities.
 
 from __future__ import with_statement
 
-from gomill.common import format_vertex, move_from_vertex
+import random
+from textwrap import dedent
+
+from gomill.common import format_vertex, move_from_vertex, opponent_of
 from gomill import ascii_boards
 from gomill import boards
 
@@ -169,6 +172,197 @@ def test_apply_setup_range_checks(tc):
     tc.assertEqual(b, boards.Board(9))
 
 
+def test_zobrist_hash(tc):
+    b1 = boards.Board(9)
+    tc.assertEqual(b1.get_zobrist_hash(), 0)
+    b1.play(2, 3, 'b')
+    h1 = b1.get_zobrist_hash()
+    tc.assertNotEqual(h1, 0)
+    b1.play(3, 4, 'w')
+    b2 = boards.Board(9)
+    b2.apply_setup([(2, 3)], [(3, 4)], [])
+    tc.assertEqual(b1.get_zobrist_hash(), b2.get_zobrist_hash())
+    b3 = b2.copy()
+    tc.assertEqual(b3.get_zobrist_hash(), b2.get_zobrist_hash())
+    b3.apply_setup([], [], [(3, 4)])
+    tc.assertEqual(b3.get_zobrist_hash(), h1)
+    # capturing restores the hash of the earlier position
+    b4 = boards.Board(9)
+    b4.play(0, 0, 'w')
+    b4.play(0, 1, 'b')
+    b4.play(1, 0, 'b')
+    b5 = boards.Board(9)
+    b5.apply_setup([(0, 1), (1, 0)], [], [])
+    tc.assertEqual(b4.get_zobrist_hash(), b5.get_zobrist_hash())
+
+def test_chain_tracking(tc):
+    # Play out seeded random games, checking the incrementally-maintained
+    # chains against a full recalculation after every move.
+    rnd = random.Random(3)
+    for size in (2, 3, 5, 9):
+        b = boards.Board(size)
+        colour = 'b'
+        for i in xrange(size * size * 6):
+            empties = [pt for pt in b.board_points if b.get(*pt) is None]
+            if not empties:
+                break
+            row, col = rnd.choice(empties)
+            b.play(row, col, colour)
+            b._check_consistent()
+            colour = opponent_of(colour)
+        b2 = b.copy()
+        b2._check_consistent()
+
+
+def test_undo(tc):
+    # Play out seeded random games (with a setup partway through), then undo
+    # back to the start, checking each position is restored.
+    rnd = random.Random(4)
+    for size in (2, 3, 5, 9):
+        b = boards.Board(size, keep_undo_journal=True)
+        history = []
+        colour = 'b'
+        for i in xrange(size * size * 6):
+            history.append((b.copy(), b.get_zobrist_hash(), b.is_empty()))
+            if i == size * size * 3:
+                b.apply_setup([(0, 0)], [(0, 1), (1, 0)], [(size-1, size-1)])
+                continue
+            empties = [pt for pt in b.board_points if b.get(*pt) is None]
+            if not empties:
+                break
+            row, col = rnd.choice(empties)
+            b.play(row, col, colour)
+            colour = opponent_of(colour)
+        while history:
+            expected, expected_hash, expected_is_empty = history.pop()
+            b.undo()
+            b._check_consistent()
+            tc.assertEqual(b, expected)
+            tc.assertEqual(b.get_zobrist_hash(), expected_hash)
+            tc.assertIs(b.is_empty(), expected_is_empty)
+        tc.assertRaisesRegexp(ValueError, "nothing to undo", b.undo)
+
+def test_undo_self_capture(tc):
+    b = boards.Board(9, keep_undo_journal=True)
+    b.play(0, 1, 'b')
+    b.play(1, 0, 'b')
+    b2 = b.copy()
+    b.play(0, 0, 'w')
+    tc.assertEqual(b, b2)
+    b.undo()
+    tc.assertEqual(b, b2)
+    b.play(0, 0, 'w')
+    b.undo()
+    b._check_consistent()
+    b.undo()
+    b.undo()
+    tc.assertEqual(b, boards.Board(9))
+    tc.assertRaises(ValueError, b.undo)
+    tc.assertRaises(ValueError, b2.undo)
+
+def test_checkpoint(tc):
+    b = boards.Board(9, keep_undo_journal=True)
+    b.play(2, 3, 'b')
+    b1 = b.copy()
+    checkpoint = b.checkpoint()
+    b.play(3, 4, 'w')
+    b.apply_setup([(5, 5)], [], [])
+    b.play(4, 4, 'b')
+    tc.assertNotEqual(b, b1)
+    b.restore(checkpoint)
+    tc.assertEqual(b, b1)
+    b.play(6, 6, 'w')
+    b._check_consistent()
+    b.restore(0)
+    tc.assertEqual(b, boards.Board(9))
+    tc.assertIs(b.is_empty(), True)
+    tc.assertRaisesRegexp(ValueError, "invalid checkpoint",
+                          b.restore, checkpoint)
+
+def test_undo_journal_disabled(tc):
+    b = boards.Board(9)
+    b.play(2, 3, 'b')
+    b.apply_setup([(5, 5)], [], [])
+    tc.assertIsNone(b._journal)
+    tc.assertRaisesRegexp(ValueError, "board has no undo journal", b.undo)
+    tc.assertRaisesRegexp(ValueError, "board has no undo journal",
+                          b.checkpoint)
+    tc.assertRaisesRegexp(ValueError, "invalid checkpoint", b.restore, 0)
+
+    # copy() keeps the original's setting unless told otherwise
+    tc.assertRaises(ValueError, b.copy().undo)
+    b2 = b.copy(keep_undo_journal=True)
+    b2.play(4, 4, 'w')
+    b2.undo()
+    tc.assertEqual(b2, b)
+    tc.assertRaisesRegexp(ValueError, "nothing to undo", b2.undo)
+    b3 = b2.copy()
+    b3.play(4, 4, 'w')
+    b3.undo()
+    tc.assertRaises(ValueError, b2.copy(keep_undo_journal=False).undo)
+
+def test_is_legal(tc):
+    b = ascii_boards.interpret_diagram(dedent("""\
+    9  .  .  .  .  .  .  .  .  .
+    8  .  .  .  .  .  .  .  .  .
+    7  .  .  .  .  .  .  .  .  .
+    6  .  .  .  #  o  .  .  .  .
+    5  .  .  #  o  .  o  .  .  .
+    4  .  .  .  #  o  .  .  .  .
+    3  .  .  .  .  .  .  .  .  .
+    2  #  #  .  .  .  .  .  .  .
+    1  .  o  #  .  .  .  .  .  .
+       A  B  C  D  E  F  G  H  J
+    """), 9)
+    e5 = move_from_vertex('E5', 9)
+    a1 = move_from_vertex('A1', 9)
+    tc.assertIs(b.is_legal(4, 4, 'b'), True)
+    tc.assertIs(b.is_legal(4, 4, 'b', ko_point=e5), False)
+    tc.assertIs(b.is_legal(4, 4, 'w'), True)
+    tc.assertIs(b.is_legal(0, 0, 'w'), False)
+    tc.assertIs(b.is_legal(0, 0, 'w', allow_self_capture=True), True)
+    tc.assertIs(b.is_legal(0, 0, 'b'), True)
+    tc.assertIs(b.is_legal(0, 1, 'b'), False)
+    tc.assertIs(b.is_legal(0, 1, 'b', allow_self_capture=True), False)
+    tc.assertRaises(IndexError, b.is_legal, 9, 0, 'b')
+    tc.assertRaises(ValueError, b.is_legal, 0, 0, None)
+    tc.assertIn(e5, b.legal_moves('b'))
+    tc.assertNotIn(e5, b.legal_moves('b', e5))
+    tc.assertIn(a1, b.legal_moves('b'))
+    tc.assertNotIn(a1, b.legal_moves('w'))
+    tc.assertIn(a1, b.legal_moves('w', allow_self_capture=True))
+
+def test_legal_moves(tc):
+    # Compare with the results of playing each move on a copy of the board.
+    rnd = random.Random(5)
+    for size in (2, 3, 5, 9):
+        b = boards.Board(size)
+        colour = 'b'
+        ko_point = None
+        for i in xrange(size * size * 4):
+            expected = []
+            expected_with_self_capture = []
+            for row, col in b.board_points:
+                if b.get(row, col) is not None or (row, col) == ko_point:
+                    continue
+                expected_with_self_capture.append((row, col))
+                b2 = b.copy()
+                b2.play(row, col, colour)
+                if b2.get(row, col) is not None:
+                    expected.append((row, col))
+            legal_moves = b.legal_moves(colour, ko_point)
+            tc.assertEqual(legal_moves, expected)
+            tc.assertEqual(b.legal_moves(colour, ko_point, True),
+                           expected_with_self_capture)
+            for row, col in b.board_points:
+                tc.assertIs(b.is_legal(row, col, colour, ko_point),
+                            (row, col) in expected)
+            if not legal_moves:
+                break
+            row, col = rnd.choice(legal_moves)
+            ko_point = b.play(row, col, colour)
+            colour = opponent_of(colour)
+
 class Play_test_TestCase(gomill_test_support.Gomill_ParameterisedTestCase):
     """Check final position reached by playing a sequence of moves."""
     test_name = "play_test"
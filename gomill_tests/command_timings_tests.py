@@ -0,0 +1,82 @@
+"""Tests for command_timings.py"""
+
+from __future__ import with_statement
+
+import json
+
+from gomill import command_timings
+from gomill.command_timings import Command_timings
+
+from gomill_tests import gomill_test_support
+
+def make_tests(suite):
+    suite.addTests(gomill_test_support.make_simple_tests(globals()))
+
+
+def test_summary(tc):
+    timings = Command_timings()
+    tc.assertTrue(timings.is_empty())
+    for i in xrange(1, 101):
+        timings.record('genmove', i / 100.0)
+    timings.record('play', 0.0)
+    timings.record('play', 0.002)
+    tc.assertFalse(timings.is_empty())
+    tc.assertEqual(timings.get_commands(), ['genmove', 'play'])
+    summary = timings.get_summary('genmove')
+    tc.assertEqual(summary.count, 100)
+    tc.assertAlmostEqual(summary.total, 50.5)
+    tc.assertAlmostEqual(summary.mean, 0.505)
+    tc.assertEqual(summary.max, 1.0)
+    # Percentiles may be slightly too high, but never below the true value
+    tc.assertTrue(0.50 <= summary.p50 <= 0.50 * 1.1, summary.p50)
+    tc.assertTrue(0.95 <= summary.p95 <= 1.0, summary.p95)
+    tc.assertTrue(0.99 <= summary.p99 <= 1.0, summary.p99)
+    summary = timings.get_summary('play')
+    tc.assertEqual(summary.count, 2)
+    tc.assertEqual(summary.p99, 0.002)
+    tc.assertTrue(summary.p50 <= 1e-5)
+    tc.assertEqual(sorted(summary.as_dict()),
+                   ['count', 'max', 'mean', 'p50', 'p95', 'p99', 'total'])
+    tc.assertRaises(KeyError, timings.get_summary, 'quit')
+
+def test_merge(tc):
+    timings1 = Command_timings()
+    timings1.record('genmove', 2.0)
+    timings1.record('play', 0.01)
+    timings2 = Command_timings()
+    timings2.record('genmove', 3.0)
+    timings2.record('quit', 0.01)
+    timings1.merge(timings2)
+    tc.assertEqual(timings1.get_commands(), ['genmove', 'play', 'quit'])
+    summary = timings1.get_summary('genmove')
+    tc.assertEqual(summary.count, 2)
+    tc.assertEqual(summary.total, 5.0)
+    tc.assertEqual(summary.max, 3.0)
+    tc.assertEqual(summary.p99, 3.0)
+    tc.assertEqual(timings2.get_summary('genmove').count, 1)
+
+def test_json(tc):
+    timings = Command_timings()
+    for t in [0.0, 0.001, 0.0013, 0.5, 7.0, 7.1]:
+        timings.record('genmove', t)
+    timings.record('play', 0.01)
+    data = json.loads(json.dumps(timings.get_json_data()))
+    tc.assertEqual(sorted(data), ['genmove', 'play'])
+    tc.assertEqual(data['genmove']['count'], 6)
+    tc.assertEqual(data['genmove']['max'], 7.1)
+    tc.assertEqual(sum(n for _, n in data['genmove']['histogram']), 6)
+    timings2 = Command_timings.from_json_data(data)
+    tc.assertEqual(timings2.get_commands(), ['genmove', 'play'])
+    tc.assertEqual(timings2.get_json_data(), timings.get_json_data())
+
+def test_timings_table(tc):
+    timings = Command_timings()
+    timings.record('genmove', 2.0)
+    timings.record('genmove', 0.25)
+    timings.record('play', 0.0005)
+    table = command_timings.make_timings_table(timings)
+    tc.assertMultiLineEqual(
+        "\n".join(table.render()),
+        "command   count mean   p50      p95    p99    max\n"
+        "genmove     2   1.12s  252.7ms  2.00s  2.00s  2.00s\n"
+        "play        1   0.5ms    0.5ms  0.5ms  0.5ms  0.5ms")
@@ -96,3 +96,50 @@ def test_grouped(tc):
     for token in issued:
         sc.fix(*token)
     tc.assertTrue(sc.all_fixed())
+
+def test_replay_fix(tc):
+    # Simulate: state saved with 0 fixed and 1, 2 outstanding; then (in the
+    # lost run) 1, 4 and 6 were fixed.
+    sc = competition_schedulers.Simple_scheduler()
+    tc.assertEqual([sc.issue() for _ in xrange(3)], [0, 1, 2])
+    sc.fix(0)
+    saved = pickle.dumps(sc)
+
+    sc = pickle.loads(saved)
+    sc.replay_fix(1)
+    sc._check_consistent()
+    sc.replay_fix(4)
+    sc._check_consistent()
+    sc.replay_fix(6)
+    sc._check_consistent()
+    tc.assertEqual(sc.fixed, 4)
+    tc.assertRaisesRegexp(ValueError, "token 4 already fixed",
+                          sc.replay_fix, 4)
+    sc.rollback()
+    sc._check_consistent()
+    tc.assertListEqual([sc.issue() for _ in xrange(5)], [2, 3, 5, 7, 8])
+
+    # Same again, but with the rollback done first (as set_status() does)
+    sc = pickle.loads(saved)
+    sc.rollback()
+    sc._check_consistent()
+    for token in [1, 4, 6]:
+        sc.replay_fix(token)
+        sc._check_consistent()
+    tc.assertEqual(sc.fixed, 4)
+    tc.assertEqual(sc.issued, 4)
+    tc.assertListEqual([sc.issue() for _ in xrange(5)], [2, 3, 5, 7, 8])
+
+def test_grouped_replay_fix(tc):
+    sc = competition_schedulers.Group_scheduler()
+    sc.set_groups([('m1', 4), ('m2', None)])
+    sc.replay_fix('m1', 1)
+    sc.replay_fix('m3', 0)
+    sc.rollback()
+    sc.set_groups([('m1', 4), ('m2', None), ('m3', 0)])
+    tc.assertListEqual([sc.issue() for _ in xrange(4)], [
+        ('m2', 0),
+        ('m1', 0),
+        ('m2', 1),
+        ('m1', 2),
+        ])
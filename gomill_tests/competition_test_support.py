@@ -37,6 +37,7 @@ def fake_response(job, winner):
             "%s engine" % job.player_w.code, None,
             '%s engine\ntestdescription' % job.player_w.code),
         }
+    response.command_timings = None
     response.game_data = job.game_data
     response.warnings = []
     response.log_entries = []
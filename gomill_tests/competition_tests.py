@@ -77,6 +77,40 @@ def test_player_command(tc):
                    [os.path.expanduser("~") + "/test", "foo"])
     tc.assertEqual(comp.players['t5'].cmd_args, ["~root"])
 
+def test_player_address(tc):
+    comp = competitions.Competition('test')
+    comp.set_base_directory("/base")
+    config = {
+        'players' : {
+            't1' : Player_config(address="enginehost:5000"),
+            't2' : Player_config(address="[::1]:5000"),
+            't3' : Player_config(address="sockets/engine"),
+            't4' : Player_config("test"),
+            }
+        }
+    comp.initialise_from_control_file(config)
+    tc.assertEqual(comp.players['t1'].address, ("enginehost", 5000))
+    tc.assertIsNone(comp.players['t1'].cmd_args)
+    tc.assertEqual(comp.players['t2'].address, ("::1", 5000))
+    tc.assertEqual(comp.players['t3'].address, "/base/sockets/engine")
+    tc.assertIsNone(comp.players['t4'].address)
+    tc.assertEqual(comp.players['t4'].cmd_args, ["test"])
+
+def test_player_bad_address(tc):
+    comp = competitions.Competition('test')
+    tc.assertRaisesRegexp(
+        ControlFileError, "'command' and 'address' both specified",
+        comp.game_jobs_player_from_config, 'pp',
+        Player_config("cmd", address="host:5000"))
+    tc.assertRaisesRegexp(
+        ControlFileError, "'address': bad port number",
+        comp.game_jobs_player_from_config, 'pp',
+        Player_config(address="host:100000"))
+    tc.assertRaisesRegexp(
+        ValueError, "'address': not a string",
+        comp.game_jobs_player_from_config, 'pp',
+        Player_config(address=5000))
+
 def test_player_is_reliable_scorer(tc):
     comp = competitions.Competition('test')
     config = {
@@ -151,6 +185,62 @@ def test_player_startup_gtp_commands(tc):
                        [("xyzzy", ["test"]),
                         ("foo", ["bar", "baz"])])
 
+def test_player_timeouts(tc):
+    comp = competitions.Competition('test')
+    config = {
+        'players' : {
+            't1' : Player_config("test"),
+            't2' : Player_config("test", command_timeout=10,
+                                 genmove_timeout=2.5),
+            }
+        }
+    comp.initialise_from_control_file(config)
+    tc.assertIsNone(comp.players['t1'].command_timeout)
+    tc.assertIsNone(comp.players['t1'].genmove_timeout)
+    tc.assertEqual(comp.players['t2'].command_timeout, 10.0)
+    tc.assertEqual(comp.players['t2'].genmove_timeout, 2.5)
+
+def test_player_bad_timeout(tc):
+    comp = competitions.Competition('test')
+    config = {
+        'players' : {
+            't1' : Player_config("test", genmove_timeout=0),
+            }
+        }
+    with tc.assertRaises(ControlFileError) as ar:
+        comp.initialise_from_control_file(config)
+    tc.assertEqual(str(ar.exception),
+                   "player t1: 'genmove_timeout': must be positive number")
+
+def test_player_games_per_engine(tc):
+    comp = competitions.Competition('test')
+    config = {
+        'players' : {
+            't1' : Player_config("test"),
+            't2' : Player_config("test", games_per_engine=20),
+            }
+        }
+    comp.initialise_from_control_file(config)
+    tc.assertEqual(comp.players['t1'].games_per_engine, 1)
+    tc.assertEqual(comp.players['t2'].games_per_engine, 20)
+    config['players']['t1'] = Player_config("test", games_per_engine=0)
+    with tc.assertRaises(ControlFileError) as ar:
+        comp.initialise_from_control_file(config)
+    tc.assertEqual(str(ar.exception),
+                   "player t1: 'games_per_engine': must be positive integer")
+
+def test_player_use_pipelining(tc):
+    comp = competitions.Competition('test')
+    config = {
+        'players' : {
+            't1' : Player_config("test"),
+            't2' : Player_config("test", use_pipelining=False),
+            }
+        }
+    comp.initialise_from_control_file(config)
+    tc.assertIs(comp.players['t1'].use_pipelining, True)
+    tc.assertIs(comp.players['t2'].use_pipelining, False)
+
 def test_player_gtp_aliases(tc):
     comp = competitions.Competition('test')
     config = {
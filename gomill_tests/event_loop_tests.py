@@ -0,0 +1,286 @@
+"""Tests for event_loops.py and job_manager.Event_loop_job_manager."""
+
+from __future__ import with_statement
+
+import os
+import time
+
+from gomill import event_loops
+from gomill import job_manager
+from gomill.event_loops import Return, Wait_readable
+
+from gomill_tests import gomill_test_support
+
+def make_tests(suite):
+    suite.addTests(gomill_test_support.make_simple_tests(globals()))
+
+
+class Pipe_fixture(object):
+    """Fixture providing an os.pipe().
+
+    attributes:
+      rd -- file descriptor for the read end
+      wr -- file descriptor for the write end
+
+    """
+    def __init__(self, tc):
+        self.rd, self.wr = os.pipe()
+        tc.addCleanup(self._close)
+
+    def _close(self):
+        for fd in self.rd, self.wr:
+            try:
+                os.close(fd)
+            except EnvironmentError:
+                pass
+
+
+def test_return_value(tc):
+    def inner(n):
+        raise Return(n * 2)
+        yield
+    def outer():
+        a = yield inner(3)
+        b = yield inner(a)
+        raise Return((a, b))
+    tc.assertEqual(event_loops.run_blocking(outer()), (6, 12))
+
+def test_implicit_return(tc):
+    def inner():
+        return
+        yield
+    def outer():
+        result = yield inner()
+        raise Return(result)
+    tc.assertIsNone(event_loops.run_blocking(outer()))
+
+def test_exceptions(tc):
+    def inner():
+        raise ValueError("from inner")
+        yield
+    def middle():
+        yield inner()
+    def outer():
+        try:
+            yield middle()
+        except ValueError, e:
+            raise Return("caught: %s" % e)
+    tc.assertEqual(event_loops.run_blocking(outer()), "caught: from inner")
+    with tc.assertRaises(ValueError) as ar:
+        event_loops.run_blocking(middle())
+    tc.assertEqual(str(ar.exception), "from inner")
+
+def test_bad_yield(tc):
+    def coroutine():
+        try:
+            yield 3
+        except TypeError, e:
+            raise Return(str(e))
+    tc.assertEqual(event_loops.run_blocking(coroutine()),
+                   "bad value yielded by coroutine: 3")
+
+def test_start_requires_generator(tc):
+    loop = event_loops.Event_loop()
+    tc.assertRaises(TypeError, loop.start, lambda: None)
+    tc.assertRaises(StandardError, loop.run_until_some_finished)
+    loop.close()
+
+def test_wait_readable(tc):
+    fx = Pipe_fixture(tc)
+    os.write(fx.wr, "x")
+    def coroutine():
+        is_readable = yield Wait_readable(fx.rd)
+        raise Return((is_readable, os.read(fx.rd, 10)))
+    tc.assertEqual(event_loops.run_blocking(coroutine()), (True, "x"))
+
+def test_wait_readable_eof(tc):
+    fx = Pipe_fixture(tc)
+    os.close(fx.wr)
+    def coroutine():
+        is_readable = yield Wait_readable(fx.rd, time.time() + 10)
+        raise Return((is_readable, os.read(fx.rd, 10)))
+    tc.assertEqual(event_loops.run_blocking(coroutine()), (True, ""))
+
+def test_wait_readable_timeout(tc):
+    fx = Pipe_fixture(tc)
+    def coroutine():
+        is_readable = yield Wait_readable(fx.rd, time.time() + 0.01)
+        # Check the descriptor was unregistered
+        os.write(fx.wr, "x")
+        is_readable_2 = yield Wait_readable(fx.rd, time.time() + 10)
+        raise Return((is_readable, is_readable_2))
+    tc.assertEqual(event_loops.run_blocking(coroutine()), (False, True))
+
+def test_wait_readable_twice(tc):
+    fx = Pipe_fixture(tc)
+    loop = event_loops.Event_loop()
+    def coroutine():
+        yield Wait_readable(fx.rd)
+    def coroutine2():
+        try:
+            yield Wait_readable(fx.rd)
+        except ValueError, e:
+            raise Return(str(e))
+    loop.start(coroutine())
+    tc.assertEqual(loop.run_until_complete(coroutine2()),
+                   "already waiting for file descriptor %d" % fx.rd)
+    loop.close()
+
+def test_concurrent_tasks(tc):
+    fx1 = Pipe_fixture(tc)
+    fx2 = Pipe_fixture(tc)
+    log = []
+    def reader(name, fx, reply_fd):
+        yield Wait_readable(fx.rd)
+        data = os.read(fx.rd, 10)
+        log.append((name, data))
+        if reply_fd is not None:
+            os.write(reply_fd, "from " + name)
+        raise Return(name)
+    loop = event_loops.Event_loop()
+    task1 = loop.start(reader("t1", fx1, None))
+    task2 = loop.start(reader("t2", fx2, fx1.wr))
+    tc.assertTrue(loop.has_tasks())
+    os.write(fx2.wr, "go")
+    tc.assertEqual(loop.run_until_some_finished(), [task2])
+    tc.assertEqual(loop.run_until_some_finished(), [task1])
+    tc.assertFalse(loop.has_tasks())
+    tc.assertEqual(log, [("t2", "go"), ("t1", "from t2")])
+    tc.assertEqual(task1.get_result(), "t1")
+    tc.assertEqual(task2.result, "t2")
+    tc.assertIsNone(task2.exc_info)
+    loop.close()
+
+def test_failed_task(tc):
+    def coroutine():
+        raise KeyError("xyz")
+        yield
+    loop = event_loops.Event_loop()
+    task = loop.start(coroutine())
+    tc.assertEqual(loop.run_until_some_finished(), [task])
+    tc.assertIs(task.exc_info[0], KeyError)
+    tc.assertRaises(KeyError, task.get_result)
+    loop.close()
+
+def test_close(tc):
+    fx = Pipe_fixture(tc)
+    fx2 = Pipe_fixture(tc)
+    log = []
+    def coroutine():
+        try:
+            yield Wait_readable(fx.rd)
+        finally:
+            log.append("closed")
+    loop = event_loops.Event_loop()
+    task = loop.start(coroutine())
+    def runner():
+        yield Wait_readable(fx2.rd, time.time())
+    loop.run_until_complete(runner())
+    tc.assertEqual(log, [])
+    loop.close()
+    tc.assertEqual(log, ["closed"])
+    tc.assertTrue(task.is_finished)
+
+
+### Event_loop_job_manager
+
+class Test_job(object):
+    """Job for use with Test_job_source.
+
+    Waits for its pipe to be readable, and returns the data.
+
+    """
+    def __init__(self, fx, fail=None):
+        self.fx = fx
+        self.fail = fail
+
+    def run_async(self, worker_id):
+        yield Wait_readable(self.fx.rd)
+        if self.fail == 'jobfailed':
+            raise job_manager.JobFailed("job failed")
+        if self.fail == 'error':
+            raise ValueError("unexpected error")
+        raise Return((worker_id, os.read(self.fx.rd, 100)))
+
+class Sync_test_job(object):
+    def run(self, worker_id):
+        return (worker_id, "sync")
+
+class Test_job_source(object):
+    def __init__(self, jobs):
+        self.jobs = jobs
+        self.responses = []
+        self.errors = []
+
+    def get_job(self):
+        if not self.jobs:
+            return job_manager.NoJobAvailable
+        return self.jobs.pop(0)
+
+    def process_response(self, response):
+        self.responses.append(response)
+
+    def process_error_response(self, job, message):
+        self.errors.append((job, message))
+
+def test_event_loop_job_manager(tc):
+    fxs = [Pipe_fixture(tc) for i in range(4)]
+    jobs = [Test_job(fx) for fx in fxs]
+    jobs.append(Sync_test_job())
+    class Job_source(Test_job_source):
+        def process_response(self, response):
+            Test_job_source.process_response(self, response)
+            if writes:
+                i = writes.pop(0)
+                os.write(fxs[i].wr, "job %d" % i)
+    writes = [0, 3, 2]
+    job_source = Job_source(jobs)
+    os.write(fxs[1].wr, "job 1")
+    job_manager.run_jobs(job_source, max_workers=2, use_event_loop=True)
+    tc.assertEqual(job_source.errors, [])
+    # Jobs 0 and 1 are started in slots 0 and 1. Job 2 takes slot 1 when
+    # job 1 finishes, job 3 takes slot 0 when job 0 finishes, and the
+    # synchronous job takes slot 0 when job 3 finishes.
+    tc.assertEqual(job_source.responses, [
+        (1, "job 1"),
+        (0, "job 0"),
+        (0, "job 3"),
+        (0, "sync"),
+        (1, "job 2"),
+        ])
+
+def test_event_loop_job_manager_errors(tc):
+    fx = Pipe_fixture(tc)
+    os.write(fx.wr, "x")
+    job1 = Test_job(fx, fail='jobfailed')
+    job2 = Test_job(fx, fail='error')
+    job_source = Test_job_source([job1, job2])
+    job_manager.run_jobs(job_source, max_workers=1, use_event_loop=True)
+    tc.assertEqual(job_source.responses, [])
+    tc.assertEqual(len(job_source.errors), 2)
+    tc.assertEqual(job_source.errors[0], (job1, "job failed"))
+    job, msg = job_source.errors[1]
+    tc.assertIs(job, job2)
+    tc.assertTrue(msg.startswith("ValueError: unexpected error\n"))
+    tc.assertIn("(run_async)", msg)
+
+def test_event_loop_job_manager_job_source_error(tc):
+    class Failing_job_source(Test_job_source):
+        def process_response(self, response):
+            raise KeyError("abc")
+    fx = Pipe_fixture(tc)
+    os.write(fx.wr, "x")
+    job_source = Failing_job_source([Test_job(fx)])
+    with tc.assertRaises(job_manager.JobSourceError) as ar:
+        job_manager.run_jobs(job_source, max_workers=1, use_event_loop=True)
+    tc.assertTrue(
+        str(ar.exception).startswith("error from process_response()\n"))
+    os.write(fx.wr, "x")
+    job_source = Failing_job_source([Test_job(fx)])
+    with tc.assertRaises(KeyError):
+        job_manager.run_jobs(job_source, max_workers=1, use_event_loop=True,
+                             passed_exceptions=[KeyError])
+
+def test_event_loop_job_manager_requires_max_workers(tc):
+    tc.assertRaises(ValueError, job_manager.run_jobs,
+                    Test_job_source([]), use_event_loop=True)
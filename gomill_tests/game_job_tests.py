@@ -3,10 +3,14 @@
 from __future__ import with_statement
 
 import os
+import threading
+import time
 from textwrap import dedent
 
 from gomill import gtp_controller
 from gomill import game_jobs
+from gomill import event_loops
+from gomill.event_loops import Wait_readable
 from gomill.job_manager import JobFailed
 
 from gomill_tests import test_framework
@@ -130,6 +134,15 @@ def test_player_copy(tc):
     tc.assertEqual(p2.cmd_args, ['testb', 'id=one'])
     tc.assertIsNot(p1.cmd_args, p2.cmd_args)
 
+def test_player_copy_address(tc):
+    p1 = game_jobs.Player()
+    p1.code = "one"
+    p1.cmd_args = None
+    p1.address = ("localhost", 5000)
+    p2 = p1.copy("clone")
+    tc.assertIsNone(p2.cmd_args)
+    tc.assertEqual(p2.address, ("localhost", 5000))
+
 def test_game_job(tc):
     fx = Game_job_fixture(tc)
     fx.job.game_data = 'gamedata'
@@ -179,6 +192,19 @@ def test_game_job_duplicate_player_codes(tc):
         JobFailed, "error creating game: player codes must be distinct",
         fx.job.run)
 
+def test_game_job_command_timings(tc):
+    fx = Game_job_fixture(tc)
+    result = fx.job.run()
+    tc.assertIsNone(result.command_timings)
+    fx = Game_job_fixture(tc)
+    fx.job.record_command_timings = True
+    result = fx.job.run()
+    tc.assertEqual(sorted(result.command_timings), ['one', 'two'])
+    timings = result.command_timings['one']
+    tc.assertEqual(timings.get_summary('genmove').count, 10)
+    tc.assertEqual(timings.get_summary('play').count, 10)
+    tc.assertEqual(timings.get_summary('quit').count, 1)
+
 def test_game_job_no_sgf(tc):
     fx = Game_job_fixture(tc)
     fx.job.sgf_dirname = None
@@ -470,6 +496,22 @@ def test_game_job_startup_gtp_commands_error(tc):
         "failure response from 'failplease' to player two:\n"
         "handler forced to fail")
 
+def test_game_job_use_pipelining(tc):
+    def reject_command_ids(channel):
+        channel.reject_command_ids = True
+    fx = Game_job_fixture(tc)
+    fx.init_player('w', reject_command_ids)
+    with tc.assertRaises(JobFailed) as ar:
+        fx.job.run()
+    tc.assertEqual(
+        str(ar.exception),
+        "aborting game due to error:\n"
+        "failure response from 'boardsize 9' to player two:\n"
+        "unknown command")
+    fx.job.player_w.use_pipelining = False
+    result = fx.job.run()
+    tc.assertEqual(result.game_result.sgf_result, "B+10.5")
+
 def test_game_job_players_score(tc):
     clog = []
     def handle_final_score_b(args):
@@ -527,6 +569,84 @@ def test_game_job_cpu_time_fail(tc):
     W[gc];B[eb];W[gb];B[ea];W[ga];B[tt];C[one beat two B+10.5]W[tt])
     """))
 
+def test_game_job_engine_pool(tc):
+    tc.addCleanup(game_jobs.close_engine_pool)
+    clog = []
+    cpu_times = [10.0, 25.0, 45.5, 50.0]
+    def handle_cpu_time(args):
+        return str(cpu_times.pop(0))
+    def log_clear_board(channel):
+        original = channel.engine.handlers['clear_board']
+        def handle_clear_board(args):
+            clog.append("clear_board")
+            return original(args)
+        channel.engine.add_command('clear_board', handle_clear_board)
+    fx = Game_job_fixture(tc)
+    fx.add_handler('b', 'gomill-cpu_time', handle_cpu_time)
+    fx.init_player('b', log_clear_board)
+    fx.job.player_b.games_per_engine = 3
+    fx.job.player_b.startup_gtp_commands = [('clear_board', [])]
+
+    result = fx.job.run()
+    tc.assertEqual(result.game_result.cpu_times, {'one': 10.0, 'two': 567.2})
+    description = result.engine_descriptions['one']
+    channel = fx.get_channel('one')
+    tc.assertFalse(channel.is_closed)
+    tc.assertTrue(fx.get_channel('two').is_closed)
+
+    fx.job.game_id = 'gameid2'
+    clog[:] = []
+    result = fx.job.run()
+    tc.assertEqual(result.game_result.sgf_result, "B+10.5")
+    tc.assertEqual(result.game_result.cpu_times, {'one': 15.0, 'two': 567.2})
+    tc.assertIs(fx.get_channel('one'), channel)
+    tc.assertFalse(channel.is_closed)
+    # reset, startup command, then the usual clear_board from the game
+    tc.assertEqual(clog, ["clear_board", "clear_board", "clear_board"])
+    tc.assertIs(result.engine_descriptions['one'], description)
+
+    result = fx.job.run()
+    tc.assertEqual(result.game_result.cpu_times, {'one': 20.5, 'two': 567.2})
+    tc.assertIs(fx.get_channel('one'), channel)
+    tc.assertTrue(channel.is_closed)
+
+    result = fx.job.run()
+    tc.assertEqual(result.game_result.cpu_times, {'one': 50.0, 'two': 567.2})
+    tc.assertIsNot(fx.get_channel('one'), channel)
+
+def test_game_job_engine_pool_not_reused_after_error(tc):
+    tc.addCleanup(game_jobs.close_engine_pool)
+    fx = Game_job_fixture(tc)
+    fx.job.player_b.games_per_engine = 5
+    fx.job.player_w.games_per_engine = 5
+    fx.job.run()
+    channel_b = fx.get_channel('one')
+    channel_w = fx.get_channel('two')
+    fx.job.player_b.startup_gtp_commands = [('failplease', [])]
+    with tc.assertRaises(JobFailed):
+        fx.job.run()
+    tc.assertTrue(channel_b.is_closed)
+    # White wasn't started, so its engine is still in the pool
+    tc.assertFalse(channel_w.is_closed)
+    fx.job.player_b.startup_gtp_commands = []
+    fx.job.run()
+    tc.assertIsNot(fx.get_channel('one'), channel_b)
+    tc.assertIs(fx.get_channel('two'), channel_w)
+
+def test_game_job_engine_pool_max_idle(tc):
+    tc.addCleanup(game_jobs.close_engine_pool)
+    fx = Game_job_fixture(tc)
+    fx.job.player_b.games_per_engine = 5
+    fx.job.player_w.games_per_engine = 5
+    fx.job.max_idle_engines = 1
+    result = fx.job.run()
+    tc.assertEqual(result.game_result.cpu_times, {'one': None, 'two': None})
+    tc.assertTrue(fx.get_channel('one').is_closed)
+    tc.assertFalse(fx.get_channel('two').is_closed)
+    tc.assertEqual(len(game_jobs.get_engine_pool(1)), 1)
+    game_jobs.close_engine_pool()
+    tc.assertTrue(fx.get_channel('two').is_closed)
+
 def test_game_job_player_descriptions(tc):
     fx = Game_job_fixture(tc)
     fx.add_handler('b', 'name', lambda args: "blackname")
@@ -623,6 +743,140 @@ def test_game_job_explain_final_move_zero_move_game(tc):
           "two beat one W+R",
         ])
 
+def test_game_job_run_async(tc):
+    fx = Game_job_fixture(tc)
+    fx.job.game_data = 'gamedata'
+    fx.add_handler('w', 'gomill-explain_last_move', lambda args: "EX")
+    result = event_loops.run_blocking(fx.job.run_async(3))
+    tc.assertEqual(result.game_result.sgf_result, "B+10.5")
+    tc.assertEqual(result.game_id, 'gameid')
+    tc.assertEqual(result.game_data, 'gamedata')
+    tc.assertEqual(result.game_result.cpu_times, {'one': 546.2, 'two': 567.2})
+    tc.assertEqual(result.warnings, [])
+    tc.assertEqual(result.log_entries, [])
+    tc.assertEqual(fx.get_channel('one').requested_env['GOMILL_SLOT'], '3')
+    tc.assertTrue(fx.get_channel('one').is_closed)
+    tc.assertTrue(fx.get_channel('two').is_closed)
+    tc.assertEqual(fx.job._sgf_pathname_written, '/sgf/test.games/gjtest.sgf')
+    tc.assertEqual(fx.sgf_moves_and_comments()[:3], [
+        "root: Game id gameid\nDate ***\nResult one beat two B+10.5\n"
+          "one cpu time: 546.20s\ntwo cpu time: 567.20s\n"
+          "Black one\nWhite two",
+        "b E1: --",
+        "w G1: EX",
+        ])
+
+def test_game_job_run_async_forfeit(tc):
+    fx = Game_job_fixture(tc)
+    fx.force_error('w', 'genmove')
+    result = event_loops.run_blocking(fx.job.run_async())
+    tc.assertEqual(result.game_result.sgf_result, "B+F")
+    tc.assertEqual(
+        result.warnings,
+        ["forfeit by two: failure response from 'genmove w' to player two:\n"
+        "handler forced to fail"])
+
+def test_game_job_run_async_channel_error(tc):
+    def fail_first_genmove(channel):
+        channel.fail_command = 'genmove'
+    fx = Game_job_fixture(tc)
+    fx.init_player('w', fail_first_genmove)
+    with tc.assertRaises(JobFailed) as ar:
+        event_loops.run_blocking(fx.job.run_async())
+    tc.assertEqual(str(ar.exception),
+                   "aborting game due to error:\n"
+                   "transport error sending 'genmove w' to player two:\n"
+                   "forced failure for send_command_line")
+    tc.assertEqual(fx.job._sgf_pathname_written, '/sgf/test.void/gjtest.sgf')
+
+def test_game_job_run_async_exec_failure(tc):
+    fx = Game_job_fixture(tc)
+    fx.job.player_w.cmd_args.append('fail=startup')
+    with tc.assertRaises(JobFailed) as ar:
+        event_loops.run_blocking(fx.job.run_async())
+    tc.assertEqual(str(ar.exception),
+                   "aborting game due to error:\n"
+                   "error starting subprocess for player two:\n"
+                   "exec forced to fail")
+
+def test_game_job_run_async_use_pipelining(tc):
+    def reject_command_ids(channel):
+        channel.reject_command_ids = True
+    fx = Game_job_fixture(tc)
+    fx.init_player('w', reject_command_ids)
+    with tc.assertRaises(JobFailed):
+        event_loops.run_blocking(fx.job.run_async())
+    fx.job.player_w.use_pipelining = False
+    result = event_loops.run_blocking(fx.job.run_async())
+    tc.assertEqual(result.game_result.sgf_result, "B+10.5")
+
+def test_game_job_run_async_engine_pool(tc):
+    tc.addCleanup(game_jobs.close_engine_pool)
+    fx = Game_job_fixture(tc)
+    fx.job.player_b.games_per_engine = 2
+    event_loops.run_blocking(fx.job.run_async())
+    channel = fx.get_channel('one')
+    tc.assertFalse(channel.is_closed)
+    # Engines used by run() aren't shared with those used by run_async()
+    fx.job.run()
+    sync_channel = fx.get_channel('one')
+    tc.assertIsNot(sync_channel, channel)
+    result = event_loops.run_blocking(fx.job.run_async())
+    tc.assertEqual(result.game_result.sgf_result, "B+10.5")
+    # No new engine was started
+    tc.assertIs(fx.get_channel('one'), sync_channel)
+    tc.assertTrue(channel.is_closed)
+    tc.assertFalse(sync_channel.is_closed)
+
+def test_game_job_run_async_engine_pool_overflow(tc):
+    # Closing an engine which doesn't fit in the pool mustn't hold up other
+    # coroutines in the event loop.
+    tc.addCleanup(game_jobs.close_engine_pool)
+    rd, wr = os.pipe()
+    tc.addCleanup(os.close, rd)
+    tc.addCleanup(os.close, wr)
+    log = []
+    def slow_close(channel):
+        def close_async():
+            log.append("closing")
+            readable = yield Wait_readable(rd, time.time() + 5.0)
+            log.append("closed" if readable else "timed out")
+            channel.close()
+        channel.close_async = close_async
+    def other_task():
+        while "closing" not in log:
+            yield Wait_readable(rd, time.time() + 0.01)
+        log.append("other task running")
+        os.write(wr, "x")
+    fx = Game_job_fixture(tc)
+    fx.init_player('b', slow_close)
+    fx.job.player_b.games_per_engine = 5
+    fx.job.player_w.games_per_engine = 5
+    fx.job.max_idle_engines = 1
+    game_task, other = event_loops.run_all([fx.job.run_async(), other_task()])
+    tc.assertEqual(game_task.get_result().game_result.sgf_result, "B+10.5")
+    tc.assertEqual(log, ["closing", "other task running", "closed"])
+    tc.assertTrue(fx.get_channel('one').is_closed)
+    tc.assertFalse(fx.get_channel('two').is_closed)
+    tc.assertEqual(len(game_jobs.get_engine_pool(1)), 1)
+
+def test_game_job_address(tc):
+    sfx = gtp_engine_fixtures.Engine_server_fixture(tc)
+    server_thread = threading.Thread(target=sfx.server.handle_connection)
+    server_thread.start()
+    fx = Game_job_fixture(tc)
+    fx.job.player_w.cmd_args = None
+    fx.job.player_w.address = sfx.address
+    result = fx.job.run()
+    server_thread.join()
+    # The socket engine passes every move
+    tc.assertEqual(result.game_result.sgf_result, "B+73.5")
+    tc.assertEqual(result.engine_descriptions['two'].raw_name,
+                   "socket test engine")
+    tc.assertEqual(result.log_entries, [])
+    sfx.server.close()
+    tc.assertEqual(sfx.server.engines, {})
+
 
 ### check_player
 
@@ -157,6 +157,60 @@ def test_game_ko_violation(tc):
         ('b', 'E5'),
         ])
 
+def test_game_positional_superko(tc):
+    # On a 3x3 board, w C1 is a self-capture which recreates the position
+    # after b C2 (but with the other player to move).
+    superko_setup_moves = [
+        ('b', 'B1'), ('w', 'A3'),
+        ('b', 'C2'),
+        ]
+
+    fx = Game_fixture(tc, board=boards.Board(3))
+    fx.game.set_superko_rule('positional')
+    tc.assertEqual(fx.game.superko_rule, 'positional')
+    fx.check_legal_moves(superko_setup_moves)
+    fx.game.record_move('w', move_from_vertex('C1', 3))
+    fx.check_over('seen_forfeit')
+    tc.assertEqual(fx.game.winner, 'b')
+    tc.assertEqual(fx.game.forfeit_reason,
+                   "attempted move to C1 violating positional superko")
+    tc.assertEqual(fx.game.move_count, 3)
+
+    fx = Game_fixture(tc, board=boards.Board(3))
+    fx.game.set_superko_rule('situational')
+    fx.check_legal_moves(superko_setup_moves + [('w', 'C1')])
+
+    fx = Game_fixture(tc, board=boards.Board(3))
+    tc.assertIsNone(fx.game.superko_rule)
+    fx.check_legal_moves(superko_setup_moves + [('w', 'C1')])
+
+def test_game_situational_superko(tc):
+    # On a 3x3 board, w A1 is a self-capture which recreates the position
+    # after w B3, with black to move again.
+    superko_setup_moves = [
+        ('b', 'B1'), ('w', 'A1'),
+        ('b', 'A2'), ('w', 'B3'),
+        ('b', 'pass'),
+        ]
+
+    for superko_rule in ('positional', 'situational'):
+        fx = Game_fixture(tc, board=boards.Board(3))
+        fx.game.set_superko_rule(superko_rule)
+        fx.check_legal_moves(superko_setup_moves)
+        fx.game.record_move('w', move_from_vertex('A1', 3))
+        fx.check_over('seen_forfeit')
+        tc.assertEqual(fx.game.forfeit_reason,
+                       "attempted move to A1 violating %s superko" %
+                       superko_rule)
+        tc.assertEqual(fx.game.move_count, 5)
+
+    fx = Game_fixture(tc, board=boards.Board(3))
+    fx.check_legal_moves(superko_setup_moves + [('w', 'A1')])
+
+    fx = Game_fixture(tc)
+    tc.assertRaisesRegexp(ValueError, "unknown superko rule: nonsense",
+                          fx.game.set_superko_rule, 'nonsense')
+
 def test_game_move_limit(tc):
     fx = Game_fixture(tc)
     game = fx.game
@@ -530,11 +584,12 @@ class Testing_backend(gameplay.Backend):
 
 class Game_runner_fixture(object):
     def __init__(self, tc, moves, backend_cls=Testing_backend,
-                 size=5, komi=11, move_limit=None):
+                 size=5, komi=11, move_limit=None, superko_rule=None):
         self.tc = tc
         self.backend = backend_cls(size, moves)
         self.game_runner = gameplay.Game_runner(
-            self.backend, board_size=size, komi=komi, move_limit=move_limit)
+            self.backend, board_size=size, komi=komi, move_limit=move_limit,
+            superko_rule=superko_rule)
 
     def enable_get_last_move_comment(self, colour):
         self.backend.enabled_get_last_move_comment.add(colour)
@@ -816,6 +871,22 @@ def test_game_runner_illegal_move(tc):
         ('w', (0, 3), None),
         ])
 
+def test_game_runner_superko(tc):
+    fx = Game_runner_fixture(
+        tc, moves=[('b', 'B1'), ('w', 'A3'), ('b', 'C2'), ('w', 'C1')],
+        size=3, superko_rule='positional')
+    fx.run_game()
+    tc.assertIsNone(fx.game_runner.get_game_score())
+    result = fx.game_runner.result
+    tc.assertEqual(result.sgf_result, 'B+F')
+    tc.assertEqual(result.detail,
+                   "attempted move to C1 violating positional superko")
+    tc.assertEqual(fx.game_runner.get_moves(), [
+        ('b', (0, 1), None),
+        ('w', (2, 0), None),
+        ('b', (1, 2), None),
+        ])
+
 def test_game_runner_move_rejected_as_illegal(tc):
     fx = Game_runner_fixture(
         tc,
@@ -1319,6 +1390,7 @@ def test_game_runner_defaults(tc):
     backend = Testing_backend(size=9, moves=[('b', 'C1'), ('w', 'D1')])
     gr = gameplay.Game_runner(backend, board_size=9)
     tc.assertIsNone(gr.move_limit)
+    tc.assertIsNone(gr.superko_rule)
     gr.prepare()
     gr.run()
     tc.assertEqual(backend.log[0], "start_new_game: size=9, komi=0.0")
@@ -1331,7 +1403,7 @@ def test_game_runner_defaults(tc):
         ])
 
 def test_game_runner_result_setting(tc):
-    # Tests Game_runner._set_result() behaves as expected
+    # Tests Game_runner sets the result as expected
     # Also tests set_result_class()
 
     class Mock_result_class(object):
@@ -128,6 +128,9 @@ class Gomill_testcase_mixin(object):
      assertDiagramEqual
      assertEqual and assertNotEqual for Boards
 
+    Game result features:
+     assertGameResultListEqual
+
     """
     def init_gomill_testcase_mixin(self):
         self.addTypeEqualityFunc(boards.Board, self.assertBoardEqual)
@@ -166,6 +169,16 @@ class Gomill_testcase_mixin(object):
         if not are_equal:
             self.fail(self._format_message(msg, desc+"\n"))
 
+    def assertGameResultListEqual(self, seen, expected, msg=None):
+        """Check that two lists of Game_results describe the same results.
+
+        Game_results don't compare by value, and tournament results hand out
+        new Game_result objects each time they're asked.
+
+        """
+        self.assertListEqual([r.__getstate__() for r in seen],
+                             [r.__getstate__() for r in expected], msg)
+
     def assertNotEqual(self, first, second, msg=None):
         if isinstance(first, boards.Board) and isinstance(second, boards.Board):
             are_equal, _ = compare_boards(first, second)
@@ -7,7 +7,7 @@ This is also used by gtp_engine_fixtures (and so by gtp proxy tests).
 from gomill import gtp_controller
 from gomill.gtp_controller import (
     GtpChannelError, GtpProtocolError, GtpTransportError, GtpChannelClosed,
-    BadGtpResponse)
+    GtpTimeout, BadGtpResponse)
 
 from gomill_tests import test_support
 from gomill_tests.test_framework import SupporterError
@@ -24,14 +24,24 @@ class Preprogrammed_gtp_channel(gtp_controller.Subprocess_gtp_channel):
     Pass hangs_before_eof True to simulate an engine that doesn't close its
     response pipe when the preprogrammed response data runs out.
 
+    read_size is the maximum amount of data the channel sees from each read of
+    the response pipe. The default of 1 means that breaking the response stream
+    has an immediate effect.
+
     The command stream is available from get_command_stream().
 
     """
-    def __init__(self, response, hangs_before_eof=False):
+    def __init__(self, response, hangs_before_eof=False, read_size=1):
         gtp_controller.Linebased_gtp_channel.__init__(self)
         self.command_pipe = test_support.Mock_writing_pipe()
         self.response_pipe = test_support.Mock_reading_pipe(response)
         self.response_pipe.hangs_before_eof = hangs_before_eof
+        self.response_buffer = bytearray()
+        self.response_scan_position = 0
+        self.read_size = read_size
+
+    def read_response_data(self):
+        return self.response_pipe.read(self.read_size)
 
     def close(self):
         self.command_pipe.close()
@@ -62,9 +72,11 @@ class Testing_gtp_channel(gtp_controller.Linebased_gtp_channel):
       is_closed -- bool (closed() has been called without a forced error)
 
     This raises an error if sent two commands without requesting a response in
-    between, or if asked for a response when no command was sent since the last
-    response. (GTP permits stacking up commands, but Gtp_controller should never
-    do it, so we want to report it). Similarly we reject empty command lines.
+    between (unless the second has a command id), or if asked for a response
+    when no command was sent since the last response. (GTP permits stacking up
+    commands, but Gtp_controller should only do it when pipelining, which it
+    does using command ids, so we want to report it). Similarly we reject empty
+    command lines.
 
     Unlike Internal_gtp_channel, this runs the command at the point when it is
     sent.
@@ -74,11 +86,18 @@ class Testing_gtp_channel(gtp_controller.Linebased_gtp_channel):
     disable this behaviour (it will ignore the command and respond with EOF
     instead).
 
+    Set the attribute reject_command_ids to True to simulate an engine which
+    doesn't support command ids: it gives a failure response (without an id)
+    to any command line which starts with a digit.
+
     You can force errors by setting the following attributes:
       fail_next_command   -- bool (send_command_line raises GtpTransportError)
       fail_command        -- string (like fail_next_command, if command line
                              starts with this string)
       fail_next_response  -- bool (get_response_line raises GtpTransportError)
+      timeout_command     -- string (get_response_line raises GtpTimeout for
+                             the response to a command line starting with
+                             this string)
       force_next_response -- string (get_response_line uses this string)
       fail_close          -- bool (close raises GtpTransportError)
 
@@ -90,16 +109,20 @@ class Testing_gtp_channel(gtp_controller.Linebased_gtp_channel):
         self.session_is_ended = False
         self.is_closed = False
         self.engine_exit_breaks_commands = True
+        self.reject_command_ids = False
         self.fail_next_command = False
         self.fail_next_response = False
         self.force_next_response = None
         self.fail_close = False
         self.fail_command = None
+        self.timeout_command = None
+        # Number of bytes of stored_response to return before a forced timeout
+        self.timeout_position = None
 
     def send_command_line(self, command):
         if self.is_closed:
             raise SupporterError("channel is closed")
-        if self.stored_response != "":
+        if self.stored_response != "" and not command[:1].isdigit():
             raise SupporterError("two commands in a row")
         if self.session_is_ended:
             if self.engine_exit_breaks_commands:
@@ -111,10 +134,16 @@ class Testing_gtp_channel(gtp_controller.Linebased_gtp_channel):
         if self.fail_command and command.startswith(self.fail_command):
             self.fail_command = None
             raise GtpTransportError("forced failure for send_command_line")
-        self.stored_response, self.session_is_ended = \
-            self.engine.handle_line(command)
-        if self.stored_response is None:
+        if self.timeout_command and command.startswith(self.timeout_command):
+            self.timeout_command = None
+            self.timeout_position = len(self.stored_response)
+        if self.reject_command_ids and command[:1].isdigit():
+            self.stored_response += "? unknown command\n\n"
+            return
+        response, self.session_is_ended = self.engine.handle_line(command)
+        if response is None:
             raise SupporterError("empty command line")
+        self.stored_response += response
 
     def get_response_line(self):
         if self.is_closed:
@@ -126,10 +155,16 @@ class Testing_gtp_channel(gtp_controller.Linebased_gtp_channel):
         if self.fail_next_response:
             self.fail_next_response = False
             raise GtpTransportError("forced failure for get_response_line")
+        if self.timeout_position == 0:
+            self.timeout_position = None
+            self.stored_response = ""
+            raise GtpTimeout("forced timeout for get_response_line")
         if self.force_next_response is not None:
             self.stored_response = self.force_next_response
             self.force_next_response = None
         line, self.stored_response = self.stored_response.split("\n", 1)
+        if self.timeout_position is not None:
+            self.timeout_position -= len(line) + 1
         return line + "\n"
 
     def close(self):
@@ -3,11 +3,18 @@
 from __future__ import with_statement
 
 import os
+import signal
+import sys
+import threading
+import time
 
+from gomill import command_timings
+from gomill import event_loops
 from gomill import gtp_controller
+from gomill.event_loops import Return
 from gomill.gtp_controller import (
     GtpChannelError, GtpProtocolError, GtpTransportError, GtpChannelClosed,
-    BadGtpResponse, Gtp_controller)
+    GtpTimeout, BadGtpResponse, Gtp_controller)
 
 from gomill_tests import gomill_test_support
 from gomill_tests import gtp_controller_test_support
@@ -88,6 +95,59 @@ def test_linebased_channel_response_cleaning(tc):
     tc.assertEqual(channel.get_response(), (False, "8ab\xc3\xa7de"))
     tc.assertEqual(channel.get_response(), (True, "aaa  \n  bbb ccc\nddd"))
 
+def test_subprocess_channel_response_chunking(tc):
+    # The subprocess channel's reader must give the same results however the
+    # response stream is split up by the reads from the pipe.
+    stream = (
+        "=\n\n"
+        "\n \n\t\n"
+        "= 1abc\rde\r\n\r\n"
+        "= 2abcde\n\n\n\n"
+        "= 3a\x7fbc\x00d\x07e\n\x01\n"
+        "= 4abc\tde\n\n"
+        "= 7aaa  \n  bbb\tccc\nddd  \t  \n\n"
+        "?    a\raa  \r\n  b\rbb\tcc\x01c\nddd  \t  \n\n"
+        "= 9" + "x" * 10000 + "\n" + "y" * 10000 + "\n\n"
+        "= final\nresponse"
+        )
+    expected = [
+        (False, ""),
+        (False, "1abcde"),
+        (False, "2abcde"),
+        (False, "3abcde"),
+        (False, "4abc de"),
+        (False, "7aaa  \n  bbb ccc\nddd"),
+        (True, "aaa  \n  bbb ccc\nddd"),
+        (False, "9" + "x" * 10000 + "\n" + "y" * 10000),
+        (False, "final\nresponse"),
+        ]
+    for read_size in (1, 2, 3, 7, 4096, 100000):
+        channel = Preprogrammed_gtp_channel(stream, read_size=read_size)
+        responses = [channel.get_response() for _ in expected]
+        tc.assertEqual(responses, expected, "read_size %d" % read_size)
+        tc.assertRaisesRegexp(
+            GtpChannelClosed, "^engine has closed the response channel$",
+            channel.get_response)
+
+def test_subprocess_channel_response_chunking_eof(tc):
+    for read_size in (1, 4096):
+        channel = Preprogrammed_gtp_channel("= ok\n\n  \n\t",
+                                            read_size=read_size)
+        tc.assertEqual(channel.get_response(), (False, "ok"))
+        tc.assertRaisesRegexp(
+            GtpChannelClosed, "^engine has closed the response channel$",
+            channel.get_response)
+        channel = Preprogrammed_gtp_channel("\n", read_size=read_size)
+        tc.assertRaisesRegexp(
+            GtpChannelClosed, "^engine has closed the response channel$",
+            channel.get_response)
+        channel = Preprogrammed_gtp_channel("=\n", read_size=read_size)
+        tc.assertEqual(channel.get_response(), (False, ""))
+    channel = Preprogrammed_gtp_channel("\x01\xa1\xa0\x80",
+                                        read_size=4096)
+    tc.assertRaisesRegexp(
+        GtpProtocolError, "appears to be speaking GMP", channel.get_response)
+
 def test_linebased_channel_invalid_responses(tc):
     channel = Preprogrammed_gtp_channel(
         # good response first, to get past the "isn't speaking GTP" checking
@@ -169,6 +229,36 @@ def test_linebased_channel_with_broken_response_pipe(tc):
         channel.get_response)
     channel.close()
 
+def test_linebased_channel_command_ids(tc):
+    channel = Preprogrammed_gtp_channel(
+        "=1 foo\n\n"
+        "?2 unknown command\n\n"
+        # engine which doesn't return the id
+        "= 12\n\n"
+        "=4\n\n"
+        # no id sent, so none expected
+        "=5\n\n"
+        "=7 wrong\n\n",
+        read_size=4096)
+    channel.send_command("name", [], 1)
+    channel.send_command("xyzzy", ["a"], 2)
+    channel.send_command("version", [], 3)
+    channel.send_command("clear_board", [], 4)
+    channel.send_command("test", [])
+    channel.send_command("test", [], 6)
+    tc.assertEqual(channel.get_command_stream(),
+                   "1 name\n2 xyzzy a\n3 version\n4 clear_board\n"
+                   "test\n6 test\n")
+    tc.assertEqual(channel.get_response(), (False, "foo"))
+    tc.assertEqual(channel.get_response(), (True, "unknown command"))
+    tc.assertEqual(channel.get_response(), (False, "12"))
+    tc.assertEqual(channel.get_response(), (False, ""))
+    tc.assertEqual(channel.get_response(), (False, "5"))
+    tc.assertRaisesRegexp(
+        GtpProtocolError, "^response id 7 doesn't match command id 6$",
+        channel.get_response)
+    tc.assertRaises(ValueError, channel.send_command, "test", [], -1)
+
 def test_channel_command_validation(tc):
     channel = Preprogrammed_gtp_channel("\n\n")
     # empty command
@@ -354,6 +444,142 @@ def test_controller_response_transport_error(tc):
     tc.assertTrue(controller.channel_is_bad)
     tc.assertListEqual(controller.retrieve_error_messages(), [])
 
+def test_controller_response_timeout(tc):
+    channel = gtp_engine_fixtures.get_test_channel()
+    controller = Gtp_controller(channel, 'player test')
+    tc.assertEqual(controller.do_command("test"), "test response")
+    channel.timeout_command = "test"
+    with tc.assertRaises(GtpTimeout) as ar:
+        controller.do_command("test")
+    tc.assertEqual(
+        str(ar.exception),
+        "timeout reading response to 'test' from player test:\n"
+        "forced timeout for get_response_line")
+    tc.assertTrue(controller.channel_is_bad)
+
+def test_controller_pipelined_commands(tc):
+    channel = gtp_engine_fixtures.get_test_channel()
+    controller = Gtp_controller(channel, 'player test')
+    results = controller.do_pipelined_commands([
+        ("test", []),
+        ("error", []),
+        ("test", [u"\N{POUND SIGN}"]),
+        ("multiline", []),
+        ])
+    tc.assertEqual(len(results), 4)
+    tc.assertEqual(results[0], "test response")
+    tc.assertIsInstance(results[1], BadGtpResponse)
+    tc.assertEqual(str(results[1]),
+                   "failure response from 'error' to player test:\n"
+                   "normal error")
+    tc.assertEqual(results[1].gtp_command, "error")
+    tc.assertEqual(results[1].gtp_error_message, "normal error")
+    tc.assertEqual(results[2], "args: \xc2\xa3")
+    tc.assertEqual(results[3], "first line  \n  second line\nthird line")
+    tc.assertEqual(controller.do_pipelined_commands([]), [])
+    tc.assertEqual(controller.do_command("test"), "test response")
+    tc.assertListEqual(channel.engine.commands_handled, [
+        ('test', []),
+        ('error', []),
+        ('test', ['\xc2\xa3']),
+        ('multiline', []),
+        ('test', []),
+        ])
+    tc.assertFalse(controller.channel_is_bad)
+
+def test_controller_pipelined_commands_without_pipelining(tc):
+    channel = gtp_engine_fixtures.get_test_channel()
+    channel.supports_pipelining = False
+    controller = Gtp_controller(channel, 'player test')
+    controller.set_gtp_aliases({'aliased' : 'test'})
+    results = controller.do_pipelined_commands([
+        ("error", []),
+        ("aliased", ["x"]),
+        ])
+    tc.assertEqual(str(results[0]),
+                   "failure response from first command (error) "
+                   "to player test:\n"
+                   "normal error")
+    tc.assertEqual(results[1], "args: x")
+
+def test_controller_pipelining_disabled(tc):
+    channel = gtp_engine_fixtures.get_test_channel()
+    channel.reject_command_ids = True
+    controller = Gtp_controller(channel, 'player test')
+    tc.assertIs(controller.use_pipelining, True)
+    results = controller.do_pipelined_commands([("test", [])])
+    tc.assertEqual(str(results[0]),
+                   "failure response from first command (test) "
+                   "to player test:\n"
+                   "unknown command")
+    controller.enable_pipelining(False)
+    results = controller.do_pipelined_commands([
+        ("test", []),
+        ("multiline", []),
+        ])
+    tc.assertEqual(results[0], "test response")
+    tc.assertEqual(results[1], "first line  \n  second line\nthird line")
+    tc.assertListEqual(channel.engine.commands_handled, [
+        ('test', []),
+        ('multiline', []),
+        ])
+
+def test_controller_command_timings(tc):
+    channel = gtp_engine_fixtures.get_test_channel()
+    controller = Gtp_controller(channel, 'player test')
+    controller.set_gtp_aliases({'aliased' : 'test'})
+    controller.do_command("test")
+    tc.assertIsNone(controller.command_timings)
+    timings = command_timings.Command_timings()
+    controller.set_command_timings(timings)
+    controller.do_command("test")
+    controller.do_command("aliased")
+    with tc.assertRaises(BadGtpResponse):
+        controller.do_command("error")
+    controller.do_pipelined_commands([("test", []), ("multiline", [])])
+    channel.fail_command = "multiline"
+    with tc.assertRaises(GtpTransportError):
+        controller.do_command("multiline")
+    tc.assertEqual(timings.get_commands(),
+                   ["aliased", "error", "multiline", "test"])
+    tc.assertEqual(timings.get_summary("test").count, 2)
+    tc.assertEqual(timings.get_summary("multiline").count, 1)
+    controller.set_command_timings(None)
+    controller.do_command("test")
+    tc.assertEqual(timings.get_summary("test").count, 2)
+
+def test_controller_pipelined_commands_channel_error(tc):
+    channel = gtp_engine_fixtures.get_test_channel()
+    controller = Gtp_controller(channel, 'player test')
+    # Command lines include the command id
+    channel.fail_command = "2 multiline"
+    with tc.assertRaises(GtpTransportError) as ar:
+        controller.do_pipelined_commands([
+            ("test", []),
+            ("multiline", []),
+            ("test", []),
+            ])
+    tc.assertEqual(
+        str(ar.exception),
+        "transport error sending 'multiline' to player test:\n"
+        "forced failure for send_command_line")
+    tc.assertTrue(controller.channel_is_bad)
+
+    channel = gtp_engine_fixtures.get_test_channel()
+    controller = Gtp_controller(channel, 'player test')
+    channel.timeout_command = "3 multiline"
+    with tc.assertRaises(GtpTimeout) as ar:
+        controller.do_pipelined_commands([
+            ("test", []),
+            ("test", []),
+            ("multiline", []),
+            ])
+    tc.assertEqual(
+        str(ar.exception),
+        "timeout reading response to 'multiline' from player test:\n"
+        "forced timeout for get_response_line")
+    tc.assertTrue(controller.channel_is_bad)
+
 def test_controller_response_protocol_error(tc):
     channel = gtp_engine_fixtures.get_test_channel()
     controller = Gtp_controller(channel, 'player test')
@@ -768,6 +994,284 @@ def test_subprocess_channel_with_controller(tc):
     tc.assertTrue(hasattr(rusage, 'ru_utime'))
 
 
+# Engine which responds to every command immediately, except that it takes
+# its time over genmove.
+_slow_genmove_engine_code = """
+import sys, time
+while True:
+    line = sys.stdin.readline()
+    if not line:
+        break
+    if line.startswith("genmove"):
+        time.sleep(30)
+    sys.stdout.write("= ok\\n\\n")
+    sys.stdout.flush()
+"""
+
+def test_subprocess_channel_timeout(tc):
+    channel = gtp_controller.Subprocess_gtp_channel(
+        [sys.executable, "-c", _slow_genmove_engine_code])
+    channel.send_command("name", [])
+    tc.assertEqual(channel.get_response(timeout=5), (False, "ok"))
+    channel.send_command("genmove", ["b"])
+    start = time.time()
+    with tc.assertRaises(GtpTimeout) as ar:
+        channel.get_response(timeout=0.2)
+    tc.assertLess(time.time() - start, 5)
+    tc.assertEqual(str(ar.exception),
+                   "engine did not respond within 0.2 seconds")
+    channel.close()
+    tc.assertTrue(os.WIFSIGNALED(channel.exit_status))
+    tc.assertEqual(os.WTERMSIG(channel.exit_status), signal.SIGKILL)
+
+def test_subprocess_controller_timeouts(tc):
+    channel = gtp_controller.Subprocess_gtp_channel(
+        [sys.executable, "-c", _slow_genmove_engine_code])
+    controller = Gtp_controller(channel, 'slow player')
+    controller.set_timeouts(command_timeout=5, genmove_timeout=0.2)
+    tc.assertEqual(controller.do_command("name"), "ok")
+    with tc.assertRaises(GtpTimeout) as ar:
+        controller.do_command("genmove", "b")
+    tc.assertEqual(
+        str(ar.exception),
+        "timeout reading response to 'genmove b' from slow player:\n"
+        "engine did not respond within 0.2 seconds")
+    tc.assertTrue(controller.channel_is_bad)
+    start = time.time()
+    controller.safe_close()
+    tc.assertLess(time.time() - start, 5)
+    tc.assertTrue(os.WIFSIGNALED(channel.exit_status))
+    tc.assertEqual(os.WTERMSIG(channel.exit_status), signal.SIGKILL)
+
+def test_subprocess_channel_async(tc):
+    channel = gtp_controller.Subprocess_gtp_channel(
+        [sys.executable, "-c", _slow_genmove_engine_code])
+    def coroutine():
+        channel.send_command("name", [])
+        result = yield channel.get_response_async(timeout=5)
+        channel.send_command("genmove", ["b"])
+        try:
+            yield channel.get_response_async(timeout=0.2)
+        except GtpTimeout, e:
+            raise Return((result, str(e)))
+    start = time.time()
+    tc.assertEqual(event_loops.run_blocking(coroutine()),
+                   ((False, "ok"), "engine did not respond within 0.2 seconds"))
+    tc.assertLess(time.time() - start, 5)
+    channel.close()
+    tc.assertEqual(os.WTERMSIG(channel.exit_status), signal.SIGKILL)
+
+def test_subprocess_channel_async_close(tc):
+    channel = gtp_controller.Subprocess_gtp_channel(
+        [sys.executable, "-c", _slow_genmove_engine_code])
+    channel.send_command("name", [])
+    event_loops.run_blocking(channel.close_async())
+    tc.assertEqual(channel.exit_status, 0)
+
+def test_async_controllers_in_parallel(tc):
+    # Two engines thinking at once; the fast one isn't held up by the slow one
+    slow_controller = gtp_controller.Async_gtp_controller(
+        gtp_controller.Subprocess_gtp_channel(
+            [sys.executable, "-c", _slow_genmove_engine_code]), 'slow')
+    fast_controller = gtp_controller.Async_gtp_controller(
+        gtp_controller.Subprocess_gtp_channel(
+            [sys.executable, "-c", _slow_genmove_engine_code]), 'fast')
+    slow_controller.set_timeouts(genmove_timeout=1)
+    log = []
+    def slow():
+        try:
+            yield slow_controller.do_command("genmove", "b")
+        except GtpTimeout:
+            log.append("slow timed out")
+    def fast():
+        for i in range(3):
+            result = yield fast_controller.do_command("name")
+            log.append("fast: %s" % result)
+    loop = event_loops.Event_loop()
+    loop.start(slow())
+    loop.start(fast())
+    while loop.has_tasks():
+        loop.run_until_some_finished()
+    tc.assertEqual(log, ["fast: ok", "fast: ok", "fast: ok", "slow timed out"])
+    loop.run_until_complete(slow_controller.safe_close())
+    loop.run_until_complete(fast_controller.safe_close())
+    loop.close()
+    tc.assertEqual(fast_controller.channel.exit_status, 0)
+    tc.assertEqual(slow_controller.retrieve_error_messages(), [])
+
+def test_async_controller(tc):
+    channel = gtp_engine_fixtures.get_test_channel()
+    controller = gtp_controller.Async_gtp_controller(channel, 'player test')
+    def coroutine():
+        result = yield controller.do_command("test", "ab", "cd")
+        tc.assertEqual(result, "args: ab cd")
+        tc.assertIs((yield controller.known_command("test")), True)
+        tc.assertIs((yield controller.known_command("xyzzy")), False)
+        tc.assertEqual(
+            (yield controller.do_pipelined_commands(
+                [("test", ["x"]), ("error", [])]))[0], "args: x")
+        try:
+            yield controller.do_command("error")
+        except BadGtpResponse, e:
+            tc.assertEqual(str(e),
+                           "failure response from 'error' to player test:\n"
+                           "normal error")
+        else:
+            tc.fail("no BadGtpResponse")
+        tc.assertEqual((yield controller.safe_do_command("test", "x")),
+                       "args: x")
+        yield controller.safe_close()
+    event_loops.run_blocking(coroutine())
+    tc.assertTrue(controller.channel_is_closed)
+    tc.assertEqual(controller.retrieve_error_messages(), [])
+
+def test_async_controller_list_commands_and_close(tc):
+    channel = gtp_engine_fixtures.get_test_channel()
+    controller = gtp_controller.Async_gtp_controller(channel, 'player test')
+    def coroutine():
+        commands = yield controller.list_commands()
+        yield controller.close()
+        raise Return(commands)
+    commands = event_loops.run_blocking(coroutine())
+    tc.assertIn("list_commands", commands)
+    tc.assertIn("test", commands)
+    tc.assertTrue(controller.channel_is_closed)
+    tc.assertTrue(channel.is_closed)
+    tc.assertRaises(StandardError,
+                    event_loops.run_blocking, controller.close())
+
+def test_async_controller_close_error(tc):
+    channel = gtp_engine_fixtures.get_test_channel()
+    channel.fail_close = True
+    controller = gtp_controller.Async_gtp_controller(channel, 'player test')
+    with tc.assertRaises(GtpTransportError) as ar:
+        event_loops.run_blocking(controller.close())
+    tc.assertEqual(str(ar.exception),
+                   "error closing player test:\n"
+                   "forced failure for close")
+
+def test_engine_description_from_async_controller(tc):
+    channel = gtp_engine_fixtures.get_test_channel()
+    channel.engine.add_command('name', lambda args:"test engine")
+    channel.engine.add_command('gomill-describe_engine', lambda args:"foo\nbar")
+    controller = gtp_controller.Async_gtp_controller(channel, 'player test')
+    ed = event_loops.run_blocking(
+        gtp_controller.Engine_description.from_controller_async(controller))
+    tc.assertEqual(ed.raw_name, "test engine")
+    tc.assertIsNone(ed.raw_version)
+    tc.assertEqual(ed.description, "foo\nbar")
+
+
+def test_parse_engine_address(tc):
+    parse = gtp_controller.parse_engine_address
+    tc.assertEqual(parse("localhost:5000"), ("localhost", 5000))
+    tc.assertEqual(parse("192.168.1.2:1"), ("192.168.1.2", 1))
+    tc.assertEqual(parse("[::1]:5000"), ("::1", 5000))
+    tc.assertEqual(parse("/tmp/engine.sock"), "/tmp/engine.sock")
+    tc.assertEqual(parse("./engine.sock"), "./engine.sock")
+    tc.assertRaisesRegexp(ValueError, "expected host:port", parse, "localhost")
+    tc.assertRaisesRegexp(ValueError, "expected host:port", parse, ":5000")
+    tc.assertRaisesRegexp(ValueError, "bad port number", parse, "host:")
+    tc.assertRaisesRegexp(ValueError, "bad port number", parse, "host:0")
+    tc.assertRaisesRegexp(ValueError, "bad port number", parse, "host:65536")
+    tc.assertRaisesRegexp(ValueError, "bad port number", parse, "host:x")
+    describe = gtp_controller.describe_engine_address
+    tc.assertEqual(describe(("localhost", 5000)), "localhost:5000")
+    tc.assertEqual(describe(("::1", 5000)), "[::1]:5000")
+    tc.assertEqual(describe("/tmp/engine.sock"), "/tmp/engine.sock")
+
+def test_socket_channel(tc):
+    fx = gtp_engine_fixtures.Engine_server_fixture(tc)
+    channel = gtp_controller.Socket_gtp_channel(fx.address, connect_timeout=5)
+    fx.server.handle_connection()
+    controller = Gtp_controller(channel, 'socket test')
+    tc.assertEqual(controller.do_command("name"), "socket test engine")
+    tc.assertEqual(
+        controller.do_pipelined_commands(
+            [("protocol_version", []), ("genmove", ["b"])]),
+        ["2", "pass"])
+    controller.safe_close()
+    tc.assertEqual(controller.retrieve_error_messages(), [])
+    tc.assertIsNone(channel.exit_status)
+    tc.assertIsNone(channel.resource_usage)
+    fx.server.close()
+    tc.assertEqual(fx.server.engines, {})
+
+def test_socket_channel_unix(tc):
+    pathname = os.path.join(tc.sandbox(), "engine.sock")
+    sfx = gtp_engine_fixtures.Engine_server_fixture(tc, address=pathname)
+    tc.assertEqual(sfx.address, pathname)
+    channel = gtp_controller.Socket_gtp_channel(pathname)
+    sfx.server.handle_connection()
+    channel.send_command("name", [])
+    tc.assertEqual(channel.get_response(), (False, "socket test engine"))
+    channel.close()
+    sfx.server.close()
+    tc.assertFalse(os.path.exists(pathname))
+
+def test_socket_channel_timeout(tc):
+    fx = gtp_engine_fixtures.Engine_server_fixture(tc, slow=True)
+    channel = gtp_controller.Socket_gtp_channel(fx.address)
+    fx.server.handle_connection()
+    channel.send_command("name", [])
+    tc.assertEqual(channel.get_response(timeout=5), (False, "socket test engine"))
+    channel.send_command("genmove", ["b"])
+    start = time.time()
+    with tc.assertRaises(GtpTimeout) as ar:
+        channel.get_response(timeout=0.2)
+    tc.assertLess(time.time() - start, 5)
+    tc.assertEqual(str(ar.exception),
+                   "engine did not respond within 0.2 seconds")
+    channel.close()
+
+def test_socket_channel_async(tc):
+    fx = gtp_engine_fixtures.Engine_server_fixture(
+        tc, slow=True, max_engines=2)
+    slow_controller = gtp_controller.Async_gtp_controller(
+        gtp_controller.Socket_gtp_channel(fx.address), 'slow')
+    fx.server.handle_connection()
+    fast_controller = gtp_controller.Async_gtp_controller(
+        gtp_controller.Socket_gtp_channel(fx.address), 'fast')
+    fx.server.handle_connection()
+    slow_controller.set_timeouts(genmove_timeout=0.5)
+    log = []
+    def slow():
+        try:
+            yield slow_controller.do_command("genmove", "b")
+        except GtpTimeout:
+            log.append("slow timed out")
+    def fast():
+        for i in range(2):
+            log.append((yield fast_controller.do_command("name")))
+        yield fast_controller.safe_close()
+    event_loops.run_all([slow(), fast()])
+    tc.assertEqual(log, ["socket test engine", "socket test engine",
+                         "slow timed out"])
+    event_loops.run_blocking(slow_controller.safe_close())
+    tc.assertEqual(fast_controller.retrieve_error_messages(), [])
+
+def test_socket_channel_connection_refused(tc):
+    fx = gtp_engine_fixtures.Engine_server_fixture(tc)
+    address = fx.address
+    fx.server.close()
+    with tc.assertRaises(GtpChannelError) as ar:
+        gtp_controller.Socket_gtp_channel(address)
+    tc.assertIn("Connection refused", str(ar.exception))
+
+def test_socket_channel_engine_exits(tc):
+    fx = gtp_engine_fixtures.Engine_server_fixture(tc)
+    channel = gtp_controller.Socket_gtp_channel(fx.address)
+    fx.server.handle_connection()
+    controller = Gtp_controller(channel, 'socket test')
+    tc.assertEqual(controller.do_command("quit"), "")
+    with tc.assertRaises(GtpChannelClosed) as ar:
+        controller.do_command("name")
+    tc.assertEqual(str(ar.exception),
+                   "error reading response to 'name' from socket test:\n"
+                   "engine has closed the response channel")
+    controller.safe_close()
+
+
 ### Game_controller
 
 def test_game_controller(tc):
@@ -850,6 +1354,83 @@ def test_game_controller(tc):
         ('quit', []),
         ])
 
+
+def test_game_controller_set_player_socket(tc):
+    fx = gtp_engine_fixtures.Engine_server_fixture(tc)
+    gc = gtp_controller.Game_controller('one', 'two')
+    # set_player_socket() talks to the engine, so the server has to accept the
+    # connection in another thread.
+    server_thread = threading.Thread(target=fx.server.handle_connection)
+    server_thread.start()
+    gc.set_player_socket('b', fx.address, genmove_timeout=20)
+    server_thread.join()
+    controller = gc.get_controller('b')
+    tc.assertEqual(controller.name, 'player one')
+    tc.assertIsInstance(controller.channel, gtp_controller.Socket_gtp_channel)
+    tc.assertEqual(controller.genmove_timeout, 20)
+    tc.assertEqual(gc.engine_descriptions['b'].raw_name, "socket test engine")
+    address = fx.address
+    fx.server.close(wait=False)
+    with tc.assertRaises(GtpChannelError) as ar:
+        gc.set_player_socket('w', address)
+    tc.assertTrue(str(ar.exception).startswith(
+        "error connecting to 127.0.0.1:%d for player two:\n" % address[1]))
+    gc.close_players()
+    tc.assertIsNone(gc.describe_late_errors())
+
+def test_game_controller_command_timings(tc):
+    channel1 = gtp_engine_fixtures.get_test_channel()
+    controller1 = Gtp_controller(channel1, 'player one')
+    channel2 = gtp_engine_fixtures.get_test_channel()
+    controller2 = Gtp_controller(channel2, 'player two')
+    gc = gtp_controller.Game_controller('one', 'two')
+    tc.assertIsNone(gc.get_command_timings())
+    gc.enable_command_timings()
+    gc.set_player_controller('b', controller1)
+    gc.set_player_controller('w', controller2)
+    gc.send_command('b', 'test')
+    timings = gc.get_command_timings()
+    tc.assertEqual(timings['b'].get_commands(),
+                   ['known_command', 'name', 'protocol_version', 'test',
+                    'version'])
+    tc.assertEqual(timings['w'].get_commands(),
+                   ['known_command', 'name', 'protocol_version', 'version'])
+    tc.assertIs(gc.release_player('b'), controller1)
+    tc.assertIsNone(controller1.command_timings)
+    gc.close_players()
+    tc.assertEqual(timings['w'].get_summary('quit').count, 1)
+
+def test_game_controller_send_commands(tc):
+    channel1 = gtp_engine_fixtures.get_test_channel()
+    controller1 = Gtp_controller(channel1, 'player one')
+    channel2 = gtp_engine_fixtures.get_test_channel()
+    controller2 = Gtp_controller(channel2, 'player two')
+    gc = gtp_controller.Game_controller('one', 'two')
+    gc.set_player_controller('b', controller1)
+    gc.set_player_controller('w', controller2)
+    tc.assertEqual(gc.send_commands('b', [("test", []), ("test", ["x"])]),
+                   ["test response", "args: x"])
+    with tc.assertRaises(BadGtpResponse) as ar:
+        gc.send_commands('b', [("test", []), ("error", []), ("test", ["y"])])
+    tc.assertEqual(ar.exception.gtp_error_message, "normal error")
+    gc.set_cautious_mode(True)
+    with tc.assertRaises(BadGtpResponse) as ar:
+        gc.send_commands('w', [("error", []), ("test", ["z"])])
+    tc.assertEqual(ar.exception.gtp_error_message, "normal error")
+    tc.assertEqual(channel1.engine.commands_handled[-5:], [
+        ('test', []),
+        ('test', ['x']),
+        ('test', []),
+        ('error', []),
+        ('test', ['y']),
+        ])
+    tc.assertEqual(channel2.engine.commands_handled[-2:], [
+        ('error', []),
+        ('test', ['z']),
+        ])
+    gc.close_players()
+    tc.assertIsNone(gc.describe_late_errors())
+
 def test_game_controller_same_player_code(tc):
     tc.assertRaisesRegexp(ValueError, "^player codes must be distinct$",
                           gtp_controller.Game_controller, 'one', 'one')
@@ -1,9 +1,11 @@
 """Engines (and channels) provided for the use of controller-side testing."""
 
 import os
+import sys
 
 from gomill import gtp_controller
 from gomill import gtp_engine
+from gomill import gtp_proxy
 from gomill.gtp_engine import GtpError, GtpFatalError, GtpQuit
 from gomill.gtp_controller import GtpChannelError
 from gomill.common import *
@@ -108,7 +110,7 @@ class Test_player(object):
         self.boardsize = gtp_engine.interpret_int(args[0])
 
     def handle_clear_board(self, args):
-        pass
+        self.row_to_play = 0
 
     def handle_komi(self, args):
         pass
@@ -272,6 +274,77 @@ class State_reporter_fixture(object):
         tc.addCleanup(self.devnull.close)
 
 
+## Engine server
+
+# Minimal engine for use with Engine_server_fixture. It passes every move,
+# except that it takes its time over genmove if its argument is 'slow'.
+_server_engine_code = """
+import sys, time
+slow = sys.argv[1:] == ['slow']
+responses = {'protocol_version' : '2', 'name' : 'socket test engine'}
+while True:
+    line = sys.stdin.readline()
+    if not line:
+        break
+    words = line.split()
+    if not words:
+        continue
+    if words[0].isdigit():
+        command_id = words.pop(0)
+    else:
+        command_id = ''
+    command = words[0]
+    if command == 'genmove':
+        if slow:
+            time.sleep(30)
+        response = 'pass'
+    else:
+        response = responses.get(command, '')
+    sys.stdout.write('=%s %s\\n\\n' % (command_id, response))
+    sys.stdout.flush()
+    if command == 'quit':
+        break
+"""
+
+class Engine_server_fixture(object):
+    """Fixture providing a gtp_proxy.Subprocess_engine_server.
+
+    Instantiate with
+      tc          -- TestCase
+      address     -- address to listen on (default loopback, any port)
+      slow        -- bool (default False)
+      max_engines -- int (default 1)
+
+    The engine passes every move. If 'slow' is true, it takes 30 seconds
+    over genmove.
+
+    Attributes:
+      server  -- Subprocess_engine_server
+      address -- the address being listened on
+
+    The server is closed (without waiting for engines) at cleanup time.
+
+    """
+    def __init__(self, tc, address=("127.0.0.1", 0), slow=False,
+                 max_engines=1):
+        cmd = [sys.executable, "-c", _server_engine_code]
+        if slow:
+            cmd.append("slow")
+        self.server = gtp_proxy.Subprocess_engine_server(
+            cmd, address, max_engines=max_engines)
+        self.address = self.server.address
+        tc.addCleanup(self._close)
+
+    def _close(self):
+        self.server.close(wait=False)
+        for p in self.server.engines.values():
+            try:
+                p.kill()
+                p.wait()
+            except EnvironmentError:
+                pass
+
+
 ## Mock subprocess gtp channel
 
 class Mock_resource_usage(object):
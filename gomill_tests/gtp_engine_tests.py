@@ -2,6 +2,10 @@
 
 from __future__ import with_statement
 
+import os
+import socket
+import threading
+
 from gomill import gtp_engine
 
 from gomill_tests import gomill_test_support
@@ -54,3 +58,126 @@ def test_run_gtp_session_broken_pipe(tc):
     command_pipe.close()
     response_pipe.close()
 
+
+
+### Gtp_engine_server
+
+class Engine_server_fixture(object):
+    """Fixture running a Gtp_engine_server in a separate thread.
+
+    attributes:
+      server   -- Gtp_engine_server
+      engines  -- list of engines created by make_engine
+      released -- list of engines passed to release_engine
+
+    The engines have a 'count' command, which reports how many times it
+    has been called for that engine, and a 'stop' command, which shuts the
+    server down.
+
+    """
+    def __init__(self, tc, address=("127.0.0.1", 0)):
+        self.engines = []
+        self.released = []
+        self.server = gtp_engine.Gtp_engine_server(
+            self.make_engine, address, release_engine=self.released.append)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        tc.addCleanup(self._cleanup)
+
+    def make_engine(self):
+        counter = []
+        def handle_count(args):
+            counter.append(None)
+            return str(len(counter))
+        def handle_stop(args):
+            self.server.shutdown()
+        engine = gtp_engine.Gtp_engine_protocol()
+        engine.add_protocol_commands()
+        engine.add_command('count', handle_count)
+        engine.add_command('stop', handle_stop)
+        self.engines.append(engine)
+        return engine
+
+    def connect(self):
+        s = socket.socket(self.server.listener.family, socket.SOCK_STREAM)
+        s.connect(self.server.address)
+        return s
+
+    def stop(self):
+        self.server.shutdown()
+        self.thread.join(10)
+
+    def _cleanup(self):
+        if self.thread.isAlive():
+            self.stop()
+        self.server.close()
+
+def _read_response(s, count=1):
+    data = ""
+    while data.count("\n\n") < count:
+        chunk = s.recv(4096)
+        if chunk == "":
+            break
+        data += chunk
+    return data
+
+def test_engine_server(tc):
+    fx = Engine_server_fixture(tc)
+    s1 = fx.connect()
+    s2 = fx.connect()
+    s1.sendall("count\n")
+    tc.assertEqual(_read_response(s1), "= 1\n\n")
+    s2.sendall("1 count\n")
+    tc.assertEqual(_read_response(s2), "=1 1\n\n")
+    # Two commands in one write
+    s1.sendall("count\nprotocol_version\n")
+    tc.assertEqual(_read_response(s1, 2), "= 2\n\n= 2\n\n")
+    s2.sendall("quit\n")
+    tc.assertEqual(_read_response(s2), "=\n\n")
+    tc.assertEqual(s2.recv(10), "")
+    s2.close()
+    # Command split across writes, and unterminated final command
+    s1.sendall("cou")
+    s1.sendall("nt\ncount")
+    s1.shutdown(socket.SHUT_WR)
+    tc.assertEqual(_read_response(s1, 2), "= 3\n\n= 4\n\n")
+    tc.assertEqual(s1.recv(10), "")
+    s1.close()
+    s3 = fx.connect()
+    s3.sendall("stop\n")
+    tc.assertEqual(_read_response(s3), "=\n\n")
+    fx.thread.join(10)
+    tc.assertFalse(fx.thread.isAlive())
+    s3.close()
+    tc.assertEqual(fx.server.session_count, 3)
+    tc.assertEqual(len(fx.engines), 3)
+    tc.assertItemsEqual(fx.released, fx.engines)
+
+def test_engine_server_unix(tc):
+    pathname = os.path.join(tc.sandbox(), "engine.sock")
+    fx = Engine_server_fixture(tc, pathname)
+    s = fx.connect()
+    s.sendall("count\n")
+    tc.assertEqual(_read_response(s), "= 1\n\n")
+    s.close()
+    fx.stop()
+    fx.server.close()
+    tc.assertFalse(os.path.exists(pathname))
+
+def test_engine_server_make_engine_error(tc):
+    def make_engine():
+        raise ValueError("no engine for you")
+    errors = []
+    class Server(gtp_engine.Gtp_engine_server):
+        def handle_session_error(self, exc_info):
+            errors.append(exc_info[1])
+            self.shutdown()
+    server = Server(make_engine, ("127.0.0.1", 0))
+    tc.addCleanup(server.close)
+    s = socket.socket()
+    s.connect(server.address)
+    server.serve_forever()
+    tc.assertEqual(s.recv(10), "")
+    s.close()
+    tc.assertEqual(len(errors), 1)
+    tc.assertEqual(str(errors[0]), "no engine for you")
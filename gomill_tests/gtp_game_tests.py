@@ -6,10 +6,12 @@ import cPickle as pickle
 from textwrap import dedent
 
 from gomill import boards
+from gomill import event_loops
 from gomill import gtp_controller
 from gomill import gtp_games
 from gomill import sgf
 from gomill.common import format_vertex
+from gomill.event_loops import Return
 from gomill.gtp_controller import GtpChannelError, GtpChannelClosed
 
 from gomill_tests import test_framework
@@ -643,6 +645,31 @@ def test_forfeit_genmove_fails(tc):
         "forced to fail")
     fx.check_moves(moves[:-1])
 
+def test_forfeit_genmove_timeout(tc):
+    def trigger_timeout_next_genmove():
+        fx.channel_b.timeout_command = "genmove"
+        return 'C5'
+    moves = [
+        ('b', trigger_timeout_next_genmove), ('w', 'F5'),
+        ('b', 'D6'),
+        ]
+    fx = Gtp_game_fixture(
+        tc, Programmed_player(moves), Programmed_player(moves))
+    fx.game.prepare()
+    fx.game.run()
+    tc.assertEqual(fx.game.result.sgf_result, "W+T")
+    tc.assertEqual(fx.game.result.winning_colour, 'w')
+    tc.assertEqual(fx.game.result.winning_player, 'two')
+    tc.assertIs(fx.game.result.is_forfeit, True)
+    tc.assertEqual(
+        fx.game.result.detail,
+        "forfeit by one: timeout reading response to 'genmove b' "
+        "from player one:\n"
+        "forced timeout for get_response_line")
+    fx.check_moves([('b', 'C5'), ('w', 'F5')])
+    fx.game_controller.close_players()
+    tc.assertIsNone(fx.game_controller.describe_late_errors())
+
 def test_forfeit_rejected_as_illegal(tc):
     moves = [
         ('b', 'C5'), ('w', 'F5'),
@@ -1169,3 +1196,86 @@ def test_reject_second_pass_as_illegal(tc):
     fx.check_moves([
         ('b', 'C3'), ('w', 'D3'), ('b', 'pass'), ('w', 'pass'),
         ])
+
+
+### Async_gtp_game
+
+def make_async_game(player_b=None, player_w=None, **kwargs):
+    """Return a new Async_gtp_game between two test players.
+
+    The players default to Test_players.
+
+    Additional keyword arguments are passed on to Async_gtp_game.
+
+    This is a coroutine.
+
+    """
+    kwargs.setdefault('board_size', 9)
+    game_controller = gtp_controller.Async_game_controller('one', 'two')
+    for colour, player in (('b', player_b), ('w', player_w)):
+        if player is None:
+            player = gtp_engine_fixtures.Test_player()
+        channel = gtp_controller_test_support.Testing_gtp_channel(
+            gtp_engine_fixtures.make_player_engine(player))
+        controller = gtp_controller.Async_gtp_controller(
+            channel, 'player %s' % game_controller.players[colour])
+        yield game_controller.set_player_controller(colour, controller)
+    raise Return(gtp_games.Async_gtp_game(game_controller, **kwargs))
+
+def test_async_game(tc):
+    def play(game_id):
+        game = yield make_async_game()
+        game.set_game_id(game_id)
+        game.use_internal_scorer()
+        yield game.prepare()
+        yield game.run()
+        yield game.game_controller.close_players()
+        raise Return(game)
+    tasks = event_loops.run_all([play("game%d" % i) for i in range(3)])
+    for i, task in enumerate(tasks):
+        game = task.get_result()
+        tc.assertEqual(game.result.game_id, "game%d" % i)
+        tc.assertEqual(game.result.sgf_result, "B+18")
+        tc.assertEqual(game.result.cpu_times, {'one' : None, 'two' : None})
+        tc.assertEqual(len(game.get_moves()), 20)
+        tc.assertIsNone(game.game_controller.describe_late_errors())
+
+def test_async_game_fixed_handicap(tc):
+    def handle_fixed_handicap(args):
+        return "C3 G7 C7"
+    def play():
+        game = yield make_async_game()
+        for colour in 'b', 'w':
+            game.game_controller.get_controller(colour).channel.engine.\
+                add_command('fixed_handicap', handle_fixed_handicap)
+        yield game.prepare()
+        yield game.set_handicap(3, is_free=False)
+        yield game.run()
+        raise Return(game)
+    game = event_loops.run_blocking(play())
+    tc.assertEqual(game.result.sgf_result, "B+F")
+    tc.assertEqual(game.result.detail,
+                   "forfeit by two: attempted move to occupied point G7")
+    tc.assertEqual(len(game.get_moves()), 12)
+
+def test_async_game_channel_error(tc):
+    channel_b = []
+    def trigger_fail_next_genmove():
+        channel_b[0].fail_command = "genmove"
+        return 'C3'
+    moves = [
+        ('b', trigger_fail_next_genmove),
+        ('w', 'D3'),
+        ('b', 'E3'),
+        ]
+    def play():
+        game = yield make_async_game(
+            Programmed_player(moves), Programmed_player(moves))
+        channel_b.append(game.game_controller.get_controller('b').channel)
+        yield game.prepare()
+        yield game.run()
+    with tc.assertRaises(GtpChannelError) as ar:
+        event_loops.run_blocking(play())
+    tc.assertEqual(str(ar.exception),
+                   "transport error sending 'genmove b' to player one:\n"
+                   "forced failure for send_command_line")
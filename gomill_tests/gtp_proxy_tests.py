@@ -240,3 +240,45 @@ def test_set_back_end_subprocess_nonexistent_program(tc):
     tc.assertIsInstance(ar.exception.cause, GtpChannelError)
     # check it's safe to close when the controller was never set
     proxy.close()
+
+
+### Subprocess_engine_server
+
+def test_engine_server(tc):
+    fx = gtp_engine_fixtures.Engine_server_fixture(tc, max_engines=2)
+    tc.assertEqual(fx.address[0], "127.0.0.1")
+    tc.assertNotEqual(fx.address[1], 0)
+    channels = []
+    for i in range(2):
+        channels.append(gtp_controller.Socket_gtp_channel(fx.address))
+        fx.server.handle_connection()
+    tc.assertEqual(len(fx.server.engines), 2)
+    for channel in channels:
+        channel.send_command("name", [])
+        tc.assertEqual(channel.get_response(), (False, "socket test engine"))
+    # Each connection has its own engine, which exits when the connection is
+    # closed.
+    channels[0].close()
+    channel = gtp_controller.Socket_gtp_channel(fx.address)
+    fx.server.handle_connection()
+    tc.assertEqual(len(fx.server.engines), 2)
+    channel.send_command("genmove", ["b"])
+    tc.assertEqual(channel.get_response(), (False, "pass"))
+    channel.close()
+    channels[1].close()
+    fx.server.close()
+    tc.assertEqual(fx.server.engines, {})
+
+def test_engine_server_bad_command(tc):
+    server = gtp_proxy.Subprocess_engine_server(
+        ["/nonexistent/program"], ("127.0.0.1", 0))
+    tc.addCleanup(server.close)
+    channel = gtp_controller.Socket_gtp_channel(server.address)
+    with tc.assertRaises(BackEndError) as ar:
+        server.handle_connection()
+    tc.assertEqual(str(ar.exception),
+                   "can't launch back end command\n"
+                   "[Errno 2] No such file or directory")
+    channel.send_command("name", [])
+    tc.assertRaises(GtpChannelClosed, channel.get_response)
+    channel.close()
@@ -5,7 +5,7 @@ from textwrap import dedent
 from gomill import boards
 from gomill import gtp_engine
 from gomill import gtp_states
-from gomill.common import format_vertex
+from gomill.common import format_vertex, move_from_vertex
 
 from gomill_tests import test_framework
 from gomill_tests import gomill_test_support
@@ -277,6 +277,37 @@ def test_undo(tc):
     fx.check_command('gomill-explain_last_move', [], "")
     fx.check_command('undo', [], "cannot undo", expect_failure=True)
 
+def test_undo_ko(tc):
+    ko_setup_moves = [
+        ('B', 'C5'), ('W', 'F5'),
+        ('B', 'D6'), ('W', 'E4'),
+        ('B', 'D4'), ('W', 'E6'),
+        ('B', 'E5'), ('W', 'D5'),
+        ]
+    fx = Gtp_state_fixture(tc)
+    for colour, vertex in ko_setup_moves:
+        fx.check_command('play', [colour, vertex], "")
+    fx.check_command('play', ['B', 'A1'], "")
+    fx.check_command('play', ['W', 'pass'], "")
+    fx.check_command('undo', [], "")
+    fx.check_command('undo', [], "")
+    fx.player.set_next_move("G7")
+    fx.check_command('genmove', ['B'], "G7")
+    tc.assertEqual(fx.player.last_game_state.ko_point, (4, 4))
+    fx.check_command('undo', [], "")
+    # undo the capture of E5
+    fx.check_command('undo', [], "")
+    fx.player.set_next_move("G7")
+    fx.check_command('genmove', ['W'], "G7")
+    game_state = fx.player.last_game_state
+    tc.assertIsNone(game_state.ko_point)
+    b = boards.Board(9)
+    for colour, vertex in ko_setup_moves[:-1] + [('W', 'G7')]:
+        row, col = move_from_vertex(vertex, 9)
+        b.play(row, col, colour.lower())
+    tc.assertEqual(game_state.board, b)
+    tc.assertEqual(len(game_state.move_history), 7)
+
 def test_fixed_handicap(tc):
     fx = Gtp_state_fixture(tc)
     fx.check_command('fixed_handicap', ['3'], "C3 G7 C7")
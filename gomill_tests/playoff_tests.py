@@ -2,6 +2,7 @@
 
 from __future__ import with_statement
 
+from collections import defaultdict
 from textwrap import dedent
 import cPickle as pickle
 
@@ -85,7 +86,7 @@ def test_basic_config(tc):
             Matchup_config(
                 't1',  't2', board_size=9, komi=0.5, alternating=True,
                 handicap=6, handicap_style='free',
-                move_limit=50,
+                move_limit=50, superko_rule='positional',
                 scorer="internal", internal_scorer_handicap_compensation='no',
                 number_of_games=20),
             Matchup_config('t2', 't1', id='m1'),
@@ -111,6 +112,7 @@ def test_basic_config(tc):
     tc.assertEqual(m0.handicap, 6)
     tc.assertEqual(m0.handicap_style, 'free')
     tc.assertEqual(m0.move_limit, 50)
+    tc.assertEqual(m0.superko_rule, 'positional')
     tc.assertEqual(m0.scorer, 'internal')
     tc.assertEqual(m0.internal_scorer_handicap_compensation, 'no')
     tc.assertEqual(m0.number_of_games, 20)
@@ -123,6 +125,7 @@ def test_basic_config(tc):
     tc.assertEqual(m1.handicap, None)
     tc.assertEqual(m1.handicap_style, 'fixed')
     tc.assertEqual(m1.move_limit, 1000)
+    tc.assertIsNone(m1.superko_rule)
     tc.assertEqual(m1.scorer, 'players')
     tc.assertEqual(m1.internal_scorer_handicap_compensation, 'full')
     tc.assertEqual(m1.number_of_games, None)
@@ -258,6 +261,7 @@ def test_play(tc):
     tc.assertEqual(job1.board_size, 13)
     tc.assertEqual(job1.komi, 7.5)
     tc.assertEqual(job1.move_limit, 1000)
+    tc.assertIsNone(job1.superko_rule)
     tc.assertIs(job1.use_internal_scorer, False)
     tc.assertEqual(job1.internal_scorer_handicap_compensation, 'full')
     tc.assertEqual(job1.game_data, ('0', 0))
@@ -301,7 +305,7 @@ def test_play(tc):
     fx.check_screen_report(expected_report)
     fx.check_short_report(expected_report, expected_players)
 
-    tc.assertListEqual(
+    tc.assertGameResultListEqual(
         fx.comp.get_tournament_results().get_matchup_results('0'), [result1])
 
 def test_play_many(tc):
@@ -454,6 +458,30 @@ def test_self_play(tc):
     competition_test_support.check_round_trip(tc, fx.comp, config)
 
 
+def test_old_format_state(tc):
+    # Status files from gomill 0.8.2 and earlier have lists of Game_results
+    fx = Playoff_fixture(tc)
+    jobs = [fx.comp.get_game() for _ in range(4)]
+    for i, job in enumerate(jobs):
+        fx.comp.process_game_result(fake_response(job, 'bw'[i % 2]))
+    status = pickle.loads(pickle.dumps(fx.comp.get_status()))
+    old_results = defaultdict(list)
+    for matchup_id, results in status['results'].items():
+        old_results[matchup_id] = list(results)
+    status['results'] = old_results
+
+    comp2 = playoffs.Playoff('testcomp')
+    comp2.initialise_from_control_file(default_config())
+    comp2.set_status(status)
+    check_screen_report(
+        tc, comp2, competition_test_support.get_screen_report(fx.comp))
+    tc.assertGameResultListEqual(
+        comp2.get_tournament_results().get_matchup_results('0'),
+        fx.comp.get_tournament_results().get_matchup_results('0'))
+    comp2.process_game_result(fake_response(comp2.get_game(), 'b'))
+    tc.assertEqual(
+        len(comp2.get_tournament_results().get_matchup_results('0')), 5)
+
 def test_bad_state(tc):
     fx = Playoff_fixture(tc)
     bad_status = fx.comp.get_status()
@@ -0,0 +1,187 @@
+"""Tests for result_stores.py"""
+
+import cPickle as pickle
+
+from gomill import gtp_games
+from gomill import result_stores
+from gomill import tournament_results
+
+from gomill_tests import gomill_test_support
+
+def make_tests(suite):
+    suite.addTests(gomill_test_support.make_simple_tests(globals()))
+
+
+def make_result(winner, margin, player_b='p1', player_w='p2',
+                game_id=None, detail=None, cpu_times=None):
+    result = gtp_games.Game_result.from_score(winner, margin, detail)
+    result.set_players({'b' : player_b, 'w' : player_w})
+    result.game_id = game_id
+    if cpu_times is not None:
+        result.soft_update_cpu_times(cpu_times)
+    return result
+
+def make_varied_results():
+    results = [
+        make_result('b', 1.5, game_id='0_000'),
+        make_result('w', 12, 'p2', 'p1', game_id='0_001',
+                    cpu_times={'b' : 3.25}),
+        make_result(None, 0, game_id='0_002', cpu_times={'b' : 1, 'w' : 2}),
+        make_result(None, None, game_id='0_010', detail="no score reported"),
+        make_result('b', None, game_id='0_011', detail="players disagreed"),
+        make_result('w', 0.5, game_id='xyz', cpu_times={'w' : 0.0}),
+        make_result('b', 7, game_id='game_007_1'),
+        make_result('b', 7, game_id=None),
+        make_result('b', 7, game_id='0_0123456789012'),
+        ]
+
+    forfeit = make_result('w', None, game_id='0_100')
+    forfeit.sgf_result = "W+F"
+    forfeit.is_forfeit = True
+    forfeit.set_players({'b' : 'p1', 'w' : 'p2'})
+    forfeit.detail = "forfeit by p1: engine crashed"
+    results.append(forfeit)
+
+    resigned = make_result('b', None, game_id='0_101')
+    resigned.sgf_result = "B+R"
+    results.append(resigned)
+
+    void = make_result(None, None, game_id='0_102', detail="hit move limit")
+    void.sgf_result = "Void"
+    results.append(void)
+
+    odd_margin = make_result('w', None, game_id='0_103')
+    odd_margin.sgf_result = "W+3.50"
+    results.append(odd_margin)
+    return results
+
+def test_round_trip(tc):
+    results = make_varied_results()
+    store = result_stores.Result_store(results)
+    tc.assertEqual(len(store), len(results))
+    tc.assertGameResultListEqual(list(store), results)
+    tc.assertGameResultListEqual(store[2:4], results[2:4])
+    tc.assertGameResultListEqual([store[-1]], [results[-1]])
+    tc.assertEqual([r.describe() for r in store],
+                   [r.describe() for r in results])
+    tc.assertEqual([r.is_jigo for r in store], [r.is_jigo for r in results])
+    tc.assertEqual([r.is_unknown for r in store],
+                   [r.is_unknown for r in results])
+    tc.assertEqual([r.losing_player for r in store],
+                   [r.losing_player for r in results])
+    tc.assertRaises(IndexError, store.__getitem__, len(results))
+
+def test_columns(tc):
+    store = result_stores.Result_store()
+    store.extend(make_varied_results()[:3])
+    tc.assertEqual(store.player_codes, ['p1', 'p2'])
+    tc.assertEqual(list(store.players_b), [0, 1, 0])
+    tc.assertEqual(list(store.winners), [result_stores.BLACK_WINS,
+                                         result_stores.WHITE_WINS,
+                                         result_stores.NO_WINNER])
+    tc.assertEqual(list(store.flags), [0, 0, result_stores.JIGO])
+    tc.assertEqual(list(store.margins)[:2], [1.5, 12.0])
+    tc.assertEqual(list(store.cpu_times_b)[1:], [3.25, 1.0])
+    tc.assertEqual(store.get_player_index('p2'), 1)
+    tc.assertEqual(store.get_player_index('p3'), -1)
+    tc.assertEqual(store.get_game_id(1), '0_001')
+    tc.assertEqual(store.get_sgf_result(1), 'W+12')
+
+def test_pickle(tc):
+    results = make_varied_results()
+    store = result_stores.Result_store(results)
+    store2 = pickle.loads(pickle.dumps(store, protocol=2))
+    tc.assertGameResultListEqual(list(store2), results)
+    store2.append(results[0])
+    tc.assertGameResultListEqual(list(store2), results + results[:1])
+    tc.assertEqual(len(store), len(results))
+
+def test_pickle_other_byteorder(tc):
+    results = make_varied_results()
+    store = result_stores.Result_store(results)
+    state = store.__getstate__()
+    for name, s in state['columns'].items():
+        a = getattr(store, name)[:]
+        a.byteswap()
+        state['columns'][name] = a.tostring()
+    state['byteorder'] = {'little' : 'big', 'big' : 'little'}[
+        state['byteorder']]
+    store2 = result_stores.Result_store.__new__(result_stores.Result_store)
+    store2.__setstate__(state)
+    tc.assertGameResultListEqual(list(store2), results)
+
+def test_matchup_stats(tc):
+    results = [
+        make_result('b', 1.5),
+        make_result('w', 1.5, 'p2', 'p1', cpu_times={'b' : 4, 'w' : 2}),
+        make_result('b', 1.5, 'p2', 'p1'),
+        make_result(None, 0),
+        make_result(None, None),
+        ]
+    forfeit = make_result('w', None)
+    forfeit.sgf_result = "W+F"
+    forfeit.is_forfeit = True
+    results.append(forfeit)
+
+    def stats(results):
+        ms = tournament_results.Matchup_stats(results, 'p1', 'p2')
+        ms.calculate_colour_breakdown()
+        ms.calculate_time_stats()
+        return ms
+    ms = stats(results)
+    tc.assertEqual(ms.total, 6)
+    tc.assertEqual(ms.wins_1, 2.5)
+    tc.assertEqual(ms.wins_2, 2.5)
+    tc.assertEqual(ms.forfeits_1, 1)
+    tc.assertEqual(ms.forfeits_2, 0)
+    tc.assertEqual(ms.unknown, 1)
+    tc.assertIs(ms.alternating, True)
+    tc.assertEqual(ms.played_1b, 4)
+    tc.assertEqual(ms.played_y2, 4)
+    tc.assertEqual(ms.wins_b, 2.5)
+    tc.assertEqual(ms.wins_w, 2.5)
+    tc.assertEqual(ms.wins_1b, 1.5)
+    tc.assertEqual(ms.wins_1w, 1.5)
+    tc.assertEqual(ms.wins_2b, 1.5)
+    tc.assertEqual(ms.wins_2w, 1.5)
+    tc.assertEqual(ms.average_time_1, 2.0)
+    tc.assertEqual(ms.average_time_2, 4.0)
+
+    ms2 = stats(result_stores.Result_store(results))
+    tc.assertEqual(ms2.wins_1b, 1.5)
+    tc.assertEqual(ms2.forfeits_1, 1)
+
+def test_matchup_stats_empty(tc):
+    ms = tournament_results.Matchup_stats(
+        result_stores.Result_store(), 'p1', 'p2')
+    ms.calculate_colour_breakdown()
+    ms.calculate_time_stats()
+    tc.assertEqual(ms.total, 0)
+    tc.assertEqual(ms.wins_1, 0)
+    tc.assertIs(ms.alternating, False)
+    tc.assertIsNone(ms.average_time_1)
+
+def test_running_totals(tc):
+    results = make_varied_results()
+    store = result_stores.Result_store()
+    for i, result in enumerate(results):
+        store.append(result)
+        tc.assertEqual(sum(store.tally.values()), i + 1)
+    tc.assertEqual(store.tally[(0, 1, result_stores.BLACK_WINS, 0)], 6)
+    tc.assertEqual(store.tally[(0, 1, result_stores.NO_WINNER,
+                                result_stores.JIGO)], 1)
+    tc.assertEqual(store.tally[(0, 1, result_stores.WHITE_WINS,
+                                result_stores.FORFEIT)], 1)
+    tc.assertEqual(store.cpu_totals, {0 : (1.0, 1), 1 : (5.25, 3)})
+
+    store2 = pickle.loads(pickle.dumps(store, protocol=2))
+    tc.assertEqual(store2.tally, store.tally)
+    tc.assertEqual(store2.cpu_totals, store.cpu_totals)
+
+    ms = tournament_results.Matchup_stats(store2, 'p1', 'p2')
+    tc.assertEqual(ms.total, len(results))
+    store2.append(make_result('w', 3.5, cpu_times={'w' : 0.75}))
+    ms = tournament_results.Matchup_stats(store2, 'p1', 'p2')
+    ms.calculate_time_stats()
+    tc.assertEqual(ms.total, len(results) + 1)
+    tc.assertEqual(ms.average_time_2, 1.5)
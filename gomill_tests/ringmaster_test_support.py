@@ -2,6 +2,7 @@
 
 from collections import defaultdict
 from cStringIO import StringIO
+import cPickle as pickle
 
 from gomill import ringmasters
 from gomill import ringmaster_presenters
@@ -40,8 +41,9 @@ class Testing_ringmaster(ringmasters.Ringmaster):
     (If you're testing run(), make sure record_games is False, and either
     stderr_to_log is False, or else discard_stderr is True for each player.)
 
-    (Currently, write_status is made to do nothing, so it's not usefully
-    testable.)
+    (The most recent value written to the state file, the records written to
+    the journal, and the contents of the command timings file, are kept in
+    memory.)
 
     Instantiate with the control file contents as an 8-bit string.
 
@@ -54,7 +56,10 @@ class Testing_ringmaster(ringmasters.Ringmaster):
     def __init__(self, control_file_contents):
         self._control_file_contents = control_file_contents
         self._test_status = None
+        self._test_journal = []
         self._written_status = None
+        self._written_journal = []
+        self._timings_file_contents = None
         ringmasters.Ringmaster.__init__(self, '/nonexistent/ctl/test.ctl')
         self.set_stdout(StringIO())
 
@@ -73,15 +78,17 @@ class Testing_ringmaster(ringmasters.Ringmaster):
     def _read_control_file(self):
         return self._control_file_contents
 
-    def set_test_status(self, test_status):
+    def set_test_status(self, test_status, test_journal=()):
         """Specify the value that will be loaded from the state file.
 
-        test_status -- fake state file contents
+        test_status  -- fake state file contents
+        test_journal -- fake journal contents (list of records)
 
         test_status should be a pair (status_format_version, status dict)
 
         """
         self._test_status = test_status
+        self._test_journal = list(test_journal)
 
     def _load_status(self):
         return self._test_status
@@ -90,7 +97,30 @@ class Testing_ringmaster(ringmasters.Ringmaster):
         return (self._test_status is not None)
 
     def _write_status(self, value):
-        self._written_status = value
+        # Pickle and unpickle, so later changes don't affect the stored value
+        self._written_status = pickle.loads(pickle.dumps(value, protocol=-1))
+
+    def _write_journal_record(self, value):
+        self._written_journal.append(
+            pickle.loads(pickle.dumps(value, protocol=-1)))
+
+    def _sync_journal(self):
+        pass
+
+    def _close_journal(self):
+        pass
+
+    def _clear_journal(self):
+        self._written_journal = []
+
+    def _read_journal(self):
+        return self._test_journal[:]
+
+    def _read_timings_file(self):
+        return self._timings_file_contents
+
+    def _write_timings_file(self, s):
+        self._timings_file_contents = s
 
     def retrieve_printed_output(self):
         return self.stdout.getvalue()
@@ -1,7 +1,9 @@
 """Tests for ringmaster.py."""
 
+import copy
 import os
 import re
+from cStringIO import StringIO
 from textwrap import dedent
 
 from gomill_tests import test_framework
@@ -57,9 +59,9 @@ class Ringmaster_fixture(object):
         self.ringmaster._initialise_presenter()
         self.ringmaster._initialise_terminal_reader()
 
-    def initialise_with_state(self, ringmaster_status):
-        """Initialise the ringmaster with specified status."""
-        self.ringmaster.set_test_status(ringmaster_status)
+    def initialise_with_state(self, ringmaster_status, journal=()):
+        """Initialise the ringmaster with specified status and journal."""
+        self.ringmaster.set_test_status(ringmaster_status, journal)
         self.ringmaster.load_status()
         self.ringmaster._open_files()
         self.ringmaster._initialise_presenter()
@@ -85,6 +87,10 @@ class Ringmaster_fixture(object):
         """Return the unpickled value written to the state file."""
         return self.ringmaster._written_status
 
+    def get_written_journal(self):
+        """Return the unpickled records written to the journal."""
+        return self.ringmaster._written_journal[:]
+
 
 playoff_ctl = """
 
@@ -279,7 +285,7 @@ def test_process_response(tc):
     tc.assertListEqual(
         fx.messages('results'),
         ["game 0_000: p2 beat p1 W+1.5"])
-    tc.assertEqual(
+    tc.assertGameResultListEqual(
         fx.ringmaster.get_tournament_results().get_matchup_results('0'),
         [response.game_result])
     tc.assertEqual(fx.get_log(),
@@ -289,6 +295,74 @@ def test_process_response(tc):
                    "logtest\n")
     tc.assertEqual(fx.get_history(), "")
 
+def test_journal(tc):
+    fx = Ringmaster_fixture(tc, playoff_ctl)
+    fx.initialise_clean()
+    fx.ringmaster.write_status()
+    state = fx.get_written_state()
+    job1 = fx.ringmaster.get_job()
+    job2 = fx.ringmaster.get_job()
+    job3 = fx.ringmaster.get_job()
+    fx.ringmaster.process_response(fake_response(job2, 'b'))
+    fx.ringmaster.process_error_response(job1, "forced error")
+    fx.ringmaster.process_response(fake_response(job3, 'w'))
+    # The state file isn't rewritten after each game
+    tc.assertIs(fx.get_written_state(), state)
+    journal = fx.get_written_journal()
+    tc.assertEqual([(seq, record_type) for (seq, record_type, _) in journal],
+                   [(0, 'result'), (1, 'void'), (2, 'result')])
+
+    # Reloading replays the journal, and the unfinished game is reissued
+    fx2 = Ringmaster_fixture(tc, playoff_ctl)
+    fx2.initialise_with_state(copy.deepcopy(state), journal)
+    tc.assertEqual(fx2.ringmaster.void_game_count, 1)
+    tc.assertEqual(fx2.ringmaster.journal_seq, 3)
+    results = fx2.ringmaster.get_tournament_results().get_matchup_results('0')
+    tc.assertEqual([r.game_id for r in results], ['0_001', '0_002'])
+    tc.assertEqual(fx2.ringmaster.get_job().game_id, '0_000')
+    tc.assertEqual(fx2.ringmaster.get_job().game_id, '0_003')
+
+    # Records already included in the state file are skipped
+    fx2.ringmaster.write_status()
+    state2 = fx2.get_written_state()
+    tc.assertEqual(fx2.get_written_journal(), [])
+    fx3 = Ringmaster_fixture(tc, playoff_ctl)
+    fx3.initialise_with_state(state2, journal)
+    tc.assertEqual(fx3.ringmaster.void_game_count, 1)
+    results = fx3.ringmaster.get_tournament_results().get_matchup_results('0')
+    tc.assertEqual([r.game_id for r in results], ['0_001', '0_002'])
+
+    fx4 = Ringmaster_fixture(tc, playoff_ctl)
+    fx4.ringmaster.set_test_status(state, journal[:1] + journal[2:])
+    tc.assertRaisesRegexp(
+        RingmasterError,
+        "error loading competition state: "
+        "journal record 2 is out of sequence",
+        fx4.ringmaster.load_status)
+
+def test_journal_compaction(tc):
+    fx = Ringmaster_fixture(tc, playoff_ctl)
+    fx.ringmaster.journal_compaction_interval = 3
+    fx.initialise_clean()
+    for i in xrange(4):
+        fx.ringmaster.process_response(
+            fake_response(fx.ringmaster.get_job(), 'b'))
+    tc.assertEqual(len(fx.get_written_journal()), 1)
+    state = fx.get_written_state()
+    tc.assertEqual(state[1]['journal_seq'], 3)
+    fx2 = Ringmaster_fixture(tc, playoff_ctl)
+    fx2.initialise_with_state(state, fx.get_written_journal())
+    results = fx2.ringmaster.get_tournament_results().get_matchup_results('0')
+    tc.assertEqual(len(results), 4)
+
+def test_journal_not_used_for_tuners(tc):
+    fx = Ringmaster_fixture(tc, mcts_ctl)
+    fx.initialise_clean()
+    job = fx.ringmaster.get_job()
+    fx.ringmaster.process_response(fake_response(job, 'b'))
+    tc.assertEqual(fx.get_written_journal(), [])
+    tc.assertIsNot(fx.get_written_state(), None)
+
 
 def test_check_players(tc):
     fx = Ringmaster_fixture(tc, playoff_ctl)
@@ -327,6 +401,45 @@ def test_run(tc):
         "  0_001 p1 beat p2 B+10.5\n"
         "  0_002 p1 beat p2 B+10.5\n")
 
+def test_run_with_command_timings(tc):
+    fx = Ringmaster_fixture(tc, playoff_ctl, [
+        "record_command_timings = True",
+        ])
+    fx.initialise_clean()
+    fx.ringmaster.run(max_games=2)
+    timings = fx.ringmaster._load_command_timings()
+    tc.assertEqual(sorted(timings), ['p1', 'p2'])
+    tc.assertIn('genmove', timings['p1'].get_commands())
+    tc.assertIn('play', timings['p1'].get_commands())
+    p1_genmoves = timings['p1'].get_summary('genmove').count
+    tc.assertEqual(timings['p1'].get_summary('quit').count, 2)
+    # A later run adds to the recorded timings
+    fx2 = Ringmaster_fixture(tc, playoff_ctl, [
+        "record_command_timings = True",
+        ])
+    fx2.ringmaster._timings_file_contents = \
+        fx.ringmaster._timings_file_contents
+    fx2.initialise_clean()
+    fx2.ringmaster.run(max_games=1)
+    timings = fx2.ringmaster._load_command_timings()
+    tc.assertEqual(timings['p1'].get_summary('quit').count, 3)
+    tc.assertTrue(timings['p1'].get_summary('genmove').count > p1_genmoves)
+    out = StringIO()
+    fx2.ringmaster._write_command_timings_report(out)
+    lines = out.getvalue().split("\n")
+    tc.assertEqual(lines[:4],
+                   ["", "GTP command response times:", "", "player p1"])
+    tc.assertTrue(lines[4].startswith("command "))
+
+def test_run_without_command_timings(tc):
+    fx = Ringmaster_fixture(tc, playoff_ctl)
+    fx.initialise_clean()
+    fx.ringmaster.run(max_games=1)
+    tc.assertEqual(fx.ringmaster._load_command_timings(), {})
+    out = StringIO()
+    fx.ringmaster._write_command_timings_report(out)
+    tc.assertEqual(out.getvalue(), "")
+
 def test_run_allplayall(tc):
     fx = Ringmaster_fixture(tc, allplayall_ctl)
     fx.initialise_clean()
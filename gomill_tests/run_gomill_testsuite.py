@@ -8,6 +8,8 @@ test_modules = [
     'utils_tests',
     'common_tests',
     'board_tests',
+    'batch_scoring_tests',
+    'benchmark_tests',
     'sgf_grammar_tests',
     'sgf_properties_tests',
     'sgf_tests',
@@ -15,12 +17,15 @@ test_modules = [
     'gameplay_tests',
     'gtp_engine_tests',
     'gtp_state_tests',
+    'event_loop_tests',
+    'command_timings_tests',
     'gtp_controller_tests',
     'gtp_proxy_tests',
     'gtp_game_tests',
     'game_job_tests',
     'setting_tests',
     'competition_scheduler_tests',
+    'result_store_tests',
     'competition_tests',
     'playoff_tests',
     'allplayall_tests',
@@ -2,6 +2,10 @@
 
 from __future__ import with_statement
 
+import mmap
+import os
+from cStringIO import StringIO
+
 from gomill_tests import gomill_test_support
 
 from gomill import sgf_grammar
@@ -116,6 +120,24 @@ def test_tokeniser(tc):
     tc.assertEqual(check_incomplete(r"(;B[ag\])"), (3, 3))
     tc.assertEqual(check_incomplete(r"(;B[ag\\\])"), (3, 3))
 
+def test_tokenise_iter(tc):
+    tokenise_iter = sgf_grammar.tokenise_iter
+    tokens = tokenise_iter("junk (;B[ah] C[x])(;)")
+    tc.assertEqual(tokens.next(), ('D', '(', 6))
+    tc.assertEqual(list(tokens),
+                   [('D', ';', 7),
+                    ('I', 'B', 8),
+                    ('V', 'ah', 12),
+                    ('I', 'C', 14),
+                    ('V', 'x', 17),
+                    ('D', ')', 18)])
+    tc.assertEqual(list(tokenise_iter("(;AddBlack[ag])(;)", 15)),
+                   [('D', '(', 16), ('D', ';', 17), ('D', ')', 18)])
+    tc.assertEqual(list(tokenise_iter("junk")), [])
+    tc.assertEqual(list(tokenise_iter("(;B[ag]+)")),
+                   [('D', '(', 1), ('D', ';', 2), ('I', 'B', 3),
+                    ('V', 'ag', 7)])
+
 def test_tokeniser_lower_case_propidents(tc):
     tokenise = sgf_grammar.tokenise
 
@@ -230,6 +252,18 @@ def test_parser_tree_structure(tc):
     tc.assertRaisesRegexp(ValueError, "property value outside a node",
                           parse_sgf_game, "(;B[ag](;W[ah])(B[ai]))")
 
+def test_parser_deep_tree(tc):
+    # Many variations, nested deeply; the parser shouldn't recurse
+    s = "(;B[aa]" + "(;W[bb];B[cc])(;W[dd]" * 5000 + ")" * 5000 + ")"
+    coarse_game = sgf_grammar.parse_sgf_game(s)
+    depth = 0
+    while coarse_game.children:
+        tc.assertEqual(len(coarse_game.children), 2)
+        tc.assertEqual(len(coarse_game.children[0].sequence), 2)
+        coarse_game = coarse_game.children[1]
+        depth += 1
+    tc.assertEqual(depth, 5000)
+
 def test_parser_properties(tc):
     parse_sgf_game = sgf_grammar.parse_sgf_game
 
@@ -247,6 +281,155 @@ def test_parser_properties(tc):
     tc.assertEqual(props("(;XX[1]YY[2]XX[3]YY[4])"),
                    [{'XX': ['1', '3'], 'YY' : ['2', '4']}])
 
+def test_parser_main_line_only(tc):
+    def main_line(s):
+        coarse_game = sgf_grammar.parse_sgf_game(s, main_line_only=True)
+        tc.assertEqual(coarse_game.children, [])
+        return coarse_game.sequence
+
+    tc.assertEqual(main_line("junk (;C[abc]KO[]AB[ai][bh];B[ bc]) (;B[ag])"),
+                   [{'C': ['abc'], 'KO': [''], 'AB': ['ai', 'bh']},
+                    {'B': [' bc']}])
+    tc.assertEqual(main_line("(;AddBlack[ab]XX[1]XX[2])"),
+                   [{'AB': ['ab'], 'XX': ['1', '2']}])
+    tc.assertEqual(main_line("""
+        (;C[abc]AB[ab];C[]
+          (;B[bc] (;W[ca];B[da]) (;W[cb]))
+          (;B[bd];W[ca] (;B[da])(;B[db];W[ea]) )
+        )"""),
+        [{'C': ['abc'], 'AB': ['ab']}, {'C': ['']},
+         {'B': ['bc']}, {'W': ['ca']}, {'B': ['da']}])
+
+    # The skipped variations aren't tokenised
+    tc.assertEqual(main_line(r"(;B[aa](;W[bb])(;W[cc] junk [)\]] (;)) ! )"),
+                   [{'B': ['aa']}, {'W': ['bb']}])
+
+    def end_position(s):
+        _, end = sgf_grammar._parse_sgf_main_line(s, 0)
+        return end
+    tc.assertEqual(end_position("(;B[aa]) "), 8)
+    tc.assertEqual(end_position("(;B[aa](;W[bb])(;W[cc](;)[)]))) "), 30)
+
+    def check_error(msg, s):
+        tc.assertRaisesRegexp(ValueError, msg,
+                              sgf_grammar.parse_sgf_game, s, True)
+    check_error("no SGF data found", "(B[ag])")
+    check_error("property with no values", "(;B)")
+    check_error("unexpected value", "(;[ag])")
+    check_error("unexpected end of SGF data", "(;B[ag]")
+    check_error("unexpected end of SGF data", "(;B[ag][)]")
+    check_error("unexpected end of SGF data", "(;B[ag](;W[ah])")
+    check_error("unexpected end of SGF data", "(;B[ag](;W[ah])(;W[ai]")
+    check_error("unexpected end of SGF data", "(;B[ag](;W[ah])(;W[ai)])")
+    check_error("empty sequence", "(;B[ag]())")
+    check_error("empty sequence", "(;B[ag]((;W[ah])(;W[ai]))")
+    check_error("property value outside a node", "(;B[ag](W[ah];B[ai]))")
+
+def test_parser_main_line_only_deep_tree(tc):
+    s = "(;B[aa]" + "(;W[bb];B[cc])(;W[dd]" * 5000 + ")" * 5000 + ")"
+    sequence = sgf_grammar.parse_sgf_game(s, main_line_only=True).sequence
+    tc.assertEqual(sequence, [{'B': ['aa']}, {'W': ['bb']}, {'B': ['cc']}])
+    s = "(;B[aa]" + "(;W[bb];B[cc])" * 5000 + ")"
+    sequence = sgf_grammar.parse_sgf_game(s, main_line_only=True).sequence
+    tc.assertEqual(sequence, [{'B': ['aa']}, {'W': ['bb']}, {'B': ['cc']}])
+
+def test_parser_lazy(tc):
+    def materialise(coarse_game):
+        return ([sgf_grammar.get_property_map(node)
+                 for node in coarse_game.sequence],
+                [materialise(child) for child in coarse_game.children])
+
+    samples = [
+        "junk (;C[abc]KO[]AB[ai][bh][ee];B[ bc]) (;B[ag])",
+        r"(;C[ab \] \) cd\\];C[x]C[y]XX[1] Black[aa])",
+        """
+        (;C[abc]AB[ab];C[];C[]
+          (;B[bc])
+          (;B[bd];W[ca] (;B[da])(;B[db];W[ea]) )
+        )""",
+        "(;)",
+        "(;(;)(;))",
+        ]
+    for s in samples:
+        for main_line_only in (False, True):
+            tc.assertEqual(
+                materialise(sgf_grammar.parse_sgf_game(
+                    s, main_line_only, lazy=True)),
+                materialise(sgf_grammar.parse_sgf_game(s, main_line_only)))
+
+    coarse_game = sgf_grammar.parse_sgf_game(
+        "(;SZ[9];B[aa];C[x](;W[bb])(;W[cc]))", lazy=True)
+    tc.assertEqual(coarse_game.sequence[0], {'SZ': ['9']})
+    node = coarse_game.sequence[2]
+    tc.assertIsInstance(node, sgf_grammar.Unparsed_node)
+    properties = node.get_property_map()
+    tc.assertEqual(properties, {'C': ['x']})
+    tc.assertIs(node.get_property_map(), properties)
+    tc.assertEqual(
+        sgf_grammar.serialise_game_tree(coarse_game),
+        "(;SZ[9];B[aa];C[x](;W[bb])(;W[cc]))\n")
+
+    tc.assertEqual(
+        [sgf_grammar.get_property_map(node)
+         for node in sgf_grammar.main_sequence_iter(coarse_game)],
+        [{'SZ': ['9']}, {'B': ['aa']}, {'C': ['x']}, {'W': ['bb']}])
+
+    collection = sgf_grammar.parse_sgf_collection(
+        "(;C[a];B[aa]) (;C[b];W[bb])", lazy=True)
+    tc.assertEqual([materialise(game) for game in collection],
+                   [([{'C': ['a']}, {'B': ['aa']}], []),
+                    ([{'C': ['b']}, {'W': ['bb']}], [])])
+
+def test_parser_lazy_errors(tc):
+    samples = [
+        r"",
+        r"(B[ag])",
+        r"(;B)",
+        r"(;[ag])",
+        r"(;B[ag]",
+        r"(;B[ag][)]",
+        r"(;B;W[ah])",
+        r"(;B[ag](;[ah]))",
+        r"(;B W[ag])",
+        r"(;B[ag];W[ah] 1)",
+        r"(;B[ag];W" + "A" * 65 + "[ah])",
+        "(;B[ag];W[ah](;B[ai])",
+        "(;B[ag];())",
+        "(;B[ag]())",
+        "(;B[ag]((;W[ah])(;W[ai]))",
+        "(;B[ag];W[ah](;B[ai]);W[bd])",
+        "(;B[ag];(W[ah];B[ai]))",
+        "(;B[ag](;W[ah];)B[ai])",
+        "(;B[ag](;W[ah])(B[ai]))",
+        ]
+    def get_error(*args, **kwargs):
+        try:
+            sgf_grammar.parse_sgf_game(*args, **kwargs)
+        except ValueError, e:
+            return str(e)
+        return None
+    for s in samples:
+        for main_line_only in (False, True):
+            tc.assertEqual(
+                get_error(s, main_line_only, lazy=True),
+                get_error(s, main_line_only))
+            if not main_line_only:
+                tc.assertIsNotNone(get_error(s, lazy=True))
+
+def test_parser_lazy_mmap(tc):
+    s = "(;SZ[9]C[root];B[aa]C[comment];W[bb])"
+    pathname = os.path.join(tc.sandbox(), "game.sgf")
+    with open(pathname, "wb") as f:
+        f.write(s)
+    with open(pathname, "rb") as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    coarse_game = sgf_grammar.parse_sgf_game(mapping, lazy=True)
+    tc.assertEqual(
+        [sgf_grammar.get_property_map(node) for node in coarse_game.sequence],
+        [{'SZ': ['9'], 'C': ['root']}, {'B': ['aa'], 'C': ['comment']},
+         {'W': ['bb']}])
+    mapping.close()
+
 def test_parse_sgf_collection(tc):
     parse_sgf_collection = sgf_grammar.parse_sgf_collection
 
@@ -283,6 +466,51 @@ def test_parse_sgf_collection(tc):
                    "error parsing game 1: unexpected end of SGF data")
 
 
+def test_scan_sgf_root(tc):
+    scan_sgf_root = sgf_grammar.scan_sgf_root
+    s = ("junk (;GM[1]PB[Black \\] player]KM[6.5]AddWhite[aa][bb]"
+         ";B[cc];C[x];W[dd](;B[ee];W[ff](;B[ea])(;B[eb]))(;B[gg])) (;B[aa])")
+    pathname = os.path.join(tc.sandbox(), "game.sgf")
+    with open(pathname, "wb") as f:
+        f.write(s)
+    expected_root = {'GM': ['1'], 'PB': ['Black \\] player'], 'KM': ['6.5'],
+                     'AW': ['aa', 'bb']}
+    tc.assertEqual(scan_sgf_root(pathname), (expected_root, len(s), None))
+    tc.assertEqual(scan_sgf_root(pathname, count_moves=True),
+                   (expected_root, len(s), 5))
+    tc.assertEqual(scan_sgf_root(StringIO(s), count_moves=True),
+                   (expected_root, len(s), 5))
+
+    def move_count(s):
+        return scan_sgf_root(StringIO(s), count_moves=True)[2]
+    tc.assertEqual(move_count("(;)"), 0)
+    tc.assertEqual(move_count("(;B[aa])"), 1)
+    tc.assertEqual(move_count("(;B[aa](;W[bb]))"), 2)
+    tc.assertEqual(move_count("(;(;W[bb]C[x]B[cc]White[dd];BL[20]))"), 1)
+    tc.assertEqual(move_count("(;(;W[bb](;(;B[cc])))(;B[aa]))"), 2)
+    tc.assertEqual(
+        move_count("(; ;C[x]W[aa]; PL[B]Black[bb];BL[20]C[B[cc]])"), 2)
+
+    def check_error(msg, s, count_moves=False):
+        tc.assertRaisesRegexp(ValueError, msg,
+                              scan_sgf_root, StringIO(s), count_moves)
+    check_error("no SGF data found", "")
+    check_error("no SGF data found", "(B[ag])")
+    check_error("property with no values", "(;B)")
+    check_error("unexpected value", "(;[ag])")
+    check_error("unexpected end of SGF data", "(;B[ag]")
+    check_error("unexpected end of SGF data", "(;B[ag][)]")
+    check_error("unexpected end of SGF data", "(;B[ag];W[bb]", True)
+    check_error("unexpected end of SGF data", "(;B[ag](;W[bb])(;W[cc]", True)
+    check_error("unexpected end of SGF data", "(;B[ag];W[b", True)
+    check_error("property value outside a node", "(;B[ag](W[bb]))", True)
+    # Problems after the root node aren't noticed unless we count moves
+    tc.assertEqual(scan_sgf_root(StringIO("(;B[ag];W[bb]")),
+                   ({'B': ['ag']}, 13, None))
+
+    tc.assertRaises(EnvironmentError, scan_sgf_root,
+                    os.path.join(tc.sandbox(), "nonexistent.sgf"))
+
 def test_parse_compose(tc):
     pc = sgf_grammar.parse_compose
     tc.assertEqual(pc("word"), ("word", None))
@@ -377,3 +605,61 @@ def test_serialise_game_tree(tc):
     tc.assertEqual(sgf_grammar.serialise_game_tree(coarse_game, wrap=None),
                    serialised.replace("\n", "")+"\n")
 
+
+def test_iter_sgf_collection(tc):
+    iter_sgf_collection = sgf_grammar.iter_sgf_collection
+    s = "junk (;C[abc];B[aa])\n(;C[d(;ef]) (;X[] (;B[cc])(;W[dd]))\n"
+    pathname = os.path.join(tc.sandbox(), "collection.sgf")
+    with open(pathname, "wb") as f:
+        f.write(s)
+
+    def offsets(*args, **kwargs):
+        return [(start, end) for (start, end, _)
+                in iter_sgf_collection(*args, **kwargs)]
+
+    expected = [(5, 20), (21, 32), (33, 56)]
+    tc.assertEqual(offsets(pathname), expected)
+    tc.assertEqual(offsets(StringIO(s)), expected)
+    with open(pathname, "rb") as f:
+        f.read(10)
+        tc.assertEqual(offsets(f), expected)
+        tc.assertFalse(f.closed)
+    for start, end in expected:
+        tc.assertEqual(s[start], "(")
+        tc.assertEqual(s[end-1], ")")
+
+    games = [game_tree for (_, _, game_tree) in iter_sgf_collection(pathname)]
+    tc.assertEqual(len(games), 3)
+    tc.assertEqual(games[1].sequence, [{'C' : ['d(;ef']}])
+    tc.assertEqual(len(games[2].children), 2)
+
+    main_lines = [game_tree.sequence for (_, _, game_tree)
+                  in iter_sgf_collection(pathname, main_line_only=True)]
+    tc.assertEqual(main_lines[2], [{'X' : ['']}, {'B' : ['cc']}])
+    tc.assertEqual(offsets(pathname, main_line_only=True), expected)
+
+    # Resuming and sharding
+    tc.assertEqual(offsets(pathname, 20), expected[1:])
+    tc.assertEqual(offsets(pathname, 21), expected[1:])
+    tc.assertEqual(offsets(pathname, 0, 21), expected[:1])
+    tc.assertEqual(offsets(pathname, 0, 22), expected[:2])
+    tc.assertEqual(offsets(pathname, 21, 33), expected[1:2])
+    tc.assertEqual(offsets(pathname, 56), [])
+
+    empty_pathname = os.path.join(tc.sandbox(), "empty.sgf")
+    open(empty_pathname, "wb").close()
+    tc.assertEqual(offsets(empty_pathname), [])
+    tc.assertEqual(offsets(StringIO("no games")), [])
+
+    tc.assertRaises(EnvironmentError, offsets,
+                    os.path.join(tc.sandbox(), "nonexistent.sgf"))
+
+def test_iter_sgf_collection_error(tc):
+    s = "(;C[abc]) (;B[ag](;W[ah]) (;C[def])"
+    games = sgf_grammar.iter_sgf_collection(StringIO(s))
+    tc.assertEqual(games.next()[:2], (0, 9))
+    with tc.assertRaises(ValueError) as ar:
+        games.next()
+    tc.assertEqual(str(ar.exception),
+                   "error parsing game at offset 10: "
+                   "unexpected end of SGF data")
@@ -3,6 +3,8 @@
 
 from __future__ import with_statement
 
+import cPickle as pickle
+import os
 from textwrap import dedent
 
 from gomill_tests import gomill_test_support
@@ -612,6 +614,70 @@ def test_main_sequence(tc):
         if tree_node:
             tree_node = tree_node[0]
 
+def test_main_line_only(tc):
+    sgf_game = sgf.Sgf_game.from_string(SAMPLE_SGF_VAR, main_line_only=True)
+    nodes = sgf_game.get_main_sequence()
+    tc.assertEqual(len(nodes), 8)
+    tc.assertEqual([node.get_move() for node in nodes[-3:]],
+                   [('b', (8, 8)), ('w', (7, 8)), ('b', (6, 8))])
+    tc.assertEqual(len(nodes[-4]), 1)
+    tc.assertEqual(sgf_game.get_komi(), 7.5)
+    tc.assertEqual(sgf_game.get_size(), 9)
+
+def test_lazy_parsing(tc):
+    sgf_game = sgf.Sgf_game.from_string(SAMPLE_SGF_VAR, lazy=True)
+    eager_game = sgf.Sgf_game.from_string(SAMPLE_SGF_VAR)
+    tc.assertEqual(sgf_game.serialise(), eager_game.serialise())
+    tc.assertEqual(sgf_game.get_komi(), 7.5)
+
+    nodes = list(sgf_game.main_sequence_iter())
+    eager_nodes = list(eager_game.main_sequence_iter())
+    tc.assertEqual([node.get_move() for node in nodes],
+                   [node.get_move() for node in eager_nodes])
+    # Nodes from main_sequence_iter() share the tree nodes' property maps
+    tree_nodes = sgf_game.get_main_sequence()
+    nodes[3].set('C', "new comment")
+    tc.assertEqual(tree_nodes[3].get('C'), "new comment")
+    tc.assertIs(nodes[2].get_raw_property_map(),
+                tree_nodes[2].get_raw_property_map())
+    tc.assertEqual(str(tree_nodes[2]), "C[comment\non two lines]\nW[ef]\n")
+    last = sgf_game.get_last_node()
+    tc.assertEqual(last.get_move(), ('b', (6, 8)))
+
+    tc.assertRaisesRegexp(ValueError, "unexpected end of SGF data",
+                          sgf.Sgf_game.from_string, "(;SZ[9];B[aa]", lazy=True)
+
+def test_node_get_cache(tc):
+    sgf_game = sgf.Sgf_game.from_string(SAMPLE_SGF)
+    node = sgf_game.get_main_sequence()[2]
+    comment = node.get('C')
+    tc.assertEqual(comment, "comment\non two lines")
+    tc.assertIs(node.get('C'), comment)
+    move = node.get('W')
+    tc.assertIs(node.get('W'), move)
+
+    node.set('C', "changed")
+    tc.assertEqual(node.get('C'), "changed")
+    node.set_raw('C', "raw")
+    tc.assertEqual(node.get('C'), "raw")
+    node.unset('C')
+    tc.assertRaises(KeyError, node.get, 'C')
+
+    node.set('C', "hello")
+    tc.assertEqual(node.get('C'), "hello")
+    node.get_raw_list('C')[0] = "modified"
+    tc.assertEqual(node.get('C'), "modified")
+
+    root = sgf_game.get_root()
+    ab = root.get('AB')
+    tc.assertEqual(ab, set([(0, 0), (1, 1), (4, 4)]))
+    tc.assertIsNot(root.get('AB'), ab)
+
+    presenter = sgf_game.get_property_presenter()
+    tc.assertEqual(root.get('DT'), "2009-06-06")
+    presenter.register_property('DT', presenter.get_property_type('SZ'))
+    tc.assertRaises(ValueError, root.get, 'DT')
+
 def test_find(tc):
     sgf_game = sgf.Sgf_game.from_string(SAMPLE_SGF_VAR)
     root = sgf_game.get_root()
@@ -802,3 +868,32 @@ def test_add_comment_text(tc):
     root.add_comment_text("hello\naga]in")
     tc.assertEqual(root.get('C'), "hello\nworld\n\nhello\naga]in")
 
+def test_scan_sgf_file(tc):
+    pathname = os.path.join(tc.sandbox(), "game.sgf")
+    with open(pathname, "wb") as f:
+        f.write(SAMPLE_SGF_VAR)
+    summary = sgf.scan_sgf_file(pathname)
+    tc.assertEqual(summary.pathname, pathname)
+    tc.assertEqual(summary.file_size, len(SAMPLE_SGF_VAR))
+    tc.assertIsNone(summary.move_count)
+    tc.assertEqual(summary.root_properties['PB'], ["Black engine"])
+    tc.assertEqual(summary.root_properties['AB'], ["ai", "bh", "ee"])
+    tc.assertEqual(sgf.scan_sgf_file(pathname, count_moves=True).move_count, 6)
+
+    summary = pickle.loads(pickle.dumps(summary, protocol=2))
+    game = summary.get_root_game()
+    tc.assertEqual(game.get_size(), 9)
+    tc.assertEqual(game.get_komi(), 7.5)
+    tc.assertEqual(game.get_player_name('b'), "Black engine")
+    tc.assertEqual(game.get_winner(), 'w')
+    tc.assertEqual(game.get_charset(), "UTF-8")
+    tc.assertEqual(len(game.get_root()), 0)
+
+    game = summary.get_root_game(override_encoding="iso8859-1")
+    tc.assertEqual(game.get_charset(), "ISO-8859-1")
+    tc.assertEqual(summary.root_properties['CA'], ["utf-8"])
+
+    with open(pathname, "wb") as f:
+        f.write("(;SZ[9]B")
+    tc.assertRaisesRegexp(ValueError, "unexpected end of SGF data",
+                          sgf.scan_sgf_file, pathname)